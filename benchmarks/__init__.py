@@ -0,0 +1,5 @@
+"""
+v2/benchmarks
+
+AP2エンドツーエンド負荷試験・ベンチマークスイート
+"""
@@ -0,0 +1,256 @@
+"""
+v2/benchmarks/fakes.py
+
+ベンチマーク用のローカルフェイク（外部依存のスタンドイン）
+
+- FakeMeilisearch: 商品インデックスの作成・ドキュメント追加・全文検索（部分一致）
+- FakeRedis: RedisClientが使うコマンドのインメモリ実装（redis.asyncio.from_urlの差し替え用）
+
+いずれも計測対象外の依存なので、応答遅延は固定値（既定0秒）で注入する。
+LLM（DMRの代替）はサービスのイメージからも起動できるよう common/fake_llm.py にある。
+"""
+
+import asyncio
+import fnmatch
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+# ========================================
+# Meilisearch
+# ========================================
+
+# MeilisearchClient.configure_indexのsearchableAttributesと同じ
+SEARCHABLE_ATTRIBUTES = ("name", "description", "keywords", "category", "brand")
+
+
+def create_fake_meilisearch_app(latency_seconds: float = 0.0) -> FastAPI:
+    """
+    フェイクMeilisearchアプリを作成（MeilisearchClientが使うAPIのみ）
+
+    検索はクエリの各語がいずれかの検索対象フィールドに含まれるドキュメントを返す（空クエリは全件）。
+    一致がない場合は末尾の語から順に外す（Meilisearchの既定のmatchingStrategy: last）。
+    """
+    app = FastAPI(title="Fake Meilisearch")
+    indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    task_counter = iter(range(1, 1 << 62))
+    app.state.indexes = indexes
+
+    def task(index_uid: str, task_type: str) -> JSONResponse:
+        return JSONResponse(
+            {"taskUid": next(task_counter), "indexUid": index_uid, "status": "enqueued", "type": task_type},
+            status_code=202
+        )
+
+    @app.post("/indexes")
+    async def create_index(request: Request):
+        body = await request.json()
+        indexes.setdefault(body["uid"], {})
+        return task(body["uid"], "indexCreation")
+
+    @app.patch("/indexes/{index_uid}/settings")
+    async def update_settings(index_uid: str):
+        return task(index_uid, "settingsUpdate")
+
+    @app.post("/indexes/{index_uid}/documents")
+    async def add_documents(index_uid: str, request: Request):
+        documents = indexes.setdefault(index_uid, {})
+        for document in await request.json():
+            documents[str(document["id"])] = document
+        return task(index_uid, "documentAdditionOrUpdate")
+
+    @app.delete("/indexes/{index_uid}/documents/{document_id}")
+    async def delete_document(index_uid: str, document_id: str):
+        indexes.get(index_uid, {}).pop(document_id, None)
+        return task(index_uid, "documentDeletion")
+
+    @app.delete("/indexes/{index_uid}/documents")
+    async def clear_documents(index_uid: str):
+        indexes.get(index_uid, {}).clear()
+        return task(index_uid, "documentDeletion")
+
+    @app.post("/indexes/{index_uid}/search")
+    async def search(index_uid: str, request: Request):
+        body = await request.json()
+        query = body.get("q") or ""
+        limit = int(body.get("limit", 20))
+        terms = [term.lower() for term in query.split()]
+
+        # Meilisearchの既定（matchingStrategy: last）と同様に、一致がなければ末尾の語から外して再検索
+        documents = [
+            (document["id"], " ".join(str(document.get(field, "")) for field in SEARCHABLE_ATTRIBUTES).lower())
+            for document in indexes.get(index_uid, {}).values()
+        ]
+        hits: List[Dict[str, Any]] = []
+        for used in range(len(terms), -1, -1):
+            hits = [{"id": doc_id} for doc_id, text in documents if all(term in text for term in terms[:used])]
+            if hits or used == 0:
+                break
+        hits = hits[:limit]
+
+        if latency_seconds > 0:
+            await asyncio.sleep(latency_seconds)
+        return {"hits": hits, "query": query, "limit": limit, "estimatedTotalHits": len(hits)}
+
+    return app
+
+
+# ========================================
+# Redis
+# ========================================
+
+class FakeRedis:
+    """
+    redis.asyncio.Redis（decode_responses=True）のインメモリ代替
+
+    RedisClientが使うコマンド（文字列・ソート済みセット・パイプライン）のみ実装する。
+    有効期限は読み取り時に判定する。Luaスクリプト（register_script）は未対応。
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+        self._expires_at: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._values.pop(key, None)
+            self._expires_at.pop(key, None)
+        return key in self._values
+
+    def _set_ttl(self, key: str, seconds: Optional[float]) -> None:
+        if seconds:
+            self._expires_at[key] = time.monotonic() + seconds
+        else:
+            self._expires_at.pop(key, None)
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._alive(key):
+            return None
+        self._values[key] = value
+        self._set_ttl(key, ex)
+        return True
+
+    async def setex(self, key: str, seconds: int, value: str) -> bool:
+        return await self.set(key, value, ex=seconds)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._values[key] if self._alive(key) else None
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self._values[key]
+                self._expires_at.pop(key, None)
+                deleted += 1
+        return deleted
+
+    async def exists(self, key: str) -> int:
+        return int(self._alive(key))
+
+    async def ttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        expires_at = self._expires_at.get(key)
+        return -1 if expires_at is None else max(0, int(expires_at - time.monotonic()))
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        return [key for key in list(self._values) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    async def expire(self, key: str, seconds: int, nx: bool = False, gt: bool = False) -> bool:
+        if not self._alive(key):
+            return False
+        current = self._expires_at.get(key)
+        new_expiry = time.monotonic() + seconds
+        if nx and current is not None:
+            return False
+        if gt and (current is None or new_expiry <= current):
+            return False
+        self._expires_at[key] = new_expiry
+        return True
+
+    def _zset(self, key: str) -> Dict[str, float]:
+        if not self._alive(key):
+            self._values[key] = {}
+        return self._values[key]
+
+    async def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        zset = self._zset(key)
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    async def zrangebyscore(
+        self,
+        key: str,
+        min_score: float,
+        max_score: float,
+        start: Optional[int] = None,
+        num: Optional[int] = None
+    ) -> List[str]:
+        if not self._alive(key):
+            return []
+        members = sorted(
+            (score, member) for member, score in self._values[key].items() if min_score <= score <= max_score
+        )
+        result = [member for _, member in members]
+        if start is not None and num is not None:
+            result = result[start:start + num]
+        return result
+
+    async def zrem(self, key: str, *members: str) -> int:
+        if not self._alive(key):
+            return 0
+        zset = self._values[key]
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def pipeline(self, transaction: bool = False) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def register_script(self, script: str):
+        raise NotImplementedError("FakeRedis does not support Lua scripts")
+
+    async def close(self) -> None:
+        pass
+
+
+class FakePipeline:
+    """FakeRedis.pipeline()（コマンドを記録してexecute()で順に実行）"""
+
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._commands.clear()
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeRedisServer:
+    """接続URLごとにFakeRedisを保持（同じURLのRedisClient同士でデータを共有）"""
+
+    def __init__(self):
+        self.databases: Dict[str, FakeRedis] = {}
+
+    async def from_url(self, url: str, **kwargs) -> FakeRedis:
+        """redis.asyncio.from_urlの差し替え"""
+        return self.databases.setdefault(url, FakeRedis())
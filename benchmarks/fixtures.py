@@ -0,0 +1,184 @@
+"""
+v2/benchmarks/fixtures.py
+
+ベンチマーク用のMandateフィクスチャとシミュレートしたユーザーデバイス
+
+- build_cart_mandate: Merchant Agentが生成する形式のCartMandate（商品数を指定）
+- build_payment_mandate: CartMandateに対応するPaymentMandate（user_authorizationなし）
+- SimulatedDevice: Passkey（ES256）を持つユーザーデバイス。WebAuthn assertionに署名し、
+  user_authorization（SD-JWT+KB）を生成する
+"""
+
+import base64
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+import cbor2
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from common.user_authorization import base64url_encode, create_user_authorization_vp
+
+# マイクロベンチマークのカートサイズ（商品数）
+CART_SIZES: Dict[str, int] = {"small": 1, "medium": 20, "large": 200}
+
+MERCHANT_ID = "did:ap2:merchant:mugibo_merchant"
+PAYMENT_METHOD_TYPE = "https://a2a-protocol.org/payment-methods/ap2-payment"
+
+
+def _amount(value: float) -> Dict[str, Any]:
+    return {"value": float(value), "currency": "JPY"}
+
+
+def build_cart_mandate(items: int, cart_id: str = "cart_bench") -> Dict[str, Any]:
+    """
+    Merchant Agentが生成する形式のCartMandateを作成（merchant_authorizationなし）
+
+    Args:
+        items: 商品数（display_itemsには商品ごとの行と消費税・送料の行が入る）
+        cart_id: カートID
+    """
+    raw_items = []
+    for index in range(items):
+        price = 500 + (index % 12) * 250
+        raw_items.append({
+            "product_id": str(uuid.UUID(int=index + 1)),
+            "name": f"むぎぼーグッズ No.{index + 1}",
+            "description": f"むぎぼーのオリジナルグッズ（{index + 1}番）。ギフトにもおすすめです。",
+            "quantity": 1 + index % 3,
+            "unit_price": _amount(price),
+            "total_price": _amount(price * (1 + index % 3)),
+            "image_url": f"/assets/むぎぼーグッズ{index + 1}.png"
+        })
+
+    subtotal = sum(item["total_price"]["value"] for item in raw_items)
+    tax = round(subtotal * 0.1)
+    shipping = 500.0
+    display_items = [
+        {"label": item["name"], "amount": item["total_price"], "refund_period": 2592000}
+        for item in raw_items
+    ]
+    display_items.append({"label": "消費税（10%）", "amount": _amount(tax), "refund_period": 0})
+    display_items.append({"label": "送料", "amount": _amount(shipping), "refund_period": 0})
+
+    now = datetime.now(timezone.utc)
+    return {
+        "contents": {
+            "id": cart_id,
+            "user_cart_confirmation_required": True,
+            "payment_request": {
+                "method_data": [{
+                    "supported_methods": PAYMENT_METHOD_TYPE,
+                    "data": {
+                        "version": "0.2",
+                        "processor": "did:ap2:agent:payment_processor",
+                        "supportedMethods": ["credential-based", "attestation-based"],
+                        "supportedNetworks": ["visa", "mastercard", "jcb", "amex"],
+                        "supportedTypes": ["credit", "debit"]
+                    }
+                }],
+                "details": {
+                    "id": cart_id,
+                    "display_items": display_items,
+                    "total": {"label": "合計", "amount": _amount(subtotal + tax + shipping)}
+                },
+                "options": {
+                    "request_payer_name": True,
+                    "request_payer_email": True,
+                    "request_payer_phone": False,
+                    "request_shipping": True,
+                    "shipping_type": "shipping"
+                },
+                "shipping_address": {
+                    "recipient": "山田太郎",
+                    "postal_code": "150-0001",
+                    "city": "渋谷区",
+                    "region": "東京都",
+                    "address_line1": "神宮前1-1-1",
+                    "country": "JP"
+                }
+            },
+            "cart_expiry": (now + timedelta(hours=1)).isoformat().replace("+00:00", "Z"),
+            "merchant_name": "むぎぼーショップ"
+        },
+        "_metadata": {
+            "intent_mandate_id": "intent_bench",
+            "merchant_id": MERCHANT_ID,
+            "created_at": now.isoformat().replace("+00:00", "Z"),
+            "cart_name": f"ベンチマークプラン（{items}点）",
+            "raw_items": raw_items
+        }
+    }
+
+
+def build_payment_mandate(cart_mandate: Dict[str, Any], user_id: str = "user_demo_001") -> Dict[str, Any]:
+    """CartMandateに対応するPaymentMandateを作成（user_authorizationなし）"""
+    total = cart_mandate["contents"]["payment_request"]["details"]["total"]["amount"]
+    return {
+        "id": f"payment_{cart_mandate['contents']['id']}",
+        "cart_mandate_id": cart_mandate["contents"]["id"],
+        "intent_mandate_id": cart_mandate.get("_metadata", {}).get("intent_mandate_id", "intent_bench"),
+        "payer_id": user_id,
+        "payee_id": cart_mandate.get("_metadata", {}).get("merchant_id", MERCHANT_ID),
+        "amount": {"value": total["value"], "currency": total["currency"]},
+        "payment_method": {
+            "type": "card",
+            "token": "tok_bench_0000000000000000",
+            "last4": "4242",
+            "brand": "visa"
+        },
+        "risk_score": 10,
+        "fraud_indicators": []
+    }
+
+
+class SimulatedDevice:
+    """Passkey（ES256）を持つユーザーデバイス（WebAuthnのブラウザ・認証器の代替）"""
+
+    def __init__(self, credential_id: str = "benchmark_device", origin: str = "http://localhost:3000"):
+        self.credential_id = credential_id
+        self.origin = origin
+        self.private_key = ec.generate_private_key(ec.SECP256R1())
+
+        # COSE形式の公開鍵（kty=EC2, alg=ES256, crv=P-256）
+        numbers = self.private_key.public_key().public_numbers()
+        self.public_key_cose = base64.b64encode(cbor2.dumps({
+            1: 2, 3: -7, -1: 1,
+            -2: numbers.x.to_bytes(32, "big"),
+            -3: numbers.y.to_bytes(32, "big"),
+        })).decode("ascii")
+
+    def assertion(self) -> Dict[str, Any]:
+        """WebAuthn assertion（navigator.credentials.get()の応答）を作成"""
+        client_data_json = json.dumps({
+            "type": "webauthn.get",
+            "challenge": base64url_encode(uuid.uuid4().bytes),
+            "origin": self.origin
+        }).encode()
+        # rpIdHash || flags（UP|UV） || signCount
+        authenticator_data = hashlib.sha256(b"localhost").digest() + b"\x05" + (1).to_bytes(4, "big")
+        signature = self.private_key.sign(
+            authenticator_data + hashlib.sha256(client_data_json).digest(),
+            ec.ECDSA(hashes.SHA256())
+        )
+        return {
+            "id": self.credential_id,
+            "response": {
+                "clientDataJSON": base64url_encode(client_data_json),
+                "authenticatorData": base64url_encode(authenticator_data),
+                "signature": base64url_encode(signature)
+            }
+        }
+
+    def authorize(self, cart_mandate: Dict[str, Any], payment_mandate: Dict[str, Any], user_id: str) -> str:
+        """CartMandate・PaymentMandateに対するuser_authorization（SD-JWT+KB）を生成"""
+        return create_user_authorization_vp(
+            webauthn_assertion=self.assertion(),
+            cart_mandate=cart_mandate,
+            payment_mandate_contents=payment_mandate,
+            user_id=user_id,
+            public_key_cose=self.public_key_cose
+        )
@@ -0,0 +1,306 @@
+"""
+v2/benchmarks/harness.py
+
+AP2サービス群のインプロセス起動（ASGIトランスポート）
+
+- 実際のFastAPIアプリ（Merchant Agent・Merchant Agent MCP・Merchant・Credential Provider・
+  Payment Processor・Payment Network）を1つのイベントループ上で起動し、lifespan（startup/shutdown）も実行
+- httpx.AsyncClientの既定トランスポートをホスト名ルーティングのASGIトランスポートに差し替え、
+  サービス間通信（http://merchant:8002 等のDocker Compose上のURL）をそのままインプロセスで処理
+- LLM（DMR）・Meilisearch・Redisはbenchmarks/fakes.pyのフェイクに差し替え
+- 鍵・DIDドキュメント・SQLiteデータベース・領収書・清算ファイルは作業ディレクトリ（既定は一時ディレクトリ）に作成
+- サービスごとのレイテンシ（呼び出し側から見た応答時間）をLatencyRecorderに記録
+"""
+
+import importlib
+import os
+import secrets
+import shutil
+import tempfile
+import time
+from contextlib import AsyncExitStack, redirect_stdout
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from benchmarks.fakes import FakeRedisServer, create_fake_meilisearch_app
+from benchmarks.stats import LatencyRecorder
+from common.fake_llm import create_fake_llm_app
+
+# サービス名 → Docker Compose環境のURL（各サービスのハードコード値・環境変数の既定値と同じ）
+SERVICE_URLS: Dict[str, str] = {
+    "merchant_agent": "http://merchant_agent:8001",
+    "merchant_agent_mcp": "http://merchant_agent_mcp:8011",
+    "merchant": "http://merchant:8002",
+    "credential_provider": "http://credential_provider:8003",
+    "payment_processor": "http://payment_processor:8004",
+    "payment_network": "http://payment_network:8005",
+    "llm": "http://llm",
+    "meilisearch": "http://meilisearch:7700",
+}
+
+# ベンチマーク中に無効化する環境変数（外部プロセス・実Redisを前提とする設定）
+UNSET_ENV = ("KEY_AGENT_SOCKET", "ADMISSION_RATE_LIMIT_REDIS_URL", "OTEL_ENABLED", "LANGFUSE_ENABLED")
+
+
+class RoutingTransport(httpx.AsyncBaseTransport):
+    """
+    ホスト名でASGIアプリに振り分けるトランスポート（サービスごとのレイテンシを記録）
+
+    http_moduleにはリクエストを発行するクライアントのhttpx互換モジュールを指定する
+    （openai SDKがhttpx以外の互換パッケージを同梱・依存している環境向け）。
+    """
+
+    def __init__(self, recorder: LatencyRecorder, http_module: Any = httpx):
+        self._http = http_module
+        self._transports: Dict[str, Any] = {}
+        self._services: Dict[str, str] = {}
+        self.recorder = recorder
+
+    def mount(self, service: str, app: Any) -> None:
+        """SERVICE_URLSのホスト名にASGIアプリを割り当て"""
+        host = urlsplit(SERVICE_URLS[service]).hostname
+        self._transports[host] = self._http.ASGITransport(app=app, raise_app_exceptions=False)
+        self._services[host] = service
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        transport = self._transports.get(host)
+        if transport is None:
+            raise self._http.ConnectError(f"No in-process service for host: {host}", request=request)
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await transport.handle_async_request(request)
+            ok = response.status_code < 400
+            return response
+        finally:
+            self.recorder.record(self._services.get(host, host), time.perf_counter() - started, ok)
+
+
+class InProcessCluster:
+    """
+    AP2サービス群のインプロセスクラスター
+
+    使用例:
+        async with InProcessCluster() as cluster:
+            async with cluster.client() as client:
+                await client.get(f"{SERVICE_URLS['merchant_agent']}/health")
+    """
+
+    def __init__(
+        self,
+        work_dir: Optional[str] = None,
+        llm_latency: Union[str, float] = 0.0,
+        llm_token_latency_ms: float = 0.0,
+        llm_seed: Optional[int] = None,
+        search_latency_seconds: float = 0.0,
+        ai_mode: bool = True
+    ):
+        """
+        Args:
+            work_dir: 鍵・DB等の作成先（指定なしの場合は一時ディレクトリを作成し、停止時に削除）
+            llm_latency: フェイクLLMの最初のトークンまでの時間（ミリ秒、または"lognormal:800:0.5"等の分布）
+            llm_token_latency_ms: フェイクLLMのトークンあたりの時間
+            llm_seed: フェイクLLMの応答時間の乱数シード
+            search_latency_seconds: フェイクMeilisearchの検索遅延
+            ai_mode: Merchant AgentのLangGraph（LLM）モード。Falseの場合はルールベースのカート生成
+        """
+        self._owns_work_dir = work_dir is None
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="ap2_bench_"))
+        self.keys_directory = self.work_dir / "keys"
+        self.ai_mode = ai_mode
+        self.recorder = LatencyRecorder()
+        self.redis = FakeRedisServer()
+        self.llm_app = create_fake_llm_app(llm_latency, llm_token_latency_ms, seed=llm_seed)
+        self.search_app = create_fake_meilisearch_app(search_latency_seconds)
+        self.passphrases: Dict[str, str] = {}
+        self.services: Dict[str, Any] = {}
+        self.transport: Optional[RoutingTransport] = None
+        self._transports: List[RoutingTransport] = []
+
+        self._saved_env: Dict[str, Optional[str]] = {}
+        self._restore: list = []
+        self._lifespans: Optional[AsyncExitStack] = None
+
+    async def __aenter__(self) -> "InProcessCluster":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def url(self, service: str) -> str:
+        return SERVICE_URLS[service]
+
+    def client(self, **kwargs) -> httpx.AsyncClient:
+        """クラスター内のサービスにルーティングされるHTTPクライアント"""
+        return httpx.AsyncClient(transport=self.transport, **kwargs)
+
+    # ========================================
+    # 起動・停止
+    # ========================================
+
+    async def start(self) -> None:
+        """鍵生成 → 依存の差し替え → サービス構築 → lifespan実行"""
+        self._generate_keys()
+        self._configure_env()
+
+        self.transport = RoutingTransport(self.recorder)
+        self._transports = [self.transport]
+        self._patch_dependencies()
+        self._mount("llm", self.llm_app)
+        self._mount("meilisearch", self.search_app)
+
+        # 構築時に環境変数（DATABASE_URL等）を読むため1つずつ構築
+        for name in ("payment_network", "credential_provider", "payment_processor", "merchant",
+                     "merchant_agent", "merchant_agent_mcp"):
+            self.services[name] = self._build_service(name)
+            self._mount(name, self.services[name].app)
+
+        # 起動時のシードデータ投入はstdoutに進捗を出力するため抑制
+        self._lifespans = AsyncExitStack()
+        with redirect_stdout(StringIO()):
+            for service in self.services.values():
+                await self._lifespans.enter_async_context(service.app.router.lifespan_context(service.app))
+
+    async def stop(self) -> None:
+        """lifespan（shutdown）を実行し、差し替えと環境変数を元に戻す"""
+        try:
+            if self._lifespans is not None:
+                await self._lifespans.aclose()
+                self._lifespans = None
+        finally:
+            while self._restore:
+                target, attribute, value = self._restore.pop()
+                setattr(target, attribute, value)
+            for name, value in self._saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            self._saved_env.clear()
+            if self._owns_work_dir:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    # ========================================
+    # 内部処理
+    # ========================================
+
+    def _setenv(self, name: str, value: Optional[str]) -> None:
+        self._saved_env.setdefault(name, os.environ.get(name))
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+    def _patch(self, target: Any, attribute: str, value: Any) -> None:
+        self._restore.append((target, attribute, getattr(target, attribute)))
+        setattr(target, attribute, value)
+
+    def _mount(self, service: str, app: Any) -> None:
+        for transport in self._transports:
+            transport.mount(service, app)
+
+    def _database_url(self, name: str) -> str:
+        return f"sqlite+aiosqlite:///{self.work_dir / 'data' / f'{name}.db'}"
+
+    def _generate_keys(self) -> None:
+        """scripts/init_keys.pyで全エージェントの鍵とDIDドキュメントを生成（DIDResolverはkeysの隣のdataを参照）"""
+        from scripts import init_keys
+
+        did_documents = self.work_dir / "data" / "did_documents"
+        self.keys_directory.mkdir(parents=True, exist_ok=True)
+        did_documents.mkdir(parents=True, exist_ok=True)
+
+        for agent in init_keys.AGENTS:
+            self.passphrases[agent["agent_id"]] = secrets.token_urlsafe(24)
+            self._setenv(agent["env_var"], self.passphrases[agent["agent_id"]])
+
+        self._patch(init_keys, "KEYS_DIR", self.keys_directory)
+        self._patch(init_keys, "DID_DOCS_DIR", did_documents)
+        with redirect_stdout(StringIO()):
+            initializer = init_keys.KeyInitializer()
+            for agent in init_keys.AGENTS:
+                initializer.initialize_agent(agent)
+
+    def _configure_env(self) -> None:
+        for name in UNSET_ENV:
+            self._setenv(name, None)
+        self._setenv("AP2_KEYS_DIRECTORY", str(self.keys_directory))
+        self._setenv("MERCHANT_AI_MODE", "true" if self.ai_mode else "false")
+        self._setenv("DMR_API_URL", f"{SERVICE_URLS['llm']}/v1")
+        self._setenv("DMR_API_KEY", "benchmark")
+        self._setenv("MEILISEARCH_URL", SERVICE_URLS["meilisearch"])
+        self._setenv("MERCHANT_MCP_URL", SERVICE_URLS["merchant_agent_mcp"])
+        self._setenv("MERCHANT_URL", SERVICE_URLS["merchant"])
+        self._setenv("PAYMENT_NETWORK_URL", SERVICE_URLS["payment_network"])
+        self._setenv("RECEIPTS_DIR", str(self.work_dir / "receipts"))
+        self._setenv("SETTLEMENT_DIR", str(self.work_dir / "settlement"))
+
+    def _patch_dependencies(self) -> None:
+        """httpx.AsyncClient（openai SDKが使う互換パッケージを含む）の既定トランスポートとRedis接続を差し替え"""
+        import openai
+
+        from common import redis_client
+
+        self._patch_client_transport(httpx, self.transport)
+        openai_http = importlib.import_module(openai.DefaultAsyncHttpxClient.__mro__[1].__module__.partition(".")[0])
+        if openai_http is not httpx:
+            transport = RoutingTransport(self.recorder, http_module=openai_http)
+            self._transports.append(transport)
+            self._patch_client_transport(openai_http, transport)
+        self._patch(redis_client.redis, "from_url", self.redis.from_url)
+
+    def _patch_client_transport(self, http_module: Any, transport: RoutingTransport) -> None:
+        """
+        AsyncClientのトランスポートをRoutingTransportに固定
+
+        langchain-openaiはソケットオプション付きのAsyncHTTPTransport（またはプロキシ用のmounts）を
+        明示的に渡すため、既定値の補完ではなくネットワーク向けトランスポートを置き換える。
+        """
+        original_init = http_module.AsyncClient.__init__
+
+        def init_with_transport(client, *args, **kwargs):
+            if not isinstance(kwargs.get("transport"), (RoutingTransport, http_module.ASGITransport)):
+                kwargs["transport"] = transport
+                kwargs.pop("mounts", None)
+            original_init(client, *args, **kwargs)
+
+        self._patch(http_module.AsyncClient, "__init__", init_with_transport)
+
+    def _build_service(self, name: str) -> Any:
+        """サービスを構築（モジュール読み込み時に設定を読むサービスはモジュール変数を上書き）"""
+        from common.database import DatabaseManager
+
+        # Merchant Agent MCPはMerchant AgentのDBを参照する（Docker Composeと同じ構成）
+        self._setenv("DATABASE_URL", self._database_url("merchant_agent" if name == "merchant_agent_mcp" else name))
+        self._setenv("OTEL_SERVICE_NAME", name)
+
+        if name == "payment_network":
+            module = importlib.import_module("services.payment_network.network")
+            self._patch(module, "SETTLEMENT_DATABASE_URL", self._database_url(name))
+            self._patch(module, "SETTLEMENT_DIR", str(self.work_dir / "settlement"))
+            return module.PaymentNetworkService(network_name="DemoPaymentNetwork")
+        if name == "credential_provider":
+            from services.credential_provider.provider import CredentialProviderService
+            return CredentialProviderService()
+        if name == "payment_processor":
+            module = importlib.import_module("services.payment_processor.processor")
+            self._patch(module, "RECEIPTS_DIR", self.work_dir / "receipts")
+            return module.PaymentProcessorService()
+        if name == "merchant":
+            from services.merchant.service import MerchantService
+            return MerchantService()
+        if name == "merchant_agent":
+            from services.merchant_agent.agent import MerchantAgent
+            return MerchantAgent()
+        if name == "merchant_agent_mcp":
+            module = importlib.import_module("services.merchant_agent_mcp.main")
+            self._patch(module, "db_manager", DatabaseManager(self._database_url("merchant_agent")))
+            return module.mcp
+        raise ValueError(f"Unknown service: {name}")
@@ -0,0 +1,294 @@
+"""
+v2/benchmarks/loadgen.py
+
+Intent → Cart → Payment フローの非同期負荷生成
+
+ShoppingFlowClientがShopping Agent（A2A署名）とユーザーデバイス（Passkey署名）の役割を担い、
+1フローを以下のステージに分けて計測する:
+
+- intent: IntentMandate（A2A）→ Merchant Agent（LangGraph → LLM・MCP → Merchant署名）→ CartCandidates
+- credential: 支払い方法のトークン化 → デバイス証明（モックattestation）→ Payment NetworkのAgent Token発行
+- payment: PaymentMandate（A2A）→ Merchant Agent → Payment Processor（Mandate連鎖検証・CP認証情報検証・
+  Payment Networkチャージ）→ PaymentResult
+
+到着モデル:
+- closed: 同時実行数（ユーザー数）を固定し、各ユーザーが前のフロー完了後に次のフローを開始
+- open: 指定レート（フロー/秒）のポアソン到着。応答を待たずに開始する（--max-in-flight超過分は破棄して件数を記録）
+
+クライアント側の処理（メッセージ署名・user_authorization生成）は各ステージの計測に含めない。
+"""
+
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import httpx
+
+from benchmarks.fixtures import SimulatedDevice
+from benchmarks.harness import InProcessCluster
+from benchmarks.stats import LatencyRecorder
+from common.a2a_handler import A2AMessageHandler
+from common.base_agent import KEY_ALGORITHMS
+from common.crypto import KeyManager, SignatureManager
+from common.mandate_types import IntentMandate
+from common.user_authorization import base64url_encode
+
+SHOPPING_AGENT_DID = "did:ap2:agent:shopping_agent"
+MERCHANT_AGENT_DID = "did:ap2:agent:merchant_agent"
+
+STAGES = ("intent", "credential", "payment")
+
+DEFAULT_INTENTS = (
+    "むぎぼーのかわいいグッズがほしい",
+    "むぎぼーのTシャツとマグカップを探しています",
+    "3000円以内でむぎぼーのプレゼントを選びたい",
+)
+
+SHIPPING_ADDRESS = {
+    "recipient": "山田太郎",
+    "postal_code": "150-0001",
+    "city": "渋谷区",
+    "region": "東京都",
+    "address_line1": "神宮前1-1-1",
+    "country": "JP",
+}
+
+PAYMENT_METHOD = {
+    "type": "card",
+    "brand": "visa",
+    "last4": "4242",
+    "expiry_month": 12,
+    "expiry_year": 2030,
+    "holder_name": "山田太郎",
+}
+
+
+class FlowError(Exception):
+    """フローのステージ失敗（エラー応答・想定外のレスポンス）"""
+
+
+class ShoppingFlowClient:
+    """Shopping Agent・ユーザーデバイスとしてAP2フローを実行するクライアント"""
+
+    def __init__(self, cluster: InProcessCluster, client: httpx.AsyncClient, user_id: str = "user_demo_001"):
+        self.cluster = cluster
+        self.client = client
+        self.user_id = user_id
+        self.payment_method_id: Optional[str] = None
+
+        # Shopping AgentのA2A署名鍵（クラスター起動時に生成された鍵を使用）
+        key_manager = KeyManager(keys_directory=str(cluster.keys_directory))
+        for algorithm, _ in KEY_ALGORITHMS:
+            key_manager.load_private_key_encrypted(
+                "shopping_agent", cluster.passphrases["shopping_agent"], algorithm=algorithm
+            )
+        self.a2a = A2AMessageHandler(SHOPPING_AGENT_DID, key_manager, SignatureManager(key_manager))
+
+        # ユーザーデバイスのPasskey（ES256）。user_authorizationの生成に使用
+        self.device = SimulatedDevice()
+
+    async def setup(self) -> None:
+        """Credential Providerに支払い方法を登録"""
+        response = await self.client.post(
+            f"{self.cluster.url('credential_provider')}/payment-methods",
+            json={"user_id": self.user_id, "payment_method": dict(PAYMENT_METHOD)}
+        )
+        response.raise_for_status()
+        self.payment_method_id = response.json()["payment_method"]["id"]
+
+    async def run_flow(self, stages: LatencyRecorder, intent_text: str) -> None:
+        """1フローを実行し、ステージごとのレイテンシを記録（失敗時はFlowError等を送出）"""
+        cart_mandate, intent_mandate = await self._timed(stages, "intent", self._intent_stage(intent_text))
+        payment_mandate = await self._timed(
+            stages, "credential", self._credential_stage(cart_mandate, intent_mandate)
+        )
+        payment_mandate["user_authorization"] = self.device.authorize(cart_mandate, payment_mandate, self.user_id)
+        await self._timed(stages, "payment", self._payment_stage(cart_mandate, payment_mandate))
+
+    async def _timed(self, stages: LatencyRecorder, stage: str, work):
+        started = time.perf_counter()
+        try:
+            result = await work
+        except BaseException:
+            stages.record(stage, time.perf_counter() - started, ok=False)
+            raise
+        stages.record(stage, time.perf_counter() - started)
+        return result
+
+    async def _send_a2a(self, data_type: str, data_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Merchant AgentにA2Aメッセージを送信し、レスポンスのdataPartを返す"""
+        message = self.a2a.create_response_message(
+            recipient=MERCHANT_AGENT_DID,
+            data_type=data_type,
+            data_id=data_id,
+            payload=payload,
+            sign=True
+        )
+        response = await self.client.post(
+            f"{self.cluster.url('merchant_agent')}/a2a/message",
+            json=message.model_dump(by_alias=True)
+        )
+        if response.status_code >= 400:
+            raise FlowError(f"{data_type}: HTTP {response.status_code}")
+        data_part = response.json().get("dataPart", {})
+        if (data_part.get("@type") or data_part.get("type")) == "ap2.errors.Error":
+            raise FlowError(f"{data_type}: {data_part.get('payload', {}).get('error_code', 'error')}")
+        return data_part
+
+    async def _intent_stage(self, intent_text: str):
+        now = datetime.now(timezone.utc)
+        intent_mandate = {
+            "id": f"intent_{uuid.uuid4().hex[:8]}",
+            "type": "IntentMandate",
+            "user_id": self.user_id,
+            **IntentMandate(
+                natural_language_description=intent_text,
+                user_cart_confirmation_required=True,
+                requires_refundability=False,
+                intent_expiry=(now + timedelta(hours=1)).isoformat().replace("+00:00", "Z")
+            ).model_dump(),
+            "created_at": now.isoformat().replace("+00:00", "Z")
+        }
+        data_part = await self._send_a2a(
+            "ap2.mandates.IntentMandate",
+            intent_mandate["id"],
+            {"intent_mandate": intent_mandate, "shipping_address": SHIPPING_ADDRESS}
+        )
+        candidates = data_part.get("payload", {}).get("cart_candidates", [])
+        if not candidates:
+            raise FlowError("intent: no cart candidates")
+        cart_mandate = candidates[0]["parts"][0]["data"]["ap2.mandates.CartMandate"]
+        if not cart_mandate.get("merchant_authorization"):
+            raise FlowError("intent: cart mandate not signed by merchant")
+        return cart_mandate, intent_mandate
+
+    async def _credential_stage(self, cart_mandate: Dict[str, Any], intent_mandate: Dict[str, Any]) -> Dict[str, Any]:
+        cp_url = self.cluster.url("credential_provider")
+        response = await self.client.post(
+            f"{cp_url}/payment-methods/tokenize",
+            json={"user_id": self.user_id, "payment_method_id": self.payment_method_id}
+        )
+        response.raise_for_status()
+        tokenized = response.json()
+
+        total = cart_mandate["contents"]["payment_request"]["details"]["total"]["amount"]
+        payment_mandate = {
+            "id": f"payment_{uuid.uuid4().hex[:8]}",
+            "cart_mandate_id": cart_mandate["contents"]["id"],
+            "intent_mandate_id": intent_mandate["id"],
+            "payer_id": self.user_id,
+            "payee_id": cart_mandate.get("_metadata", {}).get("merchant_id", "did:ap2:merchant:mugibo_merchant"),
+            "amount": {"value": total["value"], "currency": total["currency"]},
+            "payment_method": {
+                "type": tokenized.get("type", "card"),
+                "token": tokenized["token"],
+                "last4": tokenized.get("last4", "0000"),
+                "brand": tokenized.get("brand", "unknown")
+            },
+            "risk_score": 10,
+            "fraud_indicators": []
+        }
+
+        # デバイス証明（モックPasskey）: CPがPayment NetworkからAgent Tokenを取得してトークンに紐付ける
+        response = await self.client.post(
+            f"{cp_url}/verify/attestation",
+            json={
+                "payment_mandate": payment_mandate,
+                "attestation": {
+                    "rawId": f"mock_credential_id_{uuid.uuid4().hex[:8]}",
+                    "challenge": base64url_encode(uuid.uuid4().bytes),
+                    "type": "public-key"
+                }
+            }
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("verified") or not (result.get("details") or {}).get("agent_token"):
+            raise FlowError("credential: attestation not verified")
+        return payment_mandate
+
+    async def _payment_stage(self, cart_mandate: Dict[str, Any], payment_mandate: Dict[str, Any]) -> None:
+        data_part = await self._send_a2a(
+            "ap2.mandates.PaymentMandate",
+            payment_mandate["id"],
+            {"payment_mandate": payment_mandate, "cart_mandate": cart_mandate}
+        )
+        status = data_part.get("payload", {}).get("status")
+        if status != "captured":
+            raise FlowError(f"payment: status={status}")
+
+
+class LoadGenerator:
+    """到着モデルに従ってフローを実行し、結果を集計"""
+
+    def __init__(self, flow: ShoppingFlowClient, intents=DEFAULT_INTENTS, seed: Optional[int] = None):
+        self.flow = flow
+        self.intents = list(intents)
+        self.random = random.Random(seed)
+        self.stages = LatencyRecorder()
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.errors: Counter = Counter()
+
+    def reset(self) -> None:
+        self.stages.reset()
+        self.completed = self.failed = self.dropped = 0
+        self.errors.clear()
+
+    async def _one(self) -> None:
+        started = time.perf_counter()
+        try:
+            await self.flow.run_flow(self.stages, self.random.choice(self.intents))
+        except Exception as e:
+            self.failed += 1
+            self.errors[str(e) or type(e).__name__] += 1
+            self.stages.record("flow", time.perf_counter() - started, ok=False)
+        else:
+            self.completed += 1
+            self.stages.record("flow", time.perf_counter() - started)
+
+    async def warmup(self, flows: int) -> None:
+        """計測前のウォームアップ（初回接続・遅延importの影響を除外）"""
+        for _ in range(flows):
+            await self._one()
+
+    async def run_closed(self, concurrency: int, duration: float, max_flows: Optional[int] = None) -> float:
+        """クローズドループ: concurrency人のユーザーが連続してフローを実行"""
+        deadline = time.perf_counter() + duration
+        started_flows = 0
+
+        async def user():
+            nonlocal started_flows
+            while time.perf_counter() < deadline and (max_flows is None or started_flows < max_flows):
+                started_flows += 1
+                await self._one()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    async def run_open(self, rate: float, duration: float, max_in_flight: int = 1000) -> float:
+        """オープンループ: rateフロー/秒のポアソン到着（完了を待たずに次のフローを開始）"""
+        in_flight: set = set()
+        started = time.perf_counter()
+        deadline = started + duration
+        next_arrival = started
+        while True:
+            next_arrival += self.random.expovariate(rate)
+            if next_arrival >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(in_flight) >= max_in_flight:
+                self.dropped += 1
+                continue
+            task = asyncio.create_task(self._one())
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        return time.perf_counter() - started
@@ -0,0 +1,308 @@
+"""
+v2/benchmarks/micro.py
+
+暗号・正規化プリミティブのマイクロベンチマーク
+
+対象（カートサイズ small=1件・medium=20件・large=200件のMandateフィクスチャで計測）:
+- canonicalize_json / compute_mandate_hash（common/crypto.py・common/user_authorization.py）
+- SignatureManager.sign_data / verify_signature（ECDSA・Ed25519）
+- MerchantAuthorizationJWT.generate / verify
+- verify_user_authorization_vp
+- KeyManager.public_key_from_multibase（ECDSA・Ed25519、カートサイズに依存しない）
+
+計測方法（pytest-benchmarkと同様）:
+- 1ラウンドが--round-time以上になるよう反復回数を調整し、--max-timeに達するまでラウンドを繰り返す
+- 1回あたりの時間（min/median/mean/stddev）とops/sec（1 / mean）を出力
+- tracemallocで1回あたりのメモリ確保量（一時確保のピーク・呼び出し後も保持された量）を計測
+  （時間計測とは別に実行し、計測中のtracemallocのオーバーヘッドは時間に含めない）
+
+使用例:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter canonicalize --filter hash
+    python -m benchmarks.micro --output benchmarks/results/micro_baseline.json
+    python -m benchmarks.micro --baseline benchmarks/results/micro_baseline.json --tolerance 0.1
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+MERCHANT_KEY_ID = "merchant"
+SIGNING_KEY_ID = "bench_agent"
+
+# ベースライン比較の対象（ops_per_secは低下、alloc_peak_bytesは増加を悪化とみなす）
+COMPARE_METRICS = ("ops_per_sec", "alloc_peak_bytes")
+
+
+@dataclass
+class BenchmarkCase:
+    """計測対象の操作（引数なしの呼び出し可能オブジェクト）"""
+
+    name: str
+    group: str
+    func: Callable[[], Any]
+
+
+def build_cases(keys_directory: str) -> List[BenchmarkCase]:
+    """Mandateフィクスチャと鍵を準備し、計測対象の操作を構築"""
+    from benchmarks.fixtures import CART_SIZES, SimulatedDevice, build_cart_mandate, build_payment_mandate
+    from common import crypto, user_authorization
+    from common.jwt_utils import MerchantAuthorizationJWT
+
+    key_manager = crypto.KeyManager(keys_directory=keys_directory)
+    signature_manager = crypto.SignatureManager(key_manager)
+    _, merchant_public_key = key_manager.generate_key_pair(MERCHANT_KEY_ID)
+    key_manager.save_public_key(MERCHANT_KEY_ID, merchant_public_key)
+    _, ecdsa_public_key = key_manager.generate_key_pair(SIGNING_KEY_ID)
+    _, ed25519_public_key = key_manager.generate_ed25519_key_pair(SIGNING_KEY_ID)
+    merchant_jwt = MerchantAuthorizationJWT(signature_manager, key_manager)
+    device = SimulatedDevice()
+
+    cases: List[BenchmarkCase] = []
+
+    def add(group: str, param: str, func: Callable[[], Any]) -> None:
+        cases.append(BenchmarkCase(name=f"{group}[{param}]", group=group, func=func))
+
+    for size, items in CART_SIZES.items():
+        cart_mandate = build_cart_mandate(items, cart_id=f"cart_{size}")
+        payment_mandate = build_payment_mandate(cart_mandate)
+        cart_hash = user_authorization.compute_mandate_hash(cart_mandate)
+        payment_hash = user_authorization.compute_mandate_hash(payment_mandate)
+
+        add("canonicalize_json", size, lambda m=cart_mandate: crypto.canonicalize_json(m))
+        add("crypto.compute_mandate_hash", size, lambda m=cart_mandate: crypto.compute_mandate_hash(m))
+        add("user_authorization.compute_mandate_hash", size,
+            lambda m=cart_mandate: user_authorization.compute_mandate_hash(m))
+
+        for algorithm in ("ECDSA", "ED25519"):
+            signature = signature_manager.sign_data(cart_mandate, SIGNING_KEY_ID, algorithm=algorithm)
+            add(f"sign_data.{algorithm}", size,
+                lambda m=cart_mandate, a=algorithm: signature_manager.sign_data(m, SIGNING_KEY_ID, algorithm=a))
+            add(f"verify_signature.{algorithm}", size,
+                lambda m=cart_mandate, s=signature: signature_manager.verify_signature(m, s))
+
+        jwt = merchant_jwt.generate_with_hash(merchant_id="did:ap2:merchant:mugibo_merchant", cart_hash=cart_hash)
+        add("MerchantAuthorizationJWT.generate", size,
+            lambda c=cart_mandate["contents"]: merchant_jwt.generate(
+                merchant_id="did:ap2:merchant:mugibo_merchant", cart_contents=c))
+        add("MerchantAuthorizationJWT.verify", size,
+            lambda j=jwt, m=cart_mandate: merchant_jwt.verify(j, m))
+
+        vp = device.authorize(cart_mandate, payment_mandate, user_id="user_demo_001")
+        add("verify_user_authorization_vp", size,
+            lambda v=vp, c=cart_hash, p=payment_hash: user_authorization.verify_user_authorization_vp(
+                v, expected_cart_hash=c, expected_payment_hash=p))
+
+    for algorithm, public_key in (("ECDSA", ecdsa_public_key), ("ED25519", ed25519_public_key)):
+        multibase = key_manager.public_key_to_multibase(public_key)
+        add("public_key_from_multibase", algorithm, lambda m=multibase: key_manager.public_key_from_multibase(m))
+
+    # 計測前に全ケースが成功することを確認（検証系が例外・Falseを返す場合は計測しない）
+    for case in cases:
+        if case.func() is False:
+            raise RuntimeError(f"Benchmark case returned False: {case.name}")
+    return cases
+
+
+def _time_round(func: Callable[[], Any], iterations: int) -> float:
+    loop = range(iterations)
+    started = time.perf_counter()
+    for _ in loop:
+        func()
+    return time.perf_counter() - started
+
+
+def measure_time(
+    func: Callable[[], Any],
+    max_time: float = 1.0,
+    round_time: float = 0.01,
+    min_rounds: int = 5,
+    disable_gc: bool = False
+) -> Dict[str, Any]:
+    """
+    1回あたりの実行時間を計測
+
+    Args:
+        func: 計測対象
+        max_time: 計測時間の目安（秒）。min_roundsに達するまでは超過する
+        round_time: 1ラウンドの最小時間（タイマー分解能の影響を抑える）
+        min_rounds: 最小ラウンド数
+        disable_gc: 計測中にGCを無効化
+
+    Returns:
+        {"rounds", "iterations", "min_us", "median_us", "mean_us", "stddev_us", "ops_per_sec"}
+    """
+    # 反復回数の調整（1ラウンドがround_time以上になるまで増やす）
+    iterations = 1
+    while True:
+        elapsed = _time_round(func, iterations)
+        if elapsed >= round_time:
+            break
+        iterations *= min(10, max(2, math.ceil(round_time / max(elapsed, 1e-9))))
+
+    gc_was_enabled = gc.isenabled()
+    if disable_gc:
+        gc.disable()
+    try:
+        per_call: List[float] = []
+        deadline = time.perf_counter() + max_time
+        while len(per_call) < min_rounds or time.perf_counter() < deadline:
+            per_call.append(_time_round(func, iterations) / iterations)
+    finally:
+        if disable_gc and gc_was_enabled:
+            gc.enable()
+
+    mean = statistics.fmean(per_call)
+    return {
+        "rounds": len(per_call),
+        "iterations": iterations,
+        "min_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "mean_us": round(mean * 1e6, 3),
+        "stddev_us": round(statistics.pstdev(per_call) * 1e6, 3),
+        "ops_per_sec": round(1 / mean, 1),
+    }
+
+
+def measure_allocations(func: Callable[[], Any], calls: int = 20) -> Dict[str, Any]:
+    """
+    1回あたりのメモリ確保量をtracemallocで計測
+
+    Returns:
+        {"alloc_peak_bytes": 呼び出し中に一時的に確保した量のピーク（中央値）,
+         "alloc_retained_bytes": 呼び出し後も保持された量（平均。キャッシュ・リークの検出用）}
+    """
+    func()  # 遅延初期化・キャッシュの影響を除外
+    gc.collect()
+    tracemalloc.start()
+    try:
+        peaks: List[int] = []
+        retained = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_peak_bytes": int(statistics.median(peaks)),
+        "alloc_retained_bytes": int(retained / calls),
+    }
+
+
+def run_cases(cases: Sequence[BenchmarkCase], args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for case in cases:
+        results[case.name] = {
+            "group": case.group,
+            **measure_time(case.func, args.max_time, args.round_time, args.min_rounds, args.disable_gc),
+            **measure_allocations(case.func, args.alloc_calls),
+        }
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crypto and canonicalization micro-benchmarks")
+    parser.add_argument("--filter", action="append", default=[], help="名前に含まれる文字列で対象を絞り込み（複数指定可）")
+    parser.add_argument("--max-time", type=float, default=0.5, help="1ケースあたりの計測時間（秒）")
+    parser.add_argument("--round-time", type=float, default=0.01, help="1ラウンドの最小時間（秒）")
+    parser.add_argument("--min-rounds", type=int, default=5, help="最小ラウンド数")
+    parser.add_argument("--alloc-calls", type=int, default=20, help="メモリ確保量の計測回数")
+    parser.add_argument("--disable-gc", action="store_true", help="時間計測中にGCを無効化")
+    parser.add_argument("--log-level", default="WARNING", help="ログレベル（LOG_LEVEL）")
+    parser.add_argument("--output", help="結果JSONの保存先")
+    parser.add_argument("--baseline", help="比較するベースラインの結果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="許容する悪化率（0.1 = 10%%）")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    return parser.parse_args(argv)
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"暗号・正規化マイクロベンチマーク（{len(result['benchmarks'])}ケース）")
+    print(f"  {'name':<52} {'ops/sec':>12} {'median':>12} {'stddev':>10} {'alloc peak':>12} {'retained':>10}")
+    for name, stats in result["benchmarks"].items():
+        print(f"  {name:<52} {stats['ops_per_sec']:>12,.1f} {stats['median_us']:>10.2f}us "
+              f"{stats['stddev_us']:>8.2f}us {stats['alloc_peak_bytes']:>10,d} B {stats['alloc_retained_bytes']:>8,d} B")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # ロガーはimport時にLOG_LEVELを読むため、対象モジュールのimport前に設定
+    os.environ["LOG_LEVEL"] = args.log_level
+
+    from benchmarks.stats import compare_to_baseline
+
+    keys_directory = tempfile.mkdtemp(prefix="ap2_micro_")
+    try:
+        cases = build_cases(keys_directory)
+        if args.filter:
+            cases = [case for case in cases if any(pattern in case.name for pattern in args.filter)]
+        benchmarks = run_cases(cases, args)
+    finally:
+        shutil.rmtree(keys_directory, ignore_errors=True)
+
+    result: Dict[str, Any] = {
+        "config": {
+            "max_time": args.max_time,
+            "round_time": args.round_time,
+            "min_rounds": args.min_rounds,
+            "disable_gc": args.disable_gc,
+        },
+        "benchmarks": benchmarks,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+    }
+
+    exit_code = 0
+    if args.baseline:
+        comparison = compare_to_baseline(
+            result,
+            json.loads(Path(args.baseline).read_text()),
+            args.tolerance,
+            metrics=COMPARE_METRICS,
+            sections=("benchmarks",),
+            higher_is_better=("ops_per_sec",)
+        )
+        result["baseline_comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "rows": comparison}
+        if any(row["regression"] for row in comparison):
+            exit_code = 1
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return exit_code
+
+    print_report(result)
+    if args.baseline:
+        regressions = [row for row in result["baseline_comparison"]["rows"] if row["regression"]]
+        print(f"  ベースライン比較（許容 {args.tolerance:.0%}）: "
+              f"{'悪化なし' if not regressions else f'{len(regressions)}件の悪化'}")
+        for row in regressions:
+            print(f"    {row['name']} {row['metric']}: {row['baseline']} → {row['current']}（{row['change']:+.1%}）")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
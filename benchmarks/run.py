@@ -0,0 +1,183 @@
+"""
+v2/benchmarks/run.py
+
+AP2エンドツーエンド負荷試験（Intent → Cart → Payment）
+
+- 実際のFastAPIアプリをインプロセス（ASGIトランスポート）で起動し、LLM・Meilisearch・Redisはフェイクに差し替え
+- クローズドループ（同時実行ユーザー数固定）またはオープンループ（ポアソン到着）でフローを実行
+- ステージ別（intent/credential/payment/flow）・サービス別（呼び出し先ごと）のp50/p95/p99を出力
+- --outputで結果をJSONに保存し、--baselineで過去の結果と比較（悪化率が--toleranceを超えたら終了コード1）
+
+全サービスが1つのイベントループ上で動作するため、計測値はネットワーク遅延を含まない
+コードパス（署名・検証・DB・シリアライズ）のコストとなる。LLM推論時間は--llm-latency（分布）・
+--llm-token-latency-msで注入する（フェイクLLMは common/fake_llm.py）。
+
+使用例:
+    python -m benchmarks.run --mode closed --concurrency 4 --duration 30
+    python -m benchmarks.run --mode open --rate 5 --duration 60 --llm-latency-ms 200
+    python -m benchmarks.run --llm-latency lognormal:800:0.5 --llm-token-latency-ms 20 --seed 1
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AP2 end-to-end load generator")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="到着モデル")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時実行ユーザー数（closed）")
+    parser.add_argument("--rate", type=float, default=5.0, help="到着レート（フロー/秒、open）")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="同時実行フローの上限（open、超過分は破棄）")
+    parser.add_argument("--duration", type=float, default=30.0, help="計測時間（秒）")
+    parser.add_argument("--flows", type=int, default=None, help="実行するフロー数の上限（closed）")
+    parser.add_argument("--warmup", type=int, default=3, help="計測前に実行するフロー数")
+    parser.add_argument("--llm-latency", default=None,
+                        help="フェイクLLMの最初のトークンまでの時間の分布（例: 200, uniform:100:500, lognormal:800:0.5）")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="フェイクLLMの固定応答遅延（--llm-latencyの省略形）")
+    parser.add_argument("--llm-token-latency-ms", type=float, default=0.0, help="フェイクLLMのトークンあたりの時間")
+    parser.add_argument("--search-latency-ms", type=float, default=0.0, help="フェイクMeilisearchの検索遅延")
+    parser.add_argument("--no-ai-mode", action="store_true", help="Merchant Agentをルールベースモードで起動")
+    parser.add_argument("--seed", type=int, default=None, help="インテント選択・到着間隔・LLM応答時間の乱数シード")
+    parser.add_argument("--log-level", default="WARNING", help="サービスのログレベル（LOG_LEVEL）")
+    parser.add_argument("--output", help="結果JSONの保存先")
+    parser.add_argument("--baseline", help="比較するベースラインの結果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する悪化率（0.2 = 20%%）")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    return parser.parse_args(argv)
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    # サービスのロガーはimport時にLOG_LEVELを読むため、ここで遅延import
+    from benchmarks.harness import InProcessCluster
+    from benchmarks.loadgen import LoadGenerator, ShoppingFlowClient
+
+    from common.fake_llm import LatencyDistribution
+
+    llm_latency = LatencyDistribution.parse(args.llm_latency or args.llm_latency_ms)
+    cluster = InProcessCluster(
+        llm_latency=llm_latency,
+        llm_token_latency_ms=args.llm_token_latency_ms,
+        llm_seed=args.seed,
+        search_latency_seconds=args.search_latency_ms / 1000,
+        ai_mode=not args.no_ai_mode
+    )
+    async with cluster:
+        async with cluster.client(timeout=120.0) as client:
+            flow = ShoppingFlowClient(cluster, client)
+            await flow.setup()
+            generator = LoadGenerator(flow, seed=args.seed)
+
+            await generator.warmup(args.warmup)
+            generator.reset()
+            cluster.recorder.reset()
+
+            if args.mode == "closed":
+                elapsed = await generator.run_closed(args.concurrency, args.duration, args.flows)
+            else:
+                elapsed = await generator.run_open(args.rate, args.duration, args.max_in_flight)
+
+            llm_requests = cluster.llm_app.state.requests
+
+    return {
+        "config": {
+            "mode": args.mode,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate": args.rate if args.mode == "open" else None,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "llm_latency": str(llm_latency),
+            "llm_token_latency_ms": args.llm_token_latency_ms,
+            "search_latency_ms": args.search_latency_ms,
+            "ai_mode": not args.no_ai_mode,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "flows": {
+            "completed": generator.completed,
+            "failed": generator.failed,
+            "dropped": generator.dropped,
+            "throughput_per_second": round(generator.completed / elapsed, 3) if elapsed else 0.0,
+        },
+        "stages": generator.stages.summary(),
+        "services": cluster.recorder.summary(),
+        "errors": dict(generator.errors.most_common(10)),
+        "llm_requests": llm_requests,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+    }
+
+
+def print_report(result: dict) -> None:
+    config, flows = result["config"], result["flows"]
+    load = f"concurrency={config['concurrency']}" if config["mode"] == "closed" else f"rate={config['rate']}/s"
+    print(f"AP2 E2E負荷試験（{config['mode']}, {load}, {result['elapsed_seconds']}s）")
+    print(f"  フロー: 完了 {flows['completed']} / 失敗 {flows['failed']} / 破棄 {flows['dropped']}"
+          f"（{flows['throughput_per_second']} flows/sec）")
+    for section, title in (("stages", "ステージ別"), ("services", "サービス別")):
+        print(f"  {title}:")
+        for name, stats in result[section].items():
+            print(f"    {name:<20} n={stats['count']:<6} err={stats['errors']:<4} "
+                  f"p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  p99 {stats['p99_ms']:>9.2f}ms")
+    if result["errors"]:
+        print("  エラー:")
+        for message, count in result["errors"].items():
+            print(f"    {count:>5} {message}")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    os.environ["LOG_LEVEL"] = args.log_level
+
+    from benchmarks.stats import compare_to_baseline
+
+    # サービスのロガーは作成時のsys.stdoutに出力するため、実行中はstderrに向けて結果出力と分離
+    with redirect_stdout(sys.stderr):
+        result = asyncio.run(run_benchmark(args))
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        comparison = compare_to_baseline(result, baseline, args.tolerance)
+        result["baseline_comparison"] = {
+            "baseline": args.baseline,
+            "tolerance": args.tolerance,
+            "config_matches": baseline.get("config") == result["config"],
+            "rows": comparison
+        }
+        if any(row["regression"] for row in comparison):
+            exit_code = 1
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return exit_code
+
+    print_report(result)
+    if args.baseline:
+        regressions = [row for row in result["baseline_comparison"]["rows"] if row["regression"]]
+        if not result["baseline_comparison"]["config_matches"]:
+            print("  警告: ベースラインと計測条件（config）が異なります")
+        print(f"  ベースライン比較（許容 {args.tolerance:.0%}）: "
+              f"{'悪化なし' if not regressions else f'{len(regressions)}件の悪化'}")
+        for row in regressions:
+            print(f"    {row['section']}/{row['name']} {row['metric']}: "
+                  f"{row['baseline']}ms → {row['current']}ms（{row['change']:+.1%}）")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+v2/benchmarks/stats.py
+
+レイテンシの記録・集計（p50/p95/p99）とベースライン比較（E2E負荷試験・マイクロベンチマーク共通）
+"""
+
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """ソート済みの値からパーセンタイルを計算（線形補間）"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def summarize(samples: List[float], errors: int = 0) -> Dict[str, Any]:
+    """秒単位のサンプルをミリ秒の集計値に変換"""
+    values = sorted(samples)
+    summary: Dict[str, Any] = {"count": len(values), "errors": errors}
+    for q in PERCENTILES:
+        summary[f"p{q}_ms"] = round(percentile(values, q) * 1000, 3)
+    summary["mean_ms"] = round(sum(values) / len(values) * 1000, 3) if values else 0.0
+    summary["max_ms"] = round(values[-1] * 1000, 3) if values else 0.0
+    return summary
+
+
+class LatencyRecorder:
+    """名前（ステージ・サービス）ごとのレイテンシとエラー件数"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, seconds: float, ok: bool = True) -> None:
+        """成功・失敗にかかわらずレイテンシを記録（失敗はエラー件数にも加算）"""
+        self.samples[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def reset(self) -> None:
+        self.samples.clear()
+        self.errors.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: summarize(self.samples[name], self.errors.get(name, 0))
+            for name in sorted(set(self.samples) | set(self.errors))
+        }
+
+
+def compare_to_baseline(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.2,
+    metrics: Sequence[str] = ("p50_ms", "p95_ms", "p99_ms"),
+    sections: Sequence[str] = ("stages", "services"),
+    higher_is_better: Sequence[str] = ()
+) -> List[Dict[str, Any]]:
+    """
+    セクション内の項目ごとの集計値をベースラインと比較
+
+    Args:
+        current: 今回の結果（run.py・micro.pyのJSON）
+        baseline: ベースラインの結果
+        tolerance: 許容する悪化率（0.2 = 20%）
+        metrics: 比較する集計値
+        sections: 比較するセクション（{項目名: {集計値: 数値}}）
+        higher_is_better: 値が大きいほど良い集計値（ops_per_sec等。低下を悪化として扱う）
+
+    Returns:
+        [{"section", "name", "metric", "baseline", "current", "change", "regression"}, ...]
+        （ベースラインにない項目は比較しない）
+    """
+    rows = []
+    for section in sections:
+        for name, stats in current.get(section, {}).items():
+            base_stats: Optional[Dict[str, Any]] = baseline.get(section, {}).get(name)
+            if not base_stats:
+                continue
+            for metric in metrics:
+                before, after = base_stats.get(metric), stats.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before
+                worse = -change if metric in higher_is_better else change
+                rows.append({
+                    "section": section,
+                    "name": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 4),
+                    "regression": worse > tolerance
+                })
+    return rows
@@ -9,6 +9,7 @@ import sys
 from pathlib import Path
 from typing import Callable, Dict, Any, Optional
 from datetime import datetime, timezone
+import time
 import uuid
 import logging
 
@@ -21,9 +22,16 @@ from common.models import (
 from common.did_resolver import DIDResolver
 from common.nonce_manager import NonceManager
 from common.logger import get_logger, log_a2a_message
+from common import metrics
 
 logger = get_logger(__name__)
 
+SIGNATURE_VERIFICATION_SECONDS = metrics.histogram(
+    "ap2_a2a_signature_verification_seconds",
+    "A2Aメッセージの署名検証の所要時間（秒）",
+    ("result",)
+)
+
 
 class A2AMessageHandler:
     """
@@ -72,6 +80,23 @@ class A2AMessageHandler:
         logger.info(f"[A2AHandler] Registered handler for @type: {data_type}")
 
     async def verify_message_signature(self, message: A2AMessage) -> bool:
+        """
+        A2Aメッセージの署名を検証（所要時間をメトリクスに記録）
+
+        Args:
+            message: 検証するA2Aメッセージ
+
+        Returns:
+            bool: 署名が有効な場合True
+        """
+        started = time.perf_counter()
+        is_valid = await self._verify_message_signature(message)
+        SIGNATURE_VERIFICATION_SECONDS.labels(result="valid" if is_valid else "invalid").observe(
+            time.perf_counter() - started
+        )
+        return is_valid
+
+    async def _verify_message_signature(self, message: A2AMessage) -> bool:
         """
         A2Aメッセージの署名を検証
 
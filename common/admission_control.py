@@ -0,0 +1,482 @@
+"""
+v2/common/admission_control.py
+
+アドミッション制御ミドルウェア（共通モジュール）
+
+- ルート単位・送信元DID単位のトークンバケットによるレート制限（超過時は429 + Retry-After）
+  - 既定はプロセス内のバケット、Redis URL指定時は全レプリカで共有（Luaスクリプトでアトミックに更新）
+- 優先度レーン付きの同時実行数制限
+  - 空きスロットは優先度の高いレーン（payment → a2a → chat）から割り当てる
+  - レーンごとの同時実行数上限（長時間のチャットストリームが決済を締め出さない）
+  - レーンごとの待ち時間予算を超えた場合・待ち行列が満杯の場合は即座に503（+ Retry-After）
+- /a2a/messageはボディのheader.sender・dataPart["@type"]で送信元DIDとレーン（決済系はpayment）を判定
+  - 署名検証前の自己申告のため、どのレーンも必ずルート単位のバケットを通す
+    （paymentレーンは専用のルートバケットとレーン同時実行数上限を持ち、偽装しても他レーンの枠を奪えない）
+
+タイムアウトの連鎖を待つより、ピーク時に早く・明示的に断る（graceful shedding）ための仕組み。
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from common import metrics
+from common.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+# レーンごとの実行中・待ち数（export_metrics()で登録したリミッターの値を/metrics出力時に取得）
+ADMISSION_IN_FLIGHT = metrics.gauge(
+    "ap2_admission_in_flight", "アドミッション制御で実行中のリクエスト数", ("lane",)
+)
+ADMISSION_QUEUED = metrics.gauge(
+    "ap2_admission_queued", "アドミッション制御で待機中のリクエスト数", ("lane",)
+)
+
+LANE_PAYMENT = "payment"
+LANE_A2A = "a2a"
+LANE_CHAT = "chat"
+
+# paymentレーンに振り分けるA2Aメッセージタイプ
+DEFAULT_PAYMENT_TYPES = ("ap2.mandates.PaymentMandate", "ap2.requests.AttestationRequest")
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    """
+    ルートごとのアドミッションポリシー
+
+    rate/sender_rateが0の場合はそのバケットを使わない。
+    classify=Trueの場合はA2Aメッセージとしてボディを解析し、送信元DIDとレーンを判定する。
+    payment_rate>0の場合、paymentレーンはルート全体のバケットの代わりに専用のバケット（route:<path>:payment）を使う。
+    """
+    path: str
+    lane: str
+    rate: float = 0.0  # ルート全体のリクエスト/秒
+    burst: int = 0
+    sender_rate: float = 0.0  # 送信元DIDごとのリクエスト/秒
+    sender_burst: int = 0
+    classify: bool = False
+    payment_rate: float = 0.0  # paymentレーン専用のルートバケット（リクエスト/秒）
+    payment_burst: int = 0
+
+
+@dataclass(frozen=True)
+class LanePolicy:
+    """優先度レーン（priorityが小さいほど優先）"""
+    name: str
+    priority: int
+    max_concurrency: int
+    queue_budget_seconds: float
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def default_route_policies() -> List[RoutePolicy]:
+    """環境変数から既定のルートポリシーを構築"""
+    return [
+        RoutePolicy(
+            path="/a2a/message",
+            lane=LANE_A2A,
+            rate=_env_float("ADMISSION_A2A_RATE", 200.0),
+            burst=_env_int("ADMISSION_A2A_BURST", 400),
+            sender_rate=_env_float("ADMISSION_SENDER_RATE", 50.0),
+            sender_burst=_env_int("ADMISSION_SENDER_BURST", 100),
+            classify=True,
+            payment_rate=_env_float("ADMISSION_PAYMENT_RATE", 100.0),
+            payment_burst=_env_int("ADMISSION_PAYMENT_BURST", 200)
+        ),
+        RoutePolicy(
+            path="/chat/stream",
+            lane=LANE_CHAT,
+            rate=_env_float("ADMISSION_CHAT_RATE", 20.0),
+            burst=_env_int("ADMISSION_CHAT_BURST", 40)
+        ),
+    ]
+
+
+def default_lane_policies(max_concurrency: int) -> List[LanePolicy]:
+    """環境変数から既定のレーンポリシーを構築（payment → a2a → chatの優先順）"""
+    return [
+        LanePolicy(
+            LANE_PAYMENT, 0,
+            _env_int("ADMISSION_PAYMENT_MAX_CONCURRENCY", max(1, max_concurrency * 3 // 4)),
+            _env_float("ADMISSION_PAYMENT_QUEUE_BUDGET_MS", 2000) / 1000
+        ),
+        LanePolicy(LANE_A2A, 1, max_concurrency, _env_float("ADMISSION_A2A_QUEUE_BUDGET_MS", 1000) / 1000),
+        LanePolicy(
+            LANE_CHAT, 2,
+            _env_int("ADMISSION_CHAT_MAX_CONCURRENCY", max(1, max_concurrency // 2)),
+            _env_float("ADMISSION_CHAT_QUEUE_BUDGET_MS", 250) / 1000
+        ),
+    ]
+
+
+# ========================================
+# レート制限（トークンバケット）
+# ========================================
+
+class TokenBucket:
+    """トークンバケット（rate: 補充レート/秒、burst: 容量）"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        トークンを1つ消費
+
+        Returns:
+            float: 0.0（許可）または次のトークンまでの秒数
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class LocalRateLimiter:
+    """プロセス内のトークンバケット（キー数はLRUで上限管理）"""
+
+    def __init__(self, max_keys: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """
+        Returns:
+            float: 0.0（許可）またはRetry-Afterの秒数
+        """
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+# Redis上のトークンバケット（時刻はRedisのTIMEを使い、レプリカ間の時計ずれの影響を受けない）
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry)
+"""
+
+
+class RedisRateLimiter:
+    """
+    Redis共有のトークンバケット（全レプリカで同じ上限を適用）
+
+    Redisに接続できない場合はプロセス内のバケットで代替する。
+    """
+
+    def __init__(self, redis_client: RedisClient, namespace: str, fallback: Optional[LocalRateLimiter] = None):
+        self.redis = redis_client
+        self.namespace = namespace
+        self.fallback = fallback or LocalRateLimiter()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        result = await self.redis.run_script(
+            _REDIS_TOKEN_BUCKET, keys=[f"ratelimit:{self.namespace}:{key}"], args=[rate, burst]
+        )
+        if result is None:
+            return await self.fallback.acquire(key, rate, burst)
+        return float(result)
+
+
+# ========================================
+# 同時実行数制限（優先度レーン）
+# ========================================
+
+class PriorityConcurrencyLimiter:
+    """
+    優先度レーン付きの同時実行数制限
+
+    使用例:
+        limiter = PriorityConcurrencyLimiter(64, default_lane_policies(64), max_queue=256)
+        if await limiter.acquire("payment"):
+            try:
+                ...
+            finally:
+                limiter.release("payment")
+    """
+
+    def __init__(self, max_concurrency: int, lanes: Iterable[LanePolicy], max_queue: int = 256):
+        """
+        Args:
+            max_concurrency: 全レーン合計の同時実行数
+            lanes: レーンポリシー
+            max_queue: 全レーン合計の最大待ち数（超過時は即座に拒否）
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.lanes: Dict[str, LanePolicy] = {lane.name: lane for lane in lanes}
+        self._order = sorted(self.lanes.values(), key=lambda lane: lane.priority)
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane.name: deque() for lane in self._order}
+        self.in_flight = 0
+        self.lane_in_flight: Counter = Counter()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _has_capacity(self, lane: LanePolicy) -> bool:
+        return self.in_flight < self.max_concurrency and self.lane_in_flight[lane.name] < lane.max_concurrency
+
+    def _grant(self, lane_name: str):
+        self.in_flight += 1
+        self.lane_in_flight[lane_name] += 1
+
+    async def acquire(self, lane_name: str) -> bool:
+        """
+        スロットを取得（待ち時間予算内に取得できない場合False）
+        """
+        lane = self.lanes[lane_name]
+        # 同じか高い優先度のレーンに待ちがある場合は追い越さない
+        ahead = any(self._queues[other.name] for other in self._order if other.priority <= lane.priority)
+        if not ahead and self._has_capacity(lane):
+            self._grant(lane_name)
+            return True
+        if self.queued >= self.max_queue or lane.queue_budget_seconds <= 0:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues[lane_name]
+        queue.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=lane.queue_budget_seconds)
+            return True
+        except asyncio.TimeoutError:
+            if future.done():
+                # タイムアウトと同時に割り当てられた
+                return True
+            future.cancel()
+            return False
+        except BaseException:
+            # クライアント切断等でキャンセルされた場合は割り当て済みのスロットを返却
+            if future.done() and not future.cancelled():
+                self.release(lane_name)
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in queue:
+                queue.remove(future)
+
+    def export_metrics(self):
+        """レーンごとの実行中・待ち数を/metricsに公開（プロセス内で最後に登録したリミッターが対象）"""
+        for lane in self._order:
+            ADMISSION_IN_FLIGHT.labels(lane=lane.name).set_function(
+                lambda name=lane.name: self.lane_in_flight[name]
+            )
+            ADMISSION_QUEUED.labels(lane=lane.name).set_function(
+                lambda name=lane.name: len(self._queues[name])
+            )
+
+    def release(self, lane_name: str):
+        """スロットを返却し、優先度順に待ちへ割り当て"""
+        self.in_flight -= 1
+        self.lane_in_flight[lane_name] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrency:
+            for lane in self._order:
+                queue = self._queues[lane.name]
+                while queue and queue[0].done():
+                    queue.popleft()
+                if queue and self._has_capacity(lane):
+                    self._grant(lane.name)
+                    queue.popleft().set_result(True)
+                    break
+            else:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "lanes": {
+                lane.name: {
+                    "in_flight": self.lane_in_flight[lane.name],
+                    "queued": len(self._queues[lane.name]),
+                    "max_concurrency": lane.max_concurrency,
+                }
+                for lane in self._order
+            },
+        }
+
+
+# ========================================
+# ASGIミドルウェア
+# ========================================
+
+class AdmissionControlMiddleware:
+    """
+    レート制限・同時実行数制限によるアドミッション制御（ASGIミドルウェア）
+
+    使用例:
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            routes=default_route_policies(),
+            concurrency=PriorityConcurrencyLimiter(64, default_lane_policies(64)),
+            rate_limiter=LocalRateLimiter()
+        )
+    """
+
+    def __init__(
+        self,
+        app,
+        routes: Iterable[RoutePolicy],
+        concurrency: PriorityConcurrencyLimiter,
+        rate_limiter,
+        payment_types: Iterable[str] = DEFAULT_PAYMENT_TYPES,
+        stats: Optional[Counter] = None
+    ):
+        """
+        Args:
+            app: ASGIアプリ
+            routes: 対象ルート（POSTのみ）
+            concurrency: 同時実行数制限
+            rate_limiter: LocalRateLimiterまたはRedisRateLimiter
+            payment_types: paymentレーンに振り分けるA2Aメッセージタイプ
+            stats: 結果カウンター（"<lane>:<outcome>" → 件数）
+        """
+        self.app = app
+        self.routes: Dict[str, RoutePolicy] = {route.path: route for route in routes}
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.payment_types = frozenset(payment_types)
+        self.stats = stats if stats is not None else Counter()
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        lane = route.lane
+        sender = None
+        if route.classify:
+            body = await self._read_body(receive)
+            receive = self._replay_receive(body, receive)
+            sender, data_type = self._classify_a2a(body)
+            if data_type in self.payment_types:
+                lane = LANE_PAYMENT
+
+        # ルート全体のバケット（レーン判定は未検証のボディによるため、決済も専用のバケットで必ず制限）
+        if lane == LANE_PAYMENT and route.payment_rate > 0:
+            bucket = (f"route:{route.path}:{LANE_PAYMENT}", route.payment_rate, route.payment_burst)
+        else:
+            bucket = (f"route:{route.path}", route.rate, route.burst)
+        if bucket[1] > 0:
+            retry_after = await self.rate_limiter.acquire(*bucket)
+            if retry_after > 0:
+                await self._reject(send, lane, 429, "Rate limit exceeded", retry_after)
+                return
+        if sender and route.sender_rate > 0:
+            retry_after = await self.rate_limiter.acquire(
+                f"sender:{route.path}:{sender}", route.sender_rate, route.sender_burst
+            )
+            if retry_after > 0:
+                await self._reject(send, lane, 429, "Rate limit exceeded for sender", retry_after)
+                return
+
+        if not await self.concurrency.acquire(lane):
+            await self._reject(send, lane, 503, "Server is busy, retry later", 1.0)
+            return
+
+        self.stats[f"{lane}:admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concurrency.release(lane)
+
+    async def _reject(self, send, lane: str, status: int, detail: str, retry_after: float):
+        outcome = "rate_limited" if status == 429 else "shed"
+        self.stats[f"{lane}:{outcome}"] += 1
+        logger.warning(f"[AdmissionControl] Rejected request: lane={lane}, status={status}, detail={detail}")
+        body = json.dumps({"detail": detail}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _classify_a2a(body: bytes) -> Tuple[Optional[str], Optional[str]]:
+        """A2Aメッセージの送信元DIDとデータタイプを取得（解析できない場合はNone）"""
+        try:
+            message = json.loads(body)
+            sender = message.get("header", {}).get("sender")
+            data_type = message.get("dataPart", {}).get("@type")
+        except (ValueError, AttributeError):
+            return None, None
+        return (sender if isinstance(sender, str) else None), (data_type if isinstance(data_type, str) else None)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive) -> Callable[[], Awaitable[Dict[str, Any]]]:
+        """読み取り済みのボディを1回だけ返し、以降は元のreceive（切断検知）に委譲"""
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
@@ -8,7 +8,9 @@ v2/common/base_agent.py
 import sys
 import os
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
 import logging
 
 from fastapi import FastAPI, HTTPException, Request
@@ -20,6 +22,19 @@ from common.crypto import KeyManager, SignatureManager
 
 from .models import A2AMessage
 from .a2a_handler import A2AMessageHandler
+from .admission_control import (
+    AdmissionControlMiddleware,
+    LocalRateLimiter,
+    PriorityConcurrencyLimiter,
+    RedisRateLimiter,
+    default_lane_policies,
+    default_route_policies,
+)
+from .idempotency import IdempotencyMiddleware
+from .key_agent import KeyAgentClient, KeyAgentError
+from .metrics import register_metrics_endpoint
+from .profiler import register_profiling
+from .redis_client import RedisClient
 
 # OpenTelemetry分散トレーシング
 from .telemetry import (
@@ -29,6 +44,9 @@ from .telemetry import (
 
 logger = logging.getLogger(__name__)
 
+# 起動時に読み込む鍵（KeyManagerのアルゴリズム名, ログ表示名）
+KEY_ALGORITHMS: Tuple[Tuple[str, str], ...] = (("ECDSA", "ECDSA"), ("ED25519", "Ed25519"))
+
 
 class BaseAgent(ABC):
     """
@@ -38,8 +56,15 @@ class BaseAgent(ABC):
     - 各エージェントは独立したFastAPIサービス
     - 共通エンドポイント: POST /a2a/message
     - A2Aメッセージの受信→署名検証→処理→署名付きレスポンス
+
+    サブクラスはIDEMPOTENT_PATHSにIdempotency-Key対応のPOSTパスを指定できる。
+    /a2a/message・/chat/streamにはアドミッション制御（レート制限・優先度レーン付き同時実行数制限）を適用する
+    （ADMISSION_CONTROL_ENABLED=falseで無効）。
     """
 
+    # Idempotency-Keyヘッダーで重複排除するPOSTパス（サブクラスで指定）
+    IDEMPOTENT_PATHS: Tuple[str, ...] = ()
+
     def __init__(
         self,
         agent_id: str,
@@ -65,6 +90,17 @@ class BaseAgent(ABC):
             version="2.0.0"
         )
 
+        # オンデマンドのプロファイリング（PROFILING_ADMIN_TOKEN設定時のみ、最も内側のミドルウェア）
+        self.profiler = register_profiling(self.app)
+
+        # Idempotency-Key（CORS・アドミッション制御の内側で処理）
+        self._setup_idempotency()
+
+        # アドミッション制御（CORSの内側: 429/503にもCORSヘッダーを付与）
+        self.admission_limiter: Optional[PriorityConcurrencyLimiter] = None
+        self.admission_stats: Counter = Counter()
+        self._setup_admission_control()
+
         # CORS設定
         self._setup_cors()
 
@@ -110,6 +146,50 @@ class BaseAgent(ABC):
 
         logger.info(f"[{self.agent_name}] Initialized: {self.agent_id}")
 
+    def _setup_idempotency(self):
+        """Idempotency-Keyミドルウェア設定（IDEMPOTENT_PATHSが空の場合は何もしない）"""
+        if not self.IDEMPOTENT_PATHS:
+            return
+
+        redis_url = os.getenv("IDEMPOTENCY_REDIS_URL") or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.app.add_middleware(
+            IdempotencyMiddleware,
+            redis_client=RedisClient(redis_url=redis_url),
+            paths=self.IDEMPOTENT_PATHS,
+            namespace=self.agent_id.split(":")[-1]
+        )
+        logger.info(f"[{self.agent_name}] Idempotency-Key enabled for: {', '.join(self.IDEMPOTENT_PATHS)}")
+
+    def _setup_admission_control(self):
+        """アドミッション制御ミドルウェア設定（ADMISSION_RATE_LIMIT_REDIS_URL指定時はレート制限をレプリカ間で共有）"""
+        if os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() != "true":
+            return
+
+        max_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+        self.admission_limiter = PriorityConcurrencyLimiter(
+            max_concurrency,
+            default_lane_policies(max_concurrency),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+        )
+        self.admission_limiter.export_metrics()
+        redis_url = os.getenv("ADMISSION_RATE_LIMIT_REDIS_URL")
+        if redis_url:
+            rate_limiter = RedisRateLimiter(RedisClient(redis_url=redis_url), namespace=self.agent_id.split(":")[-1])
+        else:
+            rate_limiter = LocalRateLimiter()
+
+        self.app.add_middleware(
+            AdmissionControlMiddleware,
+            routes=default_route_policies(),
+            concurrency=self.admission_limiter,
+            rate_limiter=rate_limiter,
+            stats=self.admission_stats
+        )
+        logger.info(
+            f"[{self.agent_name}] Admission control enabled: max_concurrency={max_concurrency}, "
+            f"rate_limit={'redis' if redis_url else 'local'}"
+        )
+
     def _setup_cors(self):
         """CORS設定"""
         self.app.add_middleware(
@@ -134,57 +214,67 @@ class BaseAgent(ABC):
         - キーペアはv2/scripts/init_keys.pyで事前に生成・暗号化されている
         - 各エージェントは永続化ストレージ（Docker Volume）から既存の鍵を読み込む
         - DIDドキュメントも永続化されているため、DIDは再起動後も一貫している
+        - ECDSA鍵（JWT署名用）とEd25519鍵（A2A通信用）の復号（PBKDF2）は並行して実行し、起動時間を短縮
+        - KEY_AGENT_SOCKETが設定されている場合は復号せず、鍵エージェント（common/key_agent.py）に署名を委譲
         """
         # agent_idから鍵IDを抽出（例: did:ap2:agent:shopping_agent -> shopping_agent）
         key_id = self.agent_id.split(":")[-1]
 
-        try:
-            # 永続化ストレージから既存のECDSA鍵を読み込み（JWT署名用）
-            self.key_manager.load_private_key_encrypted(key_id, self.passphrase, algorithm="ECDSA")
-            logger.info(
-                f"[{self.agent_name}] ✓ ECDSA鍵を読み込みました: {key_id}"
-            )
-        except Exception as e:
-            # 鍵が存在しない場合はエラー
-            logger.error(
-                f"[{self.agent_name}] ❌ ECDSA鍵が見つかりません。\n"
-                f"   鍵を生成するには以下のコマンドを実行してください:\n"
-                f"   \n"
-                f"   cd /app/v2 && python scripts/init_keys.py\n"
-                f"   \n"
-                f"   または Docker環境では:\n"
-                f"   \n"
-                f"   docker compose exec {self.agent_name.lower().replace(' ', '_')} python /app/v2/scripts/init_keys.py\n"
-                f"   \n"
-                f"   Error: {e}"
-            )
-            raise RuntimeError(
-                f"ECDSA鍵が見つかりません。v2/scripts/init_keys.py を実行してください。"
-            ) from e
+        key_agent_socket = os.getenv("KEY_AGENT_SOCKET", "")
+        if key_agent_socket:
+            self._attach_key_agent(key_id, key_agent_socket)
+            return
+
+        with ThreadPoolExecutor(max_workers=len(KEY_ALGORITHMS), thread_name_prefix="key-load") as executor:
+            futures = {
+                algorithm: executor.submit(
+                    self.key_manager.load_private_key_encrypted, key_id, self.passphrase, algorithm=algorithm
+                )
+                for algorithm, _ in KEY_ALGORITHMS
+            }
+
+        # 結果はECDSA → Ed25519の順に確認（エラーの報告順を従来と同じにする）
+        for algorithm, label in KEY_ALGORITHMS:
+            try:
+                futures[algorithm].result()
+                logger.info(
+                    f"[{self.agent_name}] ✓ {label}鍵を読み込みました: {key_id}"
+                )
+            except Exception as e:
+                # 鍵が存在しない場合はエラー
+                logger.error(
+                    f"[{self.agent_name}] ❌ {label}鍵が見つかりません。\n"
+                    f"   鍵を生成するには以下のコマンドを実行してください:\n"
+                    f"   \n"
+                    f"   cd /app/v2 && python scripts/init_keys.py\n"
+                    f"   \n"
+                    f"   または Docker環境では:\n"
+                    f"   \n"
+                    f"   docker compose exec {self.agent_name.lower().replace(' ', '_')} python /app/v2/scripts/init_keys.py\n"
+                    f"   \n"
+                    f"   Error: {e}"
+                )
+                raise RuntimeError(
+                    f"{label}鍵が見つかりません。v2/scripts/init_keys.py を実行してください。"
+                ) from e
 
-        # Ed25519鍵を読み込み（A2A通信用）
+    def _attach_key_agent(self, key_id: str, socket_path: str):
+        """鍵エージェントモード: 秘密鍵を保持せず、鍵エージェントの鍵への参照をKeyManagerに登録"""
+        self.key_agent = KeyAgentClient(socket_path)
         try:
-            self.key_manager.load_private_key_encrypted(key_id, self.passphrase, algorithm="ED25519")
-            logger.info(
-                f"[{self.agent_name}] ✓ Ed25519鍵を読み込みました: {key_id}"
-            )
-        except Exception as e:
-            # Ed25519鍵が存在しない場合はエラー
+            self.key_agent.attach(self.key_manager, key_id, [algorithm for algorithm, _ in KEY_ALGORITHMS])
+        except KeyAgentError as e:
             logger.error(
-                f"[{self.agent_name}] ❌ Ed25519鍵が見つかりません。\n"
-                f"   鍵を生成するには以下のコマンドを実行してください:\n"
-                f"   \n"
-                f"   cd /app/v2 && python scripts/init_keys.py\n"
-                f"   \n"
-                f"   または Docker環境では:\n"
-                f"   \n"
-                f"   docker compose exec {self.agent_name.lower().replace(' ', '_')} python /app/v2/scripts/init_keys.py\n"
+                f"[{self.agent_name}] ❌ 鍵エージェントから鍵を取得できません: {key_id}\n"
+                f"   鍵エージェント（python -m common.key_agent）が {socket_path} で起動し、\n"
+                f"   --keys に {key_id} が含まれていることを確認してください。\n"
                 f"   \n"
                 f"   Error: {e}"
             )
             raise RuntimeError(
-                f"Ed25519鍵が見つかりません。v2/scripts/init_keys.py を実行してください。"
+                f"鍵エージェントから鍵を取得できません（KEY_AGENT_SOCKET={socket_path}）。"
             ) from e
+        logger.info(f"[{self.agent_name}] ✓ 鍵エージェントモード: {key_id} ({socket_path})")
 
     def _register_common_endpoints(self):
         """共通エンドポイントの登録"""
@@ -282,6 +372,20 @@ class BaseAgent(ABC):
             """ヘルスチェック（Docker向け）"""
             return {"status": "healthy"}
 
+        # GET /metrics - Prometheusテキスト形式のメトリクス（METRICS_ENABLED=falseで無効）
+        register_metrics_endpoint(self.app)
+
+        @self.app.get("/admission/stats")
+        async def admission_stats():
+            """アドミッション制御の状態（レーンごとの実行中・待ち数と、受付・429・503の件数）"""
+            if self.admission_limiter is None:
+                return {"enabled": False}
+            return {
+                "enabled": True,
+                **self.admission_limiter.stats(),
+                "outcomes": dict(self.admission_stats)
+            }
+
         @self.app.get("/.well-known/agent-card.json")
         async def get_agent_card():
             """
@@ -385,7 +489,7 @@ class AgentPassphraseManager:
             str: パスフレーズ
 
         Raises:
-            RuntimeError: 環境変数が設定されていない場合
+            RuntimeError: 環境変数が設定されていない場合（鍵エージェントモードを除く）
         """
         import os
 
@@ -393,6 +497,10 @@ class AgentPassphraseManager:
         env_key = f"AP2_{agent_key.upper()}_PASSPHRASE"
         passphrase = os.getenv(env_key)
 
+        if not passphrase and os.getenv("KEY_AGENT_SOCKET"):
+            # 鍵エージェントモードではサービスは秘密鍵を復号しないため不要
+            return ""
+
         if not passphrase:
             raise RuntimeError(
                 f"❌ セキュリティエラー: 環境変数 {env_key} が設定されていません。\n"
@@ -369,8 +369,7 @@ class KeyManager:
             )
 
             # メモリに保存（アルゴリズム別のkey_idを使用）
-            storage_key_id = f"{key_id}_{algorithm_upper}" if algorithm_upper == "ED25519" else key_id
-            self._active_keys[storage_key_id] = private_key
+            self.set_private_key(key_id, private_key, algorithm=algorithm_upper)
 
             logger.info("Private key loaded successfully")
             return private_key
@@ -378,6 +377,22 @@ class KeyManager:
         except ValueError as e:
             raise CryptoError(f"パスフレーズが正しくないか、鍵ファイルが破損しています: {e}")
 
+    def set_private_key(self, key_id: str, private_key: Any, algorithm: str = "ECDSA"):
+        """
+        秘密鍵をメモリ上のアクティブな鍵として登録
+
+        鍵エージェントモードでは、秘密鍵の代わりに署名を鍵エージェントに委譲する
+        参照（common.key_agent.RemotePrivateKey）を登録する。
+
+        Args:
+            key_id: 鍵の識別子
+            private_key: 秘密鍵（sign()とpublic_key()を持つオブジェクト）
+            algorithm: 鍵のアルゴリズム（ECDSA or ED25519）
+        """
+        algorithm_upper = algorithm.upper()
+        storage_key_id = f"{key_id}_{algorithm_upper}" if algorithm_upper == "ED25519" else key_id
+        self._active_keys[storage_key_id] = private_key
+
     def save_public_key(
         self,
         key_id: str,
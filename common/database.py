@@ -6,18 +6,29 @@ demo_app_v2.mdのデータモデル要件に準拠
 """
 
 import json
+import os
 import uuid
 from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 from contextlib import asynccontextmanager
 
-from sqlalchemy import Column, String, Integer, DateTime, Text, create_engine
+from sqlalchemy import Column, String, Integer, DateTime, Text, create_engine, inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.future import select
 
+from common import metrics
+
 Base = declarative_base()
 
+# リポジトリ操作の所要時間（repository: 対象テーブル, operation: CRUDメソッド名）
+DB_QUERY_SECONDS = metrics.histogram(
+    "ap2_db_query_seconds",
+    "データベース操作の所要時間（秒）",
+    ("repository", "operation")
+)
+
 
 # ========================================
 # SQLAlchemy Models
@@ -338,6 +349,39 @@ class TransactionHistory(Base):
         }
 
 
+# リスク特徴量集計のバケット幅（秒）
+RISK_BUCKET_SECONDS = int(os.getenv("RISK_FEATURE_BUCKET_SECONDS", "300"))
+
+
+class PayerRiskBucket(Base):
+    """
+    payer_risk_bucketsテーブル
+
+    リスク特徴量（24時間件数・直近平均・30日履歴）のための支払者別インクリメンタル集計
+    - payer_id (user_id)
+    - bucket_start (epoch秒, RISK_BUCKET_SECONDS単位)
+    - tx_count
+    - amount_sum (cents)
+
+    transaction_historyへの書き込みと同時にUPSERTで加算されるため、
+    複数レプリカから同じ集計を参照できる
+    """
+    __tablename__ = "payer_risk_buckets"
+
+    payer_id = Column(String, primary_key=True)
+    bucket_start = Column(Integer, primary_key=True)
+    tx_count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Integer, nullable=False, default=0)  # cents
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "payer_id": self.payer_id,
+            "bucket_start": self.bucket_start,
+            "tx_count": self.tx_count,
+            "amount_sum": self.amount_sum,
+        }
+
+
 class AgentSession(Base):
     """
     agent_sessionsテーブル
@@ -383,6 +427,7 @@ class Receipt(Base):
     - currency (JPY, USD, etc.)
     - payment_timestamp (決済実行時刻)
     - received_at (領収書受信時刻)
+    - content_hash (領収書PDFのSHA-256、コンテンツアドレス型ストアのキー・ETag)
     """
     __tablename__ = "receipts"
 
@@ -394,6 +439,7 @@ class Receipt(Base):
     currency = Column(String, nullable=False, default="JPY")
     payment_timestamp = Column(DateTime, nullable=False)
     received_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    content_hash = Column(String, nullable=True)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -401,6 +447,7 @@ class Receipt(Base):
             "user_id": self.user_id,
             "transaction_id": self.transaction_id,
             "receipt_url": self.receipt_url,
+            "content_hash": self.content_hash,
             "amount": {
                 "value": str(self.amount_value / 100),  # centsをdecimalに変換
                 "currency": self.currency
@@ -414,6 +461,22 @@ class Receipt(Base):
 # Database Manager
 # ========================================
 
+def _add_missing_columns(sync_conn):
+    """
+    既存テーブルに後から追加されたNULL許容カラムを追加
+
+    create_allは既存テーブルを変更しないため、既存DBでも新しいカラムを使えるようにする。
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
 class DatabaseManager:
     """SQLiteデータベース管理クラス"""
 
@@ -432,6 +495,7 @@ class DatabaseManager:
         """データベース初期化（テーブル作成）"""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns)
 
     async def drop_all(self):
         """全テーブル削除（開発用）"""
@@ -453,6 +517,7 @@ class ProductCRUD:
     """Product CRUD操作"""
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="create")
     async def create(session: AsyncSession, product_data: Dict[str, Any]) -> Product:
         """商品作成"""
         metadata = product_data.get("metadata", {})
@@ -476,18 +541,21 @@ class ProductCRUD:
         return product
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="get_by_id")
     async def get_by_id(session: AsyncSession, product_id: str) -> Optional[Product]:
         """IDで商品取得"""
         result = await session.execute(select(Product).where(Product.id == product_id))
         return result.scalar_one_or_none()
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="get_by_sku")
     async def get_by_sku(session: AsyncSession, sku: str) -> Optional[Product]:
         """SKUで商品取得"""
         result = await session.execute(select(Product).where(Product.sku == sku))
         return result.scalar_one_or_none()
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="search")
     async def search(session: AsyncSession, query: str, limit: int = 10) -> List[Product]:
         """商品検索（名前または説明で部分一致）"""
         from sqlalchemy import or_
@@ -543,6 +611,7 @@ class ProductCRUD:
         return list(result.scalars().all())
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="update_inventory")
     async def update_inventory(session: AsyncSession, product_id: str, delta: int) -> Optional[Product]:
         """在庫更新"""
         product = await ProductCRUD.get_by_id(session, product_id)
@@ -554,12 +623,14 @@ class ProductCRUD:
         return product
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="list_all")
     async def list_all(session: AsyncSession, limit: int = 100) -> List[Product]:
         """全商品取得"""
         result = await session.execute(select(Product).limit(limit))
         return list(result.scalars().all())
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="get_all_with_stock")
     async def get_all_with_stock(session: AsyncSession, limit: int = 100) -> List[Product]:
         """在庫がある商品のみ取得（AP2準拠）"""
         stmt = select(Product).where(Product.inventory_count > 0).limit(limit)
@@ -567,6 +638,7 @@ class ProductCRUD:
         return list(result.scalars().all())
 
     @staticmethod
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="delete")
     async def delete(session: AsyncSession, product_id: str) -> bool:
         """商品削除"""
         product = await ProductCRUD.get_by_id(session, product_id)
@@ -670,6 +742,20 @@ class TransactionCRUD:
         )
         return list(result.scalars().all())
 
+    @staticmethod
+    async def list_by_created_range(
+        session: AsyncSession,
+        start: datetime,
+        end: datetime
+    ) -> List[Transaction]:
+        """作成日時の範囲（start <= created_at < end）でTransaction取得（古い順）"""
+        result = await session.execute(
+            select(Transaction)
+            .where(Transaction.created_at >= start, Transaction.created_at < end)
+            .order_by(Transaction.created_at)
+        )
+        return list(result.scalars().all())
+
     @staticmethod
     async def list_all(session: AsyncSession, limit: int = 100) -> List[Transaction]:
         """全Transaction取得"""
@@ -778,15 +864,32 @@ class TransactionHistoryCRUD:
 
     @staticmethod
     async def create(session: AsyncSession, history_data: Dict[str, Any]) -> TransactionHistory:
-        """取引履歴作成"""
+        """取引履歴作成（payer_risk_bucketsの集計も同一トランザクションで加算）"""
+        timestamp = history_data.get("timestamp") or datetime.now(timezone.utc)
         history = TransactionHistory(
             id=history_data.get("id", str(uuid.uuid4())),
             payer_id=history_data["payer_id"],
             amount_value=history_data["amount_value"],
             currency=history_data.get("currency", "JPY"),
-            risk_score=history_data["risk_score"]
+            risk_score=history_data["risk_score"],
+            timestamp=timestamp
         )
         session.add(history)
+
+        bucket_start = int(timestamp.timestamp()) // RISK_BUCKET_SECONDS * RISK_BUCKET_SECONDS
+        stmt = sqlite_insert(PayerRiskBucket).values(
+            payer_id=history.payer_id,
+            bucket_start=bucket_start,
+            tx_count=1,
+            amount_sum=history.amount_value
+        )
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[PayerRiskBucket.payer_id, PayerRiskBucket.bucket_start],
+            set_={
+                "tx_count": PayerRiskBucket.tx_count + 1,
+                "amount_sum": PayerRiskBucket.amount_sum + stmt.excluded.amount_sum,
+            }
+        ))
         await session.commit()
         await session.refresh(history)
         return history
@@ -841,10 +944,43 @@ class TransactionHistoryCRUD:
 
         stmt = delete(TransactionHistory).where(TransactionHistory.timestamp < cutoff_date)
         result = await session.execute(stmt)
+        await session.execute(
+            delete(PayerRiskBucket).where(PayerRiskBucket.bucket_start < int(cutoff_date.timestamp()))
+        )
         await session.commit()
 
         return result.rowcount if result.rowcount else 0
 
+    @staticmethod
+    async def get_risk_buckets(
+        session: AsyncSession,
+        payer_ids: List[str],
+        days: int = 30
+    ) -> List[PayerRiskBucket]:
+        """
+        複数ユーザーのリスク集計バケットを1クエリで取得（過去N日間）
+
+        Args:
+            session: データベースセッション
+            payer_ids: ユーザーIDリスト
+            days: 過去何日間の集計を取得するか（デフォルト30日）
+
+        Returns:
+            集計バケットリスト（payer_id, bucket_start昇順）
+        """
+        from datetime import timedelta
+        if not payer_ids:
+            return []
+        cutoff = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp())
+
+        result = await session.execute(
+            select(PayerRiskBucket)
+            .where(PayerRiskBucket.payer_id.in_(payer_ids))
+            .where(PayerRiskBucket.bucket_start >= cutoff)
+            .order_by(PayerRiskBucket.payer_id, PayerRiskBucket.bucket_start)
+        )
+        return list(result.scalars().all())
+
 
 class AgentSessionCRUD:
     """AgentSession CRUD操作"""
@@ -1006,7 +1142,8 @@ class ReceiptCRUD:
                 "transaction_id": "txn_xxxxx",
                 "receipt_url": "http://...",
                 "amount": {"value": "8068.00", "currency": "JPY"},
-                "payment_timestamp": "2025-10-18T12:34:56Z"
+                "payment_timestamp": "2025-10-18T12:34:56Z",
+                "content_hash": "ab12..."  # オプション（領収書PDFのSHA-256）
             }
 
         Returns:
@@ -1031,7 +1168,8 @@ class ReceiptCRUD:
             receipt_url=receipt_data["receipt_url"],
             amount_value=amount_value,
             currency=currency,
-            payment_timestamp=payment_timestamp
+            payment_timestamp=payment_timestamp,
+            content_hash=receipt_data.get("content_hash")
         )
         session.add(receipt)
         await session.commit()
@@ -1064,6 +1202,36 @@ class ReceiptCRUD:
         result = await session.execute(stmt)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_content_hashes(session: AsyncSession, transaction_ids: List[str]) -> Dict[str, Optional[str]]:
+        """トランザクションIDごとの領収書のコンテンツハッシュ（{transaction_id: content_hash}）"""
+        stmt = select(Receipt.transaction_id, Receipt.content_hash).where(Receipt.transaction_id.in_(transaction_ids))
+        return {transaction_id: content_hash for transaction_id, content_hash in await session.execute(stmt)}
+
+    @staticmethod
+    async def get_referenced_content_hashes(session: AsyncSession, content_hashes: List[str]) -> set:
+        """指定したコンテンツハッシュのうち、いずれかの領収書が参照しているもの"""
+        stmt = select(Receipt.content_hash).where(Receipt.content_hash.in_(content_hashes)).distinct()
+        return set((await session.execute(stmt)).scalars().all())
+
+    @staticmethod
+    async def update_content_hashes(session: AsyncSession, content_hashes: Dict[str, str]) -> int:
+        """
+        トランザクションIDごとに領収書のコンテンツハッシュを更新（再レンダリング後）
+
+        Args:
+            content_hashes: {transaction_id: content_hash}
+
+        Returns:
+            int: 更新した領収書数
+        """
+        stmt = select(Receipt).where(Receipt.transaction_id.in_(list(content_hashes)))
+        receipts = list((await session.execute(stmt)).scalars().all())
+        for receipt in receipts:
+            receipt.content_hash = content_hashes[receipt.transaction_id]
+        await session.commit()
+        return len(receipts)
+
     @staticmethod
     async def get_by_id(session: AsyncSession, receipt_id: str) -> Optional[Receipt]:
         """領収書IDで取得"""
@@ -0,0 +1,383 @@
+"""
+v2/common/fake_llm.py
+
+フェイクLLM（DMR互換のOpenAI APIスタンドインサーバー）
+
+- POST /v1/chat/completions（DMRの /engines/{engine}/v1/... も同じ）と GET /v1/models を提供し、
+  DMR_API_URLを向けるだけでShopping Agent・Merchant AgentのLangGraphフローが実際のプロンプト・
+  JSONパースの経路を通る（ネットワーク・GPUなしで負荷試験・CIを実行するため）
+- 応答はプロンプトから判別したスクリプト済みJSON（決定的）:
+    analyze_intent（Merchant Agent）: ユーザー嗜好と検索キーワード
+    optimize_cart（Merchant Agent）: プロンプト内の商品リストから3プラン
+    collect_intent（Shopping Agent）: intent・予算上限・キーワード
+  --scriptのJSONファイル（[{"match": "部分文字列", "response": 文字列またはJSON}, ...]）で追加・上書きできる
+- 応答時間 = 最初のトークンまでの時間（分布から抽出） + トークン数 × トークンあたりの時間
+  分布の指定: "200"（固定ms）、"fixed:200"、"uniform:100:500"、"normal:300:50"、"lognormal:800:0.5"（中央値ms・σ）
+- stream=trueの場合はchat.completion.chunkをSSEで1トークンずつ返す（stream_options.include_usageに対応）
+
+起動例:
+    python -m common.fake_llm --port 12434 --latency lognormal:800:0.5 --token-latency-ms 20
+    DMR_API_URL=http://localhost:12434/engines/llama.cpp/v1 python -m services.merchant_agent.main
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from common.logger import get_logger
+
+logger = get_logger(__name__, service_name='fake_llm')
+
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "0")
+FAKE_LLM_TOKEN_LATENCY_MS = float(os.getenv("FAKE_LLM_TOKEN_LATENCY_MS", "0"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED")
+FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT", "")
+
+DEFAULT_MODEL = "ai/qwen3"
+
+# 日本語テキストのトークン数の概算（1トークンあたりの文字数）
+CHARS_PER_TOKEN = 2
+
+
+# ========================================
+# 応答時間の分布
+# ========================================
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """応答時間の分布（ミリ秒）"""
+
+    kind: str = "fixed"
+    params: Tuple[float, ...] = (0.0,)
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    @classmethod
+    def parse(cls, spec: Union[str, float, "LatencyDistribution"]) -> "LatencyDistribution":
+        """
+        "200" / "fixed:200" / "uniform:100:500" / "normal:300:50" / "lognormal:800:0.5" を解析
+
+        Raises:
+            ValueError: 不明な分布・パラメータ数の誤り
+        """
+        if isinstance(spec, LatencyDistribution):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", (float(spec),))
+        kind, *params = str(spec).strip().split(":")
+        if not params:
+            kind, params = "fixed", [kind]
+        if kind not in cls.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind} (use {', '.join(cls.KINDS)})")
+        if len(params) != cls.KINDS[kind]:
+            raise ValueError(f"Latency distribution '{kind}' takes {cls.KINDS[kind]} parameter(s): {spec}")
+        return cls(kind, tuple(float(param) for param in params))
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            value = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self) -> str:
+        return ":".join([self.kind, *(f"{param:g}" for param in self.params)])
+
+
+# ========================================
+# スクリプト済み応答
+# ========================================
+
+_PRODUCT_LIST_PATTERN = re.compile(r"商品リスト（\d+件）:\s*")
+_KEYWORD_PATTERN = re.compile(r"[A-Za-zァ-ヶー]{2,}")
+_AMOUNT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(万)?\s*円")
+
+
+def extract_keywords(text: str, limit: int = 5) -> List[str]:
+    """テキストから検索キーワードを抽出（ブランド名「むぎぼー」とカタカナ・英字の語）"""
+    keywords = ["むぎぼー"] if "むぎぼー" in text else []
+    for word in _KEYWORD_PATTERN.findall(text):
+        if word not in keywords:
+            keywords.append(word)
+    return keywords[:limit] or ["グッズ"]
+
+
+def extract_max_amount(text: str) -> Optional[int]:
+    """「5000円以内」「1万円まで」から予算上限（円）を抽出"""
+    match = _AMOUNT_PATTERN.search(text)
+    if not match:
+        return None
+    amount = float(match.group(1)) * (10000 if match.group(2) else 1)
+    return int(amount)
+
+
+def _line_after(prompt: str, label: str) -> str:
+    match = re.search(rf"{label}[:：]\s*(.*)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+def analyze_intent_reply(prompt: str) -> Dict[str, Any]:
+    """Merchant Agentのanalyze_intentノード向けの応答（ユーザー嗜好）"""
+    description = _line_after(prompt, "自然言語説明")
+    return {
+        "primary_need": description,
+        "budget_strategy": "low" if extract_max_amount(description) else "balanced",
+        "key_factors": ["品質", "価格"],
+        "search_keywords": extract_keywords(description)
+    }
+
+
+def optimize_cart_reply(prompt: str) -> List[Dict[str, Any]]:
+    """Merchant Agentのoptimize_cartノード向けの応答（プロンプト内の商品から3プランを構成）"""
+    products: List[Dict[str, Any]] = []
+    match = _PRODUCT_LIST_PATTERN.search(prompt)
+    if match:
+        try:
+            products, _ = json.JSONDecoder().raw_decode(prompt, match.end())
+        except ValueError:
+            products = []
+    products = sorted(products, key=lambda p: (p.get("price_jpy", 0), str(p.get("id"))))
+    plans = []
+    for name, chosen in (
+        ("予算内プラン", products[:2]),
+        ("充実プラン", products[-3:]),
+        ("シンプルプラン", products[:1]),
+    ):
+        if chosen:
+            plans.append({
+                "name": name,
+                "description": f"{len(chosen)}点の商品を組み合わせました",
+                "items": [{"product_id": p["id"], "quantity": 1} for p in chosen]
+            })
+    return plans
+
+
+def collect_intent_reply(prompt: str) -> Dict[str, Any]:
+    """Shopping Agentのcollect_intent_node向けの応答（intent・予算上限・キーワード）"""
+    match = re.search(r"以下のユーザー要望を分析してください:\s*\n(.*?)\n\s*\nJSON形式", prompt, re.DOTALL)
+    user_input = match.group(1).strip() if match else prompt.strip()
+    return {
+        "intent": user_input,
+        "max_amount": extract_max_amount(user_input),
+        "keywords": extract_keywords(user_input)
+    }
+
+
+Responder = Callable[[str], Any]
+
+
+@dataclass(frozen=True)
+class ScriptRule:
+    """システムプロンプト（またはユーザープロンプト）に含まれる文字列で応答を選ぶルール"""
+
+    name: str
+    match: str
+    respond: Responder
+
+
+# 判定順に注意: Shopping Agentは「Intent分析」、Merchant Agentは「インテント分析」
+BUILTIN_RULES: Tuple[ScriptRule, ...] = (
+    ScriptRule("analyze_intent", "インテント分析", analyze_intent_reply),
+    ScriptRule("optimize_cart", "カート最適化", optimize_cart_reply),
+    ScriptRule("collect_intent", "Shopping AgentのIntent分析", collect_intent_reply),
+)
+
+
+def load_script(path: str) -> List[ScriptRule]:
+    """
+    スクリプトファイル（JSON配列）を読み込み
+
+    [{"match": "部分文字列", "response": 文字列またはJSON, "name": "任意"}, ...]
+    responseが文字列以外の場合はJSONとして返す。
+    """
+    rules = []
+    for index, entry in enumerate(json.loads(Path(path).read_text(encoding="utf-8"))):
+        response = entry["response"]
+        content = response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+        rules.append(ScriptRule(entry.get("name", f"script_{index}"), entry["match"], lambda _prompt, c=content: c))
+    return rules
+
+
+def select_reply(messages: Sequence[Dict[str, Any]], rules: Sequence[ScriptRule]) -> Tuple[str, str]:
+    """メッセージから応答を選択し、(ルール名, 応答テキスト) を返す（一致なしは "{}"）"""
+    system_prompt = "\n".join(_content_text(m) for m in messages if m.get("role") == "system")
+    user_prompt = next((_content_text(m) for m in reversed(messages) if m.get("role") == "user"), "")
+    for rule in rules:
+        if rule.match in system_prompt or rule.match in user_prompt:
+            reply = rule.respond(user_prompt)
+            return rule.name, reply if isinstance(reply, str) else json.dumps(reply, ensure_ascii=False)
+    return "default", "{}"
+
+
+def _content_text(message: Dict[str, Any]) -> str:
+    """message.content（文字列またはcontent partの配列）をテキストに変換"""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def split_tokens(text: str) -> List[str]:
+    """ストリーミング用にテキストをトークン相当の断片に分割"""
+    return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)] or [""]
+
+
+# ========================================
+# アプリ
+# ========================================
+
+def create_fake_llm_app(
+    latency: Union[str, float, LatencyDistribution] = 0.0,
+    token_latency_ms: float = 0.0,
+    seed: Optional[int] = None,
+    script_rules: Sequence[ScriptRule] = (),
+    model: str = DEFAULT_MODEL
+) -> FastAPI:
+    """
+    OpenAI互換のフェイクLLMアプリを作成
+
+    Args:
+        latency: 最初のトークンまでの時間の分布（LatencyDistribution.parseの形式、ミリ秒）
+        token_latency_ms: 生成トークンあたりの時間
+        seed: 応答時間の乱数シード（指定すると応答時間の系列も決定的になる）
+        script_rules: 組み込みルールより優先するスクリプト
+        model: /v1/modelsで返すモデル名
+
+    Returns:
+        FastAPIアプリ（app.state.requests: 受信件数、app.state.replies: ルール別の応答件数）
+    """
+    distribution = LatencyDistribution.parse(latency)
+    rng = random.Random(seed)
+    rules = (*script_rules, *BUILTIN_RULES)
+
+    app = FastAPI(title="Fake LLM")
+    app.state.requests = 0
+    app.state.replies = Counter()
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        messages = body.get("messages", [])
+        rule_name, content = select_reply(messages, rules)
+        app.state.replies[rule_name] += 1
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model_name = body.get("model") or model
+        tokens = split_tokens(content)
+        prompt_tokens = sum(len(_content_text(m)) for m in messages) // CHARS_PER_TOKEN
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)
+        }
+        first_token_seconds = distribution.sample_ms(rng) / 1000
+        token_seconds = token_latency_ms / 1000
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_seconds + token_seconds * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model_name,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model_name,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def stream():
+            await asyncio.sleep(first_token_seconds)
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                if token_seconds:
+                    await asyncio.sleep(token_seconds)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            if include_usage:
+                yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model_name, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def list_models():
+        return {"object": "list", "data": [{"id": model, "object": "model", "created": 0, "owned_by": "fake_llm"}]}
+
+    # DMRのURL（/engines/llama.cpp/v1）とOpenAI形式（/v1）の両方で受け付ける
+    for prefix in ("/v1", "/engines/{engine}/v1"):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+        app.add_api_route(f"{prefix}/models", list_models, methods=["GET"])
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "latency": str(distribution), "token_latency_ms": token_latency_ms}
+
+    @app.exception_handler(json.JSONDecodeError)
+    async def invalid_json(request: Request, exc: json.JSONDecodeError):
+        return JSONResponse(status_code=400, content={"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server (DMR stand-in)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=12434)
+    parser.add_argument("--latency", default=FAKE_LLM_LATENCY,
+                        help="最初のトークンまでの時間の分布（例: 200, uniform:100:500, lognormal:800:0.5）")
+    parser.add_argument("--token-latency-ms", type=float, default=FAKE_LLM_TOKEN_LATENCY_MS, help="トークンあたりの時間")
+    parser.add_argument("--seed", type=int, default=int(FAKE_LLM_SEED) if FAKE_LLM_SEED else None, help="応答時間の乱数シード")
+    parser.add_argument("--script", default=FAKE_LLM_SCRIPT, help="スクリプト済み応答のJSONファイル")
+    parser.add_argument("--model", default=os.getenv("DMR_MODEL", DEFAULT_MODEL))
+    args = parser.parse_args()
+
+    app = create_fake_llm_app(
+        latency=args.latency,
+        token_latency_ms=args.token_latency_ms,
+        seed=args.seed,
+        script_rules=load_script(args.script) if args.script else (),
+        model=args.model
+    )
+    logger.info(f"[FakeLLM] Listening on {args.host}:{args.port} (latency={LatencyDistribution.parse(args.latency)}, "
+                f"token_latency_ms={args.token_latency_ms})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
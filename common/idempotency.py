@@ -0,0 +1,293 @@
+"""
+v2/common/idempotency.py
+
+Idempotency-Keyミドルウェア（共通モジュール）
+
+- Idempotency-Keyヘッダー付きのPOSTリクエストを1回だけ実行し、レスポンスをRedisに保存（TTL付き）
+- 同じキーの再送には保存済みレスポンスを返す（Idempotent-Replayed: trueヘッダー付き）
+- 同時に届いた重複リクエストは実行中のリクエストの完了を待って同じレスポンスを返す
+  （同一プロセス内はFutureで待機、他レプリカはRedisをポーリング）
+- 同じキーで異なるリクエスト（メソッド・パス・Authorization・ボディ）が届いた場合は422
+- Redisに接続できない場合は通常どおり処理する（fail open）
+- post_idempotent(): 呼び出し側のヘルパー。決定的なキーを付けてPOSTし、送信失敗・タイムアウト・
+  409（実行中）・5xxは同じキー・同じボディで再送する（再送による二重実行を防ぐ）
+
+Redisキー: idempotency:{namespace}:{path}:{Idempotency-Key}
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from common.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = "idempotent-replayed"
+MAX_KEY_LENGTH = 255
+
+STATE_IN_FLIGHT = "in_flight"
+STATE_COMPLETED = "completed"
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+# post_idempotent()の再送回数・初回の待機秒数（以降は倍々）
+IDEMPOTENCY_CLIENT_RETRIES = int(os.getenv("IDEMPOTENCY_CLIENT_RETRIES", "2"))
+IDEMPOTENCY_CLIENT_BACKOFF_SECONDS = float(os.getenv("IDEMPOTENCY_CLIENT_BACKOFF_SECONDS", "0.2"))
+
+
+def request_fingerprint(method: str, path: str, authorization: bytes, body: bytes) -> str:
+    """リクエストの同一性判定用ハッシュ（異なる呼び出し元・内容でのキー再利用を検出）"""
+    digest = hashlib.sha256()
+    for part in (method.encode(), path.encode(), authorization, body):
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def _is_retryable(response) -> bool:
+    # 409はミドルウェアの「実行中」「元のリクエストが失敗」（Retry-After付き）のみ再送
+    if response.status_code == 409:
+        return "retry-after" in response.headers
+    return response.status_code >= 500
+
+
+async def post_idempotent(
+    client,
+    url: str,
+    idempotency_key: str,
+    retries: int = IDEMPOTENCY_CLIENT_RETRIES,
+    backoff_seconds: float = IDEMPOTENCY_CLIENT_BACKOFF_SECONDS,
+    **kwargs
+):
+    """
+    Idempotency-Key付きでPOSTし、失敗時は同じキー・同じボディで再送
+
+    キーは再送しても変わらない値（transaction_id・mandate ID等）を渡すこと。
+    応答が失われた（タイムアウト）リクエストの再送は、サーバー側で保存済みレスポンスの再生になる。
+
+    Args:
+        client: HTTPクライアント（httpx.AsyncClient・LoggingAsyncClient）
+        url: 送信先URL
+        idempotency_key: Idempotency-Keyヘッダーの値
+        retries: 再送回数
+        backoff_seconds: 初回の再送までの待機秒数（以降は倍々）
+        **kwargs: client.postに渡す引数（json・timeout等）
+
+    Returns:
+        最後のレスポンス（再送しても失敗した場合は最後の失敗レスポンス）
+
+    Raises:
+        httpx.TransportError: 最後の送信も接続エラー・タイムアウトだった場合
+    """
+    headers = {**(kwargs.pop("headers", None) or {}), "Idempotency-Key": idempotency_key}
+    for attempt in range(retries + 1):
+        last_attempt = attempt == retries
+        try:
+            response = await client.post(url, headers=headers, **kwargs)
+        except httpx.TransportError as e:
+            if last_attempt:
+                raise
+            logger.warning(f"[Idempotency] POST {url} failed ({type(e).__name__}), retrying with the same key")
+        else:
+            if last_attempt or not _is_retryable(response):
+                return response
+            logger.warning(f"[Idempotency] POST {url} returned {response.status_code}, retrying with the same key")
+        await asyncio.sleep(backoff_seconds * (2 ** attempt))
+
+
+class IdempotencyMiddleware:
+    """
+    Idempotency-KeyによるPOSTリクエストの重複排除（ASGIミドルウェア）
+
+    使用例:
+        app.add_middleware(
+            IdempotencyMiddleware,
+            redis_client=RedisClient(redis_url),
+            paths=["/network/charge"],
+            namespace="payment_network"
+        )
+    """
+
+    def __init__(
+        self,
+        app,
+        redis_client: RedisClient,
+        paths: Iterable[str],
+        namespace: str,
+        ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+        lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS,
+        wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS,
+        poll_interval: float = 0.05
+    ):
+        """
+        Args:
+            app: ASGIアプリ
+            redis_client: 保存先のRedisクライアント
+            paths: 対象パス（POSTのみ）
+            namespace: Redisキーの名前空間（サービス名）
+            ttl_seconds: 完了済みレスポンスの保存期間
+            lock_seconds: 実行中エントリの有効期限（実行中のプロセスが落ちた場合の解放）
+            wait_seconds: 重複リクエストが実行完了を待つ最大秒数
+            poll_interval: 他レプリカで実行中のリクエストのポーリング間隔
+        """
+        self.app = app
+        self.redis = redis_client
+        self.paths = frozenset(paths)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+        # 同一プロセス内で実行中のリクエスト（Redisキー → 完了レコードのFuture）
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = headers.get(IDEMPOTENCY_HEADER.encode(), b"").decode("latin-1").strip()
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+            return
+
+        body = await self._read_body(receive)
+        replay_receive = self._replay_receive(body, receive)
+        fingerprint = request_fingerprint(scope["method"], scope["path"], headers.get(b"authorization", b""), body)
+        redis_key = f"idempotency:{self.namespace}:{scope['path']}:{key}"
+
+        # 同一プロセス内で実行中なら完了を待つ
+        local = self._in_flight.get(redis_key)
+        if local is not None:
+            record = await asyncio.shield(local)
+            await self._send_record(send, record, fingerprint)
+            return
+
+        claimed = await self.redis.set_if_absent(
+            redis_key, {"state": STATE_IN_FLIGHT, "fingerprint": fingerprint}, ttl_seconds=self.lock_seconds
+        )
+        if claimed is None:
+            logger.warning(f"[Idempotency] Redis unavailable, processing without idempotency: {redis_key}")
+            await self.app(scope, replay_receive, send)
+            return
+        if not claimed:
+            record = await self._wait_for_completion(redis_key)
+            await self._send_record(send, record, fingerprint)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[redis_key] = future
+        record: Optional[Dict[str, Any]] = None
+        try:
+            record = await self._execute(scope, replay_receive, send, fingerprint)
+        finally:
+            self._in_flight.pop(redis_key, None)
+            future.set_result(record)
+            if record is not None and record["status"] < 500:
+                await self.redis.set(redis_key, record, ttl_seconds=self.ttl_seconds)
+            else:
+                # 5xx・例外時は保存しない（クライアントの再送で再実行できるようにする）
+                await self.redis.delete(redis_key)
+
+    async def _execute(self, scope, receive, send, fingerprint: str) -> Dict[str, Any]:
+        """リクエストを実行し、クライアントに送信しながらレスポンスを記録"""
+        record: Dict[str, Any] = {"state": STATE_COMPLETED, "fingerprint": fingerprint, "status": 500, "headers": []}
+        chunks: List[bytes] = []
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                record["status"] = message["status"]
+                record["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, capture_send)
+        record["body"] = base64.b64encode(b"".join(chunks)).decode("ascii")
+        return record
+
+    async def _wait_for_completion(self, redis_key: str) -> Optional[Dict[str, Any]]:
+        """他レプリカで実行中のリクエストが完了するまでRedisをポーリング"""
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            record = await self.redis.get(redis_key)
+            if not isinstance(record, dict):
+                # 実行側が失敗して解放された
+                return None
+            if record.get("state") == STATE_COMPLETED:
+                return record
+            await asyncio.sleep(self.poll_interval)
+        logger.warning(f"[Idempotency] Timed out waiting for in-flight request: {redis_key}")
+        return {"state": STATE_IN_FLIGHT}
+
+    async def _send_record(self, send, record: Optional[Dict[str, Any]], fingerprint: str):
+        """保存済みレスポンスを再送"""
+        if record is None:
+            await self._send_error(
+                send, 409, "The original request with this Idempotency-Key failed; retry the request", retry_after=True
+            )
+            return
+        if record.get("state") != STATE_COMPLETED:
+            await self._send_error(
+                send, 409, "A request with this Idempotency-Key is still in progress", retry_after=True
+            )
+            return
+        if record.get("fingerprint") != fingerprint:
+            await self._send_error(send, 422, "Idempotency-Key was reused with a different request")
+            return
+
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+        headers.append((REPLAYED_HEADER.encode(), b"true"))
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+    @staticmethod
+    async def _send_error(send, status: int, detail: str, retry_after: bool = False):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if retry_after:
+            headers.append((b"retry-after", b"1"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive) -> Callable[[], Awaitable[Dict[str, Any]]]:
+        """読み取り済みのボディを1回だけ返し、以降は元のreceive（切断検知）に委譲"""
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
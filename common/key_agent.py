@@ -0,0 +1,366 @@
+"""
+v2/common/key_agent.py
+
+鍵エージェント（署名サイドカー）
+
+- 鍵エージェントは起動時に1回だけ秘密鍵を復号してメモリに保持し、Unixドメインソケットで署名リクエストを処理する
+- ソケットは鍵IDごとに分ける（<socket_dir>/<key_id>/key-agent.sock）。各ソケットはその鍵IDの鍵だけを扱うため、
+  サービスには自分の鍵IDのディレクトリだけをマウントすれば、他のエージェントの鍵では署名できない
+- 各サービスは秘密鍵を復号せずに起動し（パスフレーズ不要）、署名を鍵エージェントに委譲する
+  （KEY_AGENT_SOCKETを設定するとBaseAgentが鍵エージェントモードで起動）
+- サービスのKeyManagerにはRemotePrivateKey（cryptographyの秘密鍵と同じsign()/public_key()を持つ参照）を登録するため、
+  SignatureManager・JWT生成などの既存の署名処理はそのまま鍵エージェント経由になる
+
+プロトコル（長さプレフィックス付きバイナリフレーム、1接続で複数リクエストを順に処理）:
+    リクエスト: [長さ:uint32][op:uint8][algorithm:uint8][key_id長:uint16][key_id][data]
+    レスポンス: [長さ:uint32][status:uint8][body]   （body: 署名・公開鍵PEM・エラーメッセージ）
+    長さはそれ以降のバイト数（ビッグエンディアン）
+
+起動例:
+    python -m common.key_agent --socket-dir /run/key-agent \\
+        --keys shopping_agent merchant_agent merchant credential_provider payment_processor
+    # shopping_agent: KEY_AGENT_SOCKET=/run/key-agent/shopping_agent/key-agent.sock
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import queue
+import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from common.crypto import CryptoError, KeyManager
+from common.logger import get_logger
+
+logger = get_logger(__name__, service_name='key_agent')
+
+KEY_AGENT_SOCKET = os.getenv("KEY_AGENT_SOCKET", "")
+KEY_AGENT_SOCKET_DIR = os.getenv("KEY_AGENT_SOCKET_DIR", "/run/key-agent")
+KEY_AGENT_SOCKET_NAME = "key-agent.sock"
+KEY_AGENT_TIMEOUT_SECONDS = float(os.getenv("KEY_AGENT_TIMEOUT_SECONDS", "5"))
+
+OP_PING = 0
+OP_PUBLIC_KEY = 1
+OP_SIGN = 2
+
+ALGORITHMS = {"ECDSA": 1, "ED25519": 2}
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# 1フレームの最大サイズ（署名対象データを含む）
+MAX_FRAME_SIZE = 1024 * 1024
+
+_LENGTH = struct.Struct("!I")
+_REQUEST_HEADER = struct.Struct("!BBH")
+_RESPONSE_HEADER = struct.Struct("!B")
+
+
+class KeyAgentError(CryptoError):
+    """鍵エージェントとの通信・署名エラー"""
+
+
+def encode_request(op: int, algorithm: str = "ECDSA", key_id: str = "", data: bytes = b"") -> bytes:
+    """リクエストフレームをエンコード"""
+    key_bytes = key_id.encode("utf-8")
+    body_length = _REQUEST_HEADER.size + len(key_bytes) + len(data)
+    return b"".join((
+        _LENGTH.pack(body_length),
+        _REQUEST_HEADER.pack(op, ALGORITHMS[algorithm.upper()], len(key_bytes)),
+        key_bytes,
+        data
+    ))
+
+
+def encode_response(status: int, body: bytes) -> bytes:
+    """レスポンスフレームをエンコード"""
+    return _LENGTH.pack(_RESPONSE_HEADER.size + len(body)) + _RESPONSE_HEADER.pack(status) + body
+
+
+class RemotePrivateKey:
+    """
+    鍵エージェントが保持する秘密鍵への参照
+
+    cryptographyの秘密鍵（EllipticCurvePrivateKey / Ed25519PrivateKey）のうち、
+    このリポジトリの署名処理が使うsign()とpublic_key()だけを提供する。
+    """
+
+    def __init__(self, client: "KeyAgentClient", key_id: str, algorithm: str, public_key: Any):
+        self.key_id = key_id
+        self.algorithm = algorithm.upper()
+        self._client = client
+        self._public_key = public_key
+
+    def sign(self, data: bytes, signature_algorithm: Optional[Any] = None) -> bytes:
+        """鍵エージェントで署名（ECDSAはSHA-256のDER署名、Ed25519は生署名）"""
+        if self.algorithm == "ECDSA" and not (
+            isinstance(signature_algorithm, ec.ECDSA) and isinstance(signature_algorithm.algorithm, hashes.SHA256)
+        ):
+            raise KeyAgentError("Key agent supports only ECDSA with SHA-256")
+        return self._client.sign(self.key_id, self.algorithm, data)
+
+    def public_key(self) -> Any:
+        return self._public_key
+
+
+class KeyAgentClient:
+    """
+    鍵エージェントのクライアント（同期）
+
+    署名処理は同期API（private_key.sign）から呼ばれるため、ブロッキングソケットを使用する。
+    接続はスレッド間で共有せず、アイドル接続をプールして再利用する。
+    """
+
+    def __init__(self, socket_path: str, timeout: float = KEY_AGENT_TIMEOUT_SECONDS, max_idle: int = 16):
+        """
+        Args:
+            socket_path: 鍵エージェントのUnixドメインソケットのパス
+            timeout: 1リクエストのタイムアウト（秒）
+            max_idle: プールに保持するアイドル接続の最大数
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue(maxsize=max_idle)
+
+    def _connect(self) -> socket.socket:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _release(self, sock: socket.socket):
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    @staticmethod
+    def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = sock.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("Key agent closed the connection")
+            received += count
+        return bytes(buffer)
+
+    def _call(self, op: int, algorithm: str = "ECDSA", key_id: str = "", data: bytes = b"") -> bytes:
+        request = encode_request(op, algorithm, key_id, data)
+        try:
+            sock = self._connect()
+        except OSError as e:
+            raise KeyAgentError(f"Failed to connect to key agent at {self.socket_path}: {e}") from e
+        try:
+            sock.sendall(request)
+            (length,) = _LENGTH.unpack(self._recv_exactly(sock, _LENGTH.size))
+            frame = self._recv_exactly(sock, length)
+        except OSError as e:
+            sock.close()
+            raise KeyAgentError(f"Key agent request failed: {e}") from e
+        self._release(sock)
+
+        status, body = frame[0], frame[_RESPONSE_HEADER.size:]
+        if status != STATUS_OK:
+            raise KeyAgentError(body.decode("utf-8", errors="replace"))
+        return body
+
+    def ping(self):
+        """鍵エージェントの疎通確認"""
+        self._call(OP_PING)
+
+    def get_public_key(self, key_id: str, algorithm: str = "ECDSA") -> Any:
+        """鍵エージェントが保持する鍵の公開鍵を取得"""
+        pem = self._call(OP_PUBLIC_KEY, algorithm, key_id)
+        return serialization.load_pem_public_key(pem)
+
+    def sign(self, key_id: str, algorithm: str, data: bytes) -> bytes:
+        """鍵エージェントで署名"""
+        return self._call(OP_SIGN, algorithm, key_id, data)
+
+    def attach(self, key_manager: KeyManager, key_id: str, algorithms: Iterable[str] = ("ECDSA", "ED25519")):
+        """
+        鍵エージェントの鍵をKeyManagerに登録（秘密鍵の代わりにRemotePrivateKeyを登録）
+
+        Raises:
+            KeyAgentError: 鍵エージェントに接続できない、または鍵を保持していない場合
+        """
+        for algorithm in algorithms:
+            public_key = self.get_public_key(key_id, algorithm)
+            key_manager.set_private_key(key_id, RemotePrivateKey(self, key_id, algorithm, public_key), algorithm)
+
+    def close(self):
+        """アイドル接続を閉じる"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class KeyAgentServer:
+    """
+    鍵エージェントのサーバー
+
+    使用例:
+        server = KeyAgentServer("/run/key-agent")
+        server.load_keys(KeyManager("./keys"), {"shopping_agent": passphrase})
+        await server.start()  # /run/key-agent/shopping_agent/key-agent.sock
+    """
+
+    def __init__(self, socket_dir: str):
+        self.socket_dir = socket_dir
+        self._keys: Dict[Tuple[str, int], Any] = {}
+        self._public_keys: Dict[Tuple[str, int], bytes] = {}
+        self._servers: Dict[str, asyncio.AbstractServer] = {}
+        self.requests = 0
+
+    def socket_path(self, key_id: str) -> str:
+        """鍵IDのソケットのパス"""
+        return str(Path(self.socket_dir) / key_id / KEY_AGENT_SOCKET_NAME)
+
+    def add_key(self, key_id: str, algorithm: str, private_key: Any):
+        """復号済みの秘密鍵を登録"""
+        key = (key_id, ALGORITHMS[algorithm.upper()])
+        self._keys[key] = private_key
+        self._public_keys[key] = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+    def load_keys(
+        self,
+        key_manager: KeyManager,
+        passphrases: Dict[str, str],
+        algorithms: Iterable[str] = ("ECDSA", "ED25519")
+    ):
+        """
+        暗号化された秘密鍵を復号して登録（鍵ごと・アルゴリズムごとに並行して復号）
+
+        Args:
+            key_manager: 鍵ファイルを読み込むKeyManager
+            passphrases: 鍵ID → パスフレーズ
+            algorithms: 読み込むアルゴリズム
+        """
+        jobs = [(key_id, algorithm) for key_id in passphrases for algorithm in algorithms]
+        with ThreadPoolExecutor(max_workers=max(len(jobs), 1), thread_name_prefix="key-load") as executor:
+            futures = {
+                job: executor.submit(
+                    key_manager.load_private_key_encrypted, job[0], passphrases[job[0]], algorithm=job[1]
+                )
+                for job in jobs
+            }
+        for (key_id, algorithm), future in futures.items():
+            self.add_key(key_id, algorithm, future.result())
+            logger.info(f"[KeyAgent] Loaded {algorithm} key: {key_id}")
+
+    def handle_frame(self, frame: bytes, socket_key_id: str) -> bytes:
+        """
+        リクエストフレーム（長さプレフィックスを除く）を処理してレスポンスフレームを返す
+
+        Args:
+            frame: リクエストフレーム
+            socket_key_id: 接続を受け付けたソケットの鍵ID（他の鍵IDへのリクエストは拒否）
+        """
+        self.requests += 1
+        try:
+            op, algorithm_code, key_length = _REQUEST_HEADER.unpack_from(frame)
+            offset = _REQUEST_HEADER.size
+            key = (frame[offset:offset + key_length].decode("utf-8"), algorithm_code)
+            data = frame[offset + key_length:]
+
+            if op == OP_PING:
+                return encode_response(STATUS_OK, b"")
+            if key[0] != socket_key_id:
+                logger.warning(f"[KeyAgent] Rejected request for key {key[0]} on the {socket_key_id} socket")
+                return encode_response(STATUS_ERROR, f"Key {key[0]} is not served on this socket".encode())
+            if key not in self._keys:
+                return encode_response(STATUS_ERROR, f"Unknown key: {key[0]} (algorithm: {algorithm_code})".encode())
+            if op == OP_PUBLIC_KEY:
+                return encode_response(STATUS_OK, self._public_keys[key])
+            if op == OP_SIGN:
+                private_key = self._keys[key]
+                if algorithm_code == ALGORITHMS["ECDSA"]:
+                    signature = private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+                else:
+                    signature = private_key.sign(data)
+                return encode_response(STATUS_OK, signature)
+            return encode_response(STATUS_ERROR, f"Unknown operation: {op}".encode())
+        except Exception as e:
+            logger.warning(f"[KeyAgent] Request failed: {e}")
+            return encode_response(STATUS_ERROR, str(e).encode("utf-8"))
+
+    async def _handle_connection(self, key_id: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                if length > MAX_FRAME_SIZE:
+                    logger.warning(f"[KeyAgent] Frame too large ({length} bytes), closing connection")
+                    return
+                writer.write(self.handle_frame(await reader.readexactly(length), key_id))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        """鍵IDごとのUnixドメインソケットで待ち受け開始（ソケットは所有者のみアクセス可）"""
+        for key_id in sorted({key_id for key_id, _ in self._keys}):
+            path = Path(self.socket_path(key_id))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                path.unlink()
+            self._servers[key_id] = await asyncio.start_unix_server(
+                functools.partial(self._handle_connection, key_id), path=str(path)
+            )
+            os.chmod(path, 0o600)
+            logger.info(f"[KeyAgent] Listening on {path} (key: {key_id})")
+
+    async def serve_forever(self):
+        await self.start()
+        await asyncio.gather(*(server.serve_forever() for server in self._servers.values()))
+
+    async def stop(self):
+        for key_id, server in self._servers.items():
+            server.close()
+            await server.wait_closed()
+            Path(self.socket_path(key_id)).unlink(missing_ok=True)
+        self._servers.clear()
+
+
+def main():
+    from common.base_agent import AgentPassphraseManager
+
+    parser = argparse.ArgumentParser(description="AP2 key agent (signing sidecar)")
+    parser.add_argument("--socket-dir", default=KEY_AGENT_SOCKET_DIR, help="鍵IDごとのソケットを作るディレクトリ")
+    parser.add_argument("--keys", nargs="+", required=True, help="読み込む鍵ID（パスフレーズはAP2_{KEY_ID}_PASSPHRASE）")
+    parser.add_argument("--keys-directory", default=os.getenv("AP2_KEYS_DIRECTORY", "./keys"))
+    args = parser.parse_args()
+
+    server = KeyAgentServer(args.socket_dir)
+    server.load_keys(
+        KeyManager(keys_directory=args.keys_directory),
+        {key_id: AgentPassphraseManager.get_passphrase(key_id) for key_id in args.keys}
+    )
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
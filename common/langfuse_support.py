@@ -0,0 +1,88 @@
+"""
+v2/common/langfuse_support.py
+
+Langfuseトレーシングの遅延初期化（共通モジュール）
+
+- langfuseパッケージのimportとクライアント生成は最初の利用時に1回だけ行う
+  （モジュールimport時に初期化しないことでサービスの起動時間を短縮）
+- LANGFUSE_ENABLED=false、またはパッケージ未インストール・初期化失敗時は無効として扱う
+
+使用例:
+    handler_class = get_callback_handler_class()
+    if handler_class:
+        config["callbacks"] = [handler_class()]
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() == "true"
+
+_lock = threading.Lock()
+_initialized = False
+_client: Optional[Any] = None
+_callback_handler_class: Optional[type] = None
+
+
+def _initialize():
+    """Langfuseクライアントを初期化（初回のみ）"""
+    global _initialized, _client, _callback_handler_class
+    if _initialized:
+        return
+    with _lock:
+        if _initialized:
+            return
+        if LANGFUSE_ENABLED:
+            try:
+                from langfuse import Langfuse
+                from langfuse.langchain import CallbackHandler
+
+                _client = Langfuse(
+                    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+                    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+                    host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
+                )
+                _callback_handler_class = CallbackHandler
+                logger.info("[Langfuse] Tracing enabled")
+            except Exception as e:
+                logger.warning(f"[Langfuse] Failed to initialize: {e}")
+                _client = None
+                _callback_handler_class = None
+        _initialized = True
+
+
+def is_langfuse_enabled() -> bool:
+    """Langfuseトレーシングが有効か（初回呼び出し時に初期化）"""
+    _initialize()
+    return _client is not None
+
+
+def get_langfuse_client() -> Optional[Any]:
+    """Langfuseクライアント（無効時はNone）"""
+    _initialize()
+    return _client
+
+
+def get_callback_handler_class() -> Optional[type]:
+    """LangChain用CallbackHandlerクラス（無効時はNone）"""
+    _initialize()
+    return _callback_handler_class
+
+
+def flush_langfuse():
+    """送信待ちのトレースをフラッシュ（未初期化の場合は何もしない）"""
+    if _initialized and _client is not None:
+        _client.flush()
+
+
+def reset_langfuse():
+    """初期化状態をリセット（テスト用）"""
+    global _initialized, _client, _callback_handler_class
+    with _lock:
+        _initialized = False
+        _client = None
+        _callback_handler_class = None
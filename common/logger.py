@@ -3,12 +3,21 @@ AP2 共通ロギング設定モジュール
 
 環境変数でログレベルを制御可能な統一ロガーを提供します。
 HTTPやA2Aのペイロードは自動的にDEBUGレベルで出力されます。
+
+ペイロードの整形（機密データのマスク・JSONシリアライズ）はLazyPayloadにより
+ハンドラーがレコードを出力するときまで遅延し、DEBUGが無効な場合は一切行いません。
+LOG_ASYNC=trueの場合、ログの出力（フォーマット・I/O）はQueueListenerのスレッドで行い、
+イベントループをブロックしません（ペイロードは呼び出し後に変更されうるため、キューに入れる時点で展開します）。
 """
 
+import atexit
 import logging
 import os
+import queue
 import sys
 import json
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any, Dict, Optional
 from datetime import datetime
 
@@ -29,30 +38,68 @@ class SensitiveDataFilter(logging.Filter):
                 return True
 
             # JSONペイロードの場合はパースして機密キーをマスク
+            # （機密キーの文字列を含まないメッセージはパースしない）
+            if not record.msg.lstrip().startswith('{'):
+                return True
+            message = record.msg.lower()
+            if not any(key in message for key in self.SENSITIVE_KEYS):
+                return True
             try:
-                if record.msg.strip().startswith('{'):
-                    data = json.loads(record.msg)
-                    masked_data = self._mask_sensitive_data(data)
-                    record.msg = json.dumps(masked_data, ensure_ascii=False, indent=2)
+                data = json.loads(record.msg)
+                masked_data = self._mask_sensitive_data(data)
+                record.msg = json.dumps(masked_data, ensure_ascii=False, indent=2)
             except (json.JSONDecodeError, AttributeError):
                 pass
 
         return True
 
-    def _mask_sensitive_data(self, data: Any) -> Any:
-        """再帰的に機密データをマスク"""
+    @classmethod
+    def _mask_sensitive_data(cls, data: Any) -> Any:
+        """再帰的に機密データをマスク（dict・list以外の値はそのまま参照する）"""
         if isinstance(data, dict):
-            return {
-                key: '***MASKED***' if key.lower() in self.SENSITIVE_KEYS
-                else self._mask_sensitive_data(value)
-                for key, value in data.items()
-            }
+            masked = {}
+            for key, value in data.items():
+                if isinstance(key, str) and key.lower() in cls.SENSITIVE_KEYS:
+                    masked[key] = '***MASKED***'
+                elif isinstance(value, (dict, list)):
+                    masked[key] = cls._mask_sensitive_data(value)
+                else:
+                    masked[key] = value
+            return masked
         elif isinstance(data, list):
-            return [self._mask_sensitive_data(item) for item in data]
+            return [
+                cls._mask_sensitive_data(item) if isinstance(item, (dict, list)) else item
+                for item in data
+            ]
         else:
             return data
 
 
+class LazyPayload:
+    """
+    ログ出力時まで整形を遅延するペイロード
+
+    ログ引数（%s）として渡すと、ハンドラーがメッセージを整形するとき（AsyncLogHandlerではキューに入れるとき）に初めて
+    機密データのマスクとJSONシリアライズを行う（結果はキャッシュし、複数のハンドラーでも1回のみ）。
+    ログレベルが無効でレコードが作られない場合は何も行わない。
+
+    使用例:
+        logger.debug("A2A_MESSAGE_RAW: %s", LazyPayload({"payload": payload}))
+    """
+
+    __slots__ = ("data", "_text")
+
+    def __init__(self, data: Any):
+        self.data = data
+        self._text: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            masked = SensitiveDataFilter._mask_sensitive_data(self.data)
+            self._text = json.dumps(masked, ensure_ascii=False, default=str)
+        return self._text
+
+
 class StructuredFormatter(logging.Formatter):
     """構造化ログフォーマッター（JSON出力対応）"""
 
@@ -95,11 +142,93 @@ class StructuredFormatter(logging.Formatter):
             )
 
 
+# ログ出力用の共有キューとリスナー（LOG_ASYNC=true の場合）
+_log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_log_listener: Optional["_DispatchingQueueListener"] = None
+_log_listener_lock = threading.Lock()
+
+
+class _DispatchingQueueListener(QueueListener):
+    """キューの(出力先ハンドラー, レコード)を取り出し、そのハンドラーで出力するリスナー"""
+
+    def handle(self, item):
+        handler, record = item
+        if record.levelno >= handler.level:
+            handler.handle(record)
+
+
+def _ensure_log_listener():
+    """リスナースレッドを起動（起動済みの場合は何もしない）"""
+    global _log_listener
+    with _log_listener_lock:
+        if _log_listener is None:
+            _log_listener = _DispatchingQueueListener(_log_queue)
+            _log_listener.start()
+
+
+def stop_log_listener():
+    """
+    リスナースレッドを停止（キューに残っているレコードはすべて出力してから停止）
+
+    プロセス終了時にatexitで呼ばれる。停止後にログが出力された場合はリスナーを再起動する。
+    """
+    global _log_listener
+    with _log_listener_lock:
+        listener, _log_listener = _log_listener, None
+    if listener is not None:
+        listener.stop()
+
+
+atexit.register(stop_log_listener)
+
+
+class AsyncLogHandler(QueueHandler):
+    """
+    ログの出力をQueueListenerのスレッドに委譲するハンドラー
+
+    呼び出し元（イベントループ）ではレコードをキューに入れるだけで、
+    フィルター（機密データのマスク）・フォーマット・I/Oは出力先ハンドラーがリスナーのスレッドで行う。
+    キューは無制限のため、呼び出し元がブロックすることはない。
+    """
+
+    def __init__(self, target: logging.Handler):
+        super().__init__(_log_queue)
+        self.target = target
+        self.setLevel(target.level)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        キューに入れるレコードを準備
+
+        引数（LazyPayloadが参照する辞書を含む）は呼び出し後に変更される可能性があるため、
+        出力先ハンドラーが出力するレベルのレコードはここでメッセージに展開する
+        （リスナーのスレッドで呼び出し元と並行して辞書を読むと、変更後の内容や反復中の変更エラーになる）。
+        """
+        if record.levelno < self.target.level:
+            # リスナーで破棄されるため展開しない
+            return record
+        # ロガーのハンドラーはこのハンドラーのみのため、コピーせずにレコードを書き換える
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if _log_listener is None:
+            _ensure_log_listener()
+        self.queue.put_nowait((self.target, record))
+
+
+def is_async_logging_enabled() -> bool:
+    """LOG_ASYNC環境変数でログ出力の非同期化が有効かどうか"""
+    return os.getenv('LOG_ASYNC', 'false').lower() in ('true', '1', 'yes')
+
+
 def setup_logger(
     name: str,
     level: Optional[str] = None,
     json_format: bool = False,
-    service_name: Optional[str] = None
+    service_name: Optional[str] = None,
+    log_async: Optional[bool] = None
 ) -> logging.Logger:
     """
     統一ロガーをセットアップ
@@ -109,6 +238,7 @@ def setup_logger(
         level: ログレベル（指定なしの場合は環境変数 LOG_LEVEL を使用）
         json_format: JSON形式で出力するか（デフォルト: False）
         service_name: サービス名（ログに含める）
+        log_async: ログの出力をリスナースレッドで行うか（指定なしの場合は環境変数 LOG_ASYNC を使用）
 
     Returns:
         設定済みのロガー
@@ -116,6 +246,7 @@ def setup_logger(
     環境変数:
         LOG_LEVEL: ログレベル（DEBUG/INFO/WARNING/ERROR/CRITICAL、デフォルト: INFO）
         LOG_FORMAT: ログフォーマット（json/text、デフォルト: text）
+        LOG_ASYNC: ログの出力をQueueListenerのスレッドで行う（true/false、デフォルト: false）
     """
     logger = logging.getLogger(name)
 
@@ -149,7 +280,9 @@ def setup_logger(
     # 機密データフィルターを追加
     console_handler.addFilter(SensitiveDataFilter())
 
-    logger.addHandler(console_handler)
+    if log_async is None:
+        log_async = is_async_logging_enabled()
+    logger.addHandler(AsyncLogHandler(console_handler) if log_async else console_handler)
 
     # サービス名を保存（ログに含める場合）
     if service_name:
@@ -179,18 +312,17 @@ def log_http_request(
         body: リクエストボディ
     """
     # 簡易ログ（INFO）
-    logger.info(f"HTTP Request: {method} {url}")
+    logger.info("HTTP Request: %s %s", method, url)
 
-    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG）
+    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG、整形は出力時）
     if logger.isEnabledFor(logging.DEBUG):
-        request_data = {
+        logger.debug("HTTP_REQUEST_RAW: %s", LazyPayload({
             "type": "HTTP_REQUEST",
             "method": method,
             "url": url,
             "headers": headers or {},
             "body": body
-        }
-        logger.debug(f"HTTP_REQUEST_RAW: {json.dumps(request_data, ensure_ascii=False, default=str)}")
+        }))
 
 
 def log_http_response(
@@ -211,19 +343,20 @@ def log_http_response(
         duration_ms: リクエスト処理時間（ミリ秒）
     """
     # 簡易ログ（INFO）
-    duration_str = f" ({duration_ms:.2f}ms)" if duration_ms else ""
-    logger.info(f"HTTP Response: {status_code}{duration_str}")
+    if duration_ms:
+        logger.info("HTTP Response: %s (%.2fms)", status_code, duration_ms)
+    else:
+        logger.info("HTTP Response: %s", status_code)
 
-    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG）
+    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG、整形は出力時）
     if logger.isEnabledFor(logging.DEBUG):
-        response_data = {
+        logger.debug("HTTP_RESPONSE_RAW: %s", LazyPayload({
             "type": "HTTP_RESPONSE",
             "status_code": status_code,
             "headers": headers or {},
             "body": body,
             "duration_ms": duration_ms
-        }
-        logger.debug(f"HTTP_RESPONSE_RAW: {json.dumps(response_data, ensure_ascii=False, default=str)}")
+        }))
 
 
 def log_a2a_message(
@@ -246,20 +379,21 @@ def log_a2a_message(
         headers: HTTPヘッダー（オプション）
     """
     # 簡易ログ（INFO）
-    peer_str = f" to/from {peer}" if peer else ""
-    logger.info(f"A2A Message {direction}{peer_str}: {message_type}")
+    if peer:
+        logger.info("A2A Message %s to/from %s: %s", direction, peer, message_type)
+    else:
+        logger.info("A2A Message %s: %s", direction, message_type)
 
-    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG）
+    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG、整形は出力時）
     if logger.isEnabledFor(logging.DEBUG):
-        a2a_data = {
+        logger.debug("A2A_MESSAGE_RAW: %s", LazyPayload({
             "type": "A2A_MESSAGE",
             "direction": direction,
             "message_type": message_type,
             "peer": peer,
             "headers": headers or {},
             "payload": payload
-        }
-        logger.debug(f"A2A_MESSAGE_RAW: {json.dumps(a2a_data, ensure_ascii=False, default=str)}")
+        }))
 
 
 def log_mcp_request(
@@ -280,18 +414,17 @@ def log_mcp_request(
         headers: HTTPヘッダー（オプション）
     """
     # 簡易ログ（INFO）
-    logger.info(f"MCP Request: {tool_name}")
+    logger.info("MCP Request: %s", tool_name)
 
-    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG）
+    # 完全なペイロードとヘッダーをJSON形式で出力（DEBUG、整形は出力時）
     if logger.isEnabledFor(logging.DEBUG):
-        mcp_data = {
+        logger.debug("MCP_REQUEST_RAW: %s", LazyPayload({
             "type": "MCP_REQUEST",
             "tool_name": tool_name,
             "url": url,
             "headers": headers or {},
             "arguments": arguments
-        }
-        logger.debug(f"MCP_REQUEST_RAW: {json.dumps(mcp_data, ensure_ascii=False, default=str)}")
+        }))
 
 
 def log_mcp_response(
@@ -312,20 +445,21 @@ def log_mcp_response(
         error: エラーメッセージ（失敗時）
     """
     # 簡易ログ（INFO）
-    duration_str = f" ({duration_ms:.2f}ms)" if duration_ms else ""
     status = "ERROR" if error else "SUCCESS"
-    logger.info(f"MCP Response: {tool_name} - {status}{duration_str}")
+    if duration_ms:
+        logger.info("MCP Response: %s - %s (%.2fms)", tool_name, status, duration_ms)
+    else:
+        logger.info("MCP Response: %s - %s", tool_name, status)
 
-    # 完全なペイロードをJSON形式で出力（DEBUG）
+    # 完全なペイロードをJSON形式で出力（DEBUG、整形は出力時）
     if logger.isEnabledFor(logging.DEBUG):
-        mcp_data = {
+        logger.debug("MCP_RESPONSE_RAW: %s", LazyPayload({
             "type": "MCP_RESPONSE",
             "tool_name": tool_name,
             "result": result,
             "error": error,
             "duration_ms": duration_ms
-        }
-        logger.debug(f"MCP_RESPONSE_RAW: {json.dumps(mcp_data, ensure_ascii=False, default=str)}")
+        }))
 
 
 def log_crypto_operation(
@@ -367,6 +501,8 @@ def log_database_operation(
         record_id: レコードID
         duration_ms: 処理時間（ミリ秒）
     """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     duration_str = f" ({duration_ms:.2f}ms)" if duration_ms else ""
     record_str = f" [id: {record_id}]" if record_id else ""
     logger.debug(f"DB {operation}: {table}{record_str}{duration_str}")
@@ -428,17 +564,19 @@ class LoggingAsyncClient:
         import time
         start_time = time.time()
 
-        # リクエストボディを取得
+        # リクエストボディを取得（DEBUGのペイロードログにのみ使う）
+        debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
         request_body = None
-        if 'json' in kwargs:
-            request_body = kwargs['json']
-        elif 'data' in kwargs:
-            request_body = kwargs['data']
-        elif 'content' in kwargs:
-            try:
-                request_body = kwargs['content'].decode('utf-8') if isinstance(kwargs['content'], bytes) else kwargs['content']
-            except:
-                request_body = None
+        if debug_enabled:
+            if 'json' in kwargs:
+                request_body = kwargs['json']
+            elif 'data' in kwargs:
+                request_body = kwargs['data']
+            elif 'content' in kwargs:
+                try:
+                    request_body = kwargs['content'].decode('utf-8') if isinstance(kwargs['content'], bytes) else kwargs['content']
+                except:
+                    request_body = None
 
         # リクエストログ
         log_http_request(
@@ -449,29 +587,27 @@ class LoggingAsyncClient:
             body=request_body
         )
 
-        # リクエスト実行
+        # リクエスト実行（ストリーミングでないリクエストはボディまで読み込み済み）
         response = await self._client.request(method, url, **kwargs)
 
-        # レスポンスを読み取る（AP2完全準拠: ボディを完全に読み込む）
-        await response.aread()
-
         duration_ms = (time.time() - start_time) * 1000
 
-        # レスポンスボディを取得
+        # レスポンスボディを取得（DEBUGのペイロードログにのみ使うため、無効な場合はパースしない）
         response_body = None
-        try:
-            response_body = response.json()
-        except Exception:
+        if debug_enabled:
             try:
-                response_body = response.text
+                response_body = response.json()
             except Exception:
-                response_body = None
+                try:
+                    response_body = response.text
+                except Exception:
+                    response_body = None
 
         # レスポンスログ
         log_http_response(
             logger=self.logger,
             status_code=response.status_code,
-            headers=dict(response.headers),
+            headers=dict(response.headers) if debug_enabled else None,
             body=response_body,
             duration_ms=duration_ms
         )
@@ -6,21 +6,54 @@ Streamable HTTP Transport準拠のMCPクライアント実装。
 仕様:
 - MCP Specification 2025-03-26
 - Streamable HTTP transport
-- JSON-RPC 2.0メッセージング
+- JSON-RPC 2.0メッセージング（バッチ配列対応）
+- SSEストリーミング（tools/callの進捗・部分結果を逐次受信）
 - セッション管理（Mcp-Session-Id header）
 """
 
+import os
 import json
 import time
-from typing import Dict, Any, Optional
+import random
+import itertools
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Union
 import httpx
 
 from common.logger import get_logger, log_mcp_request, log_mcp_response, LoggingAsyncClient
 from common.telemetry import get_tracer, create_http_span, is_telemetry_enabled
+from common import metrics
 
 logger = get_logger(__name__, service_name='mcp_client')
 tracer = get_tracer(__name__)
 
+# 自前でHTTPクライアントを作成する場合のコネクションプール設定
+# （ツール呼び出しごとのTCP/TLSハンドシェイクを避けるため、keep-aliveを長めに保持）
+MCP_CONNECTION_LIMITS = httpx.Limits(
+    max_connections=50,
+    max_keepalive_connections=20,
+    keepalive_expiry=60.0
+)
+
+# ツール呼び出しのLangChain/Langfuse observationのサンプリング率（0.0-1.0）
+MCP_TOOL_OBSERVATION_SAMPLE_RATE = float(os.getenv("MCP_TOOL_OBSERVATION_SAMPLE_RATE", "1.0"))
+
+# JSON-RPC呼び出しの所要時間（method: JSON-RPCメソッド, tool: tools/callのツール名, outcome: ok/error）
+MCP_REQUEST_SECONDS = metrics.histogram(
+    "ap2_mcp_request_seconds",
+    "MCPサーバーへのJSON-RPC呼び出しの所要時間（秒）",
+    ("method", "tool", "outcome")
+)
+
+# JSON Schema型 → Python型（引数バリデーション用）
+JSON_SCHEMA_TYPES: Dict[str, Tuple[type, ...]] = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list, tuple),
+    "object": (dict,)
+}
+
 
 class MCPClient:
     """Streamable HTTP Transport準拠のMCPクライアント
@@ -35,19 +68,35 @@ class MCPClient:
         result = await client.call_tool("analyze_intent", {
             "intent_mandate": {...}
         })
+
+        # 複数ツールを1回のHTTP POST（JSON-RPCバッチ）で呼び出し
+        results = await client.call_tools([
+            {"name": "search_products", "arguments": {...}},
+            {"name": "check_inventory", "arguments": {...}},
+        ])
+
+        # 長時間ツールの進捗・部分結果をSSEで逐次受信
+        async for event in client.call_tool_stream("build_cart_mandates", {...}):
+            if event["type"] == "progress":
+                ...  # event["partial"] で最初の結果から後続処理を開始できる
+            else:
+                result = event["result"]
     """
 
     def __init__(
         self,
         base_url: str,
         timeout: float = 300.0,
-        http_client: Optional[httpx.AsyncClient] = None
+        http_client: Optional[httpx.AsyncClient] = None,
+        observation_sample_rate: Optional[float] = None
     ):
         """
         Args:
             base_url: MCPサーバーのベースURL（例: "http://merchant_agent_mcp:8011"）
             timeout: タイムアウト時間（秒）
             http_client: 既存のhttpx.AsyncClientインスタンス（オプション）
+            observation_sample_rate: call_tool_observedのobservation記録率
+                                     （省略時は環境変数 MCP_TOOL_OBSERVATION_SAMPLE_RATE）
         """
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
@@ -56,12 +105,25 @@ class MCPClient:
         if http_client:
             self.http_client = http_client
         else:
-            self.http_client = LoggingAsyncClient(logger=logger, timeout=timeout)
+            self.http_client = LoggingAsyncClient(
+                logger=logger,
+                timeout=timeout,
+                limits=MCP_CONNECTION_LIMITS
+            )
 
         # セッション管理
         self.session_id: Optional[str] = None
         self.server_info: Optional[Dict[str, Any]] = None
 
+        # JSON-RPCメッセージID（バッチ内でレスポンスを対応付けるため単調増加）
+        self._message_ids = itertools.count(1)
+
+        # ツール呼び出しのobservation設定と、inputSchemaから作成した引数バリデータのキャッシュ
+        self.observation_sample_rate = (
+            MCP_TOOL_OBSERVATION_SAMPLE_RATE if observation_sample_rate is None else observation_sample_rate
+        )
+        self._argument_validators: Dict[str, Tuple[Tuple[str, ...], Dict[str, Tuple[type, ...]]]] = {}
+
         logger.info(f"[MCPClient] Initialized: {base_url}")
 
     async def initialize(self) -> Dict[str, Any]:
@@ -84,6 +146,7 @@ class MCPClient:
         )
 
         self.server_info = response
+        self._argument_validators = {}  # スキーマが変わる可能性があるため再作成
 
         logger.info(f"[MCPClient] Initialized session: {self.session_id}")
         logger.info(f"[MCPClient] Server capabilities: {response.get('capabilities', {})}")
@@ -130,6 +193,258 @@ class MCPClient:
             }
         )
 
+        return self._parse_tool_result(tool_name, response)
+
+    async def call_tool_stream(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """MCPツールをSSEストリーミングで呼び出し（MCP Streamable HTTP）
+
+        params._meta.progressToken を付けて Accept: text/event-stream で送信し、
+        サーバーからの notifications/progress を逐次yieldする。
+        サーバーがJSONで応答した場合は最終結果のみをyieldする。
+
+        Args:
+            tool_name: ツール名
+            arguments: ツール引数
+
+        Yields:
+            {"type": "progress", "progress": 1, "total": 3, "message": "...", "partial": {...}}
+            {"type": "result", "result": {...}}  # 最後に1回
+
+        Raises:
+            httpx.HTTPError: HTTP通信エラー
+            ValueError: JSON-RPCエラー
+        """
+        message_id = next(self._message_ids)
+        message = {
+            "jsonrpc": "2.0",
+            "method": "tools/call",
+            "params": {
+                "name": tool_name,
+                "arguments": arguments,
+                "_meta": {"progressToken": f"{tool_name}-{message_id}"}
+            },
+            "id": message_id
+        }
+
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/event-stream"
+        }
+        if self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+
+        log_mcp_request(
+            logger=logger,
+            tool_name=tool_name,
+            arguments=arguments,
+            url=f"{self.base_url}/",
+            headers=headers
+        )
+
+        start_time = time.time()
+        progress_count = 0
+        with create_http_span(
+            tracer,
+            "POST",
+            f"{self.base_url}/",
+            **{
+                "mcp.method": "tools/call",
+                "mcp.tool_name": tool_name,
+                "mcp.message_id": message_id,
+                "mcp.streaming": True,
+                "rpc.system": "jsonrpc",
+                "rpc.service": "mcp"
+            }
+        ) as span:
+            async with self.http_client.stream(
+                "POST",
+                f"{self.base_url}/",
+                json=message,
+                headers=headers,
+                timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                span.set_attribute("http.status_code", response.status_code)
+
+                if "text/event-stream" in response.headers.get("content-type", ""):
+                    messages = self._iter_sse_messages(response)
+                else:
+                    # サーバーがストリーミングを選択しなかった場合
+                    await response.aread()
+                    messages = self._iter_single(response.json())
+
+                async for item in messages:
+                    if item.get("method") == "notifications/progress":
+                        params = item.get("params", {})
+                        progress_count += 1
+                        yield {
+                            "type": "progress",
+                            "progress": params.get("progress"),
+                            "total": params.get("total"),
+                            "message": params.get("message"),
+                            "partial": params.get("partialResult")
+                        }
+                        continue
+
+                    if item.get("id") != message_id:
+                        continue
+
+                    duration_ms = (time.time() - start_time) * 1000
+                    span.set_attribute("mcp.progress_events", progress_count)
+
+                    if "error" in item:
+                        error = item["error"]
+                        error_message = f"JSON-RPC error {error['code']}: {error['message']}"
+                        log_mcp_response(logger=logger, tool_name=tool_name, result=None,
+                                         duration_ms=duration_ms, error=error_message)
+                        raise ValueError(error_message)
+
+                    result = item.get("result", {})
+                    log_mcp_response(logger=logger, tool_name=tool_name, result=result,
+                                     duration_ms=duration_ms, error=None)
+                    yield {"type": "result", "result": self._parse_tool_result(tool_name, result)}
+                    return
+
+        raise ValueError(f"MCP stream for {tool_name} ended without a response")
+
+    @staticmethod
+    async def _iter_sse_messages(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+        """SSEストリームからJSON-RPCメッセージを逐次取り出す"""
+        data_lines: List[str] = []
+        async for line in response.aiter_lines():
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            elif line == "" and data_lines:
+                yield json.loads("\n".join(data_lines))
+                data_lines = []
+        if data_lines:
+            yield json.loads("\n".join(data_lines))
+
+    @staticmethod
+    async def _iter_single(message: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """JSONレスポンスをSSEと同じインターフェースで扱うためのラッパー"""
+        yield message
+
+    async def call_tool_with_progress(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        on_progress: Callable[[Dict[str, Any]], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """SSEストリーミングでツールを呼び出し、進捗ごとにコールバックを実行
+
+        Args:
+            tool_name: ツール名
+            arguments: ツール引数
+            on_progress: 進捗イベントごとに呼ばれる非同期コールバック
+
+        Returns:
+            ツール実行結果（call_toolと同じ形式）
+        """
+        result: Dict[str, Any] = {}
+        async for event in self.call_tool_stream(tool_name, arguments):
+            if event["type"] == "progress":
+                await on_progress(event)
+            else:
+                result = event["result"]
+        return result
+
+    async def call_tools(
+        self,
+        calls: List[Dict[str, Any]],
+        return_exceptions: bool = False,
+        observe: bool = False
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """複数のMCPツールをJSON-RPCバッチで呼び出し
+
+        1回のHTTP POSTで全ツール呼び出しを送信し、サーバー側で並行実行される。
+
+        Args:
+            calls: [{"name": "tool_name", "arguments": {...}}, ...]
+            return_exceptions: Trueの場合、失敗したツールの例外を結果リストに含める
+                               （Falseの場合は最初のエラーを送出）
+            observe: Trueの場合、call_tool_observedと同様に引数を検証し、
+                     各呼び出しをtool observationとして記録
+                     （検証に失敗した呼び出しは送信せず、その位置にValueErrorを入れる。他の呼び出しは送信する）
+
+        Returns:
+            ツール実行結果のリスト（callsと同じ順序）
+
+        Raises:
+            httpx.HTTPError: HTTP通信エラー
+            ValueError: JSON-RPCエラー（return_exceptions=Falseの場合）
+        """
+        if not calls:
+            return []
+
+        # 引数の検証エラーは呼び出しごとに結果へ入れる（1件の不正な引数でバッチ全体を失敗させない）
+        invalid: Dict[int, Exception] = {}
+        if observe:
+            for index, call in enumerate(calls):
+                try:
+                    self.validate_tool_arguments(call["name"], call.get("arguments", {}))
+                except ValueError as e:
+                    invalid[index] = e
+        valid_calls = [call for index, call in enumerate(calls) if index not in invalid]
+
+        run_managers: List[Any] = [None] * len(valid_calls)
+        if observe and valid_calls and self._should_observe():
+            run_managers = [
+                await self._start_tool_observation(call["name"], call.get("arguments", {}))
+                for call in valid_calls
+            ]
+
+        responses: List[Any] = []
+        if valid_calls:
+            try:
+                responses = await self._send_jsonrpc_batch([
+                    ("tools/call", {"name": call["name"], "arguments": call.get("arguments", {})})
+                    for call in valid_calls
+                ])
+            except Exception as e:
+                for run_manager in run_managers:
+                    if run_manager:
+                        await run_manager.on_tool_error(e)
+                raise
+
+        sent = iter(zip(valid_calls, responses, run_managers))
+        results = []
+        for index in range(len(calls)):
+            if index in invalid:
+                results.append(invalid[index])
+                continue
+            call, response, run_manager = next(sent)
+            if isinstance(response, Exception):
+                if run_manager:
+                    await run_manager.on_tool_error(response)
+                results.append(response)
+                continue
+            result = self._parse_tool_result(call["name"], response)
+            if run_manager:
+                await run_manager.on_tool_end(result, name=call["name"])
+            results.append(result)
+
+        if not return_exceptions:
+            error = next((r for r in results if isinstance(r, Exception)), None)
+            if error:
+                raise error
+
+        return results
+
+    def _parse_tool_result(self, tool_name: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        """tools/callのresultからツール結果を取り出す
+
+        Args:
+            tool_name: ツール名
+            response: JSON-RPCレスポンスのresultフィールド
+
+        Returns:
+            ツール実行結果（JSON）
+        """
         # MCP仕様: content[0].textからJSONを抽出
         content = response.get("content", [])
         if content and content[0].get("type") == "text":
@@ -144,6 +459,125 @@ class MCPClient:
 
         return response
 
+    async def call_tool_observed(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        observe: bool = True
+    ) -> Dict[str, Any]:
+        """MCPツールを呼び出し、LangChainのtool observationとして記録
+
+        StructuredTool.ainvoke()と同じく、実行中のRunnableConfig（LangGraphノード内）の
+        コールバック（Langfuse CallbackHandler等）に on_tool_start / on_tool_end を通知する。
+        StructuredToolやPydanticモデルは作成せず、引数はキャッシュ済みのinputSchemaで検証する。
+
+        Args:
+            tool_name: ツール名
+            arguments: ツール引数
+            observe: Falseの場合はobservationを記録しない
+                     （Trueの場合もobservation_sample_rateでサンプリング）
+
+        Returns:
+            ツール実行結果（JSON）
+
+        Raises:
+            ValueError: 引数がinputSchemaに適合しない場合、またはJSON-RPCエラー
+            httpx.HTTPError: HTTP通信エラー
+        """
+        self.validate_tool_arguments(tool_name, arguments)
+
+        run_manager = None
+        if observe and self._should_observe():
+            run_manager = await self._start_tool_observation(tool_name, arguments)
+
+        try:
+            result = await self.call_tool(tool_name, arguments)
+        except Exception as e:
+            if run_manager:
+                await run_manager.on_tool_error(e)
+            raise
+
+        if run_manager:
+            await run_manager.on_tool_end(result, name=tool_name)
+        return result
+
+    def validate_tool_arguments(self, tool_name: str, arguments: Dict[str, Any]):
+        """ツール引数をinputSchema（required / トップレベルのtype）で検証
+
+        スキーマごとのバリデータは初回のみ作成してキャッシュする。
+        サーバーが公開していないツールは検証をスキップする（サーバー側でエラーになる）。
+
+        Raises:
+            ValueError: 必須引数の欠落、または型の不一致
+        """
+        validator = self._argument_validators.get(tool_name)
+        if validator is None:
+            schema = self._get_tool_config(tool_name)
+            if schema is None:
+                return
+            input_schema = schema.get("inputSchema", {})
+            required = tuple(input_schema.get("required", []))
+            types = {
+                name: JSON_SCHEMA_TYPES[info["type"]]
+                for name, info in input_schema.get("properties", {}).items()
+                if info.get("type") in JSON_SCHEMA_TYPES
+            }
+            validator = (required, types)
+            self._argument_validators[tool_name] = validator
+
+        required, types = validator
+        missing = [name for name in required if arguments.get(name) is None]
+        if missing:
+            raise ValueError(f"Invalid arguments for {tool_name}: missing required {missing}")
+
+        for name, value in arguments.items():
+            expected = types.get(name)
+            if expected is None or value is None:
+                continue
+            # boolはintのサブクラスのため、integer/numberには受け付けない
+            if not isinstance(value, expected) or (isinstance(value, bool) and bool not in expected):
+                raise ValueError(
+                    f"Invalid arguments for {tool_name}: '{name}' must be "
+                    f"{'/'.join(t.__name__ for t in expected)}, got {type(value).__name__}"
+                )
+
+    def _get_tool_config(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """initializeで取得したツール設定（description, inputSchema）"""
+        if not self.server_info:
+            return None
+        return self.server_info.get("capabilities", {}).get("tools", {}).get(tool_name)
+
+    def _should_observe(self) -> bool:
+        """observationをサンプリングするか（ヘッドサンプリング）"""
+        if self.observation_sample_rate >= 1.0:
+            return True
+        if self.observation_sample_rate <= 0.0:
+            return False
+        return random.random() < self.observation_sample_rate
+
+    async def _start_tool_observation(self, tool_name: str, arguments: Dict[str, Any]):
+        """実行中のRunnableConfigのコールバックにon_tool_startを通知
+
+        Returns:
+            AsyncCallbackManagerForToolRun（コールバック未設定の場合はNone）
+        """
+        try:
+            from langchain_core.runnables.config import ensure_config, get_async_callback_manager_for_config
+        except ImportError:
+            return None
+
+        callback_manager = get_async_callback_manager_for_config(ensure_config())
+        if not callback_manager.handlers:
+            return None
+
+        description = (self._get_tool_config(tool_name) or {}).get("description", f"MCP tool: {tool_name}")
+        return await callback_manager.on_tool_start(
+            {"name": tool_name, "description": description},
+            str(arguments),
+            name=tool_name,
+            inputs=arguments
+        )
+
     def create_langchain_tools(self, tool_configs: Optional[Dict[str, Dict[str, Any]]] = None):
         """MCPツールをLangChain Toolとしてラップ
 
@@ -262,8 +696,7 @@ class MCPClient:
         """
         # メッセージID生成
         if message_id is None:
-            import random
-            message_id = random.randint(1, 1000000)
+            message_id = next(self._message_ids)
 
         # JSON-RPCメッセージ構築
         message = {
@@ -294,6 +727,7 @@ class MCPClient:
         # HTTP POST送信
         # OpenTelemetry 手動トレーシング: MCP通信
         start_time = time.time()
+        outcome = "error"
         try:
             with create_http_span(
                 tracer,
@@ -349,6 +783,7 @@ class MCPClient:
                 error=None
             )
 
+            outcome = "ok"
             return result
 
         except httpx.HTTPError as e:
@@ -360,6 +795,126 @@ class MCPClient:
         except Exception as e:
             logger.error(f"[MCPClient] Unexpected error calling {method}: {e}", exc_info=True)
             raise
+        finally:
+            tool = (params or {}).get("name", "") if method == "tools/call" else ""
+            MCP_REQUEST_SECONDS.labels(method=method, tool=tool, outcome=outcome).observe(
+                time.time() - start_time
+            )
+
+    async def _send_jsonrpc_batch(
+        self,
+        requests: List[tuple]
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """JSON-RPCバッチリクエストを送信（1回のHTTP POST）
+
+        Args:
+            requests: [(method, params), ...]
+
+        Returns:
+            各リクエストのresultフィールド（requestsと同じ順序）。
+            JSON-RPCエラーのメンバーはValueErrorとして返す。
+
+        Raises:
+            httpx.HTTPError: HTTP通信エラー
+            ValueError: バッチ全体が拒否された場合
+        """
+        messages = [
+            {
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params,
+                "id": next(self._message_ids)
+            }
+            for method, params in requests
+        ]
+
+        headers = {
+            "Content-Type": "application/json"
+        }
+        if self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+
+        batch_label = f"batch[{','.join(m['params'].get('name', m['method']) for m in messages)}]"
+
+        # バッチ全体で1回だけログ出力
+        log_mcp_request(
+            logger=logger,
+            tool_name=batch_label,
+            arguments={"messages": messages},
+            url=f"{self.base_url}/",
+            headers=headers
+        )
+
+        start_time = time.time()
+        outcome = "error"
+        try:
+            with create_http_span(
+                tracer,
+                "POST",
+                f"{self.base_url}/",
+                **{
+                    "mcp.method": "batch",
+                    "mcp.batch_size": len(messages),
+                    "rpc.system": "jsonrpc",
+                    "rpc.service": "mcp"
+                }
+            ) as span:
+                response = await self.http_client.post(
+                    f"{self.base_url}/",
+                    json=messages,
+                    headers=headers
+                )
+                response.raise_for_status()
+                span.set_attribute("http.status_code", response.status_code)
+
+            response_data = response.json()
+            duration_ms = (time.time() - start_time) * 1000
+
+            # バッチ自体が不正な場合は単一のエラーオブジェクトが返る
+            if isinstance(response_data, dict):
+                error = response_data.get("error", {})
+                message = f"JSON-RPC error {error.get('code')}: {error.get('message')}"
+                log_mcp_response(logger=logger, tool_name=batch_label, result=None,
+                                 duration_ms=duration_ms, error=message)
+                raise ValueError(message)
+
+            # JSON-RPC仕様: バッチレスポンスの順序は保証されないためidで対応付け
+            by_id = {item.get("id"): item for item in response_data}
+            results: List[Union[Dict[str, Any], Exception]] = []
+            error_count = 0
+            for message in messages:
+                item = by_id.get(message["id"])
+                if item is None:
+                    results.append(ValueError(f"No JSON-RPC response for id {message['id']}"))
+                    error_count += 1
+                elif "error" in item:
+                    error = item["error"]
+                    results.append(ValueError(f"JSON-RPC error {error['code']}: {error['message']}"))
+                    error_count += 1
+                else:
+                    results.append(item.get("result", {}))
+
+            log_mcp_response(
+                logger=logger,
+                tool_name=batch_label,
+                result=response_data,
+                duration_ms=duration_ms,
+                error=f"{error_count} of {len(messages)} calls failed" if error_count else None
+            )
+
+            outcome = "error" if error_count else "ok"
+            return results
+
+        except httpx.HTTPError as e:
+            logger.error(f"[MCPClient] HTTP error calling {batch_label}: {e}", exc_info=True)
+            raise
+        except ValueError as e:
+            logger.error(f"[MCPClient] JSON-RPC error calling {batch_label}: {e}", exc_info=True)
+            raise
+        finally:
+            MCP_REQUEST_SECONDS.labels(method="batch", tool="", outcome=outcome).observe(
+                time.time() - start_time
+            )
 
     async def close(self):
         """HTTPクライアントをクローズ"""
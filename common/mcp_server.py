@@ -4,13 +4,14 @@ MCP (Model Context Protocol) Server Base Class
 Streamable HTTP Transport準拠のMCPサーバー実装（完全仕様準拠版）
 
 MCP仕様準拠項目（2025-03-26 / 2025-06-18）:
-✓ JSON-RPC 2.0メッセージング
+✓ JSON-RPC 2.0メッセージング（バッチ配列対応、メンバーは並行ディスパッチ）
 ✓ Streamable HTTP transport (POST/GET)
 ✓ Accept ヘッダー検証 (application/json, text/event-stream)
 ✓ セッション管理 (Mcp-Session-Id header)
 ✓ 標準メソッド (initialize, tools/list, tools/call)
 ✓ tools/call レスポンス形式 (content配列)
-⚠ SSE streaming (部分実装: GETエンドポイントは準備済み)
+✓ SSE streaming (tools/callのPOSTレスポンスをtext/event-streamで返却:
+  notifications/progress による進捗・部分結果 → 最終JSON-RPCレスポンス)
 
 アーキテクチャ:
 - MCPサーバー: データアクセスツールのみを提供
@@ -24,15 +25,109 @@ https://github.com/modelcontextprotocol/specification
 
 import uuid
 import json
-from typing import Dict, Any, Optional, Callable, Awaitable
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 from datetime import datetime, timezone
 from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from common.logger import get_logger
+from common import metrics
+from common.profiler import register_profiling
 
 logger = get_logger(__name__, service_name='mcp_server')
 
+# ツール実行の所要時間（サーバー側、outcome: ok/error）
+MCP_TOOL_SECONDS = metrics.histogram(
+    "ap2_mcp_tool_seconds",
+    "MCPツール関数の実行時間（秒）",
+    ("tool", "outcome")
+)
+
+# JSON-RPCバッチの最大メッセージ数
+MAX_BATCH_SIZE = 50
+
+
+class MCPProgressReporter:
+    """tools/call実行中の進捗と部分結果をクライアントに通知
+
+    SSEストリーミング時のみ有効（リクエストの params._meta.progressToken が必要）。
+    それ以外の呼び出しではno-opとなるため、ツールは常に report() を呼び出してよい。
+
+    使用例:
+        @mcp.tool("build_cart_mandates")
+        async def build_cart_mandates(params):
+            progress = get_progress_reporter(params)
+            for index, cart_plan in enumerate(params["cart_plans"]):
+                cart_mandate = ...
+                await progress.report(index + 1, total=len(params["cart_plans"]),
+                                      partial={"index": index, "cart_mandate": cart_mandate})
+    """
+
+    def __init__(
+        self,
+        progress_token: Optional[Any] = None,
+        send: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ):
+        """
+        Args:
+            progress_token: クライアントが指定したprogressToken
+            send: JSON-RPC通知をSSEストリームに送信するコールバック
+        """
+        self.progress_token = progress_token
+        self._send = send
+
+    @property
+    def enabled(self) -> bool:
+        """進捗通知が有効か（SSEストリーミング中か）"""
+        return self._send is not None and self.progress_token is not None
+
+    async def report(
+        self,
+        progress: float,
+        total: Optional[float] = None,
+        message: Optional[str] = None,
+        partial: Optional[Any] = None
+    ):
+        """notifications/progress を送信
+
+        Args:
+            progress: 進捗値（単調増加）
+            total: 全体量（既知の場合）
+            message: 進捗メッセージ
+            partial: 部分結果（クライアントは最終結果を待たずに後続処理を開始できる）
+        """
+        if not self.enabled:
+            return
+
+        notification_params: Dict[str, Any] = {
+            "progressToken": self.progress_token,
+            "progress": progress
+        }
+        if total is not None:
+            notification_params["total"] = total
+        if message is not None:
+            notification_params["message"] = message
+        if partial is not None:
+            notification_params["partialResult"] = partial
+
+        await self._send({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": notification_params
+        })
+        # CPU処理が続くツールでも通知が即座にSSEストリームへ書き出されるよう、イベントループに制御を返す
+        await asyncio.sleep(0)
+
+
+def get_progress_reporter(params: Dict[str, Any]) -> MCPProgressReporter:
+    """ツール引数から進捗レポーターを取得（非ストリーミング時はno-op）"""
+    reporter = params.get("_progress")
+    if isinstance(reporter, MCPProgressReporter):
+        return reporter
+    return MCPProgressReporter()
+
 
 class MCPServer:
     """Streamable HTTP Transport準拠のMCPサーバー
@@ -84,6 +179,9 @@ class MCPServer:
             description=f"Streamable HTTP MCP Server - {server_name}"
         )
 
+        # オンデマンドのプロファイリング（PROFILING_ADMIN_TOKEN設定時のみ）
+        self.profiler = register_profiling(self.app)
+
         # エンドポイント登録
         self._setup_routes()
 
@@ -94,7 +192,9 @@ class MCPServer:
 
         - POST /: JSON-RPCメッセージ受信
         - GET /: サーバー情報取得（オプション）
+        - GET /metrics: Prometheusテキスト形式のメトリクス（METRICS_ENABLED=falseで無効）
         """
+        metrics.register_metrics_endpoint(self.app)
 
         @self.app.post("/")
         async def handle_jsonrpc(request: Request) -> Response:
@@ -103,7 +203,8 @@ class MCPServer:
             MCP仕様要件:
             - クライアントはAcceptヘッダーに application/json と text/event-stream を含める
             - サーバーは application/json または text/event-stream で応答可能
-            - リクエストボディは単一のJSON-RPCメッセージ
+            - リクエストボディは単一のJSON-RPCメッセージ、またはバッチ配列
+              （バッチの各メンバーは並行にディスパッチし、レスポンスも配列で返す）
 
             セッションID管理:
             - リクエストヘッダーから Mcp-Session-Id を読み取り
@@ -152,6 +253,30 @@ class MCPServer:
                     status_code=400
                 )
 
+            # JSON-RPCバッチ処理
+            if isinstance(body, list):
+                responses, new_session_id = await self._handle_jsonrpc_batch(body, session_id)
+                headers = {"Mcp-Session-Id": new_session_id} if new_session_id else {}
+                if responses is None:
+                    # 全メンバーが通知の場合はレスポンスボディなし
+                    return Response(status_code=202, headers=headers)
+                if isinstance(responses, dict):
+                    # バッチ自体が不正（空配列・上限超過）
+                    return JSONResponse(content=responses, status_code=400)
+                return JSONResponse(content=responses, headers=headers)
+
+            # SSEストリーミング（MCP Streamable HTTP）:
+            # クライアントがtext/event-streamを明示的に受け付け、progressTokenを指定したtools/callのみ
+            progress_token = None
+            if isinstance(body, dict) and isinstance(body.get("params"), dict):
+                progress_token = (body["params"].get("_meta") or {}).get("progressToken")
+            if (
+                progress_token is not None
+                and "text/event-stream" in accept_header
+                and body.get("method") == "tools/call"
+            ):
+                return self._stream_jsonrpc(body, session_id, progress_token)
+
             # JSONRPC処理
             response_data = await self._handle_jsonrpc(body, session_id)
 
@@ -164,21 +289,21 @@ class MCPServer:
 
         @self.app.get("/")
         async def handle_sse_stream(request: Request) -> Response:
-            """SSEストリーム確立（MCP Streamable HTTP準拠）
+            """サーバー情報取得（GET）
 
             MCP仕様要件:
-            - GETリクエストでSSEストリームを開く
-            - サーバー→クライアント方向の通信に使用
-            - クライアントがPOSTせずにサーバーメッセージを受信可能
+            - GETでのSSEストリームはサーバー側の任意機能
+            - 提供しない場合は 405 Method Not Allowed を返す
 
-            現在の実装: デモ用に基本情報を返す（SSEは将来実装）
+            現在の実装: ストリーミングはPOST（tools/call）のレスポンスとして提供するため、
+            Accept: text/event-stream のGETには405を返し、それ以外はサーバー情報をJSONで返す（開発/デバッグ用）
             """
             # セッションID取得
             session_id = request.headers.get("Mcp-Session-Id")
 
-            # MCP仕様準拠: SSEストリームを返すべきだが、現在は基本実装として
-            # サーバー情報をJSONで返す（開発/デバッグ用）
-            # 本番環境ではSSEストリーム実装を推奨
+            if "text/event-stream" in request.headers.get("Accept", ""):
+                return Response(status_code=405, headers={"Allow": "POST"})
+
             return JSONResponse({
                 "name": self.server_name,
                 "version": self.version,
@@ -189,19 +314,137 @@ class MCPServer:
                 },
                 "active_sessions": len(self.sessions),
                 "session_id": session_id,
-                "note": "SSE streaming not yet implemented. Use POST for JSON-RPC requests."
+                "note": (
+                    "Use POST for JSON-RPC requests. tools/call with params._meta.progressToken and "
+                    "Accept: text/event-stream streams progress and partial results over SSE."
+                )
             })
 
-    async def _handle_jsonrpc(
+    def _stream_jsonrpc(
         self,
         message: Dict[str, Any],
+        session_id: Optional[str],
+        progress_token: Any
+    ) -> StreamingResponse:
+        """tools/callをSSEストリームで実行（MCP Streamable HTTP準拠）
+
+        ツール実行中の notifications/progress を逐次送信し、
+        最後にJSON-RPCレスポンスを送信してストリームを閉じる。
+        クライアント切断時はツール実行をキャンセルする。
+
+        Args:
+            message: JSON-RPCメッセージ（tools/call）
+            session_id: セッションID（オプション）
+            progress_token: クライアントが指定したprogressToken
+
+        Returns:
+            text/event-stream レスポンス
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def send(notification: Dict[str, Any]):
+            await queue.put((False, notification))
+
+        reporter = MCPProgressReporter(progress_token, send)
+
+        async def run():
+            response = await self._handle_jsonrpc(message, session_id, progress=reporter)
+            await queue.put((True, response))
+
+        async def event_stream():
+            task = asyncio.create_task(run())
+            event_id = 0
+            try:
+                while True:
+                    is_final, payload = await queue.get()
+                    event_id += 1
+                    data = json.dumps(payload, ensure_ascii=False)
+                    yield f"id: {event_id}\nevent: message\ndata: {data}\n\n"
+                    if is_final:
+                        break
+            finally:
+                if not task.done():
+                    logger.info(f"[MCPServer] SSE client disconnected, cancelling tools/call id={message.get('id')}")
+                    task.cancel()
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"}
+        )
+
+    async def _handle_jsonrpc_batch(
+        self,
+        messages: List[Any],
         session_id: Optional[str]
+    ):
+        """JSON-RPCバッチを処理（JSON-RPC 2.0 Batch準拠）
+
+        各メンバーはasyncio.gatherで並行にディスパッチする。
+        id を持たないメンバー（通知）のレスポンスは返さない。
+
+        Args:
+            messages: JSON-RPCメッセージの配列
+            session_id: セッションID（オプション）
+
+        Returns:
+            tuple: (responses, new_session_id)
+                - responses: レスポンス配列（全て通知の場合はNone、バッチ不正時はエラーオブジェクト）
+                - new_session_id: バッチ内のinitializeで発行したセッションID
+        """
+        if not messages:
+            return {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {"code": -32600, "message": "Invalid Request: empty batch"}
+            }, None
+
+        if len(messages) > MAX_BATCH_SIZE:
+            return {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32600,
+                    "message": f"Invalid Request: batch size exceeds {MAX_BATCH_SIZE}"
+                }
+            }, None
+
+        async def dispatch(message: Any) -> Dict[str, Any]:
+            if not isinstance(message, dict):
+                return {
+                    "jsonrpc": "2.0",
+                    "id": None,
+                    "error": {"code": -32600, "message": "Invalid Request"}
+                }
+            return await self._handle_jsonrpc(message, session_id)
+
+        results = await asyncio.gather(*[dispatch(message) for message in messages])
+
+        responses = []
+        new_session_id = None
+        for message, response in zip(messages, results):
+            if "session_id" in response:
+                new_session_id = response.pop("session_id")
+            if isinstance(message, dict) and "id" not in message:
+                continue
+            responses.append(response)
+
+        logger.info(f"[MCPServer] Handled JSON-RPC batch: {len(messages)} messages")
+
+        return (responses or None), new_session_id
+
+    async def _handle_jsonrpc(
+        self,
+        message: Dict[str, Any],
+        session_id: Optional[str],
+        progress: Optional[MCPProgressReporter] = None
     ) -> Dict[str, Any]:
         """JSON-RPCメッセージを処理
 
         Args:
             message: JSON-RPCメッセージ
             session_id: セッションID（オプション）
+            progress: 進捗レポーター（SSEストリーミング時のみ）
 
         Returns:
             JSON-RPCレスポンス
@@ -259,7 +502,7 @@ class MCPServer:
                         }
                     }
 
-                result = await self._handle_tool_call(params, session_id)
+                result = await self._handle_tool_call(params, session_id, progress=progress)
                 return {
                     "jsonrpc": "2.0",
                     "id": msg_id,
@@ -328,7 +571,8 @@ class MCPServer:
     async def _handle_tool_call(
         self,
         params: Dict[str, Any],
-        session_id: Optional[str]
+        session_id: Optional[str],
+        progress: Optional[MCPProgressReporter] = None
     ) -> Dict[str, Any]:
         """tools/callメソッド処理（MCP仕様準拠）
 
@@ -340,6 +584,7 @@ class MCPServer:
         Args:
             params: {"name": "tool_name", "arguments": {...}}
             session_id: セッションID
+            progress: 進捗レポーター（ツールにはarguments["_progress"]として渡す）
 
         Returns:
             MCP準拠のツール実行結果:
@@ -361,9 +606,19 @@ class MCPServer:
             arguments["_session_id"] = session_id
             arguments["_session_data"] = self.sessions.get(session_id, {})
 
+        # 進捗レポーター（get_progress_reporter()で取得）
+        if progress is not None:
+            arguments["_progress"] = progress
+
         # ツール実行
         tool_func = self.tools[tool_name]
-        result = await tool_func(arguments)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await tool_func(arguments)
+            outcome = "ok"
+        finally:
+            MCP_TOOL_SECONDS.labels(tool=tool_name, outcome=outcome).observe(time.perf_counter() - started)
 
         # MCP仕様準拠: content配列形式で返す
         # ツール関数が既にMCP形式（contentフィールド）で返している場合はそのまま使用
@@ -0,0 +1,436 @@
+"""
+v2/common/metrics.py
+
+プロセス内メトリクス（Prometheusテキスト形式）
+
+トレース（telemetry.py）・ログとは別に、容量計画用の集計値をプロセス内で保持し、
+各サービスの GET /metrics でPrometheusテキスト形式（text/plain; version=0.0.4）として公開する。
+
+- Counter: 単調増加する回数（名前は _total で終わる）
+- Gauge: 現在値（キュー長、nonceストアのサイズなど）。set_function()で出力時に値を取得することもできる
+- Histogram: 所要時間などの分布（固定バケット、observeはbisect + ロック内の加算のみ）
+
+メトリクスはモジュールのトップレベルで定義し、ホットパスでは labels() の結果を使い回す:
+
+    from common import metrics
+
+    VERIFY_SECONDS = metrics.histogram(
+        "ap2_a2a_signature_verification_seconds", "A2A署名検証の所要時間", ("result",)
+    )
+
+    with VERIFY_SECONDS.labels(result="valid").time():
+        ...
+
+    @metrics.timed(DB_QUERY_SECONDS, repository="product", operation="search")
+    async def search(...):
+        ...
+
+外部ライブラリ（prometheus_client）には依存しない。
+"""
+
+import bisect
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from common.logger import get_logger
+
+logger = get_logger(__name__, service_name='metrics')
+
+# Prometheusテキスト形式のContent-Type
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# 既定のヒストグラムバケット（秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def is_metrics_enabled() -> bool:
+    """METRICS_ENABLED環境変数で /metrics エンドポイントが有効かどうか（デフォルト: true）"""
+    return os.getenv("METRICS_ENABLED", "true").lower() in ("true", "1", "yes")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """メトリクスの共通処理（ラベルごとの子の管理）"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        # ラベルなしのメトリクスは子を1つだけ持つ
+        self._default = self._new_child() if not self.labelnames else None
+        if self._default is not None:
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        """ラベル値に対応する子を取得（初回のみ作成）"""
+        try:
+            key = tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as e:
+            raise ValueError(f"Missing label {e} for metric {self.name}") from None
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Unexpected labels for metric {self.name}: {sorted(labels)}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _require_default(self):
+        if self._default is None:
+            raise ValueError(f"Metric {self.name} has labels; use labels() first")
+        return self._default
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        """(サフィックス, ラベル文字列, 値) を返す"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._require_default().inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield "", _format_labels(self.labelnames, key), child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """出力時に呼び出して値を取得する関数を設定（キュー長など）"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception as e:
+                logger.debug(f"[Metrics] Gauge callback failed: {e}")
+                return math.nan
+        return self.value
+
+
+class Gauge(_Metric):
+    """現在値を表すゲージ"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._require_default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._require_default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._require_default().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._require_default().set_function(function)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield "", _format_labels(self.labelnames, key), child.get()
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # バケットごとの件数（累積はrender時に計算）。最後の要素は+Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """withブロックの所要時間（秒）を記録（ブロック内でawaitしてもよい）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram(_Metric):
+    """固定バケットのヒストグラム"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        upper_bounds = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+        if not upper_bounds:
+            raise ValueError(f"Histogram {name} requires at least one bucket")
+        self.upper_bounds = upper_bounds
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._require_default().observe(value)
+
+    def time(self):
+        return self._require_default().time()
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.upper_bounds + (math.inf,), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                yield "_bucket", _format_labels(self.labelnames, key, le), cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class MetricsRegistry:
+    """メトリクスの登録とテキスト形式での出力"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                # 同じ定義の再登録（モジュールの再importなど）は既存のメトリクスを返す
+                if type(existing) is not metric_class or existing.labelnames != tuple(labelnames):
+                    raise ValueError(f"Metric {name} is already registered with a different definition")
+                return existing
+            metric = metric_class(name, documentation, labelnames, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter name must end with _total: {name}")
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """全メトリクスをPrometheusテキスト形式で出力"""
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+# プロセス共通のレジストリ
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """プロセス共通のレジストリにカウンターを登録"""
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """プロセス共通のレジストリにゲージを登録"""
+    return REGISTRY.gauge(name, documentation, labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    """プロセス共通のレジストリにヒストグラムを登録"""
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def render_metrics() -> str:
+    """プロセス共通のレジストリをPrometheusテキスト形式で出力"""
+    return REGISTRY.render()
+
+
+def timed(metric: Histogram, **labels: str):
+    """
+    関数の所要時間をヒストグラムに記録するデコレーター（同期・非同期関数の両方に対応）
+
+    例外が発生した場合も所要時間を記録する。
+    """
+    child = metric.labels(**labels) if labels else metric._require_default()
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+
+    return decorator
+
+
+def register_metrics_endpoint(app, path: str = "/metrics"):
+    """
+    FastAPIアプリに GET /metrics を登録（METRICS_ENABLED=false の場合は登録しない）
+
+    Args:
+        app: FastAPIアプリインスタンス
+        path: エンドポイントのパス
+    """
+    if not is_metrics_enabled():
+        logger.debug("[Metrics] /metrics endpoint skipped (METRICS_ENABLED=false)")
+        return
+
+    from fastapi.responses import Response
+
+    @app.get(path, include_in_schema=False)
+    async def metrics_endpoint():
+        return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+# ========================================
+# 複数モジュールで共有するメトリクス
+# ========================================
+
+# LLM呼び出し（LangGraphのノード・ショッピングフロー）
+LLM_REQUEST_SECONDS = histogram(
+    "ap2_llm_request_seconds",
+    "LLM呼び出しの所要時間（秒）",
+    ("node",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+)
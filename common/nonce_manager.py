@@ -6,6 +6,7 @@ AP2プロトコルのA2Aメッセージング層で使用され、各nonceが一
 
 import asyncio
 import time
+import weakref
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 
@@ -14,9 +15,20 @@ try:
 except ModuleNotFoundError:
     from common.logger import get_logger
 
+from common import metrics
+
 # ロガーのセットアップ
 logger = get_logger(__name__, service_name='nonce')
 
+# プロセス内のNonceManager（/metrics出力時に記録済みnonce数を合計する）
+_nonce_managers: "weakref.WeakSet[NonceManager]" = weakref.WeakSet()
+
+NONCE_STORE_SIZE = metrics.gauge(
+    "ap2_nonce_store_size",
+    "記録済み（期限切れ未削除を含む）nonceの数"
+)
+NONCE_STORE_SIZE.set_function(lambda: sum(len(manager._used_nonces) for manager in list(_nonce_managers)))
+
 
 class NonceManager:
     """
@@ -41,6 +53,7 @@ class NonceManager:
         self._ttl_seconds = ttl_seconds
         self._cleanup_interval = cleanup_interval
         self._last_cleanup = time.time()
+        _nonce_managers.add(self)
 
     async def is_valid_nonce(self, nonce: str) -> bool:
         """
@@ -0,0 +1,369 @@
+"""
+v2/common/profiler.py
+
+オンデマンドのサンプリングプロファイラー（管理者専用）
+
+本番で遅くなったサービスを再デプロイせずにプロファイリングするための仕組み。
+PROFILING_ADMIN_TOKEN を設定したサービスでのみ有効になり、未設定時はミドルウェア・エンドポイントを登録しない。
+
+- イベントループのスレッドのスタックを一定間隔（既定5ms）でサンプリング（sys._current_frames()、純Python）
+- 「N秒間」または「指定ルートに一致する次のN件のリクエスト」の間だけ計測
+- 各サンプルは実行中のリクエスト（asyncioタスク）のOpenTelemetry trace_idでタグ付け
+- 出力: collapsed stack（flamegraph.pl / speedscope で読める）と speedscope JSON（trace_idごとのプロファイル）
+
+エンドポイント（X-Admin-Token ヘッダーが必要）:
+    POST /admin/profile/start       {"duration_seconds": 10, "route": "/a2a/message", "max_requests": 20}
+    POST /admin/profile/stop
+    GET  /admin/profile             計測状態
+    GET  /admin/profile/collapsed   collapsed stack（?trace_id= で絞り込み）
+    GET  /admin/profile/speedscope  speedscope JSON
+
+注意: サンプリング対象はイベントループのスレッドのみ（同期エンドポイント・to_threadの処理は含まない）。
+イベントループの待機中（タスク未実行）のサンプルは記録しない。
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from opentelemetry import trace
+
+from common.logger import get_logger
+
+logger = get_logger(__name__, service_name='profiler')
+
+# サンプリング間隔と1回の計測の上限
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "300"))
+# 1サンプルあたりの最大フレーム数（深い再帰でのコストを抑える）
+MAX_STACK_DEPTH = 128
+
+UNTRACED = "untraced"
+
+# (関数名, ファイル, 行) のフレーム
+Frame = Tuple[str, str, int]
+
+
+def is_profiling_enabled() -> bool:
+    """PROFILING_ADMIN_TOKEN が設定されている場合のみ有効"""
+    return bool(os.getenv("PROFILING_ADMIN_TOKEN"))
+
+
+def _route_matches(route: Optional[str], path: str) -> bool:
+    if route is None:
+        return True
+    if route.endswith("*"):
+        return path.startswith(route[:-1])
+    return path == route
+
+
+@dataclass
+class ProfileSession:
+    """1回の計測（N秒間、または一致する次のN件のリクエスト）"""
+    duration_seconds: float
+    interval_seconds: float
+    route: Optional[str] = None
+    max_requests: Optional[int] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    matched_requests: int = 0
+    # (trace_id, スタック（ルート→リーフ）) → サンプル数
+    samples: Counter = field(default_factory=Counter)
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "route": self.route,
+            "max_requests": self.max_requests,
+            "duration_seconds": self.duration_seconds,
+            "interval_ms": self.interval_seconds * 1000,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "matched_requests": self.matched_requests,
+            "samples": sum(self.samples.values()),
+            "trace_ids": sorted({trace_id for trace_id, _ in list(self.samples)}),
+        }
+
+
+class SamplingProfiler:
+    """
+    イベントループのスレッドをサンプリングするプロファイラー
+
+    計測していない間はサンプリングスレッドを起動せず、ミドルウェアは属性チェック1回のみ。
+    """
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._target_thread_id: Optional[int] = None
+        # 計測中のリクエストのタスク → trace_id
+        self._task_traces: Dict[asyncio.Task, str] = {}
+        self._frame_cache: Dict[Any, Frame] = {}
+
+    def start(
+        self,
+        duration_seconds: float = 10.0,
+        route: Optional[str] = None,
+        max_requests: Optional[int] = None,
+        interval_ms: float = PROFILING_INTERVAL_MS
+    ) -> ProfileSession:
+        """
+        計測を開始（イベントループのスレッドから呼び出す）
+
+        Args:
+            duration_seconds: 計測時間（max_requests指定時は上限）
+            route: 対象ルート（末尾*で前方一致）。指定時は一致するリクエストの実行中のサンプルのみ記録
+            max_requests: 一致するリクエストがこの件数完了した時点で終了
+            interval_ms: サンプリング間隔（ミリ秒）
+        """
+        if self.session is not None and self.session.running:
+            raise RuntimeError("Profiling session already running")
+        if max_requests is not None and max_requests <= 0:
+            raise ValueError("max_requests must be positive")
+
+        self._loop = asyncio.get_running_loop()
+        self._target_thread_id = threading.get_ident()
+        self._task_traces.clear()
+        self._stop.clear()
+        self.session = ProfileSession(
+            duration_seconds=min(max(duration_seconds, 0.1), PROFILING_MAX_SECONDS),
+            interval_seconds=max(interval_ms, 1.0) / 1000,
+            route=route,
+            max_requests=max_requests
+        )
+        self._thread = threading.Thread(target=self._run, args=(self.session,), name="ap2-profiler", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"[Profiler] Started: duration={self.session.duration_seconds}s, route={route}, max_requests={max_requests}"
+        )
+        return self.session
+
+    def stop(self) -> Optional[ProfileSession]:
+        """計測を終了（結果はsessionに残る）"""
+        session = self.session
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self._thread = None
+        self._task_traces.clear()
+        if session is not None and session.finished_at is None:
+            session.finished_at = time.time()
+            logger.info(f"[Profiler] Finished: {sum(session.samples.values())} samples")
+        return session
+
+    def _run(self, session: ProfileSession):
+        deadline = time.monotonic() + session.duration_seconds
+        while not self._stop.wait(session.interval_seconds):
+            if time.monotonic() >= deadline:
+                break
+            self._sample(session)
+        if session.finished_at is None:
+            session.finished_at = time.time()
+            logger.info(f"[Profiler] Finished: {sum(session.samples.values())} samples")
+
+    def _sample(self, session: ProfileSession):
+        frame = sys._current_frames().get(self._target_thread_id)
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        if frame is None or task is None:
+            # イベントループの待機中
+            return
+        trace_id = self._task_traces.get(task)
+        if session.route is not None and trace_id is None:
+            # 対象ルート以外のリクエスト
+            return
+
+        stack: List[Frame] = []
+        cache = self._frame_cache
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            label = cache.get(code)
+            if label is None:
+                label = (code.co_name, code.co_filename, code.co_firstlineno)
+                cache[code] = label
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        session.samples[(trace_id or UNTRACED, tuple(stack))] += 1
+
+    # ----------------------------------------
+    # リクエストのタグ付け（ミドルウェアから呼び出す）
+    # ----------------------------------------
+
+    def begin_request(self, path: str) -> Optional[asyncio.Task]:
+        """計測対象のリクエストなら現在のタスクにtrace_idを対応付ける"""
+        session = self.session
+        if session is None or not session.running or not _route_matches(session.route, path):
+            return None
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        span_context = trace.get_current_span().get_span_context()
+        self._task_traces[task] = format(span_context.trace_id, "032x") if span_context.is_valid else UNTRACED
+        return task
+
+    def end_request(self, task: asyncio.Task):
+        self._task_traces.pop(task, None)
+        session = self.session
+        if session is None or not session.running:
+            return
+        session.matched_requests += 1
+        if session.max_requests is not None and session.matched_requests >= session.max_requests:
+            self.stop()
+
+    # ----------------------------------------
+    # 出力
+    # ----------------------------------------
+
+    @staticmethod
+    def _frame_name(frame: Frame) -> str:
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def collapsed(self, trace_id: Optional[str] = None) -> str:
+        """collapsed stack形式（"root;...;leaf count" の行）"""
+        if self.session is None:
+            return ""
+        totals: Counter = Counter()
+        # サンプリングスレッドが追記中でもよいようにコピーしてから集計
+        for (sample_trace_id, stack), count in list(self.session.samples.items()):
+            if trace_id is not None and sample_trace_id != trace_id:
+                continue
+            totals[";".join(self._frame_name(frame) for frame in stack)] += count
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope JSON（trace_idごとのsampledプロファイル、単位は秒）"""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Frame, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+        session = self.session
+        interval = session.interval_seconds if session else PROFILING_INTERVAL_MS / 1000
+
+        for (trace_id, stack), count in (list(session.samples.items()) if session else ()):
+            indexes = []
+            for frame in stack:
+                index = frame_index.get(frame)
+                if index is None:
+                    index = frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(index)
+            profile = profiles.setdefault(trace_id, {
+                "type": "sampled",
+                "name": f"trace {trace_id}" if trace_id != UNTRACED else UNTRACED,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": 0,
+                "samples": [],
+                "weights": [],
+            })
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * interval)
+            profile["endValue"] += count * interval
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": "ap2 profile",
+            "exporter": "ap2-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [profiles[trace_id] for trace_id in sorted(profiles)],
+        }
+
+
+class ProfilingMiddleware:
+    """計測中のみ、対象リクエストのタスクにtrace_idを対応付けるASGIミドルウェア"""
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if self.profiler.session is None or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        task = self.profiler.begin_request(scope["path"])
+        if task is None:
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.end_request(task)
+
+
+def register_profiling(app) -> Optional[SamplingProfiler]:
+    """
+    FastAPIアプリにプロファイリングのミドルウェアと管理者用エンドポイントを登録
+
+    PROFILING_ADMIN_TOKEN が未設定の場合は何も登録しない。
+    他のミドルウェアより先に呼び出す（最も内側でエンドポイントのタスクを捕捉するため）。
+
+    Returns:
+        SamplingProfiler（無効の場合None）
+    """
+    if not is_profiling_enabled():
+        return None
+
+    from fastapi import Body, Header, HTTPException
+    from fastapi.responses import PlainTextResponse
+
+    from common.token_auth import require_token
+
+    profiler = SamplingProfiler()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    def require_admin(token: Optional[str]):
+        require_token("PROFILING_ADMIN_TOKEN", token)
+
+    @app.post("/admin/profile/start", include_in_schema=False)
+    async def start_profile(
+        request: Dict[str, Any] = Body(default_factory=dict),
+        x_admin_token: Optional[str] = Header(None)
+    ):
+        require_admin(x_admin_token)
+        try:
+            session = profiler.start(
+                duration_seconds=float(request.get("duration_seconds", 10)),
+                route=request.get("route"),
+                max_requests=request.get("max_requests"),
+                interval_ms=float(request.get("interval_ms", PROFILING_INTERVAL_MS))
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return session.summary()
+
+    @app.post("/admin/profile/stop", include_in_schema=False)
+    async def stop_profile(x_admin_token: Optional[str] = Header(None)):
+        require_admin(x_admin_token)
+        session = profiler.stop()
+        return session.summary() if session else {"running": False}
+
+    @app.get("/admin/profile", include_in_schema=False)
+    async def profile_status(x_admin_token: Optional[str] = Header(None)):
+        require_admin(x_admin_token)
+        return profiler.session.summary() if profiler.session else {"running": False}
+
+    @app.get("/admin/profile/collapsed", include_in_schema=False)
+    async def profile_collapsed(trace_id: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+        require_admin(x_admin_token)
+        return PlainTextResponse(profiler.collapsed(trace_id))
+
+    @app.get("/admin/profile/speedscope", include_in_schema=False)
+    async def profile_speedscope(x_admin_token: Optional[str] = Header(None)):
+        require_admin(x_admin_token)
+        return profiler.speedscope()
+
+    logger.info("[Profiler] Admin profiling endpoints enabled (/admin/profile/*)")
+    return profiler
@@ -9,7 +9,8 @@ v1のreceipt_generator.pyをv2のDict構造に適応
 
 from io import BytesIO
 from datetime import datetime
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
 from reportlab.lib.pagesizes import A4
@@ -18,25 +19,172 @@ from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 
+from common import metrics
+
 logger = logging.getLogger(__name__)
 
+RECEIPT_PDF_SECONDS = metrics.histogram(
+    "ap2_receipt_pdf_generation_seconds",
+    "領収書PDF生成の所要時間（秒）"
+)
+
+JAPANESE_FONT_NAME = 'HeiseiKakuGo-W5'
+FALLBACK_FONT_NAME = 'Helvetica'
+STATIC_LAYOUT_FORM_NAME = 'receipt_static_layout'
+
+# 固定セクション（見出し, ((値キー, ラベル), ...)）
+STATIC_SECTIONS: Tuple[Tuple[str, Tuple[Tuple[str, str], ...]], ...] = (
+    ("トランザクション情報", (
+        ("transaction_id", "取引ID:"),
+        ("status", "ステータス:"),
+        ("authorized_at", "承認日時:"),
+        ("captured_at", "決済日時:"),
+    )),
+    ("支払い者情報", (
+        ("user_name", "氏名:"),
+        ("payment_method", "支払い方法:"),
+    )),
+    ("店舗情報", (
+        ("merchant_name", "店舗名:"),
+        ("merchant_id", "店舗ID:"),
+    )),
+)
+
+_registered_font_name: Optional[str] = None
+
+
+def register_receipt_font() -> str:
+    """
+    日本語フォントを登録（プロセスごとに1回だけ）
+
+    Returns:
+        str: 使用するフォント名（登録失敗時はHelvetica）
+    """
+    global _registered_font_name
+    if _registered_font_name is not None:
+        return _registered_font_name
+
+    try:
+        pdfmetrics.registerFont(UnicodeCIDFont(JAPANESE_FONT_NAME))
+        font_name = JAPANESE_FONT_NAME
+        logger.debug(f"[ReceiptGenerator] Using Japanese font: {JAPANESE_FONT_NAME}")
+    except Exception as e:
+        # フォールバック: Helvetica（日本語非対応）
+        # 失敗はキャッシュしない（次回の生成で再試行）
+        logger.warning(f"[ReceiptGenerator] Failed to load Japanese font, using Helvetica: {e}")
+        return FALLBACK_FONT_NAME
 
+    _registered_font_name = font_name
+    return font_name
+
+
+class ReceiptLayout:
+    """
+    領収書の静的レイアウト（見出し・ラベル・罫線・フッター）
+
+    描画命令と値の描画位置を1回だけ計算してキャッシュし、
+    各PDFでは静的部分をform XObjectとして1回描画する。
+    """
+
+    def __init__(self, font_name: str, pagesize: Tuple[float, float] = A4):
+        self.font_name = font_name
+        self.width, self.height = pagesize
+        # (命令, 引数) のリスト: ("font", size) / ("text", x, y, s) / ("centred", x, y, s) / ("line", x1, y1, x2, y2)
+        self.operations: List[Tuple[Any, ...]] = []
+        # 値キー -> (x, y)
+        self.value_positions: Dict[str, Tuple[float, float]] = {}
+        self.issue_date_position = (self.width - 20 * mm, self.height - 50 * mm)
+        self.items_top = self._build()
+
+    def _build(self) -> float:
+        ops = self.operations
+        width, height = self.width, self.height
+
+        # --- ヘッダー部分 ---
+        ops.append(("font", 24))
+        ops.append(("centred", width / 2, height - 40 * mm, "領収書 / RECEIPT"))
+
+        # --- トランザクション情報 / 支払い者情報 / 店舗情報 ---
+        y_position = height - 70 * mm
+        for title, fields in STATIC_SECTIONS:
+            y_position = self._add_section_heading(title, y_position)
+            for key, label in fields:
+                ops.append(("text", 25 * mm, y_position, label))
+                self.value_positions[key] = (60 * mm, y_position)
+                y_position -= 5 * mm
+            y_position -= 5 * mm
+
+        # --- 購入商品（見出しのみ、明細は動的） ---
+        y_position = self._add_section_heading("購入商品", y_position)
+
+        # --- フッター ---
+        ops.append(("font", 8))
+        ops.append(("centred", width / 2, 20 * mm, "AP2 Protocol v2 Demo - Secure Transaction System"))
+        ops.append(("font", 7))
+        ops.append(("centred", width / 2, 15 * mm, "この領収書はAP2プロトコルに基づいて発行されました。"))
+
+        return y_position
+
+    def _add_section_heading(self, title: str, y_position: float) -> float:
+        self.operations.append(("font", 12))
+        self.operations.append(("text", 20 * mm, y_position, title))
+        y_position -= 7 * mm
+
+        self.operations.append(("font", 10))
+        # 線を引く
+        self.operations.append(("line", 20 * mm, y_position + 2 * mm, self.width - 20 * mm, y_position + 2 * mm))
+        return y_position - 5 * mm
+
+    def draw_static(self, c: canvas.Canvas):
+        """静的部分をform XObjectとして登録し、ページに配置"""
+        c.beginForm(STATIC_LAYOUT_FORM_NAME)
+        for op in self.operations:
+            kind = op[0]
+            if kind == "font":
+                c.setFont(self.font_name, op[1])
+            elif kind == "text":
+                c.drawString(op[1], op[2], op[3])
+            elif kind == "centred":
+                c.drawCentredString(op[1], op[2], op[3])
+            elif kind == "line":
+                c.line(op[1], op[2], op[3], op[4])
+        c.endForm()
+        c.doForm(STATIC_LAYOUT_FORM_NAME)
+
+    def draw_value(self, c: canvas.Canvas, key: str, value: str):
+        """固定セクションの値を描画"""
+        x, y = self.value_positions[key]
+        c.drawString(x, y, value)
+
+
+@lru_cache(maxsize=4)
+def get_receipt_layout(font_name: str) -> ReceiptLayout:
+    """フォントごとの静的レイアウト（プロセス内でキャッシュ）"""
+    return ReceiptLayout(font_name)
+
+
+@metrics.timed(RECEIPT_PDF_SECONDS)
 def generate_receipt_pdf(
     transaction_result: Dict[str, Any],
     cart_mandate: Optional[Dict[str, Any]],
     payment_mandate: Dict[str, Any],
-    user_name: str
+    user_name: str,
+    issued_at: Optional[str] = None
 ) -> BytesIO:
     """
     領収書PDFを生成
 
     AP2仕様準拠：CartMandateがNoneの場合は、PaymentMandateから取得可能な情報のみで領収書を生成
 
+    フォント登録と静的レイアウトはプロセス内でキャッシュされる（レンダリングワーカーで再利用）。
+    issued_atを指定した場合、同じ入力からは同じバイト列を生成する（再レンダリング時にコンテンツハッシュで重複排除される）。
+
     Args:
         transaction_result: トランザクション結果（Dict形式）
         cart_mandate: カート情報（Dict形式、Noneの場合あり）
         payment_mandate: 支払い情報（Dict形式）
         user_name: ユーザー名
+        issued_at: 発行日時（ISO 8601、省略時は現在時刻）
 
     Returns:
         BytesIO: 生成されたPDFのバイトストリーム
@@ -47,95 +195,36 @@ def generate_receipt_pdf(
     buffer = BytesIO()
 
     # PDFキャンバスを作成
-    c = canvas.Canvas(buffer, pagesize=A4)
+    # invariant: 作成日時・ドキュメントIDをPDFに埋め込まない（出力を入力だけで決める）
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
     width, height = A4
 
-    # 日本語フォントを登録
-    try:
-        pdfmetrics.registerFont(UnicodeCIDFont('HeiseiKakuGo-W5'))
-        font_name = 'HeiseiKakuGo-W5'
-        logger.debug("[ReceiptGenerator] Using Japanese font: HeiseiKakuGo-W5")
-    except Exception as e:
-        # フォールバック: Helvetica（日本語非対応）
-        font_name = 'Helvetica'
-        logger.warning(f"[ReceiptGenerator] Failed to load Japanese font, using Helvetica: {e}")
-
-    # --- ヘッダー部分 ---
-    c.setFont(font_name, 24)
-    c.drawCentredString(width / 2, height - 40 * mm, "領収書 / RECEIPT")
+    # 日本語フォント・静的レイアウト（キャッシュ済み）
+    font_name = register_receipt_font()
+    layout = get_receipt_layout(font_name)
+    layout.draw_static(c)
 
     # 発行日
     c.setFont(font_name, 10)
-    issue_date = datetime.now().strftime("%Y年%m月%d日 %H:%M:%S")
-    c.drawRightString(width - 20 * mm, height - 50 * mm, f"発行日: {issue_date}")
+    issue_date = (datetime.fromisoformat(issued_at) if issued_at else datetime.now()).strftime("%Y年%m月%d日 %H:%M:%S")
+    c.drawRightString(*layout.issue_date_position, f"発行日: {issue_date}")
 
     # --- トランザクション情報 ---
-    y_position = height - 70 * mm
-
-    c.setFont(font_name, 12)
-    c.drawString(20 * mm, y_position, "トランザクション情報")
-    y_position -= 7 * mm
-
-    c.setFont(font_name, 10)
-    # 線を引く
-    c.line(20 * mm, y_position + 2 * mm, width - 20 * mm, y_position + 2 * mm)
-    y_position -= 5 * mm
-
-    # トランザクションID
-    c.drawString(25 * mm, y_position, f"取引ID:")
-    c.drawString(60 * mm, y_position, transaction_result.get("id", "N/A"))
-    y_position -= 5 * mm
-
-    # ステータス
-    c.drawString(25 * mm, y_position, f"ステータス:")
-    status = transaction_result.get("status", "unknown").upper()
-    c.drawString(60 * mm, y_position, status)
-    y_position -= 5 * mm
-
-    # 承認日時
-    c.drawString(25 * mm, y_position, f"承認日時:")
-    authorized_at = transaction_result.get("authorized_at", "N/A")
-    c.drawString(60 * mm, y_position, authorized_at)
-    y_position -= 5 * mm
-
-    # キャプチャ日時
-    c.drawString(25 * mm, y_position, f"決済日時:")
-    captured_at = transaction_result.get("captured_at", "N/A")
-    c.drawString(60 * mm, y_position, captured_at)
-    y_position -= 10 * mm
+    layout.draw_value(c, "transaction_id", transaction_result.get("id", "N/A"))
+    layout.draw_value(c, "status", transaction_result.get("status", "unknown").upper())
+    layout.draw_value(c, "authorized_at", transaction_result.get("authorized_at", "N/A"))
+    layout.draw_value(c, "captured_at", transaction_result.get("captured_at", "N/A"))
 
     # --- 支払い者情報 ---
-    c.setFont(font_name, 12)
-    c.drawString(20 * mm, y_position, "支払い者情報")
-    y_position -= 7 * mm
-
-    c.setFont(font_name, 10)
-    c.line(20 * mm, y_position + 2 * mm, width - 20 * mm, y_position + 2 * mm)
-    y_position -= 5 * mm
-
-    c.drawString(25 * mm, y_position, f"氏名:")
-    c.drawString(60 * mm, y_position, user_name)
-    y_position -= 5 * mm
+    layout.draw_value(c, "user_name", user_name)
 
     # 支払い方法
     payment_method = payment_mandate.get("payment_method", {})
     brand = payment_method.get("brand", "card").upper()
     last4 = payment_method.get("last4", "****")
-    c.drawString(25 * mm, y_position, f"支払い方法:")
-    payment_method_text = f"{brand} ****{last4}"
-    c.drawString(60 * mm, y_position, payment_method_text)
-    y_position -= 10 * mm
+    layout.draw_value(c, "payment_method", f"{brand} ****{last4}")
 
     # --- 店舗情報 ---
-    c.setFont(font_name, 12)
-    c.drawString(20 * mm, y_position, "店舗情報")
-    y_position -= 7 * mm
-
-    c.setFont(font_name, 10)
-    c.line(20 * mm, y_position + 2 * mm, width - 20 * mm, y_position + 2 * mm)
-    y_position -= 5 * mm
-
-    c.drawString(25 * mm, y_position, f"店舗名:")
     # AP2準拠：CartMandateがない場合はPaymentMandateから情報を取得
     if cart_mandate:
         # AP2準拠：contents.merchant_nameから取得
@@ -147,21 +236,11 @@ def generate_receipt_pdf(
         merchant_name = payment_mandate.get("payee_name", "Unknown Merchant")
         merchant_id = payment_mandate.get("payee_id", "N/A")
 
-    c.drawString(60 * mm, y_position, merchant_name)
-    y_position -= 5 * mm
-
-    c.drawString(25 * mm, y_position, f"店舗ID:")
-    c.drawString(60 * mm, y_position, merchant_id)
-    y_position -= 10 * mm
+    layout.draw_value(c, "merchant_name", merchant_name)
+    layout.draw_value(c, "merchant_id", merchant_id)
 
     # --- 購入商品 ---
-    c.setFont(font_name, 12)
-    c.drawString(20 * mm, y_position, "購入商品")
-    y_position -= 7 * mm
-
-    c.setFont(font_name, 10)
-    c.line(20 * mm, y_position + 2 * mm, width - 20 * mm, y_position + 2 * mm)
-    y_position -= 5 * mm
+    y_position = layout.items_top
 
     # AP2準拠：CartMandateがない場合は詳細情報なし
     if cart_mandate:
@@ -274,15 +353,6 @@ def generate_receipt_pdf(
         c.drawRightString(160 * mm, y_position, total_str)
         y_position -= 10 * mm
 
-    # --- フッター ---
-    c.setFont(font_name, 8)
-    footer_text = "AP2 Protocol v2 Demo - Secure Transaction System"
-    c.drawCentredString(width / 2, 20 * mm, footer_text)
-
-    c.setFont(font_name, 7)
-    footer_note = "この領収書はAP2プロトコルに基づいて発行されました。"
-    c.drawCentredString(width / 2, 15 * mm, footer_note)
-
     # PDFを保存
     c.showPage()
     c.save()
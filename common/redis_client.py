@@ -8,12 +8,21 @@ Redis KVストアクライアント（共通モジュール）
 
 import json
 import logging
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, Iterable, List
 from datetime import timedelta
 import redis.asyncio as redis
 
+from common import metrics
+
 logger = logging.getLogger(__name__)
 
+# Redisコマンドの所要時間（接続エラー等で例外になった場合も記録）
+REDIS_COMMAND_SECONDS = metrics.histogram(
+    "ap2_redis_command_seconds",
+    "Redisコマンドの所要時間（秒）",
+    ("command",)
+)
+
 
 class RedisClient:
     """
@@ -33,6 +42,8 @@ class RedisClient:
         """
         self.redis_url = redis_url
         self.client: Optional[redis.Redis] = None
+        # Luaスクリプト本文 → 登録済みスクリプト（EVALSHAで実行、未ロード時は自動でEVAL）
+        self._scripts: Dict[str, Any] = {}
 
     async def connect(self):
         """Redis接続を確立"""
@@ -53,6 +64,7 @@ class RedisClient:
             self.client = None
             logger.info("[RedisClient] Disconnected from Redis")
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="set")
     async def set(
         self,
         key: str,
@@ -92,6 +104,32 @@ class RedisClient:
             logger.error(f"[RedisClient] Failed to SET key={key}: {e}", exc_info=True)
             return False
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="set_nx")
+    async def set_if_absent(self, key: str, value: Any, ttl_seconds: int) -> Optional[bool]:
+        """
+        キーが存在しない場合のみ保存（SET NX EX）
+
+        Args:
+            key: Redis key
+            value: 保存する値（dict, list, str等）
+            ttl_seconds: 有効期限（秒）
+
+        Returns:
+            保存した場合True、既に存在する場合False、Redisエラー時None
+        """
+        try:
+            await self.connect()
+
+            value_str = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+            stored = await self.client.set(key, value_str, ex=ttl_seconds, nx=True)
+            logger.debug(f"[RedisClient] SET NX key={key}, ttl={ttl_seconds}s, stored={bool(stored)}")
+            return bool(stored)
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to SET NX key={key}: {e}", exc_info=True)
+            return None
+
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="get")
     async def get(self, key: str, as_json: bool = True) -> Optional[Any]:
         """
         キーの値を取得
@@ -124,6 +162,7 @@ class RedisClient:
             logger.error(f"[RedisClient] Failed to GET key={key}: {e}", exc_info=True)
             return None
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="delete")
     async def delete(self, key: str) -> bool:
         """
         キーを削除
@@ -145,6 +184,7 @@ class RedisClient:
             logger.error(f"[RedisClient] Failed to DELETE key={key}: {e}", exc_info=True)
             return False
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="exists")
     async def exists(self, key: str) -> bool:
         """
         キーが存在するかチェック
@@ -165,6 +205,7 @@ class RedisClient:
             logger.error(f"[RedisClient] Failed to check EXISTS key={key}: {e}", exc_info=True)
             return False
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="ttl")
     async def get_ttl(self, key: str) -> Optional[int]:
         """
         キーの残りTTLを取得
@@ -187,6 +228,7 @@ class RedisClient:
             logger.error(f"[RedisClient] Failed to get TTL for key={key}: {e}", exc_info=True)
             return None
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="keys")
     async def keys(self, pattern: str = "*") -> list[str]:
         """
         パターンにマッチするキー一覧を取得
@@ -207,6 +249,178 @@ class RedisClient:
             logger.error(f"[RedisClient] Failed to get KEYS pattern={pattern}: {e}", exc_info=True)
             return []
 
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="mget")
+    async def mget(self, keys: List[str], as_json: bool = True) -> List[Optional[Any]]:
+        """
+        複数キーの値を1往復で取得（MGET）
+
+        Args:
+            keys: Redis keyのリスト
+            as_json: True の場合、JSON文字列をパースして返す
+
+        Returns:
+            keysと同じ順序の値リスト（存在しないキー・Redisエラー時はNone）
+        """
+        if not keys:
+            return []
+        try:
+            await self.connect()
+
+            values = await self.client.mget(keys)
+            if not as_json:
+                return list(values)
+
+            results: List[Optional[Any]] = []
+            for value_str in values:
+                if value_str is None:
+                    results.append(None)
+                    continue
+                try:
+                    results.append(json.loads(value_str))
+                except json.JSONDecodeError:
+                    results.append(value_str)
+            return results
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to MGET {len(keys)} keys: {e}", exc_info=True)
+            return [None] * len(keys)
+
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="delete_many")
+    async def delete_many(self, keys: List[str]) -> int:
+        """
+        複数キーを削除
+
+        Args:
+            keys: Redis keyのリスト
+
+        Returns:
+            削除したキー数
+        """
+        if not keys:
+            return 0
+        try:
+            await self.connect()
+
+            deleted = await self.client.delete(*keys)
+            logger.debug(f"[RedisClient] DELETE {len(keys)} keys, deleted={deleted}")
+            return deleted
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to DELETE {len(keys)} keys: {e}", exc_info=True)
+            return 0
+
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="zadd")
+    async def zadd(self, key: str, mapping: Dict[str, float], ttl_seconds: Optional[int] = None) -> bool:
+        """
+        ソート済みセットにメンバーを追加（ZADD）
+
+        Args:
+            key: Redis key
+            mapping: メンバー → スコア
+            ttl_seconds: キーの有効期限（秒）。既存の有効期限より長い場合のみ延長する
+
+        Returns:
+            成功した場合True
+        """
+        try:
+            await self.connect()
+
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, mapping)
+                if ttl_seconds:
+                    # NX: 有効期限未設定のキーに設定、GT: 既存より長い場合のみ延長
+                    pipe.expire(key, ttl_seconds, nx=True)
+                    pipe.expire(key, ttl_seconds, gt=True)
+                await pipe.execute()
+
+            logger.debug(f"[RedisClient] ZADD key={key}, members={len(mapping)}, ttl={ttl_seconds}s")
+            return True
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to ZADD key={key}: {e}", exc_info=True)
+            return False
+
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="zrangebyscore")
+    async def zrange_by_score(
+        self,
+        key: str,
+        min_score: float = float("-inf"),
+        max_score: float = float("inf"),
+        limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        スコア範囲内のメンバーをスコア昇順で取得（ZRANGEBYSCORE）
+
+        Args:
+            key: Redis key
+            min_score: 最小スコア（含む）
+            max_score: 最大スコア（含む）
+            limit: 最大取得件数（Noneの場合は全件）
+
+        Returns:
+            メンバーのリスト
+        """
+        try:
+            await self.connect()
+
+            if limit is None:
+                return await self.client.zrangebyscore(key, min_score, max_score)
+            return await self.client.zrangebyscore(key, min_score, max_score, start=0, num=limit)
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to ZRANGEBYSCORE key={key}: {e}", exc_info=True)
+            return []
+
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="evalsha")
+    async def run_script(self, script: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """
+        Luaスクリプトをアトミックに実行
+
+        Args:
+            script: Luaスクリプト本文
+            keys: KEYS
+            args: ARGV
+
+        Returns:
+            スクリプトの戻り値（Redisエラー時None）
+        """
+        try:
+            await self.connect()
+
+            registered = self._scripts.get(script)
+            if registered is None:
+                registered = self.client.register_script(script)
+                self._scripts[script] = registered
+            return await registered(keys=keys, args=args)
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to run script keys={keys}: {e}", exc_info=True)
+            return None
+
+    @metrics.timed(REDIS_COMMAND_SECONDS, command="zrem")
+    async def zrem(self, key: str, members: Iterable[str]) -> int:
+        """
+        ソート済みセットからメンバーを削除（ZREM）
+
+        Args:
+            key: Redis key
+            members: 削除するメンバー
+
+        Returns:
+            削除したメンバー数
+        """
+        members = list(members)
+        if not members:
+            return 0
+        try:
+            await self.connect()
+
+            return await self.client.zrem(key, *members)
+
+        except Exception as e:
+            logger.error(f"[RedisClient] Failed to ZREM key={key}: {e}", exc_info=True)
+            return 0
+
 
 class TokenStore:
     """
@@ -267,6 +481,30 @@ class TokenStore:
         key = self._make_key(token)
         return await self.redis.delete(key)
 
+    async def get_tokens(self, tokens: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        複数トークンのデータを1往復で取得
+
+        Args:
+            tokens: トークン文字列のリスト
+
+        Returns:
+            tokensと同じ順序のトークンデータ（存在しない場合None）
+        """
+        return await self.redis.mget([self._make_key(token) for token in tokens], as_json=True)
+
+    async def delete_tokens(self, tokens: List[str]) -> int:
+        """
+        複数トークンを削除
+
+        Args:
+            tokens: トークン文字列のリスト
+
+        Returns:
+            削除したトークン数
+        """
+        return await self.redis.delete_many([self._make_key(token) for token in tokens])
+
 
 class SessionStore:
     """
@@ -0,0 +1,216 @@
+"""
+v2/common/response_cache.py
+
+HTTPレスポンスキャッシュ（共通モジュール）
+
+- キー付きLRU: 上流のレスポンス本体（シリアライズ済みバイト列）とETagを保持し、再エンコードせずに配信する
+- stale-while-revalidate: 鮮度切れ後の一定時間は古いエントリを返しつつ、バックグラウンドで再検証する
+- 条件付きリクエスト: 再検証時は保持しているETagをIf-None-Matchで上流に送り、304なら本体を再取得しない
+- 同じキーの同時ミス・再検証は1回の上流リクエストにまとめる
+  （上流への取得は独立したタスクで行い、待機者はshieldで待つため、どの待機者がキャンセルされても他の待機者に影響しない）
+- invalidate(): 全エントリを破棄（進行中の取得結果も保存しない）
+
+使用例:
+    async def fetch(etag):
+        response = await client.get(url, headers={"If-None-Match": etag} if etag else {})
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response.content, response.headers.get("ETag") or compute_etag(response.content)
+
+    entry = await cache.get_or_fetch(("query", 10), fetch)
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from fastapi.responses import JSONResponse, Response
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_EVENTS = metrics.counter(
+    "ap2_response_cache_events_total", "レスポンスキャッシュのイベント（hit・stale・miss・not_modified等）", ("cache", "event")
+)
+
+# fetch(保持しているETag) → (本体, ETag)、上流が304を返した場合はNone
+Fetcher = Callable[[Optional[str]], Awaitable[Optional[Tuple[bytes, str]]]]
+
+
+def compute_etag(content: bytes) -> str:
+    """レスポンス本体のコンテンツハッシュからETagを生成"""
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Matchヘッダーがetagに一致するか（弱い比較）"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def build_cached_response(
+    content: bytes,
+    etag: str,
+    if_none_match: Optional[str] = None,
+    media_type: str = "application/json",
+    cache_control: str = "no-cache"
+) -> Response:
+    """シリアライズ済みの本体からETag付きレスポンスを生成（If-None-Match一致時は304）"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def build_json_response(payload: Any, if_none_match: Optional[str] = None) -> Response:
+    """JSONレスポンスをETag付きで生成（If-None-Match一致時は304）"""
+    content = JSONResponse(payload).body
+    return build_cached_response(content, compute_etag(content), if_none_match)
+
+
+@dataclass
+class CachedResponse:
+    """キャッシュエントリ（fetched_atは最後に上流で確認した時刻）"""
+
+    content: bytes
+    etag: str
+    fetched_at: float
+
+
+class ResponseCache:
+    """
+    キー付きLRUのレスポンスキャッシュ（stale-while-revalidate）
+
+    Args:
+        name: メトリクスのラベル
+        max_entries: 保持するエントリ数の上限
+        ttl_seconds: 上流に確認せずに返す時間
+        stale_seconds: ttl経過後、古いエントリを返しつつバックグラウンドで再検証する時間
+            （これも過ぎたエントリは上流の応答を待って返す）
+        clock: 時刻関数（テスト用）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 512,
+        ttl_seconds: float = 30.0,
+        stale_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.clock = clock
+        self.stats: Counter = Counter()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # バックグラウンド再検証タスク（参照を保持してGCされないようにする）
+        self._tasks: Set[asyncio.Task] = set()
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _record(self, event: str) -> None:
+        self.stats[event] += 1
+        RESPONSE_CACHE_EVENTS.labels(cache=self.name, event=event).inc()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Fetcher) -> CachedResponse:
+        """
+        キャッシュから取得（ミス・期限切れの場合は上流から取得）
+
+        Raises:
+            Exception: 上流からの取得に失敗した場合（fetchの例外をそのまま送出）
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._record("miss")
+            return await self._refresh(key, fetch)
+
+        self._entries.move_to_end(key)
+        age = self.clock() - entry.fetched_at
+        if age < self.ttl_seconds:
+            self._record("hit")
+            return entry
+        if age < self.ttl_seconds + self.stale_seconds:
+            self._record("stale")
+            if key not in self._inflight:
+                task = asyncio.create_task(self._revalidate_in_background(key, fetch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return entry
+        self._record("expired")
+        return await self._refresh(key, fetch)
+
+    async def _revalidate_in_background(self, key: Hashable, fetch: Fetcher) -> None:
+        try:
+            await self._refresh(key, fetch)
+        except Exception as e:
+            logger.warning(f"[ResponseCache:{self.name}] Background revalidation failed for {key!r}: {e}")
+
+    async def _refresh(self, key: Hashable, fetch: Fetcher) -> CachedResponse:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch, self._generation))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish_inflight(key, done))
+        return await asyncio.shield(task)
+
+    def _finish_inflight(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 待機者が全員キャンセルされた場合の「例外が取得されなかった」警告を抑止
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, key: Hashable, fetch: Fetcher, generation: int) -> CachedResponse:
+        current = self._entries.get(key)
+        result = await fetch(current.etag if current is not None else None)
+        now = self.clock()
+
+        if result is None:
+            if current is None:
+                raise RuntimeError(f"Upstream returned 304 without a cached entry for {key!r}")
+            self._record("not_modified")
+            entry = CachedResponse(current.content, current.etag, now)
+        else:
+            content, etag = result
+            entry = CachedResponse(content, etag, now)
+
+        # 取得中にinvalidate()された場合、古いかもしれない結果は保存しない
+        if generation == self._generation:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    async def drain(self) -> None:
+        """進行中のバックグラウンド再検証の完了を待つ"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def aclose(self) -> None:
+        """進行中の取得・再検証をキャンセル（シャットダウン時）"""
+        tasks = [*self._tasks, *self._inflight.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def invalidate(self) -> int:
+        """全エントリを破棄（破棄した件数を返す）"""
+        count = len(self._entries)
+        self._entries.clear()
+        self._generation += 1
+        self._record("invalidated")
+        return count
@@ -5,14 +5,30 @@ Payment Mandateのリスク評価エンジン
 既存のrisk_assessment.pyをv2の構造に適応
 """
 
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Sequence, Tuple, Union
+from datetime import datetime
 from dataclasses import dataclass
 from decimal import Decimal
 import logging
 
+import numpy as np
+
+from common import metrics
+from common.risk_feature_store import (
+    DatabaseRiskFeatureStore,
+    InMemoryRiskFeatureStore,
+    PayerRiskFeatures,
+)
+
 logger = logging.getLogger(__name__)
 
+# リスク評価の所要時間（variant: sync/async）
+RISK_ASSESSMENT_SECONDS = metrics.histogram(
+    "ap2_risk_assessment_seconds",
+    "Payment Mandateのリスク評価の所要時間（秒）",
+    ("variant",)
+)
+
 
 @dataclass
 class RiskAssessmentResult:
@@ -50,19 +66,38 @@ class RiskAssessmentEngine:
     EXTREME_VALUE_THRESHOLD = 500000 * 100    # 500,000円
     SUSPICIOUS_VALUE_THRESHOLD = 1000000 * 100  # 1,000,000円
 
-    def __init__(self, db_manager=None):
+    # 総合リスクスコアの各要因の重み（この順で加算する）
+    RISK_FACTOR_WEIGHTS = {
+        "amount_risk": 2.5,
+        "constraint_risk": 2.0,
+        "agent_risk": 0.5,
+        "transaction_type_risk": 1.0,
+        "payment_method_risk": 1.2,
+        "pattern_risk": 1.3,
+        "shipping_risk": 0.8,
+        "temporal_risk": 0.7
+    }
+
+    def __init__(self, db_manager=None, feature_store=None, weights: Optional[Dict[str, float]] = None):
         """
         リスク評価エンジンを初期化
 
         Args:
             db_manager: データベースマネージャー（オプション）
                         指定されない場合はインメモリで動作（後方互換性のため）
+            feature_store: 取引パターン特徴量ストア（オプション）
+                           省略時はdb_managerがあればDatabaseRiskFeatureStoreを使用
+            weights: リスク要因の重みの上書き（オプション、リプレイでのチューニング用）
         """
         self.db_manager = db_manager
-        # 後方互換性のため、インメモリストアも残す（db_managerが指定されない場合）
-        self.transaction_history: Dict[str, List[Dict]] = {}
+        self.weights = {**self.RISK_FACTOR_WEIGHTS, **(weights or {})}
+        self.feature_store = feature_store or (DatabaseRiskFeatureStore(db_manager) if db_manager else None)
+        # DB未設定時・同期評価時のフォールバック（プロセス内ストア）
+        self.memory_store = InMemoryRiskFeatureStore()
+        self.transaction_history = self.memory_store.history
         logger.info(f"[RiskAssessmentEngine] Initialized (database_mode={'enabled' if db_manager else 'disabled'})")
 
+    @metrics.timed(RISK_ASSESSMENT_SECONDS, variant="sync")
     def assess_payment_mandate(
         self,
         payment_mandate: Dict,
@@ -71,7 +106,7 @@ class RiskAssessmentEngine:
         session: Optional[Dict] = None
     ) -> RiskAssessmentResult:
         """
-        Payment Mandateのリスクを評価
+        Payment Mandateのリスクを評価（同期版、取引パターンはプロセス内ストアを使用）
 
         Args:
             payment_mandate: 評価対象のPayment Mandate
@@ -82,6 +117,354 @@ class RiskAssessmentEngine:
         Returns:
             RiskAssessmentResult: リスク評価結果
         """
+        return self._assess_in_memory(payment_mandate, cart_mandate, intent_mandate, session)
+
+    def _assess_in_memory(
+        self,
+        payment_mandate: Dict,
+        cart_mandate: Optional[Dict],
+        intent_mandate: Optional[Dict],
+        session: Optional[Dict]
+    ) -> RiskAssessmentResult:
+        """プロセス内ストアの取引パターンでリスクを評価し、取引履歴に記録"""
+        payer_id, amount_value = self._extract_payer_and_amount(payment_mandate)
+        pattern_features = self.memory_store.get_features(payer_id)
+
+        result = self._evaluate(payment_mandate, cart_mandate, intent_mandate, session, pattern_features)
+
+        # 取引履歴に記録
+        self._record_transaction(payer_id, amount_value, result.risk_score)
+        return result
+
+    @metrics.timed(RISK_ASSESSMENT_SECONDS, variant="async")
+    async def assess_payment_mandate_async(
+        self,
+        payment_mandate: Dict,
+        cart_mandate: Optional[Dict] = None,
+        intent_mandate: Optional[Dict] = None,
+        session: Optional[Dict] = None
+    ) -> RiskAssessmentResult:
+        """
+        Payment Mandateのリスクを評価（非同期版）
+
+        取引パターンの特徴量を特徴量ストア（DB）から1クエリで取得し、
+        評価後に取引履歴と集計を同じストアへ記録する。
+        特徴量ストア未設定・DBエラー時はプロセス内ストアにフォールバックする。
+        """
+        if not self.feature_store:
+            return self._assess_in_memory(payment_mandate, cart_mandate, intent_mandate, session)
+
+        payer_id, amount_value = self._extract_payer_and_amount(payment_mandate)
+        try:
+            pattern_features = await self.feature_store.get_features(payer_id)
+        except Exception as e:
+            logger.error(f"[RiskAssessmentEngine] Failed to load risk features, using in-memory fallback: {e}", exc_info=True)
+            return self.assess_payment_mandate(payment_mandate, cart_mandate, intent_mandate, session)
+
+        result = self._evaluate(payment_mandate, cart_mandate, intent_mandate, session, pattern_features)
+
+        try:
+            await self.feature_store.record(
+                payer_id,
+                self._parse_amount_cents(amount_value),
+                result.risk_score,
+                currency=self._extract_currency(payment_mandate)
+            )
+        except Exception as e:
+            logger.error(f"[RiskAssessmentEngine] Failed to record risk features, using in-memory fallback: {e}", exc_info=True)
+            self._record_transaction(payer_id, amount_value, result.risk_score)
+
+        return result
+
+    def assess_many(
+        self,
+        payment_mandates: Sequence[Dict],
+        cart_mandates: Optional[Sequence[Optional[Dict]]] = None,
+        intent_mandates: Optional[Sequence[Optional[Dict]]] = None,
+        sessions: Optional[Sequence[Optional[Dict]]] = None,
+        pattern_features: Optional[Sequence[PayerRiskFeatures]] = None,
+        return_exceptions: bool = False
+    ) -> List[Union[RiskAssessmentResult, Exception]]:
+        """
+        複数のPayment Mandateを一括評価（列指向のベクトル化評価）
+
+        各Mandateから特徴量を列（NumPy配列）として抽出し、リスク要因と総合スコアを
+        一括で計算する。結果はassess_payment_mandateと同じスコアになる。
+
+        取引履歴への記録は行わない（リプレイ用途で本番の履歴を汚さないため）。
+        pattern_features省略時はプロセス内ストアのスナップショットを使用する。
+
+        Args:
+            payment_mandates: 評価対象のPayment Mandateリスト
+            cart_mandates: 対応するCart Mandateリスト（オプション）
+            intent_mandates: 対応するIntent Mandateリスト（オプション）
+            sessions: 対応するセッションデータリスト（オプション）
+            pattern_features: 対応する取引パターン特徴量リスト（オプション）
+            return_exceptions: Trueの場合、評価できないMandateは例外を結果に含める
+                               （Falseの場合は最初の例外を送出）
+
+        Returns:
+            List[RiskAssessmentResult | Exception]: 入力順の評価結果
+        """
+        n = len(payment_mandates)
+        if n == 0:
+            return []
+        cart_mandates = cart_mandates or [None] * n
+        intent_mandates = intent_mandates or [None] * n
+        sessions = sessions or [None] * n
+
+        columns = self._extract_columns(payment_mandates, cart_mandates, intent_mandates, sessions, pattern_features)
+        errors = columns.pop("errors")
+        if errors and not return_exceptions:
+            raise next(iter(errors.values()))
+
+        factors = self._score_columns(columns)
+
+        # 総合スコア（_calculate_total_risk_scoreと同じ順序で加算して丸め誤差も一致させる）
+        weighted_sum = np.zeros(n, dtype=np.float64)
+        total_weight = 0
+        for factor, scores in factors.items():
+            weight = self.weights.get(factor, 1.0)
+            weighted_sum += scores * weight
+            total_weight += weight
+        total = (weighted_sum / total_weight).astype(np.int64) if total_weight > 0 else np.zeros(n, dtype=np.int64)
+        total = np.clip(total, 0, 100)
+
+        recommendations = np.where(
+            total < self.LOW_RISK_THRESHOLD, "approve",
+            np.where(total < self.HIGH_RISK_THRESHOLD, "review", "decline")
+        )
+
+        indicator_masks = [
+            ("high_transaction_amount", factors["amount_risk"] > 30),
+            ("intent_constraint_violation", factors["constraint_risk"] > 0),
+            ("card_not_present_transaction", ~columns["human_present"]),
+            ("payment_method_risk", factors["payment_method_risk"] > 20),
+            ("unusual_transaction_pattern", factors["pattern_risk"] > 30),
+            ("shipping_address_risk", factors["shipping_risk"] > 20),
+            ("suspicious_timing", factors["temporal_risk"] > 20),
+        ]
+        factor_rows = np.column_stack(list(factors.values())).astype(np.int64).tolist()
+        factor_names = list(factors.keys())
+
+        results: List[Union[RiskAssessmentResult, Exception]] = []
+        for i in range(n):
+            if i in errors:
+                results.append(errors[i])
+                continue
+            results.append(RiskAssessmentResult(
+                risk_score=int(total[i]),
+                fraud_indicators=[name for name, mask in indicator_masks if mask[i]],
+                risk_factors=dict(zip(factor_names, factor_rows[i])),
+                recommendation=str(recommendations[i])
+            ))
+
+        logger.info(f"[RiskAssessmentEngine] Batch assessment completed: count={n}, errors={len(errors)}")
+        return results
+
+    async def assess_many_async(
+        self,
+        payment_mandates: Sequence[Dict],
+        cart_mandates: Optional[Sequence[Optional[Dict]]] = None,
+        intent_mandates: Optional[Sequence[Optional[Dict]]] = None,
+        sessions: Optional[Sequence[Optional[Dict]]] = None,
+        return_exceptions: bool = False
+    ) -> List[Union[RiskAssessmentResult, Exception]]:
+        """
+        複数のPayment Mandateを一括評価（取引パターン特徴量は特徴量ストアから1クエリで取得）
+        """
+        pattern_features = None
+        if self.feature_store:
+            payer_ids = [self._extract_payer_and_amount(m)[0] for m in payment_mandates]
+            features_by_payer = await self.feature_store.get_features_many(payer_ids)
+            pattern_features = [features_by_payer[payer_id] for payer_id in payer_ids]
+
+        return self.assess_many(
+            payment_mandates, cart_mandates, intent_mandates, sessions,
+            pattern_features=pattern_features,
+            return_exceptions=return_exceptions
+        )
+
+    def _extract_columns(
+        self,
+        payment_mandates: Sequence[Dict],
+        cart_mandates: Sequence[Optional[Dict]],
+        intent_mandates: Sequence[Optional[Dict]],
+        sessions: Sequence[Optional[Dict]],
+        pattern_features: Optional[Sequence[PayerRiskFeatures]]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Mandateから評価に必要な値を列として抽出
+
+        入れ子のdict参照はここで1回だけ行う。制約準拠と支払い方法は
+        分岐の多い検証ロジックのため、既存の評価メソッドを行ごとに適用する。
+        """
+        n = len(payment_mandates)
+        if pattern_features is None:
+            payer_ids = [self._extract_payer_and_amount(m)[0] for m in payment_mandates]
+            pattern_features = self.memory_store.get_features_batch(payer_ids)
+
+        amount_cents = np.zeros(n, dtype=np.int64)
+        intent_max_cents = np.zeros(n, dtype=np.int64)
+        constraint_risk = np.zeros(n, dtype=np.int64)
+        human_present = np.zeros(n, dtype=bool)
+        payment_method_risk = np.zeros(n, dtype=np.int64)
+        count_24h = np.zeros(n, dtype=np.int64)
+        has_history = np.zeros(n, dtype=bool)
+        recent_average = np.zeros(n, dtype=np.float64)
+        has_cart = np.zeros(n, dtype=bool)
+        po_box = np.zeros(n, dtype=bool)
+        express = np.zeros(n, dtype=bool)
+        elapsed = np.full(n, np.nan, dtype=np.float64)
+        errors: Dict[int, Exception] = {}
+
+        for i, payment_mandate in enumerate(payment_mandates):
+            contents = payment_mandate.get("payment_mandate_contents", {})
+            _, amount_value = self._extract_payer_and_amount(payment_mandate)
+            amount_cents[i] = self._parse_amount_cents(amount_value)
+            intent_mandate = intent_mandates[i]
+            cart_mandate = cart_mandates[i]
+            session = sessions[i]
+
+            if intent_mandate:
+                max_amount_str = intent_mandate.get("constraints", {}).get("max_amount", {}).get("value", "0")
+                try:
+                    if "." in max_amount_str:
+                        intent_max_cents[i] = int(float(max_amount_str) * 100)
+                    else:
+                        intent_max_cents[i] = int(max_amount_str)
+                except (ValueError, TypeError):
+                    intent_max_cents[i] = 0
+                elapsed[i] = self._elapsed_seconds(intent_mandate.get("created_at"), contents.get("timestamp"))
+
+            if session:
+                constraint_risk[i] = self._assess_constraint_compliance(payment_mandate, cart_mandate, intent_mandate, session)
+
+            human_present[i] = bool(payment_mandate.get("user_authorization"))
+
+            try:
+                payment_method_risk[i] = self._assess_payment_method(contents.get("payment_response", {}))
+            except ValueError as e:
+                errors[i] = e
+
+            features = pattern_features[i]
+            has_history[i] = features.has_history
+            count_24h[i] = features.count_24h
+            recent_average[i] = features.recent_average or 0.0
+
+            if cart_mandate:
+                has_cart[i] = True
+                address_line1 = cart_mandate.get("shipping_address", {}).get("address_line1", "")
+                po_box[i] = 'P.O.' in address_line1 or 'PO Box' in address_line1 or '私書箱' in address_line1
+                express[i] = cart_mandate.get("shipping_method", "standard") in ['express', 'overnight', '速達']
+
+        return {
+            "amount_cents": amount_cents,
+            "intent_max_cents": intent_max_cents,
+            "constraint_risk": constraint_risk,
+            "human_present": human_present,
+            "payment_method_risk": payment_method_risk,
+            "count_24h": count_24h,
+            "has_history": has_history,
+            "recent_average": recent_average,
+            "has_cart": has_cart,
+            "po_box": po_box,
+            "express": express,
+            "elapsed": elapsed,
+            "errors": errors,
+        }
+
+    def _score_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """抽出した列から各リスク要因をベクトル化して計算（各_assess_*メソッドと同じ規則）"""
+        amount = columns["amount_cents"]
+
+        # 1. 取引金額リスク
+        amount_risk = np.select(
+            [
+                amount >= self.SUSPICIOUS_VALUE_THRESHOLD,
+                amount >= self.EXTREME_VALUE_THRESHOLD,
+                amount >= self.VERY_HIGH_VALUE_THRESHOLD,
+                amount >= self.HIGH_VALUE_THRESHOLD,
+                amount >= self.MODERATE_VALUE_THRESHOLD,
+                amount >= 5000 * 100,
+            ],
+            [60, 45, 35, 25, 10, 5],
+            default=0
+        )
+        intent_max = columns["intent_max_cents"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(intent_max > 0, amount / np.where(intent_max > 0, intent_max, 1), 0.0)
+        amount_risk = amount_risk + np.select([ratio >= 0.95, ratio >= 0.80], [10, 5], default=0)
+        amount_risk = np.minimum(amount_risk, 80)
+
+        # 6. 取引パターンリスク
+        count_24h = columns["count_24h"]
+        recent_average = columns["recent_average"]
+        pattern_risk = np.select([count_24h >= 5, count_24h >= 3], [30, 15], default=0)
+        pattern_risk = pattern_risk + np.where((recent_average > 0) & (amount > recent_average * 3), 15, 0)
+        pattern_risk = np.where(columns["has_history"], np.minimum(pattern_risk, 30), 15)
+
+        # 7. 配送先リスク
+        shipping_risk = np.where(
+            columns["has_cart"],
+            np.minimum(15 * columns["po_box"] + 5 * columns["express"], 20),
+            0
+        )
+
+        # 8. 時間的リスク（経過時間が不明な場合は0）
+        elapsed = columns["elapsed"]
+        known = ~np.isnan(elapsed)
+        safe_elapsed = np.where(known, elapsed, 0.0)
+        temporal_risk = np.where(
+            known,
+            np.select([safe_elapsed < 5, safe_elapsed < 30, safe_elapsed > 3600], [15, 10, 5], default=0),
+            0
+        )
+
+        n = len(amount)
+        return {
+            "amount_risk": amount_risk,
+            "constraint_risk": columns["constraint_risk"],
+            "agent_risk": np.full(n, self._assess_agent_involvement(True)),
+            "transaction_type_risk": np.where(columns["human_present"], 5, 15),
+            "payment_method_risk": columns["payment_method_risk"],
+            "pattern_risk": pattern_risk,
+            "shipping_risk": shipping_risk,
+            "temporal_risk": temporal_risk,
+        }
+
+    def _extract_payer_and_amount(self, payment_mandate: Dict) -> Tuple[str, str]:
+        """AP2完全準拠: PaymentResponseから支払者ID、payment_details_totalから金額（文字列）を取得"""
+        payment_mandate_contents = payment_mandate.get("payment_mandate_contents", {})
+        payer_id = payment_mandate_contents.get("payment_response", {}).get("payer_id", "unknown")
+        payment_details_total = payment_mandate_contents.get("payment_details_total", {})
+        amount_value = str(payment_details_total.get("amount", {}).get("value", "0"))
+        return payer_id, amount_value
+
+    @staticmethod
+    def _extract_currency(payment_mandate: Dict) -> str:
+        payment_details_total = payment_mandate.get("payment_mandate_contents", {}).get("payment_details_total", {})
+        return payment_details_total.get("amount", {}).get("currency", "JPY")
+
+    @staticmethod
+    def _parse_amount_cents(amount_value_str: str) -> int:
+        """金額文字列をcent単位の整数に変換（_assess_amount_riskと同じ規則、不正値は0）"""
+        try:
+            if "." in amount_value_str:
+                return int(float(amount_value_str) * 100)
+            return int(amount_value_str) * 100
+        except (ValueError, TypeError):
+            return 0
+
+    def _evaluate(
+        self,
+        payment_mandate: Dict,
+        cart_mandate: Optional[Dict],
+        intent_mandate: Optional[Dict],
+        session: Optional[Dict],
+        pattern_features: PayerRiskFeatures
+    ) -> RiskAssessmentResult:
+        """取得済みの取引パターン特徴量を使ってリスクを評価"""
         risk_factors = {}
         fraud_indicators = []
 
@@ -133,17 +516,9 @@ class RiskAssessmentEngine:
         if payment_method_risk > 20:
             fraud_indicators.append("payment_method_risk")
 
-        # 6. 取引パターンリスク
-        # AP2完全準拠: PaymentResponseから支払者情報を取得
-        payment_mandate_contents = payment_mandate.get("payment_mandate_contents", {})
-        payment_response = payment_mandate_contents.get("payment_response", {})
-        payer_id = payment_response.get("payer_id", "unknown")
-
-        # 金額を取得（既に_assess_amount_riskで計算済みだが、再取得）
-        payment_details_total = payment_mandate_contents.get("payment_details_total", {})
-        amount_value = str(payment_details_total.get("amount", {}).get("value", "0"))
-
-        pattern_risk = self._assess_transaction_pattern(payer_id, amount_value)
+        # 6. 取引パターンリスク（特徴量ストアから取得した集計を使用）
+        _, amount_value = self._extract_payer_and_amount(payment_mandate)
+        pattern_risk = self._assess_transaction_pattern(pattern_features, amount_value)
         risk_factors["pattern_risk"] = pattern_risk
         if pattern_risk > 30:
             fraud_indicators.append("unusual_transaction_pattern")
@@ -177,9 +552,6 @@ class RiskAssessmentEngine:
         # 推奨アクションを決定
         recommendation = self._get_recommendation(total_risk_score)
 
-        # 取引履歴に記録
-        self._record_transaction(payer_id, amount_value, total_risk_score)
-
         logger.info(
             f"[RiskAssessmentEngine] Assessment completed: "
             f"risk_score={total_risk_score}, recommendation={recommendation}, "
@@ -470,79 +842,30 @@ class RiskAssessmentEngine:
 
         return min(risk, 25)
 
-    def _assess_transaction_pattern(self, payer_id: str, amount_value_str: str) -> int:
+    def _assess_transaction_pattern(self, features: PayerRiskFeatures, amount_value_str: str) -> int:
         """
-        取引パターンのリスクを評価（データベースまたはインメモリ）
+        取引パターンのリスクを評価（特徴量ストアの集計を使用）
 
         Returns:
             0-30のリスクスコア
         """
-        import asyncio
-
-        # 非同期処理が必要な場合はイベントループを取得
-        # ただし、このメソッドは同期メソッドなので、非同期処理を避ける
-        # そのため、データベースモードでも同期的に動作させる必要がある
-
         risk = 0
 
-        # データベースモードまたはインメモリモードで履歴を取得
-        if self.db_manager:
-            # データベースから取引履歴を取得（同期的に）
-            # 注意: ここは本来非同期メソッドだが、既存のインターフェースを維持するため
-            # データベースアクセスはskip（次のリファクタリングで対応）
-            # 一旦インメモリフォールバック
-            logger.debug("[RiskAssessmentEngine] Database mode enabled but sync context - using fallback")
-            history = self.transaction_history.get(payer_id, [])
-        else:
-            # インメモリモード
-            history = self.transaction_history.get(payer_id, [])
-
-        if not history:
+        if not features.has_history:
             # 初回取引（新規ユーザー）
+            return 15
+
+        # 過去24時間の取引数をチェック
+        if features.count_24h >= 5:
+            # 24時間以内に5回以上の取引（カードテスティングの可能性）
+            risk += 30
+        elif features.count_24h >= 3:
+            risk += 15
+
+        # 金額の急激な変化（過去5件の取引金額の平均の3倍以上は異常パターン）
+        current_amount = self._parse_amount_cents(amount_value_str)
+        if features.recent_average and current_amount > features.recent_average * 3:
             risk += 15
-        else:
-            # 過去24時間の取引数をチェック
-            now = datetime.now()
-            recent_transactions = [
-                t for t in history
-                if (now - datetime.fromisoformat(t['timestamp'])).total_seconds() < 86400
-            ]
-
-            if len(recent_transactions) >= 5:
-                # 24時間以内に5回以上の取引（カードテスティングの可能性）
-                risk += 30
-            elif len(recent_transactions) >= 3:
-                risk += 15
-
-            # 金額の急激な変化
-            if history:
-                try:
-                    # 値を整数に変換
-                    if "." in amount_value_str:
-                        current_amount = int(float(amount_value_str) * 100)
-                    else:
-                        current_amount = int(amount_value_str)
-
-                    # 過去5件の取引金額の平均を計算
-                    recent_amounts = []
-                    for t in history[-5:]:
-                        amount_str = t.get('amount', '0')
-                        try:
-                            if "." in amount_str:
-                                val = int(float(amount_str) * 100)
-                            else:
-                                val = int(amount_str)
-                            recent_amounts.append(val)
-                        except (ValueError, TypeError):
-                            continue
-
-                    if recent_amounts:
-                        avg_amount = sum(recent_amounts) / len(recent_amounts)
-                        if current_amount > avg_amount * 3:
-                            # 平均の3倍以上（異常パターン）
-                            risk += 15
-                except (ValueError, TypeError):
-                    logger.warning("[RiskAssessmentEngine] Failed to parse amount for pattern check")
 
         return min(risk, 30)
 
@@ -580,32 +903,37 @@ class RiskAssessmentEngine:
         Returns:
             0-15のリスクスコア
         """
-        if not intent_created_at or not payment_created_at:
+        time_diff = self._elapsed_seconds(intent_created_at, payment_created_at)
+        if np.isnan(time_diff):
             return 0
 
-        try:
-            intent_time = datetime.fromisoformat(intent_created_at.replace('Z', '+00:00'))
-            payment_time = datetime.fromisoformat(payment_created_at.replace('Z', '+00:00'))
-
-            time_diff = (payment_time - intent_time).total_seconds()
+        # 5秒未満（あまりにも速い、ボットの可能性）
+        if time_diff < 5:
+            return 15
 
-            # 5秒未満（あまりにも速い、ボットの可能性）
-            if time_diff < 5:
-                return 15
+        # 30秒未満（非常に速い）
+        elif time_diff < 30:
+            return 10
 
-            # 30秒未満（非常に速い）
-            elif time_diff < 30:
-                return 10
+        # 1時間以上（放置されていた可能性）
+        elif time_diff > 3600:
+            return 5
 
-            # 1時間以上（放置されていた可能性）
-            elif time_diff > 3600:
-                return 5
+        return 0
 
-            return 0
+    @staticmethod
+    def _elapsed_seconds(intent_created_at: Optional[str], payment_created_at: Optional[str]) -> float:
+        """Intent作成から決済までの経過秒数（不明・パース失敗時はNaN）"""
+        if not intent_created_at or not payment_created_at:
+            return float("nan")
 
+        try:
+            intent_time = datetime.fromisoformat(intent_created_at.replace('Z', '+00:00'))
+            payment_time = datetime.fromisoformat(payment_created_at.replace('Z', '+00:00'))
+            return (payment_time - intent_time).total_seconds()
         except Exception as e:
             logger.warning(f"[RiskAssessmentEngine] Failed to assess temporal risk: {e}")
-            return 0
+            return float("nan")
 
     def _calculate_total_risk_score(self, risk_factors: Dict[str, int]) -> int:
         """
@@ -614,17 +942,7 @@ class RiskAssessmentEngine:
         Returns:
             0-100のリスクスコア
         """
-        # 各要因の重み
-        weights = {
-            "amount_risk": 2.5,
-            "constraint_risk": 2.0,
-            "agent_risk": 0.5,
-            "transaction_type_risk": 1.0,
-            "payment_method_risk": 1.2,
-            "pattern_risk": 1.3,
-            "shipping_risk": 0.8,
-            "temporal_risk": 0.7
-        }
+        weights = self.weights
 
         weighted_sum = 0
         total_weight = 0
@@ -657,31 +975,8 @@ class RiskAssessmentEngine:
             return "decline"
 
     def _record_transaction(self, payer_id: str, amount_value_str: str, risk_score: int):
-        """
-        取引を履歴に記録（データベースまたはインメモリ）
-
-        注意: このメソッドは同期メソッドですが、将来的に非同期化する必要があります。
-        現時点では、データベース保存は別途非同期コンテキストで行う必要があります。
-        """
-        # インメモリ履歴に記録（後方互換性）
-        if payer_id not in self.transaction_history:
-            self.transaction_history[payer_id] = []
-
-        self.transaction_history[payer_id].append({
-            "timestamp": datetime.now().isoformat(),
-            "amount": amount_value_str,
-            "risk_score": risk_score
-        })
-
-        # 古い履歴を削除（30日以上前）
-        cutoff = datetime.now() - timedelta(days=30)
-        self.transaction_history[payer_id] = [
-            t for t in self.transaction_history[payer_id]
-            if datetime.fromisoformat(t['timestamp']) > cutoff
-        ]
-
-        # データベースモードの場合、呼び出し元で非同期保存を行う必要がある
-        # （このメソッドは同期メソッドのため、ここでは保存しない）
+        """取引をプロセス内ストアに記録（30日より古い取引は記録時に破棄）"""
+        self.memory_store.record(payer_id, self._parse_amount_cents(amount_value_str), risk_score)
         logger.debug(f"[RiskAssessmentEngine] Transaction recorded: payer_id={payer_id}, risk_score={risk_score}")
 
     async def record_transaction_to_db(self, payer_id: str, amount_value_str: str, risk_score: int, currency: str = "JPY"):
@@ -694,27 +989,16 @@ class RiskAssessmentEngine:
             risk_score: リスクスコア
             currency: 通貨（デフォルト: JPY）
         """
-        if not self.db_manager:
+        if not self.feature_store:
             logger.warning("[RiskAssessmentEngine] Database manager not configured, skipping DB save")
             return
 
         try:
             # 金額をcent単位の整数に変換
-            if "." in amount_value_str:
-                amount_cents = int(float(amount_value_str) * 100)
-            else:
-                amount_cents = int(amount_value_str)
-
-            # データベースに保存
-            from common.database import TransactionHistoryCRUD
+            amount_cents = self._parse_amount_cents(amount_value_str)
 
-            async with self.db_manager.get_session() as session:
-                await TransactionHistoryCRUD.create(session, {
-                    "payer_id": payer_id,
-                    "amount_value": amount_cents,
-                    "currency": currency,
-                    "risk_score": risk_score
-                })
+            # 取引履歴と特徴量集計を保存
+            await self.feature_store.record(payer_id, amount_cents, risk_score, currency=currency)
 
             logger.info(f"[RiskAssessmentEngine] Transaction history saved to database: payer_id={payer_id}, amount_cents={amount_cents}, risk_score={risk_score}")
 
@@ -0,0 +1,236 @@
+"""
+v2/common/risk_feature_store.py
+
+リスク評価用の取引パターン特徴量ストア
+
+支払者ごとのローリングウィンドウ（24時間件数・直近5件平均・30日履歴）を
+インクリメンタルな集計として保持し、NumPyで特徴量を計算する。
+
+- InMemoryRiskFeatureStore: プロセス内ストア（DB未設定時のフォールバック、同期API）
+- DatabaseRiskFeatureStore: payer_risk_bucketsテーブルを使う非同期ストア（レプリカ間で共有）
+"""
+
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DAY_SECONDS = 86400
+HISTORY_DAYS = 30
+RECENT_TRANSACTION_COUNT = 5
+
+
+@dataclass
+class PayerRiskFeatures:
+    """支払者の取引パターン特徴量"""
+    count_24h: int = 0
+    count_30d: int = 0
+    recent_average: Optional[float] = None  # 直近N件の平均金額（cents）
+
+    @property
+    def has_history(self) -> bool:
+        return self.count_30d > 0
+
+
+def compute_payer_features(
+    timestamps: Sequence[float],
+    counts: Sequence[float],
+    amount_sums: Sequence[float],
+    now: Optional[float] = None,
+    recent_n: int = RECENT_TRANSACTION_COUNT
+) -> PayerRiskFeatures:
+    """
+    集計バケット（または個別取引）から1支払者分の特徴量を計算
+
+    Args:
+        timestamps: バケット開始時刻（epoch秒）。個別取引の場合は取引時刻
+        counts: バケット内の取引件数（個別取引の場合は1）
+        amount_sums: バケット内の金額合計（cents）
+        now: 基準時刻（epoch秒、省略時は現在時刻）
+        recent_n: 直近平均に使う取引件数
+
+    Returns:
+        PayerRiskFeatures: 特徴量
+    """
+    groups = np.zeros(len(timestamps), dtype=np.int64)
+    return compute_grouped_features(groups, timestamps, counts, amount_sums, 1, now=now, recent_n=recent_n)[0]
+
+
+def compute_grouped_features(
+    groups: Sequence[int],
+    timestamps: Sequence[float],
+    counts: Sequence[float],
+    amount_sums: Sequence[float],
+    n_groups: int,
+    now: Union[float, Sequence[float], None] = None,
+    recent_n: int = RECENT_TRANSACTION_COUNT
+) -> List[PayerRiskFeatures]:
+    """
+    複数グループ（支払者）の特徴量を一括計算
+
+    Args:
+        groups: 各行のグループ番号（0 <= group < n_groups）
+        timestamps / counts / amount_sums: compute_payer_featuresと同じ
+        n_groups: グループ数
+        now: 基準時刻（スカラーまたはグループごとの配列、省略時は現在時刻）
+        recent_n: 直近平均に使う取引件数
+
+    Returns:
+        List[PayerRiskFeatures]: グループ番号順の特徴量
+
+    直近平均は新しいバケットから順にrecent_n件に達するまで取引を取り込む。
+    バケット内に複数の取引がある場合はバケットの平均金額で按分する。
+    """
+    now = time.time() if now is None else now
+    g = np.asarray(groups, dtype=np.int64)
+    ts = np.asarray(timestamps, dtype=np.float64)
+    n = np.asarray(counts, dtype=np.float64)
+    sums = np.asarray(amount_sums, dtype=np.float64)
+    now_rows = np.asarray(now, dtype=np.float64)
+    if now_rows.ndim:
+        now_rows = now_rows[g]
+
+    in_window = ts > now_rows - HISTORY_DAYS * DAY_SECONDS
+    recent = ts > now_rows - DAY_SECONDS
+    count_30d = np.bincount(g[in_window], weights=n[in_window], minlength=n_groups)
+    count_24h = np.bincount(g[in_window & recent], weights=n[in_window & recent], minlength=n_groups)
+
+    # グループ内で新しい順に並べ、累積件数がrecent_nに達するまでの取り込み件数を計算
+    g, ts, n, sums = g[in_window], ts[in_window], n[in_window], sums[in_window]
+    order = np.lexsort((-ts, g))
+    g, n, sums = g[order], n[order], sums[order]
+    before = np.cumsum(n) - n
+    if g.size:
+        starts = np.r_[0, np.flatnonzero(np.diff(g)) + 1]
+        before -= np.repeat(before[starts], np.diff(np.r_[starts, g.size]))
+    taken = np.clip(recent_n - before, 0.0, n)
+    means = sums / np.where(n > 0, n, 1.0)
+    taken_total = np.bincount(g, weights=taken, minlength=n_groups)
+    taken_amount = np.bincount(g, weights=taken * means, minlength=n_groups)
+
+    return [
+        PayerRiskFeatures(
+            count_24h=int(count_24h[i]),
+            count_30d=int(count_30d[i]),
+            recent_average=float(taken_amount[i] / taken_total[i]) if taken_total[i] > 0 else None
+        )
+        for i in range(n_groups)
+    ]
+
+
+class InMemoryRiskFeatureStore:
+    """
+    プロセス内の特徴量ストア
+
+    支払者ごとに(epoch秒, 金額cents, リスクスコア)のdequeを保持し、
+    30日より古い取引は記録時に先頭から取り除く。
+    支払者数はmax_payersでLRU的に制限する。
+    """
+
+    def __init__(self, max_payers: int = 10000, max_transactions_per_payer: int = 1000):
+        self.max_payers = max_payers
+        self.max_transactions_per_payer = max_transactions_per_payer
+        self.history: "OrderedDict[str, Deque[Tuple[float, int, int]]]" = OrderedDict()
+
+    def record(self, payer_id: str, amount_cents: int, risk_score: int, timestamp: Optional[float] = None):
+        """取引を記録"""
+        timestamp = time.time() if timestamp is None else timestamp
+        transactions = self.history.get(payer_id)
+        if transactions is None:
+            transactions = deque(maxlen=self.max_transactions_per_payer)
+            self.history[payer_id] = transactions
+        self.history.move_to_end(payer_id)
+        transactions.append((timestamp, amount_cents, risk_score))
+
+        cutoff = timestamp - HISTORY_DAYS * DAY_SECONDS
+        while transactions and transactions[0][0] <= cutoff:
+            transactions.popleft()
+
+        while len(self.history) > self.max_payers:
+            self.history.popitem(last=False)
+
+    def get_features(self, payer_id: str, now: Optional[float] = None) -> PayerRiskFeatures:
+        """特徴量を取得"""
+        return self.get_features_batch([payer_id], now=now)[0]
+
+    def get_features_batch(
+        self,
+        payer_ids: Sequence[str],
+        now: Union[float, Sequence[float], None] = None
+    ) -> List[PayerRiskFeatures]:
+        """
+        複数支払者の特徴量を一括計算（入力順、重複可）
+
+        Args:
+            payer_ids: 支払者IDリスト
+            now: 基準時刻（スカラーまたはpayer_idsと同じ長さの配列）
+        """
+        groups: List[int] = []
+        timestamps: List[float] = []
+        amounts: List[int] = []
+        for i, payer_id in enumerate(payer_ids):
+            for timestamp, amount, _ in self.history.get(payer_id, ()):
+                groups.append(i)
+                timestamps.append(timestamp)
+                amounts.append(amount)
+        return compute_grouped_features(
+            groups, timestamps, np.ones(len(timestamps)), amounts, len(payer_ids), now=now
+        )
+
+    def get_features_many(self, payer_ids: Sequence[str], now: Optional[float] = None) -> Dict[str, PayerRiskFeatures]:
+        """複数支払者の特徴量を取得"""
+        unique_ids = list(dict.fromkeys(payer_ids))
+        return dict(zip(unique_ids, self.get_features_batch(unique_ids, now=now)))
+
+
+class DatabaseRiskFeatureStore:
+    """
+    データベースの集計テーブル（payer_risk_buckets）を使う非同期特徴量ストア
+
+    記録はTransactionHistoryCRUD.create経由で行い、取引履歴と集計を同時に更新する。
+    特徴量は複数支払者分を1クエリで取得する。
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    async def record(self, payer_id: str, amount_cents: int, risk_score: int, currency: str = "JPY"):
+        """取引履歴と集計を記録"""
+        from common.database import TransactionHistoryCRUD
+
+        async with self.db_manager.get_session() as session:
+            await TransactionHistoryCRUD.create(session, {
+                "payer_id": payer_id,
+                "amount_value": amount_cents,
+                "currency": currency,
+                "risk_score": risk_score
+            })
+
+    async def get_features_many(
+        self,
+        payer_ids: Sequence[str],
+        now: Optional[float] = None
+    ) -> Dict[str, PayerRiskFeatures]:
+        """複数支払者の特徴量を1クエリで取得"""
+        from common.database import TransactionHistoryCRUD
+
+        unique_ids: List[str] = list(dict.fromkeys(payer_ids))
+        async with self.db_manager.get_session() as session:
+            buckets = await TransactionHistoryCRUD.get_risk_buckets(session, unique_ids, days=HISTORY_DAYS)
+
+        index = {payer_id: i for i, payer_id in enumerate(unique_ids)}
+        features = compute_grouped_features(
+            [index[bucket.payer_id] for bucket in buckets],
+            [bucket.bucket_start for bucket in buckets],
+            [bucket.tx_count for bucket in buckets],
+            [bucket.amount_sum for bucket in buckets],
+            len(unique_ids),
+            now=now
+        )
+        return dict(zip(unique_ids, features))
+
+    async def get_features(self, payer_id: str, now: Optional[float] = None) -> PayerRiskFeatures:
+        """特徴量を取得"""
+        return (await self.get_features_many([payer_id], now=now))[payer_id]
@@ -0,0 +1,285 @@
+"""
+v2/common/sse_session.py
+
+SSEセッション層（共通モジュール）
+
+- 実行（run）単位のイベントログ: 連番のイベントID（"<run_id>:<seq>"）を付けて有界リングバッファに保持
+- 実行はレスポンスから切り離したタスクで動き、接続中の購読者（再接続したクライアントを含む）に配信する
+- Last-Event-IDで続きから再開する（グラフ・LLMを再実行しない）
+- バックプレッシャー: 接続中の購読者がバッファ容量分遅れている間は生産側を待たせる
+  （送信が詰まったクライアントはEventSourceResponseのsend_timeoutで切断され、購読者から外れる）
+- 購読者がいない間は、最後に切断した購読者の配信済み位置からバッファ容量分までで生産を止める
+  （猶予時間内の再接続が押し出されたイベントで失敗しない）
+- 購読者が全員切断し、猶予時間内に再接続がなければ実行をキャンセルする
+- 所有者ごとの実行中の実行数に上限を設ける（接続してすぐ切断を繰り返しても実行が増え続けない）
+- 完了した実行のログは保持期間の間だけ残す（完了直後の再接続に備える）
+- ハートビートはEventSourceResponseのping（コメント行）で送る
+
+イベントログ・実行タスクはプロセス内に置く（実行のキャンセルがプロセス内でしか行えないため、
+複数レプリカではセッションアフィニティを前提とする）。
+
+使用例:
+    run = sse_sessions.start(event_generator(), owner=user_id)
+    return EventSourceResponse(sse_sessions.stream(run), ping=SSE_HEARTBEAT_SECONDS,
+                               send_timeout=SSE_SEND_TIMEOUT_SECONDS)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+SSE_BUFFER_SIZE = int(os.getenv("SSE_BUFFER_SIZE", "256"))
+SSE_CANCEL_GRACE_SECONDS = float(os.getenv("SSE_CANCEL_GRACE_SECONDS", "15"))
+SSE_RETENTION_SECONDS = float(os.getenv("SSE_RETENTION_SECONDS", "120"))
+SSE_MAX_RUNS = int(os.getenv("SSE_MAX_RUNS", "1000"))
+SSE_MAX_RUNS_PER_OWNER = int(os.getenv("SSE_MAX_RUNS_PER_OWNER", "2"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_SEND_TIMEOUT_SECONDS = float(os.getenv("SSE_SEND_TIMEOUT_SECONDS", "30"))
+
+SSE_RUNS = metrics.gauge("ap2_sse_runs", "SSE実行数", ("state",))
+SSE_EVENTS = metrics.counter(
+    "ap2_sse_session_events_total", "SSEセッション層のイベント（再開・キャンセル・欠落・上限超過）", ("event",)
+)
+
+
+class StreamGapError(Exception):
+    """再開位置より後のイベントが既にリングバッファから押し出されている"""
+
+
+class TooManyRunsError(Exception):
+    """所有者の実行中の実行数が上限に達している"""
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """イベントID（"<run_id>:<seq>"）を (run_id, seq) に分解（不正な形式はNone）"""
+    if not event_id:
+        return None
+    run_id, _, seq = event_id.strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        return None
+    return run_id, int(seq)
+
+
+class SSERun:
+    """
+    1回の実行（1リクエスト分のイベント列）のログと購読者
+
+    イベントは (seq, data) としてリングバッファに保持する。seqは1から始まる連番。
+    """
+
+    def __init__(self, run_id: str, owner: Optional[str] = None, buffer_size: int = SSE_BUFFER_SIZE,
+                 cancel_grace_seconds: float = SSE_CANCEL_GRACE_SECONDS):
+        self.run_id = run_id
+        self.owner = owner
+        self.cancel_grace_seconds = cancel_grace_seconds
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=buffer_size)
+        self.last_seq = 0
+        self.done = False
+        self.cancelled = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # 購読者ごとの配信済みseq
+        self._cursors: Dict[int, int] = {}
+        # 購読者がいない間の生産の基準（最後に切断した購読者の配信済みseq、購読前は0）
+        self._detached_cursor = 0
+        self._next_subscriber = 0
+        self._changed = asyncio.Event()
+        self._cancel_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._cursors)
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.run_id}:{seq}"
+
+    def _notify(self) -> None:
+        """待機中の生産側・購読者を起こす（ロック不要で呼べるよう、Eventを差し替える）"""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait_until(self, predicate: Callable[[], bool]) -> None:
+        while not predicate():
+            await self._changed.wait()
+
+    def _has_capacity(self) -> bool:
+        # 接続中で最も遅れている購読者（いなければ最後に切断した購読者）がまだ受け取っていないイベントを押し出さない
+        slowest = min(self._cursors.values(), default=self._detached_cursor)
+        return self.last_seq - slowest < self.events.maxlen
+
+    async def publish(self, data: str) -> None:
+        """イベントを追加（接続中の購読者がバッファ容量分遅れている場合は待つ）"""
+        await self._wait_until(self._has_capacity)
+        self.last_seq += 1
+        self.events.append((self.last_seq, data))
+        self._notify()
+
+    async def run(self, producer: AsyncIterator[str]) -> None:
+        """生産側（JSON文字列の非同期イテレーター）を最後まで実行してログに流す"""
+        try:
+            async for data in producer:
+                await self.publish(data)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            SSE_EVENTS.labels(event="cancelled").inc()
+            logger.info(f"[SSESession] Run {self.run_id} cancelled (no subscribers)")
+        except Exception as e:
+            logger.error(f"[SSESession] Run {self.run_id} failed: {e}", exc_info=True)
+        finally:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._notify()
+
+    def _schedule_cancel(self) -> None:
+        if self.done or self.task is None:
+            return
+        self._cancel_timer = asyncio.get_running_loop().call_later(self.cancel_grace_seconds, self._cancel_if_abandoned)
+
+    def _cancel_if_abandoned(self) -> None:
+        self._cancel_timer = None
+        if not self._cursors and not self.done and self.task is not None:
+            self.task.cancel()
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncIterator[Tuple[int, str]]:
+        """
+        after_seqより後のイベントを順に返し、実行の完了まで追従する
+
+        Raises:
+            StreamGapError: after_seqの次のイベントが既にバッファにない
+        """
+        oldest = self.events[0][0] if self.events else self.last_seq + 1
+        if after_seq + 1 < oldest:
+            raise StreamGapError(f"Events after {self.event_id(after_seq)} are no longer buffered")
+
+        subscriber = self._next_subscriber
+        self._next_subscriber += 1
+        self._cursors[subscriber] = min(after_seq, self.last_seq)
+        if self._cancel_timer is not None:
+            self._cancel_timer.cancel()
+            self._cancel_timer = None
+
+        try:
+            while True:
+                await self._wait_until(lambda: self._cursors[subscriber] < self.last_seq or self.done)
+                cursor = self._cursors[subscriber]
+                pending = [(seq, data) for seq, data in self.events if seq > cursor]
+                for seq, data in pending:
+                    yield seq, data
+                    self._cursors[subscriber] = seq
+                    self._notify()
+                if self.done and self._cursors[subscriber] >= self.last_seq:
+                    return
+        finally:
+            cursor = self._cursors.pop(subscriber)
+            if not self._cursors:
+                self._detached_cursor = cursor
+                self._schedule_cancel()
+            self._notify()
+
+
+class SSESessionManager:
+    """
+    実行ごとのSSEイベントログを管理
+
+    Args:
+        buffer_size: 実行ごとのリングバッファの容量（イベント数）
+        cancel_grace_seconds: 購読者が全員切断してから実行をキャンセルするまでの猶予
+        retention_seconds: 完了した実行のログを再接続用に残す時間
+        max_runs: 保持する実行数の上限（超過時は完了済みの古い実行から破棄）
+        max_runs_per_owner: 所有者ごとの実行中の実行数の上限（0で無制限）
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = SSE_BUFFER_SIZE,
+        cancel_grace_seconds: float = SSE_CANCEL_GRACE_SECONDS,
+        retention_seconds: float = SSE_RETENTION_SECONDS,
+        max_runs: int = SSE_MAX_RUNS,
+        max_runs_per_owner: int = SSE_MAX_RUNS_PER_OWNER
+    ):
+        self.buffer_size = buffer_size
+        self.cancel_grace_seconds = cancel_grace_seconds
+        self.retention_seconds = retention_seconds
+        self.max_runs = max_runs
+        self.max_runs_per_owner = max_runs_per_owner
+        self._runs: "OrderedDict[str, SSERun]" = OrderedDict()
+
+    def export_metrics(self) -> None:
+        """実行数を/metricsに出力（プロセスで1つのマネージャーのみ登録する）"""
+        SSE_RUNS.labels(state="running").set_function(lambda: sum(not r.done for r in self._runs.values()))
+        SSE_RUNS.labels(state="buffered").set_function(lambda: sum(r.done for r in self._runs.values()))
+
+    def running(self, owner: Optional[str]) -> int:
+        """所有者の実行中の実行数"""
+        return sum(1 for run in self._runs.values() if run.owner == owner and not run.done)
+
+    def start(self, producer: AsyncIterator[str], owner: Optional[str] = None) -> SSERun:
+        """
+        生産側をバックグラウンドタスクとして開始し、実行を返す
+
+        Raises:
+            TooManyRunsError: 所有者の実行中の実行数が上限に達している
+        """
+        self._prune()
+        if self.max_runs_per_owner and self.running(owner) >= self.max_runs_per_owner:
+            SSE_EVENTS.labels(event="rejected").inc()
+            raise TooManyRunsError(f"Too many concurrent runs for owner {owner}")
+        run = SSERun(uuid.uuid4().hex[:16], owner, self.buffer_size, self.cancel_grace_seconds)
+        run.task = asyncio.create_task(run.run(producer))
+        self._runs[run.run_id] = run
+        # 最初の購読者が来ないまま猶予時間が過ぎた場合もキャンセル
+        run._schedule_cancel()
+        return run
+
+    def get(self, run_id: str) -> Optional[SSERun]:
+        return self._runs.get(run_id)
+
+    def resume(self, last_event_id: Optional[str], owner: Optional[str] = None) -> Optional[Tuple[SSERun, int]]:
+        """Last-Event-IDから (実行, 配信済みseq) を取得（未知の実行・所有者の不一致はNone）"""
+        parsed = parse_event_id(last_event_id)
+        if parsed is None:
+            return None
+        run = self._runs.get(parsed[0])
+        if run is None or run.owner != owner:
+            return None
+        return run, parsed[1]
+
+    async def stream(self, run: SSERun, after_seq: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """EventSourceResponse用のイベント（id・data）を返す"""
+        if after_seq:
+            SSE_EVENTS.labels(event="resumed").inc()
+        try:
+            async for seq, data in run.subscribe(after_seq):
+                yield {"id": run.event_id(seq), "data": data}
+        except StreamGapError as e:
+            SSE_EVENTS.labels(event="gap").inc()
+            logger.warning(f"[SSESession] {e}")
+            yield {"data": json.dumps({"type": "error", "error": "ストリームの再開に失敗しました。もう一度お試しください。"})}
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for run_id, run in list(self._runs.items()):
+            if run.done and not run.subscribers and now - run.finished_at > self.retention_seconds:
+                del self._runs[run_id]
+        for run_id, run in list(self._runs.items()):
+            if len(self._runs) < self.max_runs:
+                break
+            if run.done and not run.subscribers:
+                del self._runs[run_id]
+
+    async def aclose(self) -> None:
+        """実行中のタスクをすべてキャンセル（シャットダウン時）"""
+        tasks = [run.task for run in self._runs.values() if run.task is not None and not run.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runs.clear()
@@ -7,20 +7,21 @@ A2A通信の分散トレーシングを実現するため、
 FastAPIとhttpxクライアントにOpenTelemetryを統合
 
 参考: https://zenn.dev/kimitsu/articles/otel-and-a2a
+
+SDK・OTLPエクスポーター（grpc）・FastAPI計装はimportが重いため、
+OTEL_ENABLED=trueでセットアップされるまでimportしない（起動時間の短縮）。
 """
 
 import os
 import logging
 import json
-from typing import Optional, Set
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
 
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.sdk.resources import Resource, SERVICE_NAME
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import TracerProvider
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,11 @@ SENSITIVE_KEYS: Set[str] = {
 # リクエスト/レスポンスボディの最大サイズ（バイト）
 MAX_BODY_SIZE = 10000  # 10KB
 
+# ボディ記録のヘッドサンプリング率（0.0〜1.0）とルート別のルール
+# 例: OTEL_BODY_CAPTURE_RULES="/a2a/message=1.0,/chat/stream=0,/products*=0.1"
+BODY_CAPTURE_RATE = float(os.getenv("OTEL_BODY_CAPTURE_RATE", "1.0"))
+BODY_CAPTURE_RULES = os.getenv("OTEL_BODY_CAPTURE_RULES", "")
+
 
 def is_telemetry_enabled() -> bool:
     """
@@ -46,7 +52,7 @@ def is_telemetry_enabled() -> bool:
     return otel_enabled in ("true", "1", "yes")
 
 
-def setup_telemetry(service_name: Optional[str] = None) -> Optional[TracerProvider]:
+def setup_telemetry(service_name: Optional[str] = None) -> Optional["TracerProvider"]:
     """
     OpenTelemetry分散トレーシングのセットアップ
 
@@ -68,6 +74,11 @@ def setup_telemetry(service_name: Optional[str] = None) -> Optional[TracerProvid
         return None
 
     try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
         # 既にTracerProviderが設定されているかチェック
         existing_provider = trace.get_tracer_provider()
         provider_type = type(existing_provider).__name__
@@ -197,10 +208,193 @@ def _truncate_body(body: str, max_size: int = MAX_BODY_SIZE) -> str:
     return body
 
 
+# マスク対象の値の範囲を求めるためのパターン
+_JSON_STRING_OR_BRACKET = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_JSON_SCALAR = re.compile(rb'[^\s,}\]]*')
+_JSON_WHITESPACE = b" \t\r\n"
+_REDACTED = b'"[REDACTED]"'
+
+
+def _json_string_end(body: bytes, pos: int) -> int:
+    """posより後ろで、エスケープされていない最初の `"` の位置"""
+    end = body.find(b'"', pos)
+    while end > 0:
+        backslashes = 0
+        while body[end - 1 - backslashes] == 0x5C:  # \
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end
+        end = body.find(b'"', end + 1)
+    return end
+
+
+def _skip_json_whitespace(body: bytes, pos: int) -> int:
+    while pos < len(body) and body[pos] in _JSON_WHITESPACE:
+        pos += 1
+    return pos
+
+
+class JsonBodyMasker:
+    """
+    JSONボディをバイト列のまま機密情報をマスクする
+
+    json.loads → 再帰マスク → json.dumps の3パスの代わりに、
+    - json.loadsは検証のみ（Cの1パス、結果のオブジェクトは使わない）
+    - 小文字化したボディから機密キーワードの出現位置をbytes.findで検索し、
+      キー名の中の出現（閉じ `"` の後が `:`）であればその値の範囲を"[REDACTED]"に置き換える
+    - それ以外の範囲は元のバイト列（memoryview）をそのまま連結する（コピーは最後のjoinの1回のみ）
+    機密キーワードを含まないボディはそのまま返す。
+
+    キーの判定は_mask_sensitive_dataと同じ（SENSITIVE_KEYSを含むキー名、大文字小文字を区別しない）。
+    妥当なJSONでは文字列の外にキーワードは現れないため、出現位置は必ずキーか値の文字列の中にある。
+    値がオブジェクト・配列の場合は全体をマスクする。
+    """
+
+    def __init__(self, sensitive_keys: Iterable[str] = SENSITIVE_KEYS):
+        keywords = {key.lower().encode("utf-8") for key in sensitive_keys}
+        # 他のキーワードを含むキーワード（access_token ⊃ token）は検索しても結果が変わらないため除く
+        self.keywords: Tuple[bytes, ...] = tuple(sorted(
+            keyword for keyword in keywords
+            if not any(other != keyword and other in keyword for other in keywords)
+        ))
+
+    def _find_keywords(self, lowered: bytes) -> List[int]:
+        positions = []
+        for keyword in self.keywords:
+            pos = lowered.find(keyword)
+            while pos >= 0:
+                positions.append(pos)
+                pos = lowered.find(keyword, pos + len(keyword))
+        positions.sort()
+        return positions
+
+    @staticmethod
+    def _value_end(body: bytes, start: int) -> int:
+        """startから始まるJSONの値の終端位置"""
+        char = body[start]
+        if char == 0x22:  # "
+            return _json_string_end(body, start + 1) + 1
+        if char in (0x7B, 0x5B):  # { [
+            depth = 0
+            for match in _JSON_STRING_OR_BRACKET.finditer(body, start):
+                token = body[match.start()]
+                if token in (0x7B, 0x5B):
+                    depth += 1
+                elif token in (0x7D, 0x5D):
+                    depth -= 1
+                    if depth == 0:
+                        return match.end()
+        return _JSON_SCALAR.match(body, start).end()
+
+    def mask(self, body: bytes) -> Optional[bytes]:
+        """
+        JSONボディをマスク
+
+        Args:
+            body: JSONのバイト列
+
+        Returns:
+            マスクされたバイト列（整形は元のまま）。JSONとして不正な場合はNone
+        """
+        try:
+            json.loads(body)
+        except (ValueError, RecursionError):
+            return None
+
+        positions = self._find_keywords(body.lower())
+        if not positions:
+            return body
+
+        view = memoryview(body)
+        chunks: List[memoryview] = []
+        last = 0
+        for pos in positions:
+            if pos < last:
+                # マスク済みの値、または処理済みのキーの中
+                continue
+            colon = _skip_json_whitespace(body, _json_string_end(body, pos) + 1)
+            if colon >= len(body) or body[colon] != 0x3A:  # :
+                # 値の文字列の中の出現
+                continue
+            value_start = _skip_json_whitespace(body, colon + 1)
+            chunks.append(view[last:value_start])
+            chunks.append(memoryview(_REDACTED))
+            last = self._value_end(body, value_start)
+        chunks.append(view[last:])
+        return b"".join(chunks)
+
+
+class BodyCaptureSampler:
+    """
+    ボディ記録のヘッドサンプリング
+
+    トレースIDから決定的に判定するため、同じトレースに属するサービス間で
+    記録する/しないが揃う。ルールはパスの完全一致、または末尾"*"による前方一致。
+    """
+
+    def __init__(self, rate: float = 1.0, rules: str = ""):
+        self.rate = rate
+        self.exact_rules: Dict[str, float] = {}
+        # 前方一致ルールは長いプレフィックスを優先
+        self.prefix_rules: List[Tuple[str, float]] = []
+        for rule in filter(None, (part.strip() for part in rules.split(","))):
+            path, _, value = rule.partition("=")
+            try:
+                rule_rate = float(value)
+            except ValueError:
+                logger.warning(f"[Telemetry] Invalid body capture rule ignored: {rule}")
+                continue
+            path = path.strip()
+            if path.endswith("*"):
+                self.prefix_rules.append((path[:-1], rule_rate))
+            else:
+                self.exact_rules[path] = rule_rate
+        self.prefix_rules.sort(key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for(self, path: str) -> float:
+        """パスに適用されるサンプリング率"""
+        if not self.exact_rules and not self.prefix_rules:
+            return self.rate
+        if path in self.exact_rules:
+            return self.exact_rules[path]
+        for prefix, rule_rate in self.prefix_rules:
+            if path.startswith(prefix):
+                return rule_rate
+        return self.rate
+
+    def should_capture(self, span_context, path: str) -> bool:
+        """スパン（サンプリング済みであること）とパスからボディを記録するか判定"""
+        if not span_context.trace_flags.sampled:
+            return False
+        rate = self.rate_for(path)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        # トレースIDの下位64ビットで判定（TraceIdRatioBasedと同じ方式）
+        return (span_context.trace_id & 0xFFFFFFFFFFFFFFFF) < int(rate * (1 << 64))
+
+
+_body_masker = JsonBodyMasker(SENSITIVE_KEYS)
+_body_sampler = BodyCaptureSampler(BODY_CAPTURE_RATE, BODY_CAPTURE_RULES)
+
+
+def _masked_body_attribute(body: bytes) -> Optional[str]:
+    """ボディをマスク・切り詰めてスパン属性の値にする（不正なJSONの場合はNone）"""
+    masked = _body_masker.mask(body)
+    if masked is None:
+        return None
+    return _truncate_body(masked.decode("utf-8", errors="replace"))
+
+
 async def _add_request_response_to_span(request, call_next):
     """
     リクエスト/レスポンスをスパンに追加するミドルウェア
 
+    ボディの記録はヘッドサンプリングする（OTEL_BODY_CAPTURE_RATE / OTEL_BODY_CAPTURE_RULES）。
+    スパンがサンプリングされていない場合はボディを読み取らない。
+    リクエストボディはStarletteがキャッシュして後段に渡すため、receiveの差し替えは不要。
+
     Args:
         request: FastAPI Request
         call_next: 次のミドルウェア/ハンドラー
@@ -208,7 +402,6 @@ async def _add_request_response_to_span(request, call_next):
     Returns:
         Response
     """
-    from fastapi import Request
     import time
 
     # 現在のスパンを取得
@@ -217,29 +410,22 @@ async def _add_request_response_to_span(request, call_next):
         # スパンがない場合はそのまま次に進む
         return await call_next(request)
 
+    capture_body = _body_sampler.should_capture(span.get_span_context(), request.url.path)
+
     try:
         # リクエストボディを読み取り（JSONのみ）
-        if request.method in ["POST", "PUT", "PATCH"]:
+        if capture_body and request.method in ["POST", "PUT", "PATCH"]:
             content_type = request.headers.get("content-type", "")
             if "application/json" in content_type:
                 try:
                     body_bytes = await request.body()
                     if body_bytes:
-                        body_str = body_bytes.decode("utf-8")
-                        body_str = _truncate_body(body_str)
-
-                        # JSONパース
-                        body_json = json.loads(body_str)
-                        # 機密情報をマスク
-                        masked_body = _mask_sensitive_data(body_json)
-
-                        # スパン属性に追加
-                        span.set_attribute("http.request.body", json.dumps(masked_body, ensure_ascii=False))
-
-                        # リクエストボディを再構築（次のミドルウェアで使用可能にする）
-                        async def receive():
-                            return {"type": "http.request", "body": body_bytes}
-                        request._receive = receive
+                        # 機密情報をマスクしてスパン属性に追加
+                        masked_body = _masked_body_attribute(body_bytes)
+                        if masked_body is None:
+                            span.set_attribute("http.request.body.error", "Invalid JSON body")
+                        else:
+                            span.set_attribute("http.request.body", masked_body)
                 except Exception as e:
                     logger.debug(f"[Telemetry] Failed to read request body: {e}")
                     span.set_attribute("http.request.body.error", str(e))
@@ -253,23 +439,17 @@ async def _add_request_response_to_span(request, call_next):
         span.set_attribute("http.response.duration_ms", int(duration * 1000))
 
         # レスポンスボディを読み取り（JSONのみ、StreamingResponseは除外）
-        if hasattr(response, "body"):
+        if capture_body and hasattr(response, "body"):
             content_type = response.headers.get("content-type", "")
             if "application/json" in content_type:
                 try:
-                    # レスポンスボディを読み取り
                     body_bytes = response.body
                     if body_bytes:
-                        body_str = body_bytes.decode("utf-8")
-                        body_str = _truncate_body(body_str)
-
-                        # JSONパース
-                        body_json = json.loads(body_str)
-                        # 機密情報をマスク
-                        masked_body = _mask_sensitive_data(body_json)
-
-                        # スパン属性に追加
-                        span.set_attribute("http.response.body", json.dumps(masked_body, ensure_ascii=False))
+                        masked_body = _masked_body_attribute(body_bytes)
+                        if masked_body is None:
+                            span.set_attribute("http.response.body.error", "Invalid JSON body")
+                        else:
+                            span.set_attribute("http.response.body", masked_body)
                 except Exception as e:
                     logger.debug(f"[Telemetry] Failed to read response body: {e}")
                     span.set_attribute("http.response.body.error", str(e))
@@ -309,6 +489,7 @@ def instrument_fastapi_app(app):
             return
 
         # FastAPIアプリを計装
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
         FastAPIInstrumentor.instrument_app(app)
 
         # リクエスト/レスポンスボディを記録するミドルウェアを追加
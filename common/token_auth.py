@@ -0,0 +1,36 @@
+"""
+v2/common/token_auth.py
+
+共有トークンによるエンドポイント保護（管理者エンドポイント・サービス間通知）
+
+- 期待値は環境変数から取得し、未設定の場合は常に拒否する（誤って無防備に公開しない）
+- 比較は定数時間（hmac.compare_digest）
+
+使用例:
+    @app.post("/admin/...")
+    async def admin_endpoint(x_admin_token: Optional[str] = Header(None)):
+        require_token("NETWORK_ADMIN_TOKEN", x_admin_token)
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def require_token(env_name: str, token: Optional[str], detail: str = "Admin token required"):
+    """
+    リクエストのトークンが環境変数env_nameの値と一致するか検証
+
+    Args:
+        env_name: 期待するトークンを保持する環境変数名
+        token: リクエストヘッダーのトークン
+        detail: 拒否時のエラーメッセージ
+
+    Raises:
+        HTTPException: 403（環境変数が未設定、トークンがない、または一致しない場合）
+    """
+    expected = os.getenv(env_name, "")
+    if not expected or not token or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail=detail)
@@ -28,8 +28,6 @@ import jwt
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.backends import default_backend
-from fido2.webauthn import AuthenticatorData
-from fido2.cose import CoseKey
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +17,10 @@ import type { A2UIComponent } from "@/lib/types/a2ui";
 import { applyDataModelOperation } from "@/lib/a2ui/jsonPointer";
 import { buildUserAction, serializeUserAction } from "@/lib/a2ui/userAction";
 
+// 接続が切れた場合の再接続（Last-Event-IDでサーバー側の実行の続きから受信）
+const MAX_RESUME_ATTEMPTS = 3;
+const RESUME_BACKOFF_MS = 500;
+
 /**
  * A2UI v0.9 Surface State
  * Represents a managed UI surface with components and data model
@@ -89,29 +93,50 @@ export function useSSEChat() {
       // AP2準拠: JWTをAuthorizationヘッダーに追加
       const authHeaders = getAuthHeaders();
 
-      const response = await fetch(`${shoppingAgentUrl}/chat/stream`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          ...authHeaders,  // JWT Authorization header
-        },
-        body: JSON.stringify({
-          user_input: userInput,
-          session_id: sessionIdRef.current,  // セッションIDを含める
-        }),
-        signal: abortController.signal,
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+      // 最後に受信したイベントID（"<run_id>:<seq>"）
+      let lastEventId: string | null = null;
+      let pendingEventId: string | null = null;
+      let streamFinished = false; // done・errorイベントを受信済み
+      let resumeAttempts = 0;
+
+      const openStream = async () => {
+        const response = await fetch(`${shoppingAgentUrl}/chat/stream`, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            ...authHeaders,  // JWT Authorization header
+            // 再接続時はフローを再実行せず、続きのイベントだけを受け取る
+            ...(lastEventId ? { "Last-Event-ID": lastEventId } : {}),
+          },
+          body: JSON.stringify({
+            user_input: userInput,
+            session_id: sessionIdRef.current,  // セッションIDを含める
+          }),
+          signal: abortController.signal,
+        });
 
-      const reader = response.body?.getReader();
-      const decoder = new TextDecoder();
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
 
-      if (!reader) {
-        throw new Error("Response body is null");
-      }
+        const streamReader = response.body?.getReader();
+        if (!streamReader) {
+          throw new Error("Response body is null");
+        }
+        return streamReader;
+      };
+
+      // 途中で切断された場合、イベントIDを受信済みなら再接続する
+      const canResume = () => !streamFinished && lastEventId !== null && resumeAttempts < MAX_RESUME_ATTEMPTS;
+      const resumeStream = async () => {
+        resumeAttempts += 1;
+        console.log("[useSSEChat] Resuming stream", { lastEventId, attempt: resumeAttempts });
+        await new Promise((resolve) => setTimeout(resolve, RESUME_BACKOFF_MS * resumeAttempts));
+        return openStream();
+      };
+
+      let reader = await openStream();
+      let decoder = new TextDecoder();
 
       let buffer = "";
       let agentMessageContent = "";
@@ -124,16 +149,39 @@ export function useSSEChat() {
       let isTyping = false; // テキストをタイプ中かどうか
 
       while (true) {
-        const { done, value } = await reader.read();
-
-        if (done) break;
+        let chunk: ReadableStreamReadResult<Uint8Array>;
+        try {
+          chunk = await reader.read();
+        } catch (error: any) {
+          if (error.name === "AbortError" || !canResume()) throw error;
+          chunk = { done: true, value: undefined };
+        }
+        const { done, value } = chunk;
+
+        if (done) {
+          if (!canResume()) break;
+          // 受信途中の行は捨て、最後に受信したイベントの次から受け取り直す
+          reader = await resumeStream();
+          decoder = new TextDecoder();
+          buffer = "";
+          pendingEventId = null;
+          continue;
+        }
 
         buffer += decoder.decode(value, { stream: true });
         const lines = buffer.split("\n");
         buffer = lines.pop() || "";
 
         for (const line of lines) {
+          if (line.startsWith("id: ")) {
+            pendingEventId = line.slice(4).trim();
+            continue;
+          }
           if (line.startsWith("data: ")) {
+            if (pendingEventId) {
+              lastEventId = pendingEventId;
+              pendingEventId = null;
+            }
             let data = line.slice(6).trim();
 
             if (!data) continue;
@@ -538,6 +586,7 @@ export function useSSEChat() {
 
                   setCurrentAgentMessage("");
                   setIsStreaming(false);
+                  streamFinished = true;
                   break;
 
                 case "error":
@@ -551,6 +600,7 @@ export function useSSEChat() {
                   setMessages((prev) => [...prev, errorMessage]);
                   setCurrentAgentMessage("");
                   setIsStreaming(false);
+                  streamFinished = true;
                   break;
               }
             } catch (e) {
@@ -0,0 +1,175 @@
+"""
+v2/scripts/bench_key_agent.py
+
+鍵エージェント（common/key_agent.py）の署名スループットベンチマーク（signs/sec）
+
+- 一時ディレクトリに暗号化鍵を作成し、鍵エージェントを別プロセスで起動
+- 指定したクライアントスレッド数で署名リクエストを送り、スループット・レイテンシ（p50/p99）を出力
+- 比較用に、プロセス内の秘密鍵で直接署名した場合のスループットと、
+  サービス起動時の鍵の準備時間（復号 vs 鍵エージェントへのattach）も出力
+
+使用例:
+    python scripts/bench_key_agent.py --signatures 20000 --clients 8
+    python scripts/bench_key_agent.py --algorithm ED25519 --json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from common.crypto import KeyManager
+from common.key_agent import KEY_AGENT_SOCKET_NAME, KeyAgentClient, KeyAgentError
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+KEY_ID = "bench_agent"
+PASSPHRASE = "bench-passphrase"
+
+
+def create_keys(keys_directory: str):
+    key_manager = KeyManager(keys_directory=keys_directory)
+    ecdsa_key, _ = key_manager.generate_key_pair(KEY_ID)
+    ed25519_key, _ = key_manager.generate_ed25519_key_pair(KEY_ID)
+    key_manager.save_private_key_encrypted(KEY_ID, ecdsa_key, PASSPHRASE)
+    key_manager.save_private_key_encrypted(f"{KEY_ID}_ed25519", ed25519_key, PASSPHRASE)
+
+
+def start_agent(socket_dir: str, keys_directory: str) -> subprocess.Popen:
+    """鍵エージェントを別プロセスで起動し、応答するまで待機"""
+    env = {
+        **os.environ,
+        f"AP2_{KEY_ID.upper()}_PASSPHRASE": PASSPHRASE,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.getenv("PYTHONPATH")])),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "common.key_agent", "--socket-dir", socket_dir,
+         "--keys", KEY_ID, "--keys-directory", keys_directory],
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    client = KeyAgentClient(os.path.join(socket_dir, KEY_ID, KEY_AGENT_SOCKET_NAME), timeout=1)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client.ping()
+            client.close()
+            return process
+        except KeyAgentError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("Key agent failed to start")
+            time.sleep(0.05)
+
+
+def sign_locally(private_key, algorithm: str, payload: bytes):
+    if algorithm == "ECDSA":
+        return private_key.sign(payload, ec.ECDSA(hashes.SHA256()))
+    return private_key.sign(payload)
+
+
+def run_clients(client: KeyAgentClient, algorithm: str, payload: bytes, signatures: int, clients: int) -> dict:
+    """クライアントスレッドから署名を実行し、スループットとレイテンシを計測"""
+    per_client = signatures // clients
+    latencies = [[] for _ in range(clients)]
+
+    def worker(index: int):
+        for _ in range(per_client):
+            started = time.perf_counter()
+            client.sign(KEY_ID, algorithm, payload)
+            latencies[index].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = sorted(latency for values in latencies for latency in values)
+    return {
+        "signatures": len(samples),
+        "elapsed_seconds": round(elapsed, 3),
+        "signs_per_second": round(len(samples) / elapsed, 1),
+        "latency_p50_ms": round(statistics.median(samples) * 1000, 3),
+        "latency_p99_ms": round(samples[int(len(samples) * 0.99) - 1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Key agent signing throughput benchmark")
+    parser.add_argument("--signatures", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8, help="クライアントスレッド数")
+    parser.add_argument("--algorithm", choices=["ECDSA", "ED25519"], default="ECDSA")
+    parser.add_argument("--payload-size", type=int, default=256, help="署名対象データのバイト数")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="ka_bench_", dir="/tmp")
+    keys_directory = os.path.join(work_dir, "keys")
+    socket_dir = os.path.join(work_dir, "agent")
+    socket_path = os.path.join(socket_dir, KEY_ID, KEY_AGENT_SOCKET_NAME)
+    payload = os.urandom(args.payload_size)
+    create_keys(keys_directory)
+    process = start_agent(socket_dir, keys_directory)
+    try:
+        # サービス起動時の鍵の準備（復号 vs 鍵エージェントへのattach）
+        started = time.perf_counter()
+        local_manager = KeyManager(keys_directory=keys_directory)
+        for algorithm in ("ECDSA", "ED25519"):
+            local_manager.load_private_key_encrypted(KEY_ID, PASSPHRASE, algorithm=algorithm)
+        decrypt_ms = (time.perf_counter() - started) * 1000
+
+        client = KeyAgentClient(socket_path)
+        started = time.perf_counter()
+        client.attach(KeyManager(keys_directory=os.path.join(work_dir, "service_keys")), KEY_ID)
+        attach_ms = (time.perf_counter() - started) * 1000
+
+        # プロセス内で直接署名した場合（比較用、1スレッド）
+        private_key = local_manager.get_private_key(KEY_ID, algorithm=args.algorithm)
+        count = min(args.signatures, 5000)
+        started = time.perf_counter()
+        for _ in range(count):
+            sign_locally(private_key, args.algorithm, payload)
+        local_per_second = count / (time.perf_counter() - started)
+
+        result = {
+            "algorithm": args.algorithm,
+            "clients": args.clients,
+            "payload_size": args.payload_size,
+            **run_clients(client, args.algorithm, payload, args.signatures, args.clients),
+            "in_process_signs_per_second": round(local_per_second, 1),
+            "startup_decrypt_ms": round(decrypt_ms, 2),
+            "startup_attach_ms": round(attach_ms, 2),
+        }
+        client.close()
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    print(f"鍵エージェント署名（{result['algorithm']}, {result['clients']} clients, {result['payload_size']} bytes）")
+    print(f"  スループット: {result['signs_per_second']:.0f} signs/sec ({result['signatures']}件, {result['elapsed_seconds']}s)")
+    print(f"  レイテンシ: p50 {result['latency_p50_ms']}ms / p99 {result['latency_p99_ms']}ms")
+    print(f"  プロセス内署名（比較）: {result['in_process_signs_per_second']:.0f} signs/sec")
+    print(f"  起動時の鍵準備: 復号 {result['startup_decrypt_ms']}ms / 鍵エージェント {result['startup_attach_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+v2/scripts/bench_logging.py
+
+ペイロードログ（common/logger.py）のマイクロベンチマーク
+
+- A2Aメッセージ（マンデート相当のペイロード）とHTTPレスポンスのログ出力1回あたりの呼び出し側の時間を計測
+- LoggingAsyncClient（httpx.MockTransport）の1リクエストあたりの時間も計測（レスポンスのパースの有無）
+- 比較対象:
+    legacy: 呼び出し時にJSONシリアライズする従来の実装（同期ハンドラー）
+    lazy:   LazyPayloadで出力時に整形する実装（同期ハンドラー）
+    async:  LazyPayload + AsyncLogHandler（整形・I/OはQueueListenerのスレッド）
+- INFO（ペイロードログ無効）とDEBUG（ペイロードログ有効）のそれぞれで計測
+- asyncはキューが空になるまでの時間（drain）も出力
+
+使用例:
+    python scripts/bench_logging.py
+    python scripts/bench_logging.py --iterations 20000 --items 50 --json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+
+from common.logger import (
+    AsyncLogHandler,
+    LoggingAsyncClient,
+    SensitiveDataFilter,
+    StructuredFormatter,
+    log_a2a_message,
+    log_http_request,
+    log_http_response,
+    stop_log_listener,
+)
+
+
+def legacy_log_a2a_message(logger, direction, message_type, payload, peer=None, headers=None):
+    """従来の実装（呼び出し時にf-stringとjson.dumpsで整形）"""
+    peer_str = f" to/from {peer}" if peer else ""
+    logger.info(f"A2A Message {direction}{peer_str}: {message_type}")
+    if logger.isEnabledFor(logging.DEBUG):
+        a2a_data = {
+            "type": "A2A_MESSAGE",
+            "direction": direction,
+            "message_type": message_type,
+            "peer": peer,
+            "headers": headers or {},
+            "payload": payload
+        }
+        logger.debug(f"A2A_MESSAGE_RAW: {json.dumps(a2a_data, ensure_ascii=False, default=str)}")
+
+
+def legacy_log_http_response(logger, status_code, headers=None, body=None, duration_ms=None):
+    """従来の実装（呼び出し時にf-stringとjson.dumpsで整形）"""
+    duration_str = f" ({duration_ms:.2f}ms)" if duration_ms else ""
+    logger.info(f"HTTP Response: {status_code}{duration_str}")
+    if logger.isEnabledFor(logging.DEBUG):
+        response_data = {
+            "type": "HTTP_RESPONSE",
+            "status_code": status_code,
+            "headers": headers or {},
+            "body": body,
+            "duration_ms": duration_ms
+        }
+        logger.debug(f"HTTP_RESPONSE_RAW: {json.dumps(response_data, ensure_ascii=False, default=str)}")
+
+
+class LegacyLoggingAsyncClient(LoggingAsyncClient):
+    """従来の実装（ログレベルに関わらずレスポンスを読み込み・パースする）"""
+
+    async def request(self, method: str, url: str, **kwargs):
+        start_time = time.time()
+        legacy_body = kwargs.get("json", kwargs.get("data"))
+        log_http_request(self.logger, method, str(url), headers=kwargs.get("headers", {}), body=legacy_body)
+        response = await self._client.request(method, url, **kwargs)
+        await response.aread()
+        duration_ms = (time.time() - start_time) * 1000
+        try:
+            response_body = response.json()
+        except Exception:
+            response_body = response.text
+        legacy_log_http_response(
+            self.logger, response.status_code, headers=dict(response.headers),
+            body=response_body, duration_ms=duration_ms
+        )
+        return response
+
+
+def build_payload(items: int) -> dict:
+    """CartMandate相当のペイロード"""
+    return {
+        "id": "cart_" + "0" * 24,
+        "merchant_id": "did:ap2:merchant:mugibo_merchant",
+        "items": [
+            {
+                "sku": f"SKU-{i:05d}",
+                "name": f"むぎぼーグッズ {i}",
+                "quantity": 1 + i % 3,
+                "price": {"value": 1980 + i, "currency": "JPY"},
+                "metadata": {"category": "goods", "tags": ["limited", "sale"]},
+            }
+            for i in range(items)
+        ],
+        "total": {"value": 99000, "currency": "JPY"},
+        "merchant_authorization": "eyJ" + "a" * 400,
+    }
+
+
+def make_logger(name: str, level: int, stream, mode: str) -> logging.Logger:
+    logger = logging.getLogger(f"bench_logging.{name}")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    handler = logging.StreamHandler(stream)
+    handler.setLevel(level)
+    handler.setFormatter(StructuredFormatter(json_format=False))
+    handler.addFilter(SensitiveDataFilter())
+    logger.addHandler(AsyncLogHandler(handler) if mode == "async" else handler)
+    return logger
+
+
+def run(mode: str, level: int, payload: dict, iterations: int, stream) -> dict:
+    logger = make_logger(f"{mode}.{level}", level, stream, mode)
+    log_a2a = legacy_log_a2a_message if mode == "legacy" else log_a2a_message
+    log_response = legacy_log_http_response if mode == "legacy" else log_http_response
+    headers = {"message_id": "msg_1", "sender": "did:ap2:agent:shopping_agent", "nonce": "n" * 32}
+    response_headers = {"content-type": "application/json", "content-length": "5120"}
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        log_a2a(logger, "sent", "ap2.mandates.CartMandate", payload, peer="merchant_agent", headers=headers)
+        log_response(logger, 200, headers=response_headers, body=payload, duration_ms=12.5)
+    caller_seconds = time.perf_counter() - started
+
+    drain_seconds = 0.0
+    if mode == "async":
+        drain_started = time.perf_counter()
+        stop_log_listener()
+        drain_seconds = time.perf_counter() - drain_started
+
+    return {
+        "mode": mode,
+        "level": logging.getLevelName(level),
+        "caller_us_per_call": round(caller_seconds / (iterations * 2) * 1e6, 2),
+        "drain_ms": round(drain_seconds * 1000, 1),
+    }
+
+
+async def run_client(mode: str, level: int, payload: dict, iterations: int, stream) -> dict:
+    logger = make_logger(f"client.{mode}.{level}", level, stream, mode)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, content=body, headers={"content-type": "application/json"})
+    )
+    client_class = LegacyLoggingAsyncClient if mode == "legacy" else LoggingAsyncClient
+    client = client_class(logger, transport=transport)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await client.post("http://merchant_agent:8001/a2a/message", json={"type": "ping"})
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    if mode == "async":
+        stop_log_listener()
+
+    return {
+        "mode": mode,
+        "level": logging.getLevelName(level),
+        "client_us_per_request": round(elapsed / iterations * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lazy/async payload logging micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=5000, help="ログ出力の回数（A2A・HTTPレスポンスの組）")
+    parser.add_argument("--items", type=int, default=20, help="ペイロードの商品数")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    args = parser.parse_args()
+
+    payload = build_payload(args.items)
+    results = []
+    client_results = []
+    fd, path = tempfile.mkstemp(prefix="bench_logging_", suffix=".log")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as stream:
+            for level in (logging.INFO, logging.DEBUG):
+                for mode in ("legacy", "lazy", "async"):
+                    results.append(run(mode, level, payload, args.iterations, stream))
+                    client_results.append(asyncio.run(
+                        run_client(mode, level, payload, max(args.iterations // 5, 1), stream)
+                    ))
+    finally:
+        os.remove(path)
+
+    if args.json:
+        print(json.dumps({"logging": results, "client": client_results}, ensure_ascii=False, indent=2))
+        return
+
+    print(f"ペイロード: {len(json.dumps(payload, ensure_ascii=False))} bytes, {args.iterations * 2} calls")
+    for result in results:
+        drain = f"  (drain {result['drain_ms']}ms)" if result["mode"] == "async" else ""
+        print(f"  {result['level']:<6} {result['mode']:<7} {result['caller_us_per_call']:>8.2f} us/call{drain}")
+    print("LoggingAsyncClient（MockTransport）")
+    for result in client_results:
+        print(f"  {result['level']:<6} {result['mode']:<7} {result['client_us_per_request']:>8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
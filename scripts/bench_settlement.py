@@ -0,0 +1,118 @@
+"""
+v2/scripts/bench_settlement.py
+
+清算台帳の追記スループットベンチマーク（charges/sec）
+
+- 指定した同時実行数で /network/charge と同じ台帳追記（record_authorization）を実行
+- グループコミット（既定）と1件ずつコミットする場合を比較可能
+- 最後に清算バッチをクローズし、バッチ数・クローズ時間を出力
+
+使用例:
+    python scripts/bench_settlement.py --charges 20000 --concurrency 200
+    python scripts/bench_settlement.py --charges 2000 --no-group-commit --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from services.payment_network.settlement import SettlementFileWriter, SettlementLedger
+
+
+async def run(args) -> dict:
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_settlement_")
+    database_url = f"sqlite+aiosqlite:///{os.path.join(work_dir, 'payment_network.db')}"
+    ledger = SettlementLedger(database_url, flush_interval=args.flush_interval, max_batch_size=args.max_batch_size)
+    await ledger.init_db()
+    if not args.no_group_commit:
+        await ledger.start()
+
+    merchants = [f"merchant_{i:03d}" for i in range(args.merchants)]
+    currencies = ["JPY", "USD"]
+    latencies = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.charges):
+        queue.put_nowait(i)
+
+    async def client():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            await ledger.record_authorization(
+                {
+                    "network_transaction_id": f"net_txn_{uuid.uuid4().hex[:12]}",
+                    "transaction_id": f"txn_{i}",
+                    "authorization_code": f"AUTH{i:06d}",
+                    "amount": {"value": str(random.randint(100, 100000)), "currency": random.choice(currencies)},
+                    "merchant_id": random.choice(merchants),
+                    "payer_id": f"user_{i % 1000}",
+                    "payment_mandate_id": f"payment_{i}"
+                },
+                capture=True
+            )
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    append_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batches = await ledger.close_batches(SettlementFileWriter(os.path.join(work_dir, "settlement")), "BenchNetwork")
+    close_seconds = time.perf_counter() - started
+    await ledger.dispose()
+
+    latencies.sort()
+    return {
+        "charges": args.charges,
+        "concurrency": args.concurrency,
+        "group_commit": not args.no_group_commit,
+        "append_seconds": round(append_seconds, 3),
+        "charges_per_second": round(args.charges / append_seconds, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+            "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        },
+        "batches": len(batches),
+        "close_seconds": round(close_seconds, 3),
+        "work_dir": work_dir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark settlement ledger append throughput")
+    parser.add_argument("--charges", type=int, default=10000, help="記録する取引数")
+    parser.add_argument("--concurrency", type=int, default=100, help="同時実行数")
+    parser.add_argument("--merchants", type=int, default=20, help="加盟店数（バッチのグループ数）")
+    parser.add_argument("--flush-interval", type=float, default=0.002, help="グループコミットの待機秒数")
+    parser.add_argument("--max-batch-size", type=int, default=500, help="1コミットの最大件数")
+    parser.add_argument("--no-group-commit", action="store_true", help="1件ずつコミット（比較用）")
+    parser.add_argument("--work-dir", default=None, help="DB・バッチファイルの出力先（省略時は一時ディレクトリ）")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    mode = "group commit" if result["group_commit"] else "per-charge commit"
+    print(f"{result['charges']} charges, concurrency={result['concurrency']} ({mode})")
+    print(f"  throughput: {result['charges_per_second']} charges/s ({result['append_seconds']}s)")
+    latency = result["latency_ms"]
+    print(f"  latency: mean={latency['mean']}ms p50={latency['p50']}ms p99={latency['p99']}ms")
+    print(f"  batch close: {result['batches']} batches in {result['close_seconds']}s")
+    print(f"  output: {result['work_dir']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+v2/scripts/bench_startup.py
+
+サービス起動時間（import時間）の回帰ベンチマーク
+
+- 各サービスのモジュールを `python -X importtime -c "import <module>"` で別プロセスとしてimport
+- importtimeの出力から対象モジュールの累積import時間を取得し、実行回数の中央値をサービスごとの予算と比較
+- 累積時間の大きいモジュールを表示（どのimportが遅いかの調査用）
+- 予算超過のサービスがあれば終了コード1（CIでの回帰検知用）
+
+BaseAgent系サービスはmain.pyが鍵の読み込みを伴うため、エージェントクラスのモジュールを計測する。
+MCPサーバーはmain.pyでアプリを構築するため、main.pyを計測する。
+
+使用例:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --services merchant_agent_mcp shopping_agent_mcp --runs 5 --json
+    python scripts/bench_startup.py --budget-scale 1.5   # 遅いCIマシン向けに予算を緩和
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# サービス名 → (計測するモジュール, 予算ミリ秒)
+# 予算は開発用コンテナでの計測値（-X importtimeのオーバーヘッド込み）に2〜3割の余裕を持たせた値。
+# fastapi・sqlalchemyだけで約800msかかるため、それ以外の依存はimport時に読み込まない前提の予算になっている
+SERVICE_MODULES: Dict[str, Tuple[str, int]] = {
+    "shopping_agent": ("services.shopping_agent.agent", 2000),
+    "merchant_agent": ("services.merchant_agent.agent", 1800),
+    "merchant": ("services.merchant.service", 1700),
+    "credential_provider": ("services.credential_provider.provider", 1700),
+    "payment_processor": ("services.payment_processor.processor", 1700),
+    "payment_network": ("services.payment_network.network", 1300),
+    "merchant_agent_mcp": ("services.merchant_agent_mcp.main", 1300),
+    "shopping_agent_mcp": ("services.shopping_agent_mcp.main", 1400),
+}
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """
+    -X importtimeの出力をパース
+
+    Returns:
+        [(モジュール名, 自身のimport時間μs, 累積import時間μs, ネストの深さ), ...]
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # ヘッダー行（self [us] | cumulative | imported package）
+            continue
+        # モジュール名のインデント（2スペース/階層）がimportのネストの深さ
+        name = fields[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return entries
+
+
+def measure_import(module: str) -> Tuple[int, List[Tuple[str, int, int, int]]]:
+    """別プロセスでモジュールをimportし、累積import時間（μs）とimporttimeの全エントリを返す"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.getenv("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"import {module} failed: {errors[-1] if errors else result.returncode}")
+    for name, _, cumulative, _ in entries:
+        if name == module:
+            return cumulative, entries
+    raise RuntimeError(f"import {module} did not appear in importtime output")
+
+
+def bench_service(service: str, runs: int, budget_scale: float, top: int) -> dict:
+    """サービス1件を複数回計測し、中央値と予算の比較結果を返す"""
+    module, budget_ms = SERVICE_MODULES[service]
+    samples_ms = []
+    entries: List[Tuple[str, int, int, int]] = []
+    for _ in range(runs):
+        cumulative_us, entries = measure_import(module)
+        samples_ms.append(cumulative_us / 1000)
+
+    # 最後の計測で累積時間の大きい直接importされたモジュール（依存ライブラリの内訳）
+    heaviest = sorted(
+        ((name, cumulative / 1000) for name, _, cumulative, depth in entries if depth == 1),
+        key=lambda item: item[1],
+        reverse=True
+    )[:top]
+    median_ms = statistics.median(samples_ms)
+    scaled_budget_ms = budget_ms * budget_scale
+    return {
+        "service": service,
+        "module": module,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(samples_ms), 1),
+        "max_ms": round(max(samples_ms), 1),
+        "budget_ms": round(scaled_budget_ms, 1),
+        "ok": median_ms <= scaled_budget_ms,
+        "heaviest": [{"module": name, "cumulative_ms": round(ms, 1)} for name, ms in heaviest]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-service import-time regression benchmark")
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICE_MODULES), default=list(SERVICE_MODULES))
+    parser.add_argument("--runs", type=int, default=3, help="サービスごとの計測回数（中央値を予算と比較）")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="予算の倍率")
+    parser.add_argument("--top", type=int, default=5, help="表示する重いモジュールの数")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    args = parser.parse_args()
+
+    results = [bench_service(service, args.runs, args.budget_scale, args.top) for service in args.services]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for result in results:
+            status = "OK  " if result["ok"] else "OVER"
+            print(
+                f"{status} {result['service']:<22} {result['median_ms']:>8.1f}ms "
+                f"(budget {result['budget_ms']:.0f}ms, min {result['min_ms']:.1f}ms, max {result['max_ms']:.1f}ms)"
+            )
+            for entry in result["heaviest"]:
+                print(f"       {entry['module']:<50} {entry['cumulative_ms']:>8.1f}ms")
+
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+v2/scripts/replay_risk.py
+
+リスク評価のオフラインリプレイスクリプト
+- DBに保存された取引履歴（transaction_history）・PaymentMandateをストリーミングで読み出し
+- RiskAssessmentEngine.assess_manyでバッチ単位に再評価
+- スコア分布・レイテンシ・スループットをレポート
+
+本番の取引履歴には書き込まない（取引パターン特徴量はリプレイ専用のインメモリストアで再構築）。
+
+使用例:
+    python scripts/replay_risk.py --database-url sqlite+aiosqlite:///./data/shopping_agent.db
+    python scripts/replay_risk.py --source mandates --weight pattern_risk=2.0 --json
+    python scripts/replay_risk.py --synthetic 1000000 --batch-size 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from common.database import DatabaseManager, Mandate, TransactionHistory
+from common.risk_assessment import RiskAssessmentEngine
+from common.risk_feature_store import InMemoryRiskFeatureStore
+
+DEFAULT_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:////app/v2/data/shopping_agent.db")
+PAYMENT_MANDATE_TYPES = ("Payment", "PaymentMandate")
+
+
+def history_to_payment_mandate(record: TransactionHistory) -> Dict[str, Any]:
+    """取引履歴レコードから評価用の最小PaymentMandateを組み立てる"""
+    return {
+        "payment_mandate_contents": {
+            "payment_details_total": {
+                "amount": {"value": f"{record.amount_value / 100:.2f}", "currency": record.currency}
+            },
+            "payment_response": {"payer_id": record.payer_id}
+        }
+    }
+
+
+async def iter_history_batches(db_manager: DatabaseManager, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """transaction_historyを時刻順にストリーミングし、バッチ単位で返す"""
+    async with db_manager.get_session() as session:
+        result = await session.stream(
+            TransactionHistory.__table__.select()
+            .order_by(TransactionHistory.timestamp)
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions(batch_size):
+            batch = []
+            for row in rows:
+                timestamp = row.timestamp or datetime.now(timezone.utc)
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+                batch.append({
+                    "payment_mandate": history_to_payment_mandate(row),
+                    "payer_id": row.payer_id,
+                    "amount_cents": row.amount_value,
+                    "timestamp": timestamp.timestamp(),
+                    "baseline_score": row.risk_score,
+                })
+            yield batch
+
+
+async def iter_mandate_batches(db_manager: DatabaseManager, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """mandatesテーブルに保存されたPaymentMandateをストリーミングし、バッチ単位で返す"""
+    async with db_manager.get_session() as session:
+        result = await session.stream(
+            Mandate.__table__.select()
+            .where(Mandate.type.in_(PAYMENT_MANDATE_TYPES))
+            .order_by(Mandate.issued_at)
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions(batch_size):
+            batch = []
+            for row in rows:
+                payload = json.loads(row.payload) if row.payload else {}
+                # ShoppingAgentのPaymentMandate形式（risk_scoreを含む場合はベースラインに使う）
+                batch.append({
+                    "payment_mandate": payload,
+                    "baseline_score": payload.get("risk_score"),
+                })
+            yield batch
+
+
+async def iter_synthetic_batches(count: int, batch_size: int, payers: int, seed: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """合成トラフィックを生成（DBなしでのスループット計測用）"""
+    rng = np.random.default_rng(seed)
+    start = time.time() - 30 * 86400
+    emitted = 0
+    while emitted < count:
+        size = min(batch_size, count - emitted)
+        amounts = np.round(rng.lognormal(mean=8.5, sigma=1.2, size=size), 2)
+        payer_ids = rng.integers(0, payers, size=size)
+        timestamps = np.sort(rng.uniform(start, time.time(), size=size))
+        human_present = rng.random(size) < 0.8
+        batch = []
+        for amount, payer, ts, present in zip(amounts.tolist(), payer_ids.tolist(), timestamps.tolist(), human_present.tolist()):
+            mandate = {
+                "payment_mandate_contents": {
+                    "payment_details_total": {"amount": {"value": f"{amount:.2f}", "currency": "JPY"}},
+                    "payment_response": {"payer_id": f"synthetic_{payer}"}
+                },
+                "user_authorization": "synthetic" if present else None
+            }
+            batch.append({
+                "payment_mandate": mandate,
+                "payer_id": f"synthetic_{payer}",
+                "amount_cents": int(amount * 100),
+                "timestamp": ts,
+                "baseline_score": None,
+            })
+        emitted += size
+        yield batch
+
+
+class ReplayReport:
+    """リプレイ結果の集計"""
+
+    def __init__(self, low_threshold: int, high_threshold: int):
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.scores: List[np.ndarray] = []
+        self.baseline_diffs: List[np.ndarray] = []
+        self.recommendations: Counter = Counter()
+        self.indicators: Counter = Counter()
+        self.batch_seconds: List[float] = []
+        self.batch_sizes: List[int] = []
+        self.errors = 0
+
+    def add_batch(self, results: List[Any], baselines: List[Optional[int]], elapsed: float):
+        scores = []
+        diffs = []
+        for result, baseline in zip(results, baselines):
+            if isinstance(result, Exception):
+                self.errors += 1
+                continue
+            scores.append(result.risk_score)
+            self.recommendations[result.recommendation] += 1
+            self.indicators.update(result.fraud_indicators)
+            if baseline is not None:
+                diffs.append(result.risk_score - baseline)
+        self.scores.append(np.asarray(scores, dtype=np.int64))
+        self.baseline_diffs.append(np.asarray(diffs, dtype=np.int64))
+        self.batch_seconds.append(elapsed)
+        self.batch_sizes.append(len(results))
+
+    def summary(self) -> Dict[str, Any]:
+        scores = np.concatenate(self.scores) if self.scores else np.zeros(0, dtype=np.int64)
+        diffs = np.concatenate(self.baseline_diffs) if self.baseline_diffs else np.zeros(0, dtype=np.int64)
+        seconds = np.asarray(self.batch_seconds, dtype=np.float64)
+        sizes = np.asarray(self.batch_sizes, dtype=np.float64)
+        total = int(sizes.sum())
+        per_item_us = seconds / np.where(sizes > 0, sizes, 1) * 1e6
+
+        summary: Dict[str, Any] = {
+            "count": total,
+            "errors": self.errors,
+            "thresholds": {"low": self.low_threshold, "high": self.high_threshold},
+            "throughput_per_sec": round(total / seconds.sum(), 1) if seconds.sum() > 0 else None,
+            "latency_us_per_mandate": self._percentiles(per_item_us),
+            "batch_latency_ms": self._percentiles(seconds * 1e3),
+            "score": self._percentiles(scores),
+            "score_histogram": {
+                f"{low}-{low + 9 if low < 90 else 100}": int(count)
+                for low, count in zip(range(0, 100, 10), np.histogram(scores, bins=10, range=(0, 100))[0])
+            },
+            "recommendations": dict(self.recommendations),
+            "fraud_indicators": dict(self.indicators.most_common()),
+        }
+        if diffs.size:
+            summary["baseline_delta"] = {
+                "compared": int(diffs.size),
+                "mean": round(float(diffs.mean()), 3),
+                "mean_abs": round(float(np.abs(diffs).mean()), 3),
+                "changed": int(np.count_nonzero(diffs)),
+            }
+        return summary
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> Dict[str, Optional[float]]:
+        if not values.size:
+            return {"mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            "mean": round(float(values.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(values.max()), 3),
+        }
+
+
+async def replay(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    engine: RiskAssessmentEngine,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    バッチを順に再評価してレポートを返す
+
+    取引パターン特徴量はバッチ開始時点のスナップショット（各取引の時刻を基準）から計算し、
+    バッチ評価後にリプレイ用ストアへ記録する。
+    """
+    store = InMemoryRiskFeatureStore(max_payers=1_000_000)
+    report = ReplayReport(engine.LOW_RISK_THRESHOLD, engine.HIGH_RISK_THRESHOLD)
+    processed = 0
+
+    async for batch in batches:
+        if limit is not None:
+            batch = batch[:max(0, limit - processed)]
+        if not batch:
+            break
+
+        started = time.perf_counter()
+        features = None
+        if all("payer_id" in item for item in batch):
+            features = store.get_features_batch(
+                [item["payer_id"] for item in batch],
+                now=[item["timestamp"] for item in batch]
+            )
+        results = engine.assess_many(
+            [item["payment_mandate"] for item in batch],
+            pattern_features=features,
+            return_exceptions=True
+        )
+        elapsed = time.perf_counter() - started
+
+        for item, result in zip(batch, results):
+            if "payer_id" in item and not isinstance(result, Exception):
+                store.record(item["payer_id"], item["amount_cents"], result.risk_score, timestamp=item["timestamp"])
+
+        report.add_batch(results, [item["baseline_score"] for item in batch], elapsed)
+        processed += len(batch)
+        if limit is not None and processed >= limit:
+            break
+
+    return report.summary()
+
+
+def parse_weights(values: List[str]) -> Dict[str, float]:
+    """--weight factor=value をdictに変換"""
+    weights = {}
+    for value in values:
+        factor, _, weight = value.partition("=")
+        if factor not in RiskAssessmentEngine.RISK_FACTOR_WEIGHTS:
+            raise argparse.ArgumentTypeError(
+                f"Unknown risk factor: {factor} (choices: {', '.join(RiskAssessmentEngine.RISK_FACTOR_WEIGHTS)})"
+            )
+        weights[factor] = float(weight)
+    return weights
+
+
+def print_summary(summary: Dict[str, Any]):
+    print("\n📊 Risk replay summary")
+    print(f"  mandates:    {summary['count']:,} (errors: {summary['errors']})")
+    print(f"  throughput:  {summary['throughput_per_sec']} mandates/sec")
+    latency = summary["latency_us_per_mandate"]
+    print(f"  latency:     p50={latency['p50']}us p95={latency['p95']}us p99={latency['p99']}us per mandate")
+    score = summary["score"]
+    print(f"  score:       mean={score['mean']} p50={score['p50']} p95={score['p95']} p99={score['p99']}")
+    print("  histogram:")
+    peak = max(summary["score_histogram"].values()) or 1
+    for bucket, count in summary["score_histogram"].items():
+        print(f"    {bucket:>6} {count:>10,} {'#' * int(40 * count / peak)}")
+    print(f"  recommendations: {summary['recommendations']}")
+    if "baseline_delta" in summary:
+        delta = summary["baseline_delta"]
+        print(
+            f"  vs stored score: compared={delta['compared']:,} mean={delta['mean']} "
+            f"mean_abs={delta['mean_abs']} changed={delta['changed']:,}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay stored payments through RiskAssessmentEngine")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--source", choices=["history", "mandates"], default="history",
+                        help="history: transaction_history, mandates: 保存済みPaymentMandate")
+    parser.add_argument("--synthetic", type=int, default=0, help="DBの代わりに合成トラフィックをN件生成")
+    parser.add_argument("--synthetic-payers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--weight", action="append", default=[], help="リスク要因の重みを上書き（例: pattern_risk=2.0）")
+    parser.add_argument("--low-threshold", type=int, default=RiskAssessmentEngine.LOW_RISK_THRESHOLD)
+    parser.add_argument("--high-threshold", type=int, default=RiskAssessmentEngine.HIGH_RISK_THRESHOLD)
+    parser.add_argument("--json", action="store_true", help="JSONでレポートを出力")
+    args = parser.parse_args()
+
+    engine = RiskAssessmentEngine(weights=parse_weights(args.weight))
+    engine.LOW_RISK_THRESHOLD = args.low_threshold
+    engine.HIGH_RISK_THRESHOLD = args.high_threshold
+
+    db_manager = None
+    if args.synthetic:
+        batches = iter_synthetic_batches(args.synthetic, args.batch_size, args.synthetic_payers, args.seed)
+    else:
+        db_manager = DatabaseManager(database_url=args.database_url)
+        iterator = iter_history_batches if args.source == "history" else iter_mandate_batches
+        batches = iterator(db_manager, args.batch_size)
+
+    try:
+        summary = await replay(batches, engine, limit=args.limit)
+    finally:
+        if db_manager:
+            await db_manager.engine.dispose()
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+v2/scripts/rerender_receipts.py
+
+領収書PDFの一括再レンダリングスクリプト
+- Payment ProcessorのDBから作成日時が指定範囲のトランザクションを取得
+- トランザクションイベント（receipt_rendered）に記録されたマンデートの参照からレンダリング入力を再構築してPDFを再生成
+- レンダリングはプロセスプールで並列実行し、領収書ストアに保存（RECEIPT_STORE_BACKEND）
+- 領収書レコードのコンテンツハッシュを更新
+- --delete-superseded: どの領収書からも参照されなくなった古いPDFを、配信側のキャッシュ（ReceiptIndexCache）の
+  TTL経過後に削除
+
+使用例:
+    python scripts/rerender_receipts.py --from 2025-10-01 --to 2025-11-01
+    python scripts/rerender_receipts.py --from 2025-10-01 --workers 4 --receipts-dir ./data/receipts --json
+    python scripts/rerender_receipts.py --from 2025-10-01 --delete-superseded
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from common.database import DatabaseManager
+from services.payment_processor.utils.receipt_renderer import ReceiptRenderer, rerender_receipts_in_range
+from services.payment_processor.utils.receipt_store import RECEIPT_INDEX_TTL_SECONDS, create_receipt_store
+
+DEFAULT_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:////app/v2/data/payment_processor.db")
+
+
+def parse_date(value: str) -> datetime:
+    """ISO 8601の日付/日時をUTCのdatetimeに変換（タイムゾーン省略時はUTC）"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-render receipt PDFs for a date range")
+    parser.add_argument("--from", dest="start", required=True, help="開始日時（含む、例: 2025-10-01）")
+    parser.add_argument("--to", dest="end", default=None, help="終了日時（含まない、省略時は現在時刻）")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--receipts-dir", default=None, help="ローカルストアの保存先（省略時はRECEIPTS_DIR）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="レンダリングプロセス数")
+    parser.add_argument("--json", action="store_true", help="JSONで結果を出力")
+    parser.add_argument(
+        "--delete-superseded", action="store_true", help="参照されなくなった古いPDFをストアから削除"
+    )
+    parser.add_argument(
+        "--gc-grace-seconds", type=float, default=RECEIPT_INDEX_TTL_SECONDS,
+        help="古いPDFを削除する前の待機時間（配信側のキャッシュが古いハッシュを参照しなくなるまで）"
+    )
+    args = parser.parse_args()
+
+    start = parse_date(args.start)
+    end = parse_date(args.end) if args.end else datetime.now(timezone.utc)
+
+    db_manager = DatabaseManager(database_url=args.database_url)
+    store = create_receipt_store(args.receipts_dir)
+    renderer = ReceiptRenderer(store, workers=args.workers)
+    started = time.perf_counter()
+    try:
+        summary = await rerender_receipts_in_range(db_manager, renderer, start, end)
+        if args.delete_superseded and summary["superseded"]:
+            await asyncio.sleep(args.gc_grace_seconds)
+            for content_hash in summary["superseded"]:
+                await store.delete(content_hash)
+    finally:
+        renderer.shutdown()
+        await db_manager.engine.dispose()
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({**summary, "elapsed_seconds": round(elapsed, 3)}, ensure_ascii=False, indent=2))
+        return
+
+    print(f"期間: {start.isoformat()} - {end.isoformat()}")
+    print(f"再レンダリング: {len(summary['rendered'])}件 ({elapsed:.2f}s)")
+    print(f"スキップ（レンダリング入力なし）: {len(summary['skipped'])}件")
+    action = "削除" if args.delete_superseded else "未削除"
+    print(f"置き換えられた古いPDF: {len(summary['superseded'])}件（{action}）")
+    for transaction_id, error in summary["failed"].items():
+        print(f"失敗: {transaction_id}: {error}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
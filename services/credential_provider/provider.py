@@ -18,13 +18,13 @@ import logging
 import httpx
 
 from fastapi import HTTPException, Query
-from fido2.webauthn import AttestationObject
 from common.base_agent import BaseAgent, AgentPassphraseManager
 from common.models import A2AMessage, AttestationVerifyRequest, AttestationVerifyResponse
 from common.database import DatabaseManager, Attestation, PasskeyCredentialCRUD, PaymentMethodCRUD, ReceiptCRUD, UserCRUD
 from common.crypto import DeviceAttestationManager, KeyManager
 from common.logger import get_logger, log_a2a_message, log_database_operation, LoggingAsyncClient
 from common.redis_client import RedisClient, TokenStore, SessionStore
+from common.idempotency import post_idempotent
 
 logger = get_logger(__name__, service_name='credential_provider')
 
@@ -59,6 +59,9 @@ class CredentialProviderService(BaseAgent):
     - トークン発行
     """
 
+    # Idempotency-Keyヘッダーで重複排除するPOSTパス（クライアント再送時の再実行を防止）
+    IDEMPOTENT_PATHS = ("/payment-methods/tokenize",)
+
     def __init__(self):
         super().__init__(
             agent_id="did:ap2:agent:credential_provider",
@@ -412,7 +415,8 @@ class CredentialProviderService(BaseAgent):
                 attestation_object_b64_std = attestation_object_b64.replace('-', '+').replace('_', '/')
                 attestation_object_bytes = base64.b64decode(attestation_object_b64_std)
 
-                # fido2ライブラリでパース
+                # fido2ライブラリでパース（importが重いため登録時に遅延import）
+                from fido2.webauthn import AttestationObject
                 attestation_obj = AttestationObject(attestation_object_bytes)
                 auth_data = attestation_obj.auth_data
 
@@ -1895,8 +1899,11 @@ class CredentialProviderService(BaseAgent):
 
             # 決済ネットワークにHTTP POSTリクエストを送信
             # AP2完全準拠: self.http_clientを使用（HTTPXLoggingEventHooksでログ記録）
-            response = await self.http_client.post(
+            # Idempotency-Key=PaymentMandate ID: 再送でAgent Tokenを二重発行しない
+            response = await post_idempotent(
+                self.http_client,
                 f"{self.payment_network_url}/network/tokenize",
+                payment_mandate["id"],
                 json={
                     "payment_mandate": payment_mandate,
                     "attestation": attestation,
@@ -20,7 +20,7 @@ from common.base_agent import BaseAgent, AgentPassphraseManager
 from common.models import A2AMessage, Signature
 from common.database import DatabaseManager, ProductCRUD, MandateCRUD
 from common.crypto import SignatureManager, KeyManager
-from common.logger import get_logger, log_a2a_message, log_crypto_operation
+from common.logger import get_logger, log_a2a_message, log_crypto_operation, LoggingAsyncClient
 
 logger = get_logger(__name__, service_name='merchant')
 
@@ -44,6 +44,9 @@ STATUS_REJECTED = "rejected"
 AP2_TYPE_CART_MANDATE = "ap2.mandates.CartMandate"
 AP2_TYPE_ERROR = "ap2.errors.Error"
 
+# HTTPクライアントのタイムアウト（秒）
+HTTP_CLIENT_TIMEOUT = 10.0
+
 # JWT有効期限
 JWT_EXPIRATION_HOURS = 1  # Merchant Authorization JWTの有効期限（時間）
 
@@ -84,6 +87,7 @@ class MerchantService(BaseAgent):
             ValidationHelpers,
             InventoryHelpers,
             JWTHelpers,
+            CatalogNotifier,
         )
 
         self.signature_helpers = SignatureHelpers()
@@ -91,6 +95,13 @@ class MerchantService(BaseAgent):
         self.inventory_helpers = InventoryHelpers(db_manager=self.db_manager)
         self.jwt_helpers = JWTHelpers(key_manager=self.key_manager)
 
+        # 商品変更時にShopping Agentの商品キャッシュを無効化
+        self.http_client = LoggingAsyncClient(
+            logger=logger,
+            timeout=HTTP_CLIENT_TIMEOUT
+        )
+        self.catalog_notifier = CatalogNotifier(http_client=self.http_client)
+
         # 起動イベントハンドラー登録
         @self.app.on_event("startup")
         async def startup_event():
@@ -411,6 +422,7 @@ class MerchantService(BaseAgent):
                         delta = update_data["inventory_count"] - product.inventory_count
                         product = await ProductCRUD.update_inventory(session, product_id, delta)
 
+                    self.catalog_notifier.notify("product.updated", product_id)
                     return product.to_dict()
 
             except Exception as e:
@@ -680,6 +692,7 @@ class MerchantService(BaseAgent):
                     product = await ProductCRUD.create(session, product_data)
 
                     logger.info(f"[Merchant] Created product: {product.id}, SKU: {product.sku}")
+                    self.catalog_notifier.notify("product.created", product.id)
 
                     return product.to_dict()
 
@@ -703,6 +716,7 @@ class MerchantService(BaseAgent):
                     await ProductCRUD.delete(session, product_id)
 
                     logger.info(f"[Merchant] Deleted product: {product_id}")
+                    self.catalog_notifier.notify("product.deleted", product_id)
 
                     return {
                         "status": "deleted",
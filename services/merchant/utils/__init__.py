@@ -8,10 +8,12 @@ from .signature_helpers import SignatureHelpers
 from .validation_helpers import ValidationHelpers
 from .inventory_helpers import InventoryHelpers
 from .jwt_helpers import JWTHelpers
+from .catalog_notifier import CatalogNotifier
 
 __all__ = [
     "SignatureHelpers",
     "ValidationHelpers",
     "InventoryHelpers",
     "JWTHelpers",
+    "CatalogNotifier",
 ]
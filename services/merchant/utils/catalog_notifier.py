@@ -0,0 +1,70 @@
+"""
+v2/services/merchant/utils/catalog_notifier.py
+
+商品カタログ変更の通知（商品の作成・更新・削除時に購読側のキャッシュを無効化）
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 通知先（カンマ区切り、例: http://shopping_agent:8000/products/cache/invalidate）
+CATALOG_INVALIDATION_URLS = os.getenv("CATALOG_INVALIDATION_URLS", "")
+CATALOG_INVALIDATION_TIMEOUT = 2.0  # 秒
+# 通知先と共有するトークン（X-Invalidation-Tokenヘッダーで送信、通知先は一致しない通知を拒否）
+CATALOG_INVALIDATION_TOKEN_ENV = "CATALOG_INVALIDATION_TOKEN"
+INVALIDATION_TOKEN_HEADER = "X-Invalidation-Token"
+
+
+class CatalogNotifier:
+    """商品カタログの変更を通知先にPOSTするクラス（失敗しても商品操作は成功させる）"""
+
+    def __init__(self, http_client, urls: Optional[List[str]] = None, token: Optional[str] = None):
+        """
+        Args:
+            http_client: HTTPクライアント（httpx.AsyncClient互換）
+            urls: 通知先URL（省略時はCATALOG_INVALIDATION_URLS）
+            token: 通知先と共有するトークン（省略時はCATALOG_INVALIDATION_TOKEN）
+        """
+        self.http_client = http_client
+        if urls is None:
+            urls = [url.strip() for url in CATALOG_INVALIDATION_URLS.split(",") if url.strip()]
+        self.urls = urls
+        self.token = token if token is not None else os.getenv(CATALOG_INVALIDATION_TOKEN_ENV, "")
+        self._tasks: Set[asyncio.Task] = set()
+
+    def notify(self, event: str, product_id: str):
+        """
+        変更を通知（応答を待たずにバックグラウンドで送信）
+
+        Args:
+            event: product.created / product.updated / product.deleted
+            product_id: 商品ID
+        """
+        if not self.urls:
+            return
+        payload = {"event": event, "product_id": product_id}
+        for url in self.urls:
+            task = asyncio.create_task(self._post(url, payload))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _post(self, url: str, payload: Dict[str, Any]):
+        try:
+            response = await self.http_client.post(
+                url,
+                json=payload,
+                headers={INVALIDATION_TOKEN_HEADER: self.token},
+                timeout=CATALOG_INVALIDATION_TIMEOUT
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"[CatalogNotifier] Failed to notify {url} ({payload['event']}): {e}")
+
+    async def drain(self):
+        """送信中の通知の完了を待つ"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -16,17 +16,16 @@ from datetime import datetime, timezone, timedelta
 import logging
 
 import httpx
-from fastapi import HTTPException
+from fastapi import HTTPException, Header
 from common.base_agent import BaseAgent, AgentPassphraseManager
 from common.models import A2AMessage
 from common.database import DatabaseManager, ProductCRUD
 from common.seed_data import seed_products, seed_users
 from common.search_engine import MeilisearchClient
+from common.langfuse_support import flush_langfuse, is_langfuse_enabled
+from common.response_cache import build_json_response
 from common.logger import get_logger, log_http_request, log_http_response, log_a2a_message, LoggingAsyncClient
 
-# LangGraphエンジンのインポート
-from services.merchant_agent.langgraph_merchant import MerchantLangGraphAgent
-
 # Merchant Agent ユーティリティモジュール
 from services.merchant_agent.utils import CartHelpers, ProductHelpers
 
@@ -129,6 +128,9 @@ class MerchantAgent(BaseAgent):
             # LangGraphエンジン初期化（AI化）
             if self.ai_mode_enabled:
                 try:
+                    # LangGraph/LangChainのimportは重いため、AIモード有効時のみ遅延import
+                    from services.merchant_agent.langgraph_merchant import MerchantLangGraphAgent
+
                     self.langgraph_agent = MerchantLangGraphAgent(
                         db_manager=self.db_manager,
                         merchant_id=self.merchant_id,
@@ -149,9 +151,8 @@ class MerchantAgent(BaseAgent):
             # Langfuse flush
             if self.ai_mode_enabled and self.langgraph_agent:
                 try:
-                    from services.merchant_agent.langgraph_merchant import langfuse_client, LANGFUSE_ENABLED
-                    if LANGFUSE_ENABLED and langfuse_client:
-                        langfuse_client.flush()
+                    if is_langfuse_enabled():
+                        flush_langfuse()
                         logger.info(f"[{self.agent_name}] Langfuse traces flushed")
                 except Exception as e:
                     logger.warning(f"[{self.agent_name}] Failed to flush Langfuse: {e}")
@@ -236,7 +237,12 @@ class MerchantAgent(BaseAgent):
                 )
 
         @self.app.get("/search")
-        async def search_products(query: str = "", category: Optional[str] = None, limit: int = 10):
+        async def search_products(
+            query: str = "",
+            category: Optional[str] = None,
+            limit: int = 10,
+            if_none_match: Optional[str] = Header(None)
+        ):
             """
             GET /search - 商品検索
 
@@ -244,6 +250,8 @@ class MerchantAgent(BaseAgent):
             - query: 検索クエリ（名前または説明で部分一致）
             - category: カテゴリーフィルター
             - limit: 結果数上限
+
+            ETagはレスポンス本体のハッシュ（If-None-Match一致時は304、Shopping Agentの再検証用）
             """
             try:
                 async with self.db_manager.get_session() as session:
@@ -259,10 +267,10 @@ class MerchantAgent(BaseAgent):
                             if p.product_metadata and json.loads(p.product_metadata).get("category") == category
                         ]
 
-                    return {
+                    return build_json_response({
                         "products": [p.to_dict() for p in products],
                         "total": len(products)
-                    }
+                    }, if_none_match)
 
             except Exception as e:
                 logger.error(f"[search_products] Error: {e}", exc_info=True)
@@ -23,7 +23,7 @@ AP2仕様準拠:
 import os
 import json
 import uuid
-from typing import Dict, Any, List, Optional, TypedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional, TypedDict
 from datetime import datetime, timezone, timedelta
 
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
@@ -35,6 +35,7 @@ import sys
 from pathlib import Path
 from common.logger import get_logger
 from common.telemetry import get_tracer, create_http_span, is_telemetry_enabled
+from common.langfuse_support import get_callback_handler_class, is_langfuse_enabled
 from services.merchant_agent.nodes import (
     analyze_intent,
     search_products,
@@ -43,6 +44,7 @@ from services.merchant_agent.nodes import (
     build_cart_mandates,
     rank_and_select
 )
+from services.merchant_agent.utils.ranking_engine import CartRankingEngine, RankingWeights
 logger = get_logger(__name__, service_name='langgraph_merchant')
 tracer = get_tracer(__name__)
 
@@ -62,27 +64,6 @@ STATUS_PENDING_MERCHANT_SIGNATURE = "pending_merchant_signature"
 STATUS_SIGNED = "signed"
 STATUS_REJECTED = "rejected"
 
-# Langfuseトレーシング設定
-LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() == "true"
-CallbackHandler = None
-langfuse_client = None
-
-if LANGFUSE_ENABLED:
-    try:
-        from langfuse.langchain import CallbackHandler as LangfuseCallbackHandler
-        from langfuse import Langfuse
-
-        langfuse_client = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
-        CallbackHandler = LangfuseCallbackHandler
-        logger.info("[Langfuse] Tracing enabled")
-    except Exception as e:
-        logger.warning(f"[Langfuse] Failed to initialize: {e}")
-        LANGFUSE_ENABLED = False
-
 
 class MerchantAgentState(TypedDict):
     """Merchant Agentの状態管理
@@ -131,7 +112,7 @@ class MerchantLangGraphAgent:
     3. check_inventory - 在庫確認（MCPツール）
     4. optimize_cart - LLMによるカート最適化3プラン生成（LLM直接実行）
     5. build_cart_mandates - AP2準拠CartMandate構築（MCPツール + Merchant署名）
-    6. rank_and_select - トップ3を選択
+    6. rank_and_select - スコアリングしてトップ3を選択（CartRankingEngine）
 
     MCP仕様準拠:
     - MCPサーバーはツールのみを提供（LLM推論なし）
@@ -186,7 +167,9 @@ class MerchantLangGraphAgent:
             http_client=http_client
         )
         self.mcp_initialized = False
-        self.mcp_tools = []  # LangChain Tools（Langfuse observation type用）
+
+        # カート候補ランキングエンジン（重みは環境変数で調整可能）
+        self.ranking_engine = CartRankingEngine(weights=RankingWeights.from_env())
 
         # グラフ構築
         self.graph = self._build_graph()
@@ -242,28 +225,30 @@ class MerchantLangGraphAgent:
 
     async def _rank_and_select_node(self, state: MerchantAgentState) -> MerchantAgentState:
         """ランキングノード"""
-        return await rank_and_select(state)
+        return await rank_and_select(self, state)
 
     async def _ensure_mcp_initialized(self):
-        """MCPクライアントを初期化し、LangChain Toolsを作成
+        """MCPクライアントを初期化
 
-        Langfuse CallbackHandlerが自動的にMCPツール呼び出しを「tool」observation typeとして記録できるようにする。
+        ツールのinputSchemaはinitializeレスポンスから取得し、MCPClient側でキャッシュされる。
         """
         if not self.mcp_initialized:
             # MCP初期化
             await self.mcp_client.initialize()
-
-            # LangChain Toolsを作成（Langfuse observation type用）
-            self.mcp_tools = self.mcp_client.create_langchain_tools()
-            logger.info(f"[MerchantLangGraphAgent] Created {len(self.mcp_tools)} LangChain tools from MCP")
+            logger.info(
+                f"[MerchantLangGraphAgent] MCP initialized with "
+                f"{len(self.mcp_client.server_info.get('capabilities', {}).get('tools', {}))} tools"
+            )
 
             self.mcp_initialized = True
 
-    async def call_mcp_tool_as_langchain(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """MCPツールをLangChain Tool経由で呼び出し
+    async def call_mcp_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """MCPツールを呼び出し（Langfuse「tool」observationとして記録）
 
-        Langfuse CallbackHandlerが「tool」observation typeとして記録するために、
-        LangChain Toolインターフェースを使用する。
+        LangChain StructuredToolを経由せず、MCPClient.call_tool_observedで直接呼び出す。
+        グラフのconfigから伝播したCallbackHandlerにon_tool_start/on_tool_endが通知されるため、
+        Langfuse上の記録はStructuredTool経由と同じ「tool」observation typeになる。
+        記録率は環境変数 MCP_TOOL_OBSERVATION_SAMPLE_RATE で調整可能。
 
         Args:
             tool_name: ツール名
@@ -274,23 +259,37 @@ class MerchantLangGraphAgent:
         """
         await self._ensure_mcp_initialized()
 
-        # 対応するLangChain Toolを検索
-        tool = next((t for t in self.mcp_tools if t.name == tool_name), None)
-
-        if not tool:
-            # ツールが見つからない場合は従来のcall_toolを使用
-            logger.warning(f"[MerchantLangGraphAgent] LangChain tool not found: {tool_name}, using direct MCP call")
-            return await self.mcp_client.call_tool(tool_name, arguments)
-
-        # LangChain Tool経由で呼び出し（Langfuse CallbackHandlerが自動的に記録）
         try:
-            # StructuredToolの場合、ainvoke()を使用して引数を渡す
-            result = await tool.ainvoke(arguments)
-            return result
+            return await self.mcp_client.call_tool_observed(
+                tool_name, arguments, observe=is_langfuse_enabled()
+            )
         except Exception as e:
-            logger.error(f"[MerchantLangGraphAgent] Error calling LangChain tool {tool_name}: {e}", exc_info=True)
+            logger.error(f"[MerchantLangGraphAgent] Error calling MCP tool {tool_name}: {e}", exc_info=True)
             raise
 
+    async def call_mcp_tool_with_progress(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        on_progress: Callable[[Dict[str, Any]], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """MCPツールをSSEストリーミングで呼び出し、部分結果ごとにコールバックを実行
+
+        プランごとのCartMandate構築のように、最初の結果から後続処理（Merchant署名）を
+        開始したい呼び出しに使用する。
+
+        Args:
+            tool_name: ツール名
+            arguments: ツール引数
+            on_progress: notifications/progressごとに呼ばれる非同期コールバック
+                         （event["partial"] に部分結果）
+
+        Returns:
+            ツール実行結果
+        """
+        await self._ensure_mcp_initialized()
+        return await self.mcp_client.call_tool_with_progress(tool_name, arguments, on_progress)
+
     async def create_cart_candidates(
         self,
         intent_mandate: Dict[str, Any],
@@ -332,7 +331,8 @@ class MerchantLangGraphAgent:
 
         try:
             config = {}
-            if LANGFUSE_ENABLED and CallbackHandler:
+            CallbackHandler = get_callback_handler_class()
+            if CallbackHandler:
                 # セッションごとにCallbackHandlerインスタンスを取得または作成
                 # shopping_agentと同じsession_idを使用することで、同じトレースグループに統合される
                 if session_id not in self._langfuse_handlers:
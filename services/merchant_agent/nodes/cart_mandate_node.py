@@ -4,7 +4,6 @@ v2/services/merchant_agent/nodes/cart_mandate_node.py
 CartMandate構築ノード（MCP経由でベース作成、Merchant署名は別途）
 """
 
-import os
 import uuid
 import asyncio
 from typing import TYPE_CHECKING
@@ -27,23 +26,6 @@ STATUS_PENDING_MERCHANT_SIGNATURE = "pending_merchant_signature"
 STATUS_SIGNED = "signed"
 STATUS_REJECTED = "rejected"
 
-# Langfuseトレーシング設定
-LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() == "true"
-langfuse_client = None
-
-if LANGFUSE_ENABLED:
-    try:
-        from langfuse import Langfuse
-
-        langfuse_client = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
-    except Exception as e:
-        logger.warning(f"[Langfuse] Failed to initialize in cart_mandate_node: {e}")
-        LANGFUSE_ENABLED = False
-
 
 async def build_cart_mandates(agent: 'MerchantLangGraphAgent', state: 'MerchantAgentState') -> 'MerchantAgentState':
     """AP2準拠のCartMandateを構築（MCP経由でベース作成、Merchant署名は別途）"""
@@ -58,50 +40,7 @@ async def build_cart_mandates(agent: 'MerchantLangGraphAgent', state: 'MerchantA
     pending_approval_count = 0  # 承認待ちカウント
     timeout_count = 0  # タイムアウトカウント
 
-    # AP2完全準拠 & UX改善:
-    # すべてのCartMandateを先に作成してから、一度にMerchantに署名依頼
-    # これにより、手動署名モードで複数のCartMandateが同時にフロントエンドに表示される
-    unsigned_cart_mandates = []  # 未署名CartMandateのリスト
-
-    # ステップ1: すべてのCartMandateを作成（未署名）
-    logger.info(f"[build_cart_mandates] Creating {len(cart_plans)} unsigned CartMandates...")
-
-    for plan in cart_plans:
-        try:
-            # LangChain Tool経由でCartMandate構築（未署名）（Langfuse observation type用）
-            result = await agent.call_mcp_tool_as_langchain("build_cart_mandates", {
-                "cart_plan": plan,
-                "products": products,
-                "shipping_address": shipping_address,  # AP2準拠: 配送先住所を渡す
-                "intent_mandate_id": intent_mandate_id  # AP2準拠: IntentMandate IDを渡す
-            })
-
-            cart_mandate = result.get("cart_mandate")
-
-            if cart_mandate:
-                unsigned_cart_mandates.append({
-                    "plan": plan,
-                    "cart_mandate": cart_mandate
-                })
-                logger.info(
-                    f"[build_cart_mandates] Created unsigned CartMandate: "
-                    f"{cart_mandate.get('contents', {}).get('id')}, plan={plan.get('name')}"
-                )
-            else:
-                logger.warning(f"[build_cart_mandates] Failed to create CartMandate for plan: {plan.get('name')}")
-
-        except Exception as e:
-            logger.error(f"[build_cart_mandates] Error creating CartMandate for plan {plan.get('name')}: {e}")
-
-    logger.info(
-        f"[build_cart_mandates] Created {len(unsigned_cart_mandates)} unsigned CartMandates, "
-        f"sending to Merchant for signature..."
-    )
-
-    # ステップ2: すべてのCartMandateを **同時に** Merchantに送信（バッチ署名依頼）
-    # AP2完全準拠: 手動署名モードの場合、すべてのCartMandateが同時にフロントエンドに表示される
-    # asyncio.gatherを使用してすべてのHTTPリクエストを並列実行
-
+    # 署名依頼処理を先に定義し、MCPツールが部分結果としてCartMandateを返すたびに開始する
     async def process_single_cart_mandate(item):
         """
         単一のCartMandateを処理（署名依頼 + ポーリング）
@@ -282,12 +221,59 @@ async def build_cart_mandates(agent: 'MerchantLangGraphAgent', state: 'MerchantA
 
             return (None, status_dict)
 
-    # asyncio.gatherですべてのCartMandateを並列処理
-    # AP2完全準拠: すべてのCartMandateが同時にMerchantに送信される
-    logger.info(f"[build_cart_mandates] Processing {len(unsigned_cart_mandates)} CartMandates in parallel...")
+    # ステップ1: 全プランのCartMandate構築を1回のtools/callで依頼（SSEストリーミング）
+    # MCPサーバーは構築したCartMandateを1件ずつ部分結果（partialResult）として通知するため、
+    # 最初のCartMandateを受信した時点でMerchant署名（ステップ2）を開始し、残りの構築と並行させる
+    # 手動署名モードでも各CartMandateの署名依頼はほぼ同時に届き、フロントエンドにまとめて表示される
+    logger.info(f"[build_cart_mandates] Creating {len(cart_plans)} unsigned CartMandates...")
+
+    signing_tasks = {}  # プランのindex -> 署名依頼タスク
+
+    def start_signing(index, cart_mandate):
+        """未署名CartMandateのMerchant署名依頼を開始（同じプランは1回のみ）"""
+        if index in signing_tasks or not cart_mandate or not 0 <= index < len(cart_plans):
+            return
+        plan = cart_plans[index]
+        logger.info(
+            f"[build_cart_mandates] Created unsigned CartMandate: "
+            f"{cart_mandate.get('contents', {}).get('id')}, plan={plan.get('name')}, sending to Merchant..."
+        )
+        signing_tasks[index] = asyncio.create_task(
+            process_single_cart_mandate({"plan": plan, "cart_mandate": cart_mandate})
+        )
+
+    async def on_progress(event):
+        partial = event.get("partial") or {}
+        if "index" in partial:
+            start_signing(partial["index"], partial.get("cart_mandate"))
+
+    try:
+        mcp_result = await agent.call_mcp_tool_with_progress(
+            "build_cart_mandates",
+            {
+                "cart_plans": cart_plans,
+                "products": products,
+                "shipping_address": shipping_address,  # AP2準拠: 配送先住所を渡す
+                "intent_mandate_id": intent_mandate_id  # AP2準拠: IntentMandate IDを渡す
+            },
+            on_progress
+        )
+        # サーバーがストリーミングしなかった場合、部分結果で受信できなかったCartMandateは最終結果から開始
+        for index, cart_mandate in enumerate(mcp_result.get("cart_mandates") or []):
+            if cart_mandate is None:
+                logger.warning(
+                    f"[build_cart_mandates] Failed to create CartMandate for plan: {cart_plans[index].get('name')}"
+                )
+            start_signing(index, cart_mandate)
+    except Exception as e:
+        # 受信済みのCartMandateの署名依頼はそのまま継続する
+        logger.error(f"[build_cart_mandates] MCP error: {e}")
+
+    # ステップ2: 署名依頼（+承認待ちポーリング）の完了を待機（例外が発生してもすべての結果を取得）
+    logger.info(f"[build_cart_mandates] Waiting for {len(signing_tasks)} CartMandate signatures...")
     results = await asyncio.gather(
-        *[process_single_cart_mandate(item) for item in unsigned_cart_mandates],
-        return_exceptions=True  # 例外が発生してもすべての結果を取得
+        *[signing_tasks[index] for index in sorted(signing_tasks)],  # カート候補はプランの順序を維持
+        return_exceptions=True
     )
 
     # 結果を集計
@@ -10,6 +10,7 @@ from typing import TYPE_CHECKING, List
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from common.logger import get_logger
+from common.metrics import LLM_REQUEST_SECONDS
 from services.merchant_agent.utils.llm_utils import extract_keywords_simple, parse_json_from_llm
 
 if TYPE_CHECKING:
@@ -27,7 +28,7 @@ async def analyze_intent(agent: 'MerchantLangGraphAgent', state: 'MerchantAgentS
     - skus: 特定のSKUリスト（オプション）
     - requires_refundability: 返金可能性要件（オプション）
     """
-    # MCP初期化（初回のみ、LangChain Tools作成も含む）
+    # MCP初期化（初回のみ）
     await agent._ensure_mcp_initialized()
 
     intent_mandate = state["intent_mandate"]
@@ -102,7 +103,8 @@ JSON形式で返答してください（search_keywordsは必ず日本語）:
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_prompt)
         ]
-        response = await agent.llm.ainvoke(messages)
+        with LLM_REQUEST_SECONDS.labels(node="analyze_intent").time():
+            response = await agent.llm.ainvoke(messages)
         response_text = response.content
 
         # JSON抽出
@@ -4,7 +4,6 @@ v2/services/merchant_agent/nodes/inventory_node.py
 在庫確認ノード（MCP経由）
 """
 
-import os
 from typing import TYPE_CHECKING
 
 from common.logger import get_logger
@@ -14,23 +13,6 @@ if TYPE_CHECKING:
 
 logger = get_logger(__name__, service_name='langgraph_merchant')
 
-# Langfuseトレーシング設定
-LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() == "true"
-langfuse_client = None
-
-if LANGFUSE_ENABLED:
-    try:
-        from langfuse import Langfuse
-
-        langfuse_client = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
-    except Exception as e:
-        logger.warning(f"[Langfuse] Failed to initialize in inventory_node: {e}")
-        LANGFUSE_ENABLED = False
-
 
 async def check_inventory(agent: 'MerchantLangGraphAgent', state: 'MerchantAgentState') -> 'MerchantAgentState':
     """在庫確認（MCP経由）"""
@@ -39,11 +21,11 @@ async def check_inventory(agent: 'MerchantLangGraphAgent', state: 'MerchantAgent
     # 商品IDリスト抽出
     product_ids = [p["id"] for p in products]
 
-    # Langfuseトレーシング: LangChain Tool経由で呼び出すことで、
-    # CallbackHandlerが自動的に「tool」observation typeとして記録
+    # Langfuseトレーシング: call_mcp_toolがCallbackHandlerに通知し、
+    # 「tool」observation typeとして記録
     try:
-        # LangChain Tool経由で在庫確認（Langfuse observation type用）
-        result = await agent.call_mcp_tool_as_langchain("check_inventory", {
+        # MCP経由で在庫確認（Langfuse「tool」observationとして記録）
+        result = await agent.call_mcp_tool("check_inventory", {
             "product_ids": product_ids
         })
 
@@ -10,6 +10,7 @@ from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from common.logger import get_logger
+from common.metrics import LLM_REQUEST_SECONDS
 from services.merchant_agent.utils.llm_utils import parse_json_from_llm
 
 if TYPE_CHECKING:
@@ -136,7 +137,8 @@ JSON配列形式で返答してください:
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_prompt)
         ]
-        response = await agent.llm.ainvoke(messages)
+        with LLM_REQUEST_SECONDS.labels(node="optimize_cart").time():
+            response = await agent.llm.ainvoke(messages)
         response_text = response.content
 
         # JSON抽出
@@ -167,7 +169,23 @@ JSON配列形式で返答してください:
             if "円" not in plan.get("name", ""):
                 plan["name"] = f"{plan.get('name', 'プラン')} ({int(total_price):,}円)"
 
-        state["cart_plans"] = cart_plans[:3]  # 最大3プラン
+        # 最大3プラン: 先頭切り捨てではなくランキングエンジンで選択（過剰生成されたプランも評価）
+        ranked = agent.ranking_engine.rank(
+            [plan.get("items", []) for plan in cart_plans],
+            products,
+            inventory_status=state.get("inventory_status", {}),
+            preferences=preferences,
+            max_amount=max_amount,
+            top_k=3
+        )
+        if not ranked:
+            # 有効な商品を含むプランがない場合はルールベースフォールバック
+            logger.warning("[optimize_cart] No LLM plan references available products, using rule-based fallback")
+            state["cart_plans"] = create_rule_based_plans(products, max_amount)
+            state["llm_reasoning"] = "LLM plans had no available products, using rule-based fallback"
+            return state
+
+        state["cart_plans"] = [cart_plans[r.index] for r in ranked]
         state["llm_reasoning"] = f"Cart optimization completed via LLM: {len(cart_plans)} plans"
 
         logger.info(f"[optimize_cart] LLM generated {len(cart_plans)} cart plans")
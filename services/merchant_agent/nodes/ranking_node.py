@@ -4,30 +4,83 @@ v2/services/merchant_agent/nodes/ranking_node.py
 カート候補ランキングノード
 """
 
-from typing import TYPE_CHECKING
+import os
+from typing import TYPE_CHECKING, Dict, Any, List
 
 if TYPE_CHECKING:
-    from services.merchant_agent.langgraph_merchant import MerchantAgentState
+    from services.merchant_agent.langgraph_merchant import MerchantLangGraphAgent, MerchantAgentState
 
 from common.logger import get_logger
 
 logger = get_logger(__name__, service_name='langgraph_merchant')
 
+# 返却するカート候補数
+RANKING_TOP_K = int(os.getenv("MERCHANT_RANKING_TOP_K", "3"))
 
-async def rank_and_select(state: 'MerchantAgentState') -> 'MerchantAgentState':
-    """カート候補をランク付けしてトップ3を選択"""
+
+def extract_cart_items(cart_candidate: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Artifact形式のカート候補から明細（product_id, quantity）を取り出す
+
+    CartMandateの_metadata.raw_itemsを使用する（Merchant署名後も保持される）。
+    """
+    for part in cart_candidate.get("parts", []):
+        cart_mandate = part.get("data", {}).get("ap2.mandates.CartMandate")
+        if cart_mandate:
+            raw_items = cart_mandate.get("_metadata", {}).get("raw_items", [])
+            return [
+                {"product_id": item.get("product_id"), "quantity": item.get("quantity", 1)}
+                for item in raw_items
+            ]
+    return []
+
+
+async def rank_and_select(agent: 'MerchantLangGraphAgent', state: 'MerchantAgentState') -> 'MerchantAgentState':
+    """カート候補をランク付けしてトップ3を選択
+
+    ランキング基準（CartRankingEngineでベクトル化して一括計算）:
+    - ユーザー嗜好マッチ度
+    - 在庫確実性
+    - 価格競争力（予算超過は減点）
+    """
     cart_candidates = state["cart_candidates"]
 
-    # 現在は全て返す（将来的にランキングロジック追加）
-    # ランキング基準:
-    # - ユーザー嗜好マッチ度
-    # - 在庫確実性
-    # - 価格競争力
+    if not cart_candidates:
+        logger.info("[rank_and_select] No cart candidates to rank")
+        return state
+
+    constraints = state.get("intent_mandate", {}).get("constraints", {})
+    max_amount = constraints.get("max_amount", {}).get("value") if constraints.get("max_amount") else None
+
+    ranked = agent.ranking_engine.rank(
+        [extract_cart_items(candidate) for candidate in cart_candidates],
+        state.get("available_products", []),
+        inventory_status=state.get("inventory_status", {}),
+        preferences=state.get("user_preferences", {}),
+        max_amount=max_amount,
+        top_k=RANKING_TOP_K
+    )
+
+    if not ranked:
+        # 明細を商品に解決できる候補がない（raw_items欠落等）場合は、ランキング前と同じく提案順の上位を返す
+        state["cart_candidates"] = cart_candidates[:RANKING_TOP_K]
+        logger.warning(
+            f"[rank_and_select] No rankable carts, falling back to the first {len(state['cart_candidates'])} "
+            f"of {len(cart_candidates)} unranked carts"
+        )
+        return state
+
+    selected = []
+    for result in ranked:
+        candidate = cart_candidates[result.index]
+        # A2A Artifactのmetadataにスコアを付与
+        candidate.setdefault("metadata", {})["ranking"] = result.to_dict()
+        selected.append(candidate)
 
-    # トップ3まで
-    selected = cart_candidates[:3]
     state["cart_candidates"] = selected
 
-    logger.info(f"[rank_and_select] Selected top {len(selected)} carts")
+    logger.info(
+        f"[rank_and_select] Selected top {len(selected)} of {len(cart_candidates)} carts: "
+        f"scores={[round(r.score, 3) for r in ranked]}"
+    )
 
     return state
@@ -4,7 +4,6 @@ v2/services/merchant_agent/nodes/search_node.py
 商品検索ノード（MCP経由）
 """
 
-import os
 from typing import TYPE_CHECKING
 
 from common.logger import get_logger
@@ -14,23 +13,6 @@ if TYPE_CHECKING:
 
 logger = get_logger(__name__, service_name='langgraph_merchant')
 
-# Langfuseトレーシング設定
-LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() == "true"
-langfuse_client = None
-
-if LANGFUSE_ENABLED:
-    try:
-        from langfuse import Langfuse
-
-        langfuse_client = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
-    except Exception as e:
-        logger.warning(f"[Langfuse] Failed to initialize in search_node: {e}")
-        LANGFUSE_ENABLED = False
-
 
 async def search_products(agent: 'MerchantLangGraphAgent', state: 'MerchantAgentState') -> 'MerchantAgentState':
     """データベースから商品検索（MCP経由）
@@ -45,11 +27,11 @@ async def search_products(agent: 'MerchantLangGraphAgent', state: 'MerchantAgent
     # キーワード抽出（AP2準拠）
     search_keywords = preferences.get("search_keywords", [])
 
-    # Langfuseトレーシング: LangChain Tool経由で呼び出すことで、
-    # CallbackHandlerが自動的に「tool」observation typeとして記録
+    # Langfuseトレーシング: call_mcp_toolがCallbackHandlerに通知し、
+    # 「tool」observation typeとして記録
     try:
-        # LangChain Tool経由で商品検索（Langfuse observation type用）
-        result = await agent.call_mcp_tool_as_langchain("search_products", {
+        # MCP経由で商品検索（Langfuse「tool」observationとして記録）
+        result = await agent.call_mcp_tool("search_products", {
             "keywords": search_keywords,
             "limit": 20
         })
@@ -6,8 +6,11 @@ Merchant Agent ユーティリティモジュール
 
 from .cart_helpers import CartHelpers
 from .product_helpers import ProductHelpers
+from .ranking_engine import CartRankingEngine, RankingWeights
 
 __all__ = [
     "CartHelpers",
     "ProductHelpers",
+    "CartRankingEngine",
+    "RankingWeights",
 ]
@@ -0,0 +1,260 @@
+"""
+v2/services/merchant_agent/utils/ranking_engine.py
+
+カート候補ランキングエンジン（NumPyによるベクトル化スコアリング）
+
+ランキング基準:
+- preference_match: ユーザー嗜好マッチ度（search_keywordsに一致する商品の数量比率）
+- inventory_certainty: 在庫確実性（各明細の在庫余裕の最小値）
+- price_competitiveness: 価格競争力（候補間で相対的に安いほど高い）
+
+全候補の特徴量を「候補 × 商品」の数量行列から一括で計算するため、
+Optimizerが数百件の候補を過剰生成してもランキングで選別できる。
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from common.logger import get_logger
+
+logger = get_logger(__name__, service_name='langgraph_merchant')
+
+FEATURE_NAMES = ("preference_match", "inventory_certainty", "price_competitiveness")
+
+# budget_strategyごとの価格重みの倍率
+BUDGET_STRATEGY_PRICE_FACTORS = {
+    "low": 2.0,
+    "balanced": 1.0,
+    "premium": 0.5,
+}
+
+
+@dataclass
+class RankingWeights:
+    """ランキングの重み設定"""
+    preference: float = 0.4
+    inventory: float = 0.3
+    price: float = 0.3
+    budget_penalty: float = 0.5  # 予算超過時の最大減点率（0-1）
+
+    @classmethod
+    def from_env(cls) -> "RankingWeights":
+        """環境変数から重みを読み込み（未設定の項目はデフォルト値）"""
+        defaults = cls()
+        return cls(
+            preference=float(os.getenv("MERCHANT_RANKING_WEIGHT_PREFERENCE", defaults.preference)),
+            inventory=float(os.getenv("MERCHANT_RANKING_WEIGHT_INVENTORY", defaults.inventory)),
+            price=float(os.getenv("MERCHANT_RANKING_WEIGHT_PRICE", defaults.price)),
+            budget_penalty=float(os.getenv("MERCHANT_RANKING_BUDGET_PENALTY", defaults.budget_penalty)),
+        )
+
+    def as_vector(self, budget_strategy: str = "balanced") -> np.ndarray:
+        """FEATURE_NAMESの順に並べた正規化済み重みベクトル"""
+        price_factor = BUDGET_STRATEGY_PRICE_FACTORS.get(budget_strategy, 1.0)
+        vector = np.array([self.preference, self.inventory, self.price * price_factor], dtype=np.float64)
+        total = vector.sum()
+        if total <= 0:
+            return np.full(len(FEATURE_NAMES), 1.0 / len(FEATURE_NAMES))
+        return vector / total
+
+
+@dataclass
+class RankedCandidate:
+    """ランキング結果（元の候補リストでのインデックス + スコア）"""
+    index: int
+    score: float
+    features: Dict[str, float] = field(default_factory=dict)
+    total_price: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "score": round(self.score, 4),
+            "features": {name: round(value, 4) for name, value in self.features.items()},
+            "total_price": self.total_price,
+        }
+
+
+class CartRankingEngine:
+    """カート候補をベクトル化した特徴量でスコアリングするエンジン"""
+
+    def __init__(self, weights: Optional[RankingWeights] = None, safety_stock: int = 5):
+        """
+        Args:
+            weights: ランキングの重み（省略時はデフォルト）
+            safety_stock: 在庫確実性が1.0になるために必要な余剰在庫数
+        """
+        self.weights = weights or RankingWeights()
+        self.safety_stock = max(0, safety_stock)
+
+    def build_features(
+        self,
+        candidate_items: Sequence[List[Dict[str, Any]]],
+        products: List[Dict[str, Any]],
+        inventory_status: Optional[Dict[Any, int]] = None,
+        preferences: Optional[Dict[str, Any]] = None,
+        max_amount: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        全候補の特徴量を一括計算
+
+        Args:
+            candidate_items: 候補ごとのアイテムリスト [{"product_id": 1, "quantity": 2}, ...]
+            products: 商品リスト（search_productsの結果）
+            inventory_status: 商品ID → 在庫数（MCPのJSON経由で文字列キーの場合もある）
+            preferences: user_preferences（search_keywordsを使用）
+            max_amount: 予算上限（円）
+
+        Returns:
+            Dict[str, np.ndarray]: "features"（候補数 × 3）, "totals", "budget_factor", "valid"
+        """
+        inventory_status = inventory_status or {}
+        preferences = preferences or {}
+
+        product_index = {p["id"]: i for i, p in enumerate(products)}
+        n_candidates = len(candidate_items)
+        n_products = len(products)
+
+        # 候補 × 商品の数量行列
+        quantities = np.zeros((n_candidates, n_products), dtype=np.float64)
+        rows, cols, values = [], [], []
+        for row, items in enumerate(candidate_items):
+            for item in items or []:
+                col = product_index.get(item.get("product_id"))
+                if col is None:
+                    continue
+                rows.append(row)
+                cols.append(col)
+                values.append(item.get("quantity", 1))
+        if rows:
+            np.add.at(quantities, (np.array(rows), np.array(cols)), np.array(values, dtype=np.float64))
+
+        prices = np.array([p.get("price_jpy", 0) or 0 for p in products], dtype=np.float64)
+        stock = np.array(
+            [self._lookup_stock(p, inventory_status) for p in products],
+            dtype=np.float64
+        )
+        matches = self._keyword_matches(products, preferences.get("search_keywords", []))
+
+        item_counts = quantities.sum(axis=1)
+        valid = item_counts > 0
+        safe_counts = np.where(valid, item_counts, 1.0)
+
+        # 嗜好マッチ度: キーワード一致商品の数量比率
+        preference_match = (quantities @ matches) / safe_counts
+
+        # 在庫確実性: 明細ごとに stock / (数量 + safety_stock) を計算し、最も不確実な明細を採用
+        in_cart = quantities > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            line_certainty = np.clip(stock / (quantities + self.safety_stock), 0.0, 1.0)
+        line_certainty = np.where(stock < quantities, 0.0, line_certainty)
+        line_certainty = np.where(in_cart, line_certainty, np.inf)
+        inventory_certainty = line_certainty.min(axis=1, initial=np.inf)
+        inventory_certainty = np.where(valid, inventory_certainty, 0.0)
+
+        # 価格競争力: 有効な候補内での相対価格（安いほど1.0に近い）
+        totals = quantities @ prices
+        price_competitiveness = np.zeros(n_candidates, dtype=np.float64)
+        if valid.any():
+            low, high = totals[valid].min(), totals[valid].max()
+            span = high - low
+            price_competitiveness = np.where(
+                valid,
+                1.0 - (totals - low) / span if span > 0 else 1.0,
+                0.0
+            )
+
+        # 予算超過の減点係数（超過率に比例、最大budget_penalty）
+        budget_factor = np.ones(n_candidates, dtype=np.float64)
+        if max_amount:
+            overrun = np.clip((totals - max_amount) / max_amount, 0.0, 1.0)
+            budget_factor = 1.0 - self.weights.budget_penalty * overrun
+
+        features = np.column_stack([preference_match, inventory_certainty, price_competitiveness])
+
+        return {
+            "features": features,
+            "totals": totals,
+            "budget_factor": budget_factor,
+            "valid": valid,
+        }
+
+    def rank(
+        self,
+        candidate_items: Sequence[List[Dict[str, Any]]],
+        products: List[Dict[str, Any]],
+        inventory_status: Optional[Dict[Any, int]] = None,
+        preferences: Optional[Dict[str, Any]] = None,
+        max_amount: Optional[float] = None,
+        top_k: Optional[int] = 3
+    ) -> List[RankedCandidate]:
+        """
+        候補をスコアリングし、上位top_k件を返す
+
+        同点の場合は元の候補順（Optimizerの提案順）を維持する。
+        商品を1つも含まない候補は除外する。
+
+        Returns:
+            List[RankedCandidate]: スコア降順のランキング結果
+        """
+        if not candidate_items:
+            return []
+
+        preferences = preferences or {}
+        computed = self.build_features(candidate_items, products, inventory_status, preferences, max_amount)
+        features = computed["features"]
+        valid = computed["valid"]
+
+        weight_vector = self.weights.as_vector(preferences.get("budget_strategy", "balanced"))
+        scores = (features @ weight_vector) * computed["budget_factor"]
+        scores = np.where(valid, scores, -np.inf)
+
+        n_valid = int(valid.sum())
+        k = n_valid if top_k is None else min(top_k, n_valid)
+        if k <= 0:
+            return []
+
+        # 上位k件だけを部分ソートしてから、(スコア降順, 元インデックス昇順)で並べ替え
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        order = top[np.lexsort((top, -scores[top]))][:k]
+
+        return [
+            RankedCandidate(
+                index=int(i),
+                score=float(scores[i]),
+                features={name: float(features[i, j]) for j, name in enumerate(FEATURE_NAMES)},
+                total_price=float(computed["totals"][i])
+            )
+            for i in order
+        ]
+
+    @staticmethod
+    def _lookup_stock(product: Dict[str, Any], inventory_status: Dict[Any, int]) -> float:
+        """在庫数を取得（inventory_status優先、なければ商品データのinventory_count）"""
+        product_id = product["id"]
+        if product_id in inventory_status:
+            return inventory_status[product_id] or 0
+        if str(product_id) in inventory_status:
+            return inventory_status[str(product_id)] or 0
+        return product.get("inventory_count", 0) or 0
+
+    @staticmethod
+    def _keyword_matches(products: List[Dict[str, Any]], keywords: List[str]) -> np.ndarray:
+        """商品ごとのキーワード一致フラグ（キーワード未指定時は全商品1.0）"""
+        normalized = [k.lower() for k in keywords or [] if k and k.strip()]
+        if not normalized:
+            return np.ones(len(products), dtype=np.float64)
+
+        matches = np.zeros(len(products), dtype=np.float64)
+        for i, product in enumerate(products):
+            text = " ".join(
+                str(product.get(key) or "") for key in ("name", "description", "category", "brand")
+            ).lower()
+            if any(keyword in text for keyword in normalized):
+                matches[i] = 1.0
+        return matches
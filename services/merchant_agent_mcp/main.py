@@ -11,7 +11,7 @@ MCP仕様準拠：
 - search_products: データベースから商品検索
 - check_inventory: 在庫確認
 - get_product_details: 商品詳細取得
-- build_cart_mandate: AP2準拠CartMandate構築（データ構造化のみ）
+- build_cart_mandates: AP2準拠CartMandate構築（データ構造化のみ、構築済みのCartMandateを部分結果として逐次通知）
 """
 
 import os
@@ -22,7 +22,7 @@ import uvicorn
 from pathlib import Path
 from typing import Dict, Any, List
 from datetime import datetime, timezone, timedelta
-from common.mcp_server import MCPServer
+from common.mcp_server import MCPServer, get_progress_reporter
 from common.database import DatabaseManager, ProductCRUD
 from common.search_engine import MeilisearchClient
 from common.logger import get_logger
@@ -242,6 +242,11 @@ async def check_inventory(params: Dict[str, Any]) -> Dict[str, Any]:
                 "type": "object",
                 "description": "カートプラン（optimize_cartの結果）"
             },
+            "cart_plans": {
+                "type": "array",
+                "items": {"type": "object"},
+                "description": "カートプランリスト（指定時はプランごとにCartMandateを構築し、1件ずつ部分結果として通知）"
+            },
             "products": {
                 "type": "array",
                 "items": {"type": "object"},
@@ -256,26 +261,63 @@ async def check_inventory(params: Dict[str, Any]) -> Dict[str, Any]:
                 "description": "IntentMandate ID（AP2準拠）"
             }
         },
-        "required": ["cart_plan", "products"]
+        "required": ["products"]
     }
 )
 async def build_cart_mandates(params: Dict[str, Any]) -> Dict[str, Any]:
     """AP2準拠のCartMandateを構築
 
     Args:
-        params: {"cart_plan": {...}, "products": [...], "shipping_address": {...}, "intent_mandate_id": "..."}
+        params: {"cart_plans": [...] または "cart_plan": {...}, "products": [...],
+                 "shipping_address": {...}, "intent_mandate_id": "..."}
 
     Returns:
-        {"cart_mandate": {...}}  # 未署名
+        {"cart_mandates": [...]}  # cart_plans指定時（未署名、プランと同じ順序、構築失敗はNone）
+        {"cart_mandate": {...}}   # cart_plan指定時（未署名）
+
+    SSEストリーミング時は、構築したCartMandateを1件ずつ部分結果として通知する
+    （partialResult: {"index": 0, "cart_mandate": {...}}）。
+    呼び出し側は最初のCartMandateを受信した時点でMerchant署名を開始できる。
     """
-    cart_plan = params["cart_plan"]
     products = params["products"]
     shipping_address = params.get("shipping_address")
     intent_mandate_id = params.get("intent_mandate_id")  # AP2準拠: IntentMandate IDを取得
+    progress = get_progress_reporter(params)
 
     # 商品IDマッピング
     products_map = {p["id"]: p for p in products}
 
+    if "cart_plans" not in params:
+        cart_mandate = _build_cart_mandate(params["cart_plan"], products_map, shipping_address, intent_mandate_id)
+        return {"cart_mandate": cart_mandate}
+
+    cart_plans = params["cart_plans"]
+    cart_mandates = []
+    for index, cart_plan in enumerate(cart_plans):
+        try:
+            cart_mandate = _build_cart_mandate(cart_plan, products_map, shipping_address, intent_mandate_id)
+        except Exception as e:
+            logger.error(f"[build_cart_mandates] Failed to build CartMandate for plan {cart_plan.get('name')}: {e}")
+            cart_mandate = None
+        cart_mandates.append(cart_mandate)
+
+        await progress.report(
+            index + 1,
+            total=len(cart_plans),
+            message="CartMandate built" if cart_mandate else "CartMandate build failed",
+            partial={"index": index, "cart_mandate": cart_mandate} if cart_mandate else None
+        )
+
+    return {"cart_mandates": cart_mandates}
+
+
+def _build_cart_mandate(
+    cart_plan: Dict[str, Any],
+    products_map: Dict[Any, Dict[str, Any]],
+    shipping_address: Any,
+    intent_mandate_id: Any
+) -> Dict[str, Any]:
+    """カートプラン1件からAP2準拠のCartMandate（未署名）を構築"""
     # カートアイテム構築（ヘルパーメソッドに委譲）
     display_items, raw_items, subtotal = cart_mandate_helpers.build_cart_items(cart_plan, products_map)
 
@@ -304,12 +346,10 @@ async def build_cart_mandates(params: Dict[str, Any]) -> Dict[str, Any]:
         "cart_name": cart_plan.get("name", "カート"),
         "cart_description": cart_plan.get("description", "")
     }
-    cart_mandate = cart_mandate_helpers.build_cart_mandate_structure(
+    return cart_mandate_helpers.build_cart_mandate_structure(
         display_items, raw_items, total, shipping_address, session_data
     )
 
-    return {"cart_mandate": cart_mandate}
-
 
 # FastAPIアプリ
 app = mcp.app
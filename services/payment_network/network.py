@@ -14,18 +14,36 @@ AP2仕様準拠：
 """
 
 import os
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException
+from pydantic import BaseModel, Field
 
-from services.payment_network.utils import TokenHelpers
+from services.payment_network.settlement import SettlementFileWriter, SettlementLedger
+from services.payment_network.utils import AgentTokenIndex, TokenHelpers
+from common.idempotency import IdempotencyMiddleware
+from common.profiler import register_profiling
 from common.redis_client import RedisClient, TokenStore
+from common.token_auth import require_token
 
 logger = logging.getLogger(__name__)
 
+# 一括検証で受け付ける最大トークン数
+MAX_BULK_VERIFY_TOKENS = int(os.getenv("AGENT_TOKEN_BULK_VERIFY_MAX", "100"))
+# 期限切れAgent Tokenのスイープ間隔（秒、0で無効）
+AGENT_TOKEN_SWEEP_INTERVAL_SECONDS = int(os.getenv("AGENT_TOKEN_SWEEP_INTERVAL_SECONDS", "300"))
+AGENT_TOKEN_SWEEP_BATCH_SIZE = 1000
+# 清算台帳・バッチファイル
+SETTLEMENT_DATABASE_URL = os.getenv("SETTLEMENT_DATABASE_URL", "sqlite+aiosqlite:///./data/payment_network.db")
+SETTLEMENT_DIR = os.getenv("SETTLEMENT_DIR", "./data/settlement")
+# トークン列挙・失効・スイープ用の管理者トークン（X-Admin-Tokenヘッダー、未設定時は管理者エンドポイントを拒否）
+NETWORK_ADMIN_TOKEN_ENV = "NETWORK_ADMIN_TOKEN"
+# 清算バッチの自動クローズ間隔（秒、0で無効）
+SETTLEMENT_BATCH_CLOSE_INTERVAL_SECONDS = int(os.getenv("SETTLEMENT_BATCH_CLOSE_INTERVAL_SECONDS", "3600"))
+
 
 # ========================================
 # リクエスト/レスポンスモデル
@@ -69,6 +87,28 @@ class VerifyTokenResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BulkVerifyTokensRequest(BaseModel):
+    """
+    トークン一括検証リクエスト
+    """
+    agent_tokens: List[str] = Field(..., min_length=1, max_length=MAX_BULK_VERIFY_TOKENS)
+
+
+class BulkVerifyTokensResponse(BaseModel):
+    """
+    トークン一括検証レスポンス（リクエストと同じ順序）
+    """
+    results: List[Dict[str, Any]]
+
+
+class RevokeTokensRequest(BaseModel):
+    """
+    トークン失効リクエスト（payer_id・payment_mandate_idの少なくとも一方を指定）
+    """
+    payer_id: Optional[str] = None
+    payment_mandate_id: Optional[str] = None
+
+
 class ChargeRequest(BaseModel):
     """
     決済実行リクエスト（Payment Processorから受信）
@@ -78,6 +118,8 @@ class ChargeRequest(BaseModel):
     amount: Dict[str, Any]  # {"value": 1000.0, "currency": "JPY"}
     payment_mandate_id: str  # PaymentMandate ID
     payer_id: str  # 支払者ID
+    merchant_id: Optional[str] = None  # 加盟店ID（清算バッチのグループ化に使用）
+    capture: bool = True  # Falseの場合はオーソリのみ（/network/captureで後からキャプチャ）
 
 
 class ChargeResponse(BaseModel):
@@ -91,6 +133,14 @@ class ChargeResponse(BaseModel):
     error: Optional[str] = None
 
 
+class CaptureRequest(BaseModel):
+    """
+    キャプチャリクエスト（オーソリ済み取引の売上確定）
+    """
+    network_transaction_id: str
+    amount: Optional[Dict[str, Any]] = None  # 省略時はオーソリ金額（オーソリ金額以下のみ可）
+
+
 # ========================================
 # Payment Network Service
 # ========================================
@@ -107,6 +157,9 @@ class PaymentNetworkService:
     デモ環境でのスタブ実装です。
     """
 
+    # Idempotency-Keyヘッダーで重複排除するPOSTパス
+    IDEMPOTENT_PATHS = ("/network/charge", "/network/tokenize")
+
     def __init__(self, network_name: str = "DemoPaymentNetwork"):
         self.network_name = network_name
         self.app = FastAPI(
@@ -127,21 +180,93 @@ class PaymentNetworkService:
             prefix="agent_token"  # Key prefix: agent_token:xxx
         )
 
+        # Agent Tokenのセカンダリインデックス（支払者・PaymentMandate・有効期限）
+        self.agent_token_index = AgentTokenIndex(
+            redis_client=self.redis_client,
+            prefix="agent_token_idx"  # Key prefix: agent_token_idx:payer:xxx 等
+        )
+
         # Helperクラス初期化（RedisベースのTokenStore）
         self.token_helpers = TokenHelpers(
             network_name=self.network_name,
-            token_store=self.agent_token_store
+            token_store=self.agent_token_store,
+            index=self.agent_token_index
+        )
+        self._sweep_task: Optional[asyncio.Task] = None
+
+        # 清算台帳（オーソリ・キャプチャ・バッチクローズ）
+        self.settlement_ledger = SettlementLedger(SETTLEMENT_DATABASE_URL)
+        self.settlement_writer = SettlementFileWriter(SETTLEMENT_DIR)
+        self._settlement_task: Optional[asyncio.Task] = None
+
+        # オンデマンドのプロファイリング（PROFILING_ADMIN_TOKEN設定時のみ、最も内側のミドルウェア）
+        self.profiler = register_profiling(self.app)
+
+        # Idempotency-Key（再送時の二重キャプチャ・二重トークン発行を防止）
+        self.app.add_middleware(
+            IdempotencyMiddleware,
+            redis_client=self.redis_client,
+            paths=self.IDEMPOTENT_PATHS,
+            namespace="payment_network"
         )
 
         # エンドポイント登録
         self.register_endpoints()
 
+        @self.app.on_event("startup")
+        async def startup_event():
+            """清算台帳の初期化と、期限切れAgent Tokenスイープ・清算バッチクローズの定期実行を開始"""
+            await self.settlement_ledger.init_db()
+            await self.settlement_ledger.start()
+            if AGENT_TOKEN_SWEEP_INTERVAL_SECONDS > 0:
+                self._sweep_task = asyncio.create_task(self._sweep_loop(AGENT_TOKEN_SWEEP_INTERVAL_SECONDS))
+            if SETTLEMENT_BATCH_CLOSE_INTERVAL_SECONDS > 0:
+                self._settlement_task = asyncio.create_task(
+                    self._settlement_loop(SETTLEMENT_BATCH_CLOSE_INTERVAL_SECONDS)
+                )
+
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            for task in (self._sweep_task, self._settlement_task):
+                if task is not None:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+            self._sweep_task = None
+            self._settlement_task = None
+            await self.settlement_ledger.stop()
+
         logger.info(
             f"[{self.network_name}] Payment Network Service initialized\n"
             f"  Redis URL: {redis_url}\n"
             f"  Token Store: RedisベースのKVストア（TTL管理対応）"
         )
 
+    async def _sweep_loop(self, interval_seconds: int):
+        """期限切れAgent Tokenを定期的にインデックスから削除"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                # 上限件数に達した場合は続けてスイープ
+                swept = AGENT_TOKEN_SWEEP_BATCH_SIZE
+                while swept >= AGENT_TOKEN_SWEEP_BATCH_SIZE:
+                    swept = await self.token_helpers.sweep_expired_tokens(AGENT_TOKEN_SWEEP_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"[{self.network_name}] Agent Token sweep error: {e}", exc_info=True)
+
+    async def _settlement_loop(self, interval_seconds: int):
+        """キャプチャ済み取引の清算バッチを定期的にクローズ"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.settlement_ledger.close_batches(self.settlement_writer, self.network_name)
+            except Exception as e:
+                logger.error(f"[{self.network_name}] Settlement batch close error: {e}", exc_info=True)
+
+    @staticmethod
+    def _require_admin(token: Optional[str]):
+        """管理者トークンを検証（NETWORK_ADMIN_TOKEN未設定時は常に拒否）"""
+        require_token(NETWORK_ADMIN_TOKEN_ENV, token)
+
     def register_endpoints(self):
         """エンドポイントの登録"""
 
@@ -272,6 +397,90 @@ class PaymentNetworkService:
                 logger.error(f"[{self.network_name}] Token verification error: {e}", exc_info=True)
                 raise HTTPException(status_code=500, detail=str(e))
 
+        @self.app.post("/network/verify-tokens", response_model=BulkVerifyTokensResponse)
+        async def verify_tokens(request: BulkVerifyTokensRequest):
+            """
+            POST /network/verify-tokens - Agent Token一括検証
+
+            Redis 1往復（MGET）で複数トークンを検証する。
+
+            リクエスト:
+            {
+              "agent_tokens": ["agent_tok_xxx", "agent_tok_yyy"]
+            }
+
+            レスポンス:
+            {
+              "results": [
+                {"agent_token": "agent_tok_xxx", "valid": true, "token_info": {...}, "error": null},
+                {"agent_token": "agent_tok_yyy", "valid": false, "token_info": null, "error": "Agent Token expired"}
+              ]
+            }
+            """
+            try:
+                results = await self.token_helpers.verify_agent_tokens(request.agent_tokens)
+                return BulkVerifyTokensResponse(results=results)
+
+            except Exception as e:
+                logger.error(f"[{self.network_name}] Bulk token verification error: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/network/tokens")
+        async def list_tokens(
+            payer_id: Optional[str] = None,
+            payment_mandate_id: Optional[str] = None,
+            x_admin_token: Optional[str] = Header(None)
+        ):
+            """
+            GET /network/tokens?payer_id=...&payment_mandate_id=... - 有効なAgent Tokenの列挙（照合用、管理者のみ）
+
+            トークン本体は返さず、SHA-256ハッシュとメタデータのみ返す。
+
+            レスポンス:
+            {
+              "tokens": [{"token_hash": "3f2a...", "payment_mandate_id": "...", "payer_id": "...", ...}]
+            }
+            """
+            self._require_admin(x_admin_token)
+            if not payer_id and not payment_mandate_id:
+                raise HTTPException(status_code=400, detail="payer_id or payment_mandate_id is required")
+            tokens = await self.token_helpers.list_agent_tokens(
+                payer_id=payer_id, payment_mandate_id=payment_mandate_id
+            )
+            return {"tokens": tokens}
+
+        @self.app.post("/network/tokens/revoke")
+        async def revoke_tokens(request: RevokeTokensRequest, x_admin_token: Optional[str] = Header(None)):
+            """
+            POST /network/tokens/revoke - 支払者・PaymentMandateに紐づくAgent Tokenを失効（管理者のみ）
+
+            レスポンス:
+            {
+              "revoked": 2
+            }
+            """
+            self._require_admin(x_admin_token)
+            if not request.payer_id and not request.payment_mandate_id:
+                raise HTTPException(status_code=400, detail="payer_id or payment_mandate_id is required")
+            revoked = await self.token_helpers.revoke_agent_tokens(
+                payer_id=request.payer_id, payment_mandate_id=request.payment_mandate_id
+            )
+            return {"revoked": revoked}
+
+        @self.app.post("/network/tokens/sweep")
+        async def sweep_tokens(x_admin_token: Optional[str] = Header(None)):
+            """
+            POST /network/tokens/sweep - 期限切れAgent Tokenのインデックスエントリを削除（管理者のみ）
+
+            レスポンス:
+            {
+              "swept": 10
+            }
+            """
+            self._require_admin(x_admin_token)
+            swept = await self.token_helpers.sweep_expired_tokens(AGENT_TOKEN_SWEEP_BATCH_SIZE)
+            return {"swept": swept}
+
         @self.app.get("/network/info")
         async def network_info():
             """
@@ -347,20 +556,34 @@ class PaymentNetworkService:
                         error=f"Invalid agent token: {error}"
                     )
 
-                # 決済実行（スタブ実装）
+                # オーソリ（スタブ実装）
                 # 実際の決済ネットワークでは、ここでカード決済APIを呼び出す
                 network_transaction_id = f"net_txn_{uuid.uuid4().hex[:12]}"
                 authorization_code = f"AUTH{uuid.uuid4().hex[:6].upper()}"
 
+                # 清算台帳に記録（キャプチャ済みの取引は次回のバッチクローズで清算）
+                entry = await self.settlement_ledger.record_authorization(
+                    {
+                        "network_transaction_id": network_transaction_id,
+                        "transaction_id": transaction_id,
+                        "authorization_code": authorization_code,
+                        "amount": amount,
+                        "merchant_id": request.merchant_id,
+                        "payer_id": request.payer_id,
+                        "payment_mandate_id": request.payment_mandate_id
+                    },
+                    capture=request.capture
+                )
+
                 logger.info(
-                    f"[{self.network_name}] Payment captured: "
+                    f"[{self.network_name}] Payment {entry['status']}: "
                     f"transaction_id={transaction_id}, "
                     f"network_transaction_id={network_transaction_id}, "
                     f"authorization_code={authorization_code}"
                 )
 
                 return ChargeResponse(
-                    status="captured",
+                    status=entry["status"],
                     transaction_id=transaction_id,
                     network_transaction_id=network_transaction_id,
                     authorization_code=authorization_code
@@ -376,3 +599,58 @@ class PaymentNetworkService:
                     network_transaction_id="",
                     error=str(e)
                 )
+
+        @self.app.post("/network/capture", response_model=ChargeResponse)
+        async def capture_payment(request: CaptureRequest, x_admin_token: Optional[str] = Header(None)):
+            """
+            POST /network/capture - オーソリ済み取引のキャプチャ（管理者のみ）
+
+            /network/chargeをcapture=falseで呼び出した取引の売上を確定する。
+            キャプチャ後の取引は次回のバッチクローズで清算される。
+            """
+            self._require_admin(x_admin_token)
+            amount_value = request.amount.get("value") if request.amount else None
+            entry = await self.settlement_ledger.capture(request.network_transaction_id, amount_value)
+            if entry is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Transaction not found, already captured, or capture amount exceeds authorization"
+                )
+
+            return ChargeResponse(
+                status=entry["status"],
+                transaction_id=entry["transaction_id"],
+                network_transaction_id=entry["network_transaction_id"],
+                authorization_code=entry["authorization_code"]
+            )
+
+        @self.app.post("/network/settlement/close")
+        async def close_settlement_batches(x_admin_token: Optional[str] = Header(None)):
+            """
+            POST /network/settlement/close - 清算バッチのクローズ（管理者のみ）
+
+            キャプチャ済み・未清算の取引を加盟店×通貨ごとにバッチ化し、清算バッチファイルを出力
+
+            レスポンス:
+            {
+              "batches": [{"id": "batch_xxx", "merchant_id": "...", "currency": "JPY", "entry_count": 10, ...}]
+            }
+            """
+            self._require_admin(x_admin_token)
+            batches = await self.settlement_ledger.close_batches(self.settlement_writer, self.network_name)
+            return {"batches": batches}
+
+        @self.app.get("/network/settlement/batches")
+        async def list_settlement_batches(limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+            """GET /network/settlement/batches - クローズ済み清算バッチ一覧（新しい順、管理者のみ）"""
+            self._require_admin(x_admin_token)
+            return {"batches": await self.settlement_ledger.list_batches(limit=limit)}
+
+        @self.app.get("/network/settlement/batches/{batch_id}")
+        async def get_settlement_batch(batch_id: str, x_admin_token: Optional[str] = Header(None)):
+            """GET /network/settlement/batches/{batch_id} - 清算バッチ取得（管理者のみ）"""
+            self._require_admin(x_admin_token)
+            batch = await self.settlement_ledger.get_batch(batch_id)
+            if batch is None:
+                raise HTTPException(status_code=404, detail="Settlement batch not found")
+            return batch
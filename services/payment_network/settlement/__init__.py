@@ -0,0 +1,29 @@
+"""
+v2/services/payment_network/settlement/__init__.py
+
+Payment Network 清算サブシステム
+- オーソリ・キャプチャの台帳（SQLite、グループコミットによる追記）
+- 加盟店×通貨ごとのバッチクローズと清算バッチファイル
+"""
+
+from .batch_file import SettlementFileWriter
+from .ledger import (
+    STATUS_AUTHORIZED,
+    STATUS_CAPTURED,
+    STATUS_SETTLED,
+    SettlementBatch,
+    SettlementEntry,
+    SettlementLedger,
+    to_minor_units,
+)
+
+__all__ = [
+    "STATUS_AUTHORIZED",
+    "STATUS_CAPTURED",
+    "STATUS_SETTLED",
+    "SettlementBatch",
+    "SettlementEntry",
+    "SettlementFileWriter",
+    "SettlementLedger",
+    "to_minor_units",
+]
@@ -0,0 +1,100 @@
+"""
+v2/services/payment_network/settlement/batch_file.py
+
+清算バッチファイルの書き出し
+
+フォーマット（CSV、1バッチ1ファイル）:
+    H,<batch_id>,<network_name>,<merchant_id>,<currency>,<closed_at>
+    D,<network_transaction_id>,<transaction_id>,<authorization_code>,<captured_value>,<captured_at>
+    ...
+    T,<entry_count>,<total_value>
+
+金額はcents。一時ファイルに書いてからrenameするため、途中までのファイルが残らない。
+"""
+
+import csv
+import hashlib
+import io
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class SettlementFileWriter:
+    """
+    清算バッチファイルライター
+
+    使用例:
+        writer = SettlementFileWriter("./data/settlement")
+        file_path, sha256 = writer.write(batch_id, "DemoPaymentNetwork", "merchant_001", "JPY", closed_at, entries)
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: 出力先ディレクトリ（日付ごとのサブディレクトリに出力）
+        """
+        self.directory = Path(directory)
+
+    @staticmethod
+    def render(
+        batch_id: str,
+        network_name: str,
+        merchant_id: str,
+        currency: str,
+        closed_at: datetime,
+        entries: List[Dict[str, Any]]
+    ) -> bytes:
+        """バッチファイルの内容を生成"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(["H", batch_id, network_name, merchant_id, currency, closed_at.isoformat()])
+        total = 0
+        for entry in entries:
+            total += entry["captured_value"]
+            writer.writerow([
+                "D",
+                entry["network_transaction_id"],
+                entry["transaction_id"],
+                entry["authorization_code"],
+                entry["captured_value"],
+                entry["captured_at"] or "",
+            ])
+        writer.writerow(["T", len(entries), total])
+        return buffer.getvalue().encode("utf-8")
+
+    def write(
+        self,
+        batch_id: str,
+        network_name: str,
+        merchant_id: str,
+        currency: str,
+        closed_at: datetime,
+        entries: List[Dict[str, Any]]
+    ) -> Tuple[str, str]:
+        """
+        バッチファイルを書き出す
+
+        Returns:
+            Tuple[str, str]: (file_path, sha256)
+        """
+        data = self.render(batch_id, network_name, merchant_id, currency, closed_at, entries)
+        directory = self.directory / closed_at.strftime("%Y%m%d")
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{batch_id}.csv"
+        tmp_path = path.with_suffix(".csv.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return str(path), hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def remove(file_path: str):
+        """書き出し済みファイルを削除（バッチ登録失敗時）"""
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
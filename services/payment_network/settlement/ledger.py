@@ -0,0 +1,397 @@
+"""
+v2/services/payment_network/settlement/ledger.py
+
+決済ネットワークの清算台帳（SQLite）
+
+- オーソリ（authorize）を即時記録し、キャプチャは即時または後から（authorize-now / capture-later）
+- 台帳への追記はグループコミット: 同時に届いた記録を1トランザクション・1回のexecutemanyでまとめて書き込む
+- バッチクローズでキャプチャ済み・未清算のエントリを加盟店×通貨ごとにまとめ、清算バッチファイルを出力
+
+テーブル（Payment Network専用DB、共通スキーマとは別のメタデータ）:
+- settlement_entries: 取引ごとのオーソリ・キャプチャ・清算状態
+- settlement_batches: クローズ済みの清算バッチ
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, event, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import declarative_base
+
+from .batch_file import SettlementFileWriter
+
+logger = logging.getLogger(__name__)
+
+SettlementBase = declarative_base()
+
+STATUS_AUTHORIZED = "authorized"
+STATUS_CAPTURED = "captured"
+STATUS_SETTLED = "settled"
+
+# 加盟店IDが無い取引のグループ名
+UNASSIGNED_MERCHANT = "unassigned"
+
+# SQLiteのバインド変数上限を超えないためのIN句の分割サイズ
+_IN_CHUNK_SIZE = 500
+
+
+def to_minor_units(value: Any) -> int:
+    """金額（"1000", 1000.5 等）をcentsに変換（浮動小数点誤差を丸める）"""
+    return int(round(float(value) * 100))
+
+
+class SettlementEntry(SettlementBase):
+    """
+    settlement_entriesテーブル
+
+    - network_transaction_id (primary key)
+    - transaction_id (Payment ProcessorのトランザクションID)
+    - merchant_id / payer_id / payment_mandate_id
+    - currency, authorized_value / captured_value (cents)
+    - status (authorized | captured | settled)
+    - batch_id (清算バッチ、未清算はNULL)
+    """
+    __tablename__ = "settlement_entries"
+
+    network_transaction_id = Column(String, primary_key=True)
+    transaction_id = Column(String, nullable=False, index=True)
+    merchant_id = Column(String, nullable=False)
+    payer_id = Column(String, nullable=True)
+    payment_mandate_id = Column(String, nullable=True)
+    authorization_code = Column(String, nullable=False)
+    currency = Column(String, nullable=False)
+    authorized_value = Column(Integer, nullable=False)  # cents
+    captured_value = Column(Integer, nullable=True)  # cents
+    status = Column(String, nullable=False)
+    batch_id = Column(String, nullable=True, index=True)
+    authorized_at = Column(DateTime, nullable=False)
+    captured_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # バッチクローズの対象抽出（status=captured AND batch_id IS NULL）
+        Index("ix_settlement_entries_status_batch", "status", "batch_id"),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "network_transaction_id": self.network_transaction_id,
+            "transaction_id": self.transaction_id,
+            "merchant_id": self.merchant_id,
+            "payer_id": self.payer_id,
+            "payment_mandate_id": self.payment_mandate_id,
+            "authorization_code": self.authorization_code,
+            "currency": self.currency,
+            "authorized_value": self.authorized_value,
+            "captured_value": self.captured_value,
+            "status": self.status,
+            "batch_id": self.batch_id,
+            "authorized_at": self.authorized_at.isoformat() if self.authorized_at else None,
+            "captured_at": self.captured_at.isoformat() if self.captured_at else None,
+        }
+
+
+class SettlementBatch(SettlementBase):
+    """
+    settlement_batchesテーブル
+
+    - id (batch_id)
+    - merchant_id, currency
+    - entry_count, total_value (cents)
+    - closed_at
+    - file_path, file_sha256 (清算バッチファイル)
+    """
+    __tablename__ = "settlement_batches"
+
+    id = Column(String, primary_key=True)
+    merchant_id = Column(String, nullable=False, index=True)
+    currency = Column(String, nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    total_value = Column(Integer, nullable=False)  # cents
+    closed_at = Column(DateTime, nullable=False, index=True)
+    file_path = Column(String, nullable=False)
+    file_sha256 = Column(String, nullable=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "merchant_id": self.merchant_id,
+            "currency": self.currency,
+            "entry_count": self.entry_count,
+            "total_value": self.total_value,
+            "closed_at": self.closed_at.isoformat() if self.closed_at else None,
+            "file_path": self.file_path,
+            "file_sha256": self.file_sha256,
+        }
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL・synchronous=NORMALで追記スループットを確保（読み取りとクローズを書き込みと並行可能に）"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+class SettlementLedger:
+    """
+    清算台帳
+
+    使用例:
+        ledger = SettlementLedger("sqlite+aiosqlite:///./data/payment_network.db")
+        await ledger.init_db()
+        await ledger.start()
+        await ledger.record_authorization({...}, capture=True)
+        batches = await ledger.close_batches(SettlementFileWriter("./data/settlement"), "DemoPaymentNetwork")
+        await ledger.stop()
+
+    start()前・stop()後の記録はグループコミットを使わず即時に書き込む。
+    """
+
+    def __init__(self, database_url: str, flush_interval: float = 0.002, max_batch_size: int = 500):
+        """
+        Args:
+            database_url: 台帳DBのURL
+            flush_interval: グループコミットで後続の記録を待つ最大秒数
+            max_batch_size: 1回のコミットでまとめる最大件数
+        """
+        self.database_url = database_url
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.engine = create_async_engine(database_url, echo=False)
+        if database_url.startswith("sqlite"):
+            event.listen(self.engine.sync_engine, "connect", _configure_sqlite)
+        self.async_session = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._close_lock = asyncio.Lock()
+
+    async def init_db(self):
+        """テーブル作成（SQLiteファイルの親ディレクトリが無い場合は作成）"""
+        database = self.engine.url.database
+        if self.engine.url.get_backend_name() == "sqlite" and database and database != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(SettlementBase.metadata.create_all)
+
+    async def start(self):
+        """グループコミットのフラッシャーを起動"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(), name="settlement-ledger-flusher")
+
+    async def stop(self):
+        """残りの記録を書き込んでフラッシャーを停止"""
+        if self._flusher is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            self._stopping = False
+        await self._flush()
+
+    async def dispose(self):
+        await self.stop()
+        await self.engine.dispose()
+
+    # ----------------------------------------
+    # 追記（オーソリ・キャプチャ）
+    # ----------------------------------------
+
+    async def record_authorization(self, entry: Dict[str, Any], capture: bool = True) -> Dict[str, Any]:
+        """
+        オーソリを台帳に記録（capture=Trueの場合はキャプチャ済みとして記録）
+
+        Args:
+            entry: network_transaction_id, transaction_id, authorization_code, amount ({"value", "currency"}),
+                   merchant_id, payer_id, payment_mandate_id
+            capture: 即時キャプチャするか
+
+        Returns:
+            Dict: 記録した行
+        """
+        now = datetime.now(timezone.utc)
+        amount = entry.get("amount") or {}
+        authorized_value = to_minor_units(amount.get("value", 0))
+        row = {
+            "network_transaction_id": entry["network_transaction_id"],
+            "transaction_id": entry["transaction_id"],
+            "merchant_id": entry.get("merchant_id") or UNASSIGNED_MERCHANT,
+            "payer_id": entry.get("payer_id"),
+            "payment_mandate_id": entry.get("payment_mandate_id"),
+            "authorization_code": entry["authorization_code"],
+            "currency": amount.get("currency", "JPY"),
+            "authorized_value": authorized_value,
+            "captured_value": authorized_value if capture else None,
+            "status": STATUS_CAPTURED if capture else STATUS_AUTHORIZED,
+            "batch_id": None,
+            "authorized_at": now,
+            "captured_at": now if capture else None,
+        }
+
+        if self._flusher is None:
+            await self._write_rows([row])
+            return row
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        self._wakeup.set()
+        await future
+        return row
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            # 同時に届く後続の記録を短時間だけ待ってまとめる
+            if not self._stopping and len(self._pending) < self.max_batch_size:
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        while self._pending:
+            pending = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            try:
+                await self._write_rows([row for row, _ in pending])
+            except Exception as e:
+                logger.error(f"[SettlementLedger] Failed to append {len(pending)} entries: {e}", exc_info=True)
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in pending:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _write_rows(self, rows: List[Dict[str, Any]]):
+        async with self.async_session() as session:
+            await session.execute(insert(SettlementEntry), rows)
+            await session.commit()
+
+    async def capture(self, network_transaction_id: str, amount_value: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        オーソリ済みエントリをキャプチャ
+
+        Args:
+            network_transaction_id: ネットワーク側のトランザクションID
+            amount_value: キャプチャ金額（省略時はオーソリ金額、オーソリ金額以下のみ可）
+
+        Returns:
+            Dict: キャプチャ後のエントリ（対象が無い・キャプチャ済み・金額超過の場合None）
+        """
+        async with self.async_session() as session:
+            entry = await session.get(SettlementEntry, network_transaction_id)
+            if entry is None or entry.status != STATUS_AUTHORIZED:
+                return None
+            captured_value = entry.authorized_value if amount_value is None else to_minor_units(amount_value)
+            if captured_value <= 0 or captured_value > entry.authorized_value:
+                return None
+
+            entry.status = STATUS_CAPTURED
+            entry.captured_value = captured_value
+            entry.captured_at = datetime.now(timezone.utc)
+            await session.commit()
+            return entry.to_dict()
+
+    async def get_entry(self, network_transaction_id: str) -> Optional[Dict[str, Any]]:
+        async with self.async_session() as session:
+            entry = await session.get(SettlementEntry, network_transaction_id)
+            return entry.to_dict() if entry else None
+
+    # ----------------------------------------
+    # バッチクローズ
+    # ----------------------------------------
+
+    async def close_batches(
+        self,
+        writer: SettlementFileWriter,
+        network_name: str,
+        closed_at: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        キャプチャ済み・未清算のエントリを加盟店×通貨ごとに清算バッチとしてクローズ
+
+        バッチファイルを書き出してから、同一トランザクションでバッチ登録とエントリの清算済み更新を行う
+        （コミット失敗時は書き出したファイルを削除）。
+
+        Returns:
+            List[Dict]: クローズしたバッチ
+        """
+        closed_at = closed_at or datetime.now(timezone.utc)
+        async with self._close_lock:
+            async with self.async_session() as session:
+                result = await session.execute(
+                    select(SettlementEntry)
+                    .where(SettlementEntry.status == STATUS_CAPTURED, SettlementEntry.batch_id.is_(None))
+                    .order_by(SettlementEntry.merchant_id, SettlementEntry.currency, SettlementEntry.captured_at)
+                )
+                entries = result.scalars().all()
+                if not entries:
+                    return []
+
+                groups: Dict[Tuple[str, str], List[SettlementEntry]] = {}
+                for entry in entries:
+                    groups.setdefault((entry.merchant_id, entry.currency), []).append(entry)
+
+                batches: List[SettlementBatch] = []
+                try:
+                    for (merchant_id, currency), group in groups.items():
+                        batch_id = f"batch_{closed_at.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+                        file_path, file_sha256 = await asyncio.to_thread(
+                            writer.write, batch_id, network_name, merchant_id, currency, closed_at,
+                            [entry.to_dict() for entry in group]
+                        )
+                        batch = SettlementBatch(
+                            id=batch_id,
+                            merchant_id=merchant_id,
+                            currency=currency,
+                            entry_count=len(group),
+                            total_value=sum(entry.captured_value for entry in group),
+                            closed_at=closed_at,
+                            file_path=file_path,
+                            file_sha256=file_sha256
+                        )
+                        session.add(batch)
+                        batches.append(batch)
+
+                        ids = [entry.network_transaction_id for entry in group]
+                        for start in range(0, len(ids), _IN_CHUNK_SIZE):
+                            await session.execute(
+                                update(SettlementEntry)
+                                .where(SettlementEntry.network_transaction_id.in_(ids[start:start + _IN_CHUNK_SIZE]))
+                                .values(status=STATUS_SETTLED, batch_id=batch_id)
+                                .execution_options(synchronize_session=False)
+                            )
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    for batch in batches:
+                        writer.remove(batch.file_path)
+                    raise
+
+        logger.info(
+            f"[SettlementLedger] Closed {len(batches)} settlement batches "
+            f"({len(entries)} entries, closed_at={closed_at.isoformat()})"
+        )
+        return [batch.to_dict() for batch in batches]
+
+    async def list_batches(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """クローズ済みバッチ一覧（新しい順）"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(SettlementBatch).order_by(SettlementBatch.closed_at.desc()).limit(limit)
+            )
+            return [batch.to_dict() for batch in result.scalars().all()]
+
+    async def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        async with self.async_session() as session:
+            batch = await session.get(SettlementBatch, batch_id)
+            return batch.to_dict() if batch else None
@@ -4,8 +4,11 @@ v2/services/payment_network/utils/__init__.py
 Payment Network Service ユーティリティモジュール
 """
 
-from .token_helpers import TokenHelpers
+from .token_helpers import AgentTokenIndex, TokenHelpers, expires_at_epoch, hash_agent_token
 
 __all__ = [
+    "AgentTokenIndex",
     "TokenHelpers",
+    "expires_at_epoch",
+    "hash_agent_token",
 ]
@@ -2,30 +2,126 @@
 v2/services/payment_network/utils/token_helpers.py
 
 Agent Token生成・検証関連のヘルパーメソッド
+
+- 有効期限はepoch秒（int）でも保存し、検証時のISO文字列パースを省略
+- セカンダリインデックス（支払者・PaymentMandate・有効期限のソート済みセット）で
+  KEYSを使わずにトークンを列挙・失効・スイープ
 """
 
+import json
+import time
+import hashlib
 import uuid
 import logging
 import secrets
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone, timedelta
 
-from common.redis_client import TokenStore
+from common.redis_client import RedisClient, TokenStore
 
 logger = logging.getLogger(__name__)
 
 
+def hash_agent_token(agent_token: str) -> str:
+    """Agent TokenのSHA-256ハッシュ（列挙結果でトークン本体の代わりに返す照合用の値）"""
+    return hashlib.sha256(agent_token.encode()).hexdigest()
+
+
+def expires_at_epoch(token_data: Dict[str, Any]) -> int:
+    """トークンデータの有効期限（epoch秒）を取得（epoch未保存の旧トークンはISO文字列から変換）"""
+    epoch = token_data.get("expires_at_epoch")
+    if epoch is not None:
+        return int(epoch)
+    return int(datetime.fromisoformat(token_data["expires_at"]).timestamp())
+
+
+class AgentTokenIndex:
+    """
+    Agent Tokenのセカンダリインデックス（Redisソート済みセット、スコア=有効期限のepoch秒）
+
+    Redisキー:
+    - {prefix}:payer:{payer_id} - 支払者ごとのトークン
+    - {prefix}:mandate:{payment_mandate_id} - PaymentMandateごとのトークン
+    - {prefix}:expiry - 全トークン（メンバーは [token, payer_id, payment_mandate_id] のJSON、スイープ用）
+
+    支払者・PaymentMandateのセットは最後のトークンの期限切れとともにTTLで消える。
+    期限切れエントリはsweep時に全インデックスから削除する。
+    """
+
+    def __init__(self, redis_client: RedisClient, prefix: str = "agent_token_idx"):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def payer_key(self, payer_id: str) -> str:
+        return f"{self.prefix}:payer:{payer_id}"
+
+    def mandate_key(self, payment_mandate_id: str) -> str:
+        return f"{self.prefix}:mandate:{payment_mandate_id}"
+
+    @property
+    def expiry_key(self) -> str:
+        return f"{self.prefix}:expiry"
+
+    @staticmethod
+    def _expiry_member(token: str, payer_id: Optional[str], payment_mandate_id: Optional[str]) -> str:
+        return json.dumps([token, payer_id, payment_mandate_id])
+
+    async def add(
+        self,
+        token: str,
+        payer_id: Optional[str],
+        payment_mandate_id: Optional[str],
+        expires_at: int,
+        ttl_seconds: int
+    ):
+        """トークンを各インデックスに登録"""
+        if payer_id:
+            await self.redis.zadd(self.payer_key(payer_id), {token: expires_at}, ttl_seconds=ttl_seconds)
+        if payment_mandate_id:
+            await self.redis.zadd(
+                self.mandate_key(payment_mandate_id), {token: expires_at}, ttl_seconds=ttl_seconds
+            )
+        await self.redis.zadd(
+            self.expiry_key, {self._expiry_member(token, payer_id, payment_mandate_id): expires_at}
+        )
+
+    async def remove(self, token: str, payer_id: Optional[str], payment_mandate_id: Optional[str]):
+        """トークンを各インデックスから削除"""
+        if payer_id:
+            await self.redis.zrem(self.payer_key(payer_id), [token])
+        if payment_mandate_id:
+            await self.redis.zrem(self.mandate_key(payment_mandate_id), [token])
+        await self.redis.zrem(self.expiry_key, [self._expiry_member(token, payer_id, payment_mandate_id)])
+
+    async def tokens_for_payer(self, payer_id: str, min_expires_at: float = float("-inf")) -> List[str]:
+        """支払者のトークン一覧（有効期限の昇順）"""
+        return await self.redis.zrange_by_score(self.payer_key(payer_id), min_expires_at, float("inf"))
+
+    async def tokens_for_mandate(self, payment_mandate_id: str, min_expires_at: float = float("-inf")) -> List[str]:
+        """PaymentMandateのトークン一覧（有効期限の昇順）"""
+        return await self.redis.zrange_by_score(
+            self.mandate_key(payment_mandate_id), min_expires_at, float("inf")
+        )
+
+    async def expired_entries(self, now: int, limit: int) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """有効期限がnow以前のエントリ (token, payer_id, payment_mandate_id) を取得"""
+        members = await self.redis.zrange_by_score(self.expiry_key, float("-inf"), now, limit=limit)
+        return [tuple(json.loads(member)) for member in members]
+
+
 class TokenHelpers:
     """Agent Token生成・検証に関連するヘルパーメソッドを提供するクラス（Redis対応）"""
 
-    def __init__(self, network_name: str, token_store: TokenStore):
+    def __init__(self, network_name: str, token_store: TokenStore, index: Optional[AgentTokenIndex] = None):
         """
         Args:
             network_name: ネットワーク名
             token_store: RedisベースのTokenStore
+            index: セカンダリインデックス（Noneの場合は列挙・失効・スイープ不可）
         """
         self.network_name = network_name
         self.token_store = token_store
+        self.index = index
 
     async def generate_agent_token(
         self,
@@ -61,6 +157,8 @@ class TokenHelpers:
             "amount": payment_mandate.get("amount"),
             "issued_at": now.isoformat(),
             "expires_at": expires_at.isoformat(),
+            "issued_at_epoch": int(now.timestamp()),
+            "expires_at_epoch": int(expires_at.timestamp()),
             "network_name": self.network_name,
             "attestation_verified": attestation_verified
         }
@@ -69,6 +167,15 @@ class TokenHelpers:
         ttl_seconds = expiry_hours * 3600
         await self.token_store.save_token(agent_token, token_data, ttl_seconds=ttl_seconds)
 
+        if self.index is not None:
+            await self.index.add(
+                agent_token,
+                payer_id=token_data["payer_id"],
+                payment_mandate_id=token_data["payment_mandate_id"],
+                expires_at=token_data["expires_at_epoch"],
+                ttl_seconds=ttl_seconds
+            )
+
         logger.info(
             f"[{self.network_name}] Issued Agent Token (Redis): {agent_token[:32]}..., "
             f"expires_at={expires_at.isoformat()}, ttl={ttl_seconds}s"
@@ -76,6 +183,18 @@ class TokenHelpers:
 
         return agent_token, expires_at.isoformat()
 
+    @staticmethod
+    def _token_info(token_data: Dict[str, Any]) -> Dict[str, Any]:
+        """検証結果として返すトークン情報（支払い方法トークンは含めない）"""
+        return {
+            "payment_mandate_id": token_data.get("payment_mandate_id"),
+            "payer_id": token_data.get("payer_id"),
+            "amount": token_data.get("amount"),
+            "network_name": token_data.get("network_name"),
+            "issued_at": token_data.get("issued_at"),
+            "expires_at": token_data.get("expires_at")
+        }
+
     async def verify_agent_token(self, agent_token: str) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
         """
         Agent Token検証（Redis対応）
@@ -95,8 +214,7 @@ class TokenHelpers:
             return False, None, "Agent Token not found"
 
         # 有効期限確認（Redis TTLで自動削除されるが、念のため確認）
-        expires_at = datetime.fromisoformat(token_data["expires_at"])
-        if datetime.now(timezone.utc) > expires_at:
+        if time.time() > expires_at_epoch(token_data):
             logger.warning(f"[{self.network_name}] Agent Token expired: {agent_token[:32]}...")
             # 期限切れトークンを削除
             await self.token_store.delete_token(agent_token)
@@ -107,13 +225,141 @@ class TokenHelpers:
             f"payment_mandate_id={token_data.get('payment_mandate_id')}"
         )
 
-        token_info = {
-            "payment_mandate_id": token_data.get("payment_mandate_id"),
-            "payer_id": token_data.get("payer_id"),
-            "amount": token_data.get("amount"),
-            "network_name": token_data.get("network_name"),
-            "issued_at": token_data.get("issued_at"),
-            "expires_at": token_data.get("expires_at")
-        }
+        return True, self._token_info(token_data), None
+
+    async def verify_agent_tokens(self, agent_tokens: List[str]) -> List[Dict[str, Any]]:
+        """
+        複数のAgent Tokenを一括検証（MGETで1往復）
+
+        Args:
+            agent_tokens: Agent Tokenのリスト
+
+        Returns:
+            List[Dict]: agent_tokensと同じ順序の {"agent_token", "valid", "token_info", "error"}
+        """
+        unique_tokens = list(dict.fromkeys(agent_tokens))
+        token_data_list = await self.token_store.get_tokens(unique_tokens)
+
+        now = time.time()
+        results: Dict[str, Dict[str, Any]] = {}
+        expired: List[str] = []
+        for token, token_data in zip(unique_tokens, token_data_list):
+            if not token_data:
+                results[token] = {"agent_token": token, "valid": False, "token_info": None,
+                                  "error": "Agent Token not found"}
+            elif now > expires_at_epoch(token_data):
+                expired.append(token)
+                results[token] = {"agent_token": token, "valid": False, "token_info": None,
+                                  "error": "Agent Token expired"}
+            else:
+                results[token] = {"agent_token": token, "valid": True,
+                                  "token_info": self._token_info(token_data), "error": None}
+
+        if expired:
+            await self.token_store.delete_tokens(expired)
+
+        valid_count = sum(1 for result in results.values() if result["valid"])
+        logger.info(
+            f"[{self.network_name}] Bulk verified Agent Tokens: "
+            f"requested={len(agent_tokens)}, valid={valid_count}, expired={len(expired)}"
+        )
+        return [results[token] for token in agent_tokens]
+
+    def _require_index(self) -> AgentTokenIndex:
+        if self.index is None:
+            raise RuntimeError("Agent Token index is not configured")
+        return self.index
+
+    async def _indexed_tokens(
+        self,
+        payer_id: Optional[str],
+        payment_mandate_id: Optional[str],
+        min_expires_at: float = float("-inf")
+    ) -> List[str]:
+        index = self._require_index()
+        if not payer_id and not payment_mandate_id:
+            raise ValueError("payer_id or payment_mandate_id is required")
+
+        if payer_id and payment_mandate_id:
+            mandate_tokens = set(await index.tokens_for_mandate(payment_mandate_id, min_expires_at))
+            return [
+                token for token in await index.tokens_for_payer(payer_id, min_expires_at)
+                if token in mandate_tokens
+            ]
+        if payer_id:
+            return await index.tokens_for_payer(payer_id, min_expires_at)
+        return await index.tokens_for_mandate(payment_mandate_id, min_expires_at)
+
+    async def list_agent_tokens(
+        self,
+        payer_id: Optional[str] = None,
+        payment_mandate_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        支払者・PaymentMandateで有効なAgent Tokenを列挙（照合ジョブ用、KEYS不使用）
+
+        Returns:
+            List[Dict]: 有効期限の昇順のトークン情報（トークン本体は含めず、token_hashで照合）
+        """
+        tokens = await self._indexed_tokens(payer_id, payment_mandate_id, min_expires_at=time.time())
+        token_data_list = await self.token_store.get_tokens(tokens)
+        return [
+            {"token_hash": hash_agent_token(token), **self._token_info(token_data)}
+            for token, token_data in zip(tokens, token_data_list)
+            if token_data
+        ]
+
+    async def revoke_agent_tokens(
+        self,
+        payer_id: Optional[str] = None,
+        payment_mandate_id: Optional[str] = None
+    ) -> int:
+        """
+        支払者・PaymentMandateに紐づくAgent Tokenを失効
+
+        Returns:
+            int: 失効したトークン数（既に期限切れで消えていたものは含まない）
+        """
+        index = self._require_index()
+        tokens = await self._indexed_tokens(payer_id, payment_mandate_id)
+        if not tokens:
+            return 0
+
+        token_data_list = await self.token_store.get_tokens(tokens)
+        revoked = await self.token_store.delete_tokens(tokens)
+        for token, token_data in zip(tokens, token_data_list):
+            # 他方のインデックスのキーはトークンデータから取得（データ消失済みなら指定値のみ）
+            token_data = token_data or {}
+            await index.remove(
+                token,
+                payer_id=token_data.get("payer_id", payer_id),
+                payment_mandate_id=token_data.get("payment_mandate_id", payment_mandate_id)
+            )
+
+        logger.info(
+            f"[{self.network_name}] Revoked Agent Tokens: "
+            f"payer_id={payer_id}, payment_mandate_id={payment_mandate_id}, revoked={revoked}"
+        )
+        return revoked
+
+    async def sweep_expired_tokens(self, limit: int = 1000) -> int:
+        """
+        期限切れAgent Tokenをインデックスから削除（トークンデータが残っていれば削除）
+
+        Args:
+            limit: 1回のスイープで処理する最大件数
+
+        Returns:
+            int: スイープしたエントリ数
+        """
+        index = self._require_index()
+        entries = await index.expired_entries(int(time.time()), limit)
+        if not entries:
+            return 0
+
+        await self.token_store.delete_tokens([token for token, _, _ in entries])
+        for token, payer_id, payment_mandate_id in entries:
+            await index.remove(token, payer_id=payer_id, payment_mandate_id=payment_mandate_id)
 
-        return True, token_info, None
+        logger.info(f"[{self.network_name}] Swept {len(entries)} expired Agent Tokens")
+        return len(entries)
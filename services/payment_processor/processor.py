@@ -7,25 +7,32 @@ Payment Processor実装
 - レシート生成
 """
 
+import asyncio
+import os
 import sys
 import uuid
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Dict, Optional, Tuple
 from datetime import datetime, timezone
 import logging
 
 import httpx
 from fastapi import HTTPException, Header
+from fastapi.responses import JSONResponse
 from common.base_agent import BaseAgent, AgentPassphraseManager
 from common.models import A2AMessage, ProcessPaymentRequest, ProcessPaymentResponse
 from common.database import DatabaseManager, TransactionCRUD
 from common.user_authorization import verify_user_authorization_vp, compute_mandate_hash
 from common.auth import verify_access_token
+from common.idempotency import post_idempotent
 from common.logger import get_logger, log_a2a_message, log_database_operation, LoggingAsyncClient
 from common.telemetry import get_tracer, create_http_span, is_telemetry_enabled
 
 # Payment Processor ユーティリティモジュール
-from services.payment_processor.utils import JWTHelpers, MandateHelpers
+from services.payment_processor.utils import (
+    JWTHelpers, MandateHelpers, BackgroundJobQueue, Job, PermanentJobError, ReceiptRenderer, RECEIPT_RENDERED_EVENT,
+    ReceiptIndexCache, create_receipt_store, build_receipt_response, build_render_input, save_receipt_mandates
+)
 
 logger = get_logger(__name__, service_name='payment_processor')
 tracer = get_tracer(__name__)
@@ -43,6 +50,16 @@ SHORT_HTTP_TIMEOUT = 10.0  # 短い通信のタイムアウト
 STATUS_CAPTURED = "captured"
 STATUS_FAILED = "failed"
 
+# 領収書ジョブキュー設定（レシート生成・CP通知はレスポンス経路外で実行）
+RECEIPT_JOB_WORKERS = int(os.getenv("RECEIPT_JOB_WORKERS", "2"))
+RECEIPT_JOB_MAX_RETRIES = int(os.getenv("RECEIPT_JOB_MAX_RETRIES", "5"))
+RECEIPT_JOB_RETRY_BASE_SECONDS = float(os.getenv("RECEIPT_JOB_RETRY_BASE_SECONDS", "0.5"))
+
+# 領収書PDFレンダリング設定（PDF生成はプロセスプールで実行、0の場合はスレッド）
+# 保存先はRECEIPT_STORE_BACKEND（local / s3）で切り替え（create_receipt_store参照）
+RECEIPTS_DIR = Path(os.getenv("RECEIPTS_DIR", "/app/v2/data/receipts"))
+RECEIPT_RENDER_WORKERS = int(os.getenv("RECEIPT_RENDER_WORKERS", "2"))
+
 
 class PaymentProcessorService(BaseAgent):
     """
@@ -54,6 +71,9 @@ class PaymentProcessorService(BaseAgent):
     - レシート生成
     """
 
+    # Idempotency-Keyヘッダーで重複排除するPOSTパス（クライアント再送時の再実行を防止）
+    IDEMPOTENT_PATHS = ("/process",)
+
     def __init__(self):
         super().__init__(
             agent_id="did:ap2:agent:payment_processor",
@@ -88,6 +108,22 @@ class PaymentProcessorService(BaseAgent):
         self.jwt_helpers = JWTHelpers(key_manager=self.key_manager)
         self.mandate_helpers = MandateHelpers()
 
+        # 領収書PDFレンダリングワーカー
+        self.receipt_store = create_receipt_store(str(RECEIPTS_DIR))
+        self.receipt_index = ReceiptIndexCache()
+        self.receipt_renderer = ReceiptRenderer(
+            self.receipt_store, workers=RECEIPT_RENDER_WORKERS, index=self.receipt_index
+        )
+
+        # 領収書ジョブキュー（レシート生成 → CP通知をバックグラウンドで再試行付き実行）
+        self.receipt_jobs = BackgroundJobQueue(
+            "receipts",
+            handler=self._run_receipt_job,
+            workers=RECEIPT_JOB_WORKERS,
+            max_retries=RECEIPT_JOB_MAX_RETRIES,
+            retry_base_seconds=RECEIPT_JOB_RETRY_BASE_SECONDS
+        )
+
         # 起動イベントハンドラー登録
         @self.app.on_event("startup")
         async def startup_event():
@@ -98,6 +134,14 @@ class PaymentProcessorService(BaseAgent):
             await self.db_manager.init_db()
             logger.info(f"[{self.agent_name}] Database initialized")
 
+            await self.receipt_jobs.start()
+
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            """停止時に残りの領収書ジョブを処理"""
+            await self.receipt_jobs.stop()
+            self.receipt_renderer.shutdown()
+
         logger.info(f"[{self.agent_name}] Initialized")
 
     def get_ap2_roles(self) -> list[str]:
@@ -187,14 +231,18 @@ class PaymentProcessorService(BaseAgent):
               "receipt_url"?: "...",
               "error"?: "..."
             }
+
+            再送時の二重決済を防ぐため、呼び出し側はIdempotency-Key: <PaymentMandate ID>を付けること
+            （common.idempotency.post_idempotent）。
             """
             try:
                 payment_mandate = request.payment_mandate
                 cart_mandate = request.cart_mandate  # VDC交換：CartMandateを取得
                 credential_token = request.credential_token
 
-                # 1. PaymentMandateバリデーション
+                # 1. PaymentMandateバリデーション（領収書の入力もチャージ前に検証）
                 self._validate_payment_mandate(payment_mandate)
+                self._validate_receipt_inputs(cart_mandate)
 
                 # 2. トランザクション作成
                 transaction_id = f"txn_{uuid.uuid4().hex[:12]}"
@@ -215,8 +263,10 @@ class PaymentProcessorService(BaseAgent):
 
                 # ===== レスポンス生成 =====
                 if result["status"] == STATUS_CAPTURED:
-                    # レシート生成（PDF形式、VDC交換によりCartMandateを渡す）
-                    receipt_url = await self._generate_receipt(transaction_id, payment_mandate, cart_mandate)
+                    # レシート生成（PDF形式、VDC交換によりCartMandateを渡す）はバックグラウンドで実行
+                    receipt_url = self._enqueue_receipt_job(
+                        transaction_id, payment_mandate, cart_mandate, result, notify_credential_provider=False
+                    )
 
                     return ProcessPaymentResponse(
                         transaction_id=transaction_id,
@@ -297,7 +347,9 @@ class PaymentProcessorService(BaseAgent):
         @self.app.get("/receipts/{transaction_id}.pdf")
         async def get_receipt_pdf(
             transaction_id: str,
-            authorization: str = Header(None)
+            authorization: str = Header(None),
+            range_header: Optional[str] = Header(None, alias="Range"),
+            if_none_match: Optional[str] = Header(None)
         ):
             """
             GET /receipts/{transaction_id}.pdf - 領収書PDFダウンロード（AP2完全準拠）
@@ -307,12 +359,18 @@ class PaymentProcessorService(BaseAgent):
             - トランザクション所有者のみアクセス可能
             - JWT内のuser_id（payer_id）とトランザクションのpayer_idが一致する必要あり
 
+            キャッシュ・部分取得：
+            - ETagはコンテンツハッシュ（If-None-Match一致時は304）
+            - Rangeヘッダー（単一範囲）に対応（206 / 416）
+
             Args:
                 transaction_id: トランザクションID
                 authorization: Authorizationヘッダー（Bearer JWT）
+                range_header: Rangeヘッダー（オプション）
+                if_none_match: If-None-Matchヘッダー（オプション）
 
             Returns:
-                FileResponse: 領収書PDFファイル
+                Response: 領収書PDF（200 / 206 / 304）
 
             Raises:
                 HTTPException:
@@ -349,8 +407,17 @@ class PaymentProcessorService(BaseAgent):
                 )
 
                 # 3. 領収書の所有者検証（AP2完全準拠：セキュリティ）
-                async with self.db_manager.get_session() as session:
-                    receipt = await ReceiptCRUD.get_by_transaction_id(session, transaction_id)
+                # 生成待ちの領収書（バックグラウンドジョブ処理中）はジョブのPaymentMandateで検証してから202
+                # 繰り返しダウンロード時はキャッシュした所有者・ハッシュを使いDB検索を省略
+                pending_job = self.receipt_jobs.get_pending(transaction_id)
+                indexed = self.receipt_index.get(transaction_id)
+                if pending_job:
+                    owner_id, content_hash = pending_job.payload["payment_mandate"].get("payer_id"), None
+                elif indexed:
+                    owner_id, content_hash = indexed
+                else:
+                    async with self.db_manager.get_session() as session:
+                        receipt = await ReceiptCRUD.get_by_transaction_id(session, transaction_id)
 
                     if not receipt:
                         logger.warning(
@@ -358,35 +425,60 @@ class PaymentProcessorService(BaseAgent):
                         )
                         raise HTTPException(status_code=404, detail="Receipt not found")
 
-                    # レシートのuser_idとJWT内のuser_idが一致するか確認
-                    if receipt.user_id != user_id_from_jwt:
-                        logger.warning(
-                            f"[get_receipt_pdf] Access denied: JWT user_id={user_id_from_jwt}, "
-                            f"receipt user_id={receipt.user_id}"
-                        )
-                        raise HTTPException(
-                            status_code=403,
-                            detail="Access denied: You do not own this receipt"
-                        )
+                    owner_id, content_hash = receipt.user_id, receipt.content_hash
+                    if content_hash:
+                        self.receipt_index.put(transaction_id, owner_id, content_hash)
 
-                # 4. 領収書ファイル取得
-                receipts_dir = Path("/app/v2/data/receipts")
-                receipt_file_path = receipts_dir / f"{transaction_id}.pdf"
-
-                if not receipt_file_path.exists():
-                    logger.warning(f"[get_receipt_pdf] Receipt file not found: {receipt_file_path}")
-                    raise HTTPException(status_code=404, detail="Receipt file not found")
+                # レシートのuser_idとJWT内のuser_idが一致するか確認
+                if owner_id != user_id_from_jwt:
+                    logger.warning(
+                        f"[get_receipt_pdf] Access denied: JWT user_id={user_id_from_jwt}, "
+                        f"receipt user_id={owner_id}"
+                    )
+                    raise HTTPException(
+                        status_code=403,
+                        detail="Access denied: You do not own this receipt"
+                    )
 
                 logger.info(
                     f"[get_receipt_pdf] Access granted: user_id={user_id_from_jwt}, "
                     f"transaction_id={transaction_id}"
                 )
 
-                return FileResponse(
-                    path=str(receipt_file_path),
-                    media_type="application/pdf",
-                    filename=f"receipt_{transaction_id}.pdf"
-                )
+                if pending_job:
+                    return JSONResponse(
+                        status_code=202,
+                        content={"transaction_id": transaction_id, "status": "pending"},
+                        headers={"Retry-After": "1"}
+                    )
+
+                # 4. 領収書取得
+                filename = f"receipt_{transaction_id}.pdf"
+                if not content_hash:
+                    # コンテンツハッシュ導入前の領収書（フラットなファイル）
+                    receipt_file_path = RECEIPTS_DIR / f"{transaction_id}.pdf"
+                    if not receipt_file_path.exists():
+                        logger.warning(f"[get_receipt_pdf] Receipt file not found: {receipt_file_path}")
+                        raise HTTPException(status_code=404, detail="Receipt file not found")
+                    return FileResponse(
+                        path=str(receipt_file_path),
+                        media_type="application/pdf",
+                        filename=filename
+                    )
+
+                try:
+                    return await build_receipt_response(
+                        self.receipt_store,
+                        content_hash,
+                        filename,
+                        range_header=range_header,
+                        if_none_match=if_none_match
+                    )
+                except FileNotFoundError:
+                    logger.warning(f"[get_receipt_pdf] Receipt content not found: {content_hash}")
+                    # 別プロセスで再レンダリング・削除された古いハッシュをキャッシュしていた場合、次回はDBから引き直す
+                    self.receipt_index.discard(transaction_id)
+                    raise HTTPException(status_code=404, detail="Receipt file not found")
 
             except HTTPException:
                 raise
@@ -422,9 +514,10 @@ class PaymentProcessorService(BaseAgent):
             logger.error("[PaymentProcessor] Missing payment_mandate in payload")
             raise ValueError("Payload must contain 'payment_mandate' field")
 
-        # AP2仕様準拠：PaymentMandate検証
+        # AP2仕様準拠：PaymentMandate検証（領収書の入力もチャージ前に検証）
         try:
             self._validate_payment_mandate(payment_mandate)
+            self._validate_receipt_inputs(cart_mandate)
         except Exception as e:
             logger.error(f"[PaymentProcessor] PaymentMandate validation failed: {e}")
             return {
@@ -436,9 +529,16 @@ class PaymentProcessorService(BaseAgent):
                 }
             }
 
-        # AP2仕様準拠：Mandate連鎖検証
+        # 決済処理実行
+        # AP2仕様準拠：Mandate連鎖検証（ローカル暗号検証）はスレッドで実行し、
+        # Credential Providerへの認証情報検証と並行させる（連鎖検証失敗時はチャージしない）
+        transaction_id = f"txn_{uuid.uuid4().hex[:12]}"
         try:
-            self._validate_mandate_chain(payment_mandate, cart_mandate)
+            result = await self._process_payment_mock(
+                transaction_id,
+                payment_mandate,
+                chain_validation=asyncio.to_thread(self._validate_mandate_chain, payment_mandate, cart_mandate)
+            )
         except Exception as e:
             logger.error(f"[PaymentProcessor] Mandate chain validation failed: {e}")
             return {
@@ -450,25 +550,19 @@ class PaymentProcessorService(BaseAgent):
                 }
             }
 
-        # 決済処理実行
-        transaction_id = f"txn_{uuid.uuid4().hex[:12]}"
-        result = await self._process_payment_mock(transaction_id, payment_mandate)
-
         # トランザクション保存
         await self._save_transaction(transaction_id, payment_mandate, result)
 
         # ===== レスポンス生成 =====
         if result["status"] == STATUS_CAPTURED:
-            receipt_url = await self._generate_receipt(transaction_id, payment_mandate, cart_mandate)
-
-            # AP2 Step 29: Credential Providerに領収書を送信
-            if self.enable_receipt_notification:
-                await self._send_receipt_to_credential_provider(
-                    transaction_id=transaction_id,
-                    receipt_url=receipt_url,
-                    payer_id=payment_mandate.get("payer_id"),
-                    payment_mandate=payment_mandate
-                )
+            # レシート生成とAP2 Step 29（Credential Providerへの領収書送信）はバックグラウンドで実行
+            receipt_url = self._enqueue_receipt_job(
+                transaction_id,
+                payment_mandate,
+                cart_mandate,
+                result,
+                notify_credential_provider=self.enable_receipt_notification
+            )
 
             return {
                 "type": "ap2.responses.PaymentResult",
@@ -677,6 +771,9 @@ class PaymentProcessorService(BaseAgent):
             f"CartMandate({cart_mandate_id})"
         )
 
+        # CartMandateハッシュはuser_authorizationとmerchant_authorizationの検証で共用（1回だけ計算）
+        cart_hash: Optional[str] = None
+
         # 3. user_authorization SD-JWT-VC検証（AP2仕様完全準拠）
         user_authorization = payment_mandate.get("user_authorization")
         if user_authorization:
@@ -738,9 +835,8 @@ class PaymentProcessorService(BaseAgent):
                         f"{cart_hash_in_jwt[:16]}..."
                     )
 
-                    # 実際のCartMandateハッシュを計算（RFC 8785準拠）
-                    # compute_mandate_hashは既にグローバルにimportされている（v2.common.user_authorizationから）
-                    actual_cart_hash = compute_mandate_hash(cart_mandate)
+                    # 実際のCartMandateハッシュを計算（RFC 8785準拠、user_authorization検証で計算済みなら再利用）
+                    actual_cart_hash = cart_hash or compute_mandate_hash(cart_mandate)
 
                     # ハッシュを比較
                     if actual_cart_hash != cart_hash_in_jwt:
@@ -789,7 +885,8 @@ class PaymentProcessorService(BaseAgent):
         self,
         transaction_id: str,
         payment_mandate: Dict[str, Any],
-        credential_token: Optional[str] = None
+        credential_token: Optional[str] = None,
+        chain_validation: Optional[Awaitable[Any]] = None
     ) -> Dict[str, Any]:
         """
         決済処理（Payment Network連携）
@@ -800,51 +897,35 @@ class PaymentProcessorService(BaseAgent):
         3. Payment Networkに決済実行を依頼
 
         Payment Network連携により、実際の決済ネットワーク（スタブ）を使用
+
+        Args:
+            chain_validation: Mandate連鎖検証のawaitable（オプション）
+                              ステージ2と並行して実行し、失敗時は例外を送出してチャージしない
+
+        Raises:
+            Exception: chain_validationが失敗した場合（その他の失敗はstatus=failedで返す）
         """
         logger.info(f"[PaymentProcessor] Processing payment: {transaction_id}")
 
         amount = payment_mandate.get("amount", {})
         payment_method = payment_mandate.get("payment_method", {})
 
-        # AP2 Step 26-27: Credential Providerにトークン検証を依頼
-        token = payment_method.get("token")
-        if not token:
-            logger.error(f"[PaymentProcessor] No token found in payment_method")
-            return {
-                "status": "failed",
-                "transaction_id": transaction_id,
-                "error": "No payment method token provided"
-            }
-
-        try:
-            # Credential Providerにトークン検証・認証情報要求
-            credential_info = await self._verify_credential_with_cp(
-                token=token,
-                payer_id=payment_mandate.get("payer_id"),
-                amount=amount
+        # ステージ1+2: ローカル暗号検証とCP認証情報検証を並行実行
+        credential_stage = self._obtain_agent_token(transaction_id, payment_mandate)
+        if chain_validation is not None:
+            chain_outcome, credential_outcome = await asyncio.gather(
+                chain_validation, credential_stage, return_exceptions=True
             )
+            if isinstance(chain_outcome, BaseException):
+                raise chain_outcome
+            if isinstance(credential_outcome, BaseException):
+                raise credential_outcome
+        else:
+            credential_outcome = await credential_stage
 
-            logger.info(f"[PaymentProcessor] Credential verified: {credential_info.get('payment_method_id')}")
-
-            # Agent Token取得（CPレスポンスに含まれる）
-            agent_token = credential_info.get("agent_token")
-            if not agent_token:
-                logger.error(f"[PaymentProcessor] No agent_token returned from Credential Provider")
-                return {
-                    "status": "failed",
-                    "transaction_id": transaction_id,
-                    "error": "Credential Provider did not return agent_token"
-                }
-
-            logger.info(f"[PaymentProcessor] Agent token received from CP: {agent_token[:20]}...")
-
-        except Exception as e:
-            logger.error(f"[PaymentProcessor] Credential verification failed: {e}")
-            return {
-                "status": "failed",
-                "transaction_id": transaction_id,
-                "error": f"Credential verification failed: {str(e)}"
-            }
+        agent_token, failure = credential_outcome
+        if failure:
+            return failure
 
         # AP2仕様準拠：リスクベース承認/拒否判定
         # PaymentMandateからリスク評価結果を取得
@@ -882,14 +963,18 @@ class PaymentProcessorService(BaseAgent):
                     "payment_network.transaction_id": transaction_id
                 }
             ) as span:
-                response = await self.http_client.post(
+                # Idempotency-Key=transaction_id: 応答が失われた場合の再送で二重キャプチャしない
+                response = await post_idempotent(
+                    self.http_client,
                     f"{self.payment_network_url}/network/charge",
+                    transaction_id,
                     json={
                         "agent_token": agent_token,
                         "transaction_id": transaction_id,
                         "amount": amount,
                         "payment_mandate_id": payment_mandate.get("id"),
-                        "payer_id": payment_mandate.get("payer_id")
+                        "payer_id": payment_mandate.get("payer_id"),
+                        "merchant_id": payment_mandate.get("payee_id")
                     },
                     timeout=SHORT_HTTP_TIMEOUT
                 )
@@ -958,6 +1043,58 @@ class PaymentProcessorService(BaseAgent):
                 "fraud_indicators": fraud_indicators
             }
 
+    async def _obtain_agent_token(
+        self,
+        transaction_id: str,
+        payment_mandate: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        AP2 Step 26-27: Credential Providerにトークン検証を依頼してagent_tokenを取得
+
+        Returns:
+            (agent_token, None) 成功時 / (None, 失敗結果dict) 失敗時
+        """
+        amount = payment_mandate.get("amount", {})
+        token = payment_mandate.get("payment_method", {}).get("token")
+        if not token:
+            logger.error(f"[PaymentProcessor] No token found in payment_method")
+            return None, {
+                "status": "failed",
+                "transaction_id": transaction_id,
+                "error": "No payment method token provided"
+            }
+
+        try:
+            # Credential Providerにトークン検証・認証情報要求
+            credential_info = await self._verify_credential_with_cp(
+                token=token,
+                payer_id=payment_mandate.get("payer_id"),
+                amount=amount
+            )
+
+            logger.info(f"[PaymentProcessor] Credential verified: {credential_info.get('payment_method_id')}")
+
+            # Agent Token取得（CPレスポンスに含まれる）
+            agent_token = credential_info.get("agent_token")
+            if not agent_token:
+                logger.error(f"[PaymentProcessor] No agent_token returned from Credential Provider")
+                return None, {
+                    "status": "failed",
+                    "transaction_id": transaction_id,
+                    "error": "Credential Provider did not return agent_token"
+                }
+
+            logger.info(f"[PaymentProcessor] Agent token received from CP: {agent_token[:20]}...")
+            return agent_token, None
+
+        except Exception as e:
+            logger.error(f"[PaymentProcessor] Credential verification failed: {e}")
+            return None, {
+                "status": "failed",
+                "transaction_id": transaction_id,
+                "error": f"Credential verification failed: {str(e)}"
+            }
+
     async def _save_transaction(
         self,
         transaction_id: str,
@@ -1054,6 +1191,8 @@ class PaymentProcessorService(BaseAgent):
 
         AP2 Step 29対応: Payment ProcessorがCredential Providerに領収書通知を送信
 
+        送信失敗時は例外を送出する（領収書ジョブキューで再試行）。
+
         Args:
             transaction_id: トランザクションID
             receipt_url: 領収書URL
@@ -1097,23 +1236,101 @@ class PaymentProcessorService(BaseAgent):
                 f"transaction_id={transaction_id}, status={response.status_code}"
             )
 
-        except httpx.HTTPError as e:
-            # 領収書送信失敗は致命的エラーではないので、ログのみ出力
-            logger.warning(
-                f"[PaymentProcessor] Failed to send receipt to Credential Provider: {e}. "
-                f"Continuing with payment process."
-            )
         except Exception as e:
+            # 領収書送信失敗は決済には影響しない（呼び出し元のジョブキューが再試行する）
             logger.warning(
-                f"[PaymentProcessor] Unexpected error while sending receipt: {e}. "
-                f"Continuing with payment process."
+                f"[PaymentProcessor] Failed to send receipt to Credential Provider: {e}"
+            )
+            raise
+
+    def _receipt_url(self, transaction_id: str) -> str:
+        """領収書URL（ブラウザからアクセス可能なlocalhost URL、ジョブ完了前に確定できる）"""
+        # Docker環境ではホストマシンのlocalhostからポート8004でアクセス可能
+        return f"http://localhost:8004/receipts/{transaction_id}.pdf"
+
+    def _enqueue_receipt_job(
+        self,
+        transaction_id: str,
+        payment_mandate: Dict[str, Any],
+        cart_mandate: Optional[Dict[str, Any]],
+        payment_result: Dict[str, Any],
+        notify_credential_provider: bool
+    ) -> str:
+        """
+        領収書ジョブ（レシート生成 → CP通知）をキューに投入し、領収書URLを返す
+
+        キューが満杯・未起動の場合もURLは返し、ジョブはキュー外のタスクとして同じ再試行規則で実行する
+        （実行中はpendingに含まれるため、GET /receiptsは202を返す）。
+        レンダリング入力はチャージ前に_validate_receipt_inputs()で検証済みであること。
+        """
+        job = Job(
+            job_id=transaction_id,
+            payload={
+                "payment_mandate": payment_mandate,
+                "cart_mandate": cart_mandate,
+                "payment_result": payment_result,
+                "notify_credential_provider": notify_credential_provider,
+            }
+        )
+        if not self.receipt_jobs.running or not self.receipt_jobs.submit(job):
+            logger.warning(f"[PaymentProcessor] Receipt queue unavailable, running job outside the queue: {transaction_id}")
+            self.receipt_jobs.run_detached(job)
+        return self._receipt_url(transaction_id)
+
+    async def _run_receipt_job(self, job: Job):
+        """
+        領収書ジョブを実行（完了済みステージは再試行時にスキップ）
+
+        1. レシートPDF生成・保存
+        2. AP2 Step 29: Credential Providerに領収書を送信
+        """
+        transaction_id = job.job_id
+        payment_mandate = job.payload["payment_mandate"]
+
+        try:
+            self._validate_receipt_inputs(job.payload.get("cart_mandate"))
+        except ValueError as e:
+            # 入力不備は再試行しても成功しない
+            raise PermanentJobError(str(e)) from e
+
+        if "receipt_url" not in job.state:
+            job.state["receipt_url"] = await self._generate_receipt(
+                transaction_id,
+                payment_mandate,
+                job.payload.get("cart_mandate"),
+                payment_result=job.payload.get("payment_result")
+            )
+
+        if job.payload.get("notify_credential_provider") and not job.state.get("notified"):
+            await self._send_receipt_to_credential_provider(
+                transaction_id=transaction_id,
+                receipt_url=job.state["receipt_url"],
+                payer_id=payment_mandate.get("payer_id"),
+                payment_mandate=payment_mandate
+            )
+            job.state["notified"] = True
+
+    @staticmethod
+    def _validate_receipt_inputs(cart_mandate: Optional[Dict[str, Any]]) -> None:
+        """
+        領収書のレンダリング入力を検証（チャージ前に同期的に呼ぶ）
+
+        Raises:
+            ValueError: CartMandateがない場合（AP2仕様違反）
+        """
+        if not cart_mandate:
+            raise ValueError(
+                "AP2 specification violation: CartMandate not provided. "
+                "CartMandate with Merchant signature is required for all transactions. "
+                "VDC exchange principle: CartMandate must be passed from Shopping Agent."
             )
 
     async def _generate_receipt(
         self,
         transaction_id: str,
         payment_mandate: Dict[str, Any],
-        cart_mandate: Optional[Dict[str, Any]] = None
+        cart_mandate: Optional[Dict[str, Any]] = None,
+        payment_result: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         レシート生成（実際のPDF生成）
@@ -1126,31 +1343,15 @@ class PaymentProcessorService(BaseAgent):
             transaction_id: トランザクションID
             payment_mandate: PaymentMandate（最小限のペイロード）
             cart_mandate: CartMandate（注文詳細、領収書生成に必要）
+            payment_result: 決済結果（省略時はトランザクションイベントから取得）
 
         Returns:
             str: 領収書PDF URL
         """
         try:
-            # receipt_generatorをインポート
-            from common.receipt_generator import generate_receipt_pdf
-
             # トランザクション結果を取得（_process_payment_mockの結果から）
-            async with self.db_manager.get_session() as session:
-                transaction = await TransactionCRUD.get_by_id(session, transaction_id)
-                if not transaction:
-                    logger.error(f"[PaymentProcessor] Transaction not found for receipt generation: {transaction_id}")
-                    raise ValueError(f"Transaction not found: {transaction_id}")
-
-                transaction_dict = transaction.to_dict()
-
-                # トランザクションイベントから決済結果を取得
-                events = transaction_dict.get("events", [])
-                payment_result = None
-                for event in events:
-                    if event.get("type") == "payment_processed":
-                        payment_result = event.get("result", {})
-                        break
-
+            if payment_result is None:
+                payment_result = await self._load_payment_result(transaction_id)
                 if not payment_result:
                     logger.warning(f"[PaymentProcessor] Payment result not found in transaction events")
                     return f"https://receipts.ap2-demo.com/{transaction_id}.pdf"
@@ -1167,45 +1368,27 @@ class PaymentProcessorService(BaseAgent):
                 logger.error(f"[PaymentProcessor] {error_msg}")
                 raise ValueError(error_msg)
 
-            # トランザクション結果を整形（receipt_generator.generate_receipt_pdf用）
-            transaction_result = {
-                "id": transaction_id,
-                "status": payment_result.get("status", "captured"),
-                "authorized_at": payment_result.get("authorized_at", "N/A"),
-                "captured_at": payment_result.get("captured_at", "N/A")
-            }
-
-            # ユーザー名を生成（AP2完全準拠：マイクロサービスの独立性を保つ）
-            # AP2仕様: PaymentMandateにユーザー名は含まれない
-            # 各サービスは独立したDBを持つため、payer_idから表示名を生成
-            import os
+            # PDFを生成・保存（レンダリングワーカーで実行）
+            render_input = build_render_input(transaction_id, payment_result, cart_mandate, payment_mandate)
             payer_id = payment_mandate.get("payer_id") or os.getenv("DEFAULT_USER_ID", "user_demo_001")
-            user_name = f"User {payer_id[:8]}" if payer_id.startswith("usr_") else "Demo User"
-
-            logger.info(f"[PaymentProcessor] Generated user name for receipt: {user_name} (payer_id: {payer_id})")
-
-            # PDFを生成
-            pdf_buffer = generate_receipt_pdf(
-                transaction_result=transaction_result,
-                cart_mandate=cart_mandate,
-                payment_mandate=payment_mandate,
-                user_name=user_name
+            logger.info(
+                f"[PaymentProcessor] Generated user name for receipt: {render_input['user_name']} (payer_id: {payer_id})"
             )
+            content_hash = await self.receipt_renderer.render_to_store(render_input)
 
-            # PDFをファイルシステムに保存
-            import os
-            receipts_dir = Path("/app/v2/data/receipts")
-            receipts_dir.mkdir(parents=True, exist_ok=True)
+            receipt_url = self._receipt_url(transaction_id)
 
-            receipt_file_path = receipts_dir / f"{transaction_id}.pdf"
-            with open(receipt_file_path, "wb") as f:
-                f.write(pdf_buffer.getvalue())
-
-            logger.info(f"[PaymentProcessor] Generated receipt PDF: {receipt_file_path}")
-
-            # URLを生成（ブラウザからアクセス可能なlocalhost URL）
-            # Docker環境ではホストマシンのlocalhostからポート8004でアクセス可能
-            receipt_url = f"http://localhost:8004/receipts/{transaction_id}.pdf"
+            # 再レンダリング用にマンデートを保存し、トランザクションイベントには参照だけを記録
+            # （イベントにマンデート本体・個人情報を複製しない）
+            async with self.db_manager.get_session() as session:
+                references = await save_receipt_mandates(session, transaction_id, cart_mandate, payment_mandate)
+                await TransactionCRUD.add_event(session, transaction_id, {
+                    "type": RECEIPT_RENDERED_EVENT,
+                    "receipt_url": receipt_url,
+                    "content_hash": content_hash,
+                    **references,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                })
 
             # データベースにレシートレコードを保存（AP2完全準拠）
             try:
@@ -1217,7 +1400,8 @@ class PaymentProcessorService(BaseAgent):
                         "transaction_id": transaction_id,
                         "receipt_url": receipt_url,
                         "amount_value": int(payment_result.get("amount", {}).get("value", 0) * 100),  # cents
-                        "currency": payment_result.get("amount", {}).get("currency", "JPY")
+                        "currency": payment_result.get("amount", {}).get("currency", "JPY"),
+                        "content_hash": content_hash
                     }
                     await ReceiptCRUD.create(session, receipt_data)
                     logger.info(f"[PaymentProcessor] Receipt record saved to database: {transaction_id}")
@@ -1230,3 +1414,16 @@ class PaymentProcessorService(BaseAgent):
             logger.error(f"[_generate_receipt] Failed to generate PDF receipt: {e}", exc_info=True)
             # AP2完全準拠: 領収書生成失敗時は例外を再スロー
             raise ValueError(f"Receipt generation failed for transaction {transaction_id}: {str(e)}") from e
+
+    async def _load_payment_result(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        """トランザクションイベントから決済結果を取得"""
+        async with self.db_manager.get_session() as session:
+            transaction = await TransactionCRUD.get_by_id(session, transaction_id)
+            if not transaction:
+                logger.error(f"[PaymentProcessor] Transaction not found for receipt generation: {transaction_id}")
+                raise ValueError(f"Transaction not found: {transaction_id}")
+
+            for event in transaction.to_dict().get("events", []):
+                if event.get("type") == "payment_processed":
+                    return event.get("result", {})
+        return None
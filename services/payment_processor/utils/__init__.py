@@ -6,8 +6,32 @@ Payment Processor ユーティリティモジュール
 
 from .jwt_helpers import JWTHelpers
 from .mandate_helpers import MandateHelpers
+from .job_queue import BackgroundJobQueue, Job, PermanentJobError
+from .receipt_store import (
+    ReceiptStore, LocalDiskReceiptStore, S3ReceiptStore, ReceiptIndexCache,
+    create_receipt_store, build_receipt_response
+)
+from .receipt_renderer import (
+    ReceiptRenderer, RECEIPT_RENDERED_EVENT, build_render_input, save_receipt_mandates, load_render_input,
+    rerender_receipts_in_range
+)
 
 __all__ = [
     "JWTHelpers",
     "MandateHelpers",
+    "BackgroundJobQueue",
+    "Job",
+    "PermanentJobError",
+    "ReceiptStore",
+    "LocalDiskReceiptStore",
+    "S3ReceiptStore",
+    "ReceiptIndexCache",
+    "create_receipt_store",
+    "build_receipt_response",
+    "ReceiptRenderer",
+    "RECEIPT_RENDERED_EVENT",
+    "build_render_input",
+    "save_receipt_mandates",
+    "load_render_input",
+    "rerender_receipts_in_range",
 ]
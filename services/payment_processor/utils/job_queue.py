@@ -0,0 +1,218 @@
+"""
+v2/services/payment_processor/utils/job_queue.py
+
+バックグラウンドジョブキュー（レスポンス経路外の処理用）
+
+- asyncio.Queueとワーカータスクで非同期ジョブを実行
+- 失敗したジョブは指数バックオフで再試行
+- 再試行上限に達したジョブ・PermanentJobErrorで失敗したジョブはdead_lettersに保持
+- キューが未起動・満杯の場合はrun_detached()で同じ再試行規則のタスクとして実行（参照を保持）
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """再試行しても成功しない失敗（入力不備など）。再試行せずにdead_lettersへ移す"""
+
+
+@dataclass
+class Job:
+    """キューに投入するジョブ"""
+    job_id: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+    last_error: Optional[str] = None
+    # ハンドラーがステージ間の進捗を保存する領域（再試行時に完了済みステージをスキップ）
+    state: Dict[str, Any] = field(default_factory=dict)
+
+
+class BackgroundJobQueue:
+    """
+    再試行付きバックグラウンドジョブキュー
+
+    使用例:
+        queue = BackgroundJobQueue("receipts", handler=self._run_receipt_job)
+        await queue.start()
+        queue.submit(Job(job_id=transaction_id, payload={...}))
+        await queue.stop()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Job], Awaitable[None]],
+        workers: int = 2,
+        max_retries: int = 5,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 30.0,
+        max_queue_size: int = 1000
+    ):
+        """
+        Args:
+            name: キュー名（ログ用）
+            handler: ジョブを処理するコルーチン関数（例外で失敗を通知）
+            workers: ワーカー数
+            max_retries: 最大再試行回数
+            retry_base_seconds: 再試行間隔の初期値（試行ごとに2倍）
+            retry_max_seconds: 再試行間隔の上限
+            max_queue_size: キューの最大長（超過時はsubmitがFalseを返す）
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.pending: Set[str] = set()
+        self.dead_letters: List[Job] = []
+        self._jobs: Dict[str, Job] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+        self._retry_tasks: Set[asyncio.Task] = set()
+        self._detached_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._worker_tasks)
+
+    async def start(self):
+        """ワーカーを起動"""
+        if self.running:
+            return
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"[BackgroundJobQueue:{self.name}] Started {self.workers} workers")
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        キューを処理し終えてからワーカーを停止
+
+        Args:
+            timeout: 残りジョブの処理を待つ最大秒数
+        """
+        if not self.running and not self._detached_tasks:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"[BackgroundJobQueue:{self.name}] Stopping with {len(self.pending)} pending jobs"
+            )
+        tasks = [*self._worker_tasks, *self._retry_tasks, *self._detached_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._retry_tasks.clear()
+        self._detached_tasks.clear()
+        logger.info(f"[BackgroundJobQueue:{self.name}] Stopped")
+
+    def submit(self, job: Job) -> bool:
+        """
+        ジョブを投入（ブロックしない）
+
+        Returns:
+            bool: 投入できた場合True（キューが満杯の場合False）
+        """
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.error(f"[BackgroundJobQueue:{self.name}] Queue full, rejecting job: {job.job_id}")
+            return False
+        self._track(job)
+        return True
+
+    def run_detached(self, job: Job):
+        """
+        キューを経由せずにジョブを実行（キューが未起動・満杯の場合の代替）
+
+        submit()と同じく実行中はpendingに含まれ、同じ規則で再試行する。
+        タスクの参照はキューが保持し、stop()で待機・キャンセルする。
+        """
+        self._track(job)
+        task = asyncio.create_task(self._run_until_done(job), name=f"{self.name}-detached-{job.job_id}")
+        self._detached_tasks.add(task)
+        task.add_done_callback(self._detached_tasks.discard)
+
+    def get_pending(self, job_id: str) -> Optional[Job]:
+        """実行待ち・実行中・再試行待ちのジョブを取得"""
+        return self._jobs.get(job_id)
+
+    async def join(self):
+        """投入済みジョブ（再試行待ち・キュー外で実行中のものを含む）が全て完了するまで待機"""
+        while True:
+            await self.queue.join()
+            if not self._retry_tasks and not self._detached_tasks:
+                return
+            await asyncio.gather(*self._retry_tasks, *self._detached_tasks, return_exceptions=True)
+
+    def _track(self, job: Job):
+        self.pending.add(job.job_id)
+        self._jobs[job.job_id] = job
+
+    def _untrack(self, job: Job):
+        self.pending.discard(job.job_id)
+        self._jobs.pop(job.job_id, None)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        delay = await self._attempt(job)
+        if delay is not None:
+            task = asyncio.create_task(self._requeue_later(job, delay))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+
+    async def _run_until_done(self, job: Job):
+        while True:
+            delay = await self._attempt(job)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, job: Job) -> Optional[float]:
+        """ジョブを1回実行（再試行する場合は待機秒数、完了・恒久的な失敗の場合はNoneを返す）"""
+        job.attempts += 1
+        try:
+            await self.handler(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.last_error = str(e)
+            if isinstance(e, PermanentJobError) or job.attempts > self.max_retries:
+                self._untrack(job)
+                self.dead_letters.append(job)
+                logger.error(
+                    f"[BackgroundJobQueue:{self.name}] Job failed permanently: "
+                    f"job_id={job.job_id}, attempts={job.attempts}, error={e}"
+                )
+                return None
+
+            delay = min(self.retry_base_seconds * (2 ** (job.attempts - 1)), self.retry_max_seconds)
+            logger.warning(
+                f"[BackgroundJobQueue:{self.name}] Job failed, retrying in {delay:.1f}s: "
+                f"job_id={job.job_id}, attempt={job.attempts}, error={e}"
+            )
+            return delay
+
+        self._untrack(job)
+        logger.debug(f"[BackgroundJobQueue:{self.name}] Job completed: job_id={job.job_id}")
+        return None
+
+    async def _requeue_later(self, job: Job, delay: float):
+        await asyncio.sleep(delay)
+        await self.queue.put(job)
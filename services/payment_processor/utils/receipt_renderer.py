@@ -0,0 +1,311 @@
+"""
+v2/services/payment_processor/utils/receipt_renderer.py
+
+領収書PDFレンダリングワーカー
+
+- PDF生成（ReportLab、CPUバウンド）をプロセスプールで実行し、イベントループをブロックしない
+- ワーカー起動時に日本語フォント登録・静的レイアウト構築を1回だけ実行
+- 生成したPDFは領収書ストア（コンテンツアドレス型）に保存
+- 日付範囲指定での一括再レンダリング
+  （トランザクションイベントにはマンデートの参照だけを記録し、再レンダリング時にmandatesテーブルから読み直す）
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .receipt_store import ReceiptIndexCache, ReceiptStore
+
+logger = logging.getLogger(__name__)
+
+# 領収書生成時にトランザクションへ記録するイベント種別（マンデートIDの参照を保持、マンデート本体は保持しない）
+RECEIPT_RENDERED_EVENT = "receipt_rendered"
+PAYMENT_PROCESSED_EVENT = "payment_processed"
+
+
+def _init_worker():
+    """ワーカープロセス初期化: フォント登録と静的レイアウトのキャッシュ"""
+    from common.receipt_generator import get_receipt_layout, register_receipt_font
+
+    get_receipt_layout(register_receipt_font())
+
+
+def render_receipt_bytes(
+    transaction_result: Dict[str, Any],
+    cart_mandate: Optional[Dict[str, Any]],
+    payment_mandate: Dict[str, Any],
+    user_name: str,
+    issued_at: Optional[str] = None
+) -> bytes:
+    """領収書PDFを生成してバイト列で返す（ワーカープロセスで実行）"""
+    from common.receipt_generator import generate_receipt_pdf
+
+    return generate_receipt_pdf(
+        transaction_result=transaction_result,
+        cart_mandate=cart_mandate,
+        payment_mandate=payment_mandate,
+        user_name=user_name,
+        issued_at=issued_at
+    ).getvalue()
+
+
+def build_render_input(
+    transaction_id: str,
+    payment_result: Dict[str, Any],
+    cart_mandate: Optional[Dict[str, Any]],
+    payment_mandate: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    決済結果とマンデートからレンダリング入力を構築（初回生成と再レンダリングで共通）
+
+    発行日時には決済の確定時刻（captured_at）を使うため、同じトランザクションの再レンダリングは同じPDFになる。
+    """
+    # ユーザー名を生成（AP2完全準拠：マイクロサービスの独立性を保つ）
+    # AP2仕様: PaymentMandateにユーザー名は含まれない
+    # 各サービスは独立したDBを持つため、payer_idから表示名を生成
+    payer_id = payment_mandate.get("payer_id") or os.getenv("DEFAULT_USER_ID", "user_demo_001")
+    return {
+        "transaction_result": {
+            "id": transaction_id,
+            "status": payment_result.get("status", "captured"),
+            "authorized_at": payment_result.get("authorized_at", "N/A"),
+            "captured_at": payment_result.get("captured_at", "N/A")
+        },
+        "cart_mandate": cart_mandate,
+        "payment_mandate": payment_mandate,
+        "user_name": f"User {payer_id[:8]}" if payer_id.startswith("usr_") else "Demo User",
+        "issued_at": payment_result.get("captured_at")
+    }
+
+
+async def save_receipt_mandates(
+    session,
+    transaction_id: str,
+    cart_mandate: Optional[Dict[str, Any]],
+    payment_mandate: Dict[str, Any]
+) -> Dict[str, Optional[str]]:
+    """
+    再レンダリング用にマンデートをmandatesテーブルに保存し、イベントに記録する参照を返す
+
+    既に同じIDのマンデートがあれば保存しない（ジョブの再試行で重複させない）。
+
+    Returns:
+        Dict: {"cart_mandate_id": ..., "payment_mandate_id": ...}
+    """
+    from common.database import MandateCRUD
+
+    references: Dict[str, Optional[str]] = {"cart_mandate_id": None, "payment_mandate_id": None}
+    mandates = [
+        ("payment_mandate_id", "Payment", payment_mandate, payment_mandate.get("id"), payment_mandate.get("payer_id")),
+    ]
+    if cart_mandate:
+        mandates.append((
+            "cart_mandate_id", "Cart", cart_mandate, payment_mandate.get("cart_mandate_id"),
+            cart_mandate.get("_metadata", {}).get("merchant_id")
+        ))
+    for reference, mandate_type, payload, mandate_id, issuer in mandates:
+        mandate_id = mandate_id or f"{transaction_id}_{mandate_type.lower()}_mandate"
+        if await MandateCRUD.get_by_id(session, mandate_id) is None:
+            await MandateCRUD.create(session, {
+                "id": mandate_id,
+                "type": mandate_type,
+                "status": "completed",
+                "payload": payload,
+                "issuer": issuer or "unknown",
+                "related_transaction_id": transaction_id
+            })
+        references[reference] = mandate_id
+    return references
+
+
+async def load_render_input(session, transaction) -> Optional[Dict[str, Any]]:
+    """
+    トランザクションイベントの参照からレンダリング入力を再構築
+
+    Returns:
+        Optional[Dict]: レンダリング入力（領収書イベント・決済結果・マンデートのいずれかがない場合はNone）
+    """
+    from common.database import MandateCRUD
+
+    events = json.loads(transaction.events) if transaction.events else []
+    rendered = next((event for event in reversed(events) if event.get("type") == RECEIPT_RENDERED_EVENT), None)
+    payment_result = next(
+        (event.get("result") for event in events if event.get("type") == PAYMENT_PROCESSED_EVENT), None
+    )
+    if rendered is None or payment_result is None or not rendered.get("payment_mandate_id"):
+        return None
+
+    payment_mandate = await MandateCRUD.get_by_id(session, rendered["payment_mandate_id"])
+    if payment_mandate is None:
+        return None
+    cart_mandate = None
+    if rendered.get("cart_mandate_id"):
+        cart_mandate = await MandateCRUD.get_by_id(session, rendered["cart_mandate_id"])
+        if cart_mandate is None:
+            return None
+    return build_render_input(
+        transaction.id,
+        payment_result,
+        cart_mandate.to_dict()["payload"] if cart_mandate else None,
+        payment_mandate.to_dict()["payload"]
+    )
+
+
+class ReceiptRenderer:
+    """
+    領収書PDFレンダリングサービス
+
+    使用例:
+        renderer = ReceiptRenderer(create_receipt_store(), workers=2)
+        content_hash = await renderer.render_to_store(render_input)
+        renderer.shutdown()
+
+    render_inputは以下のキーを持つdict（build_render_inputで構築）:
+        transaction_result, cart_mandate, payment_mandate, user_name, issued_at
+    """
+
+    def __init__(
+        self,
+        store: ReceiptStore,
+        workers: int = 2,
+        batch_concurrency: Optional[int] = None,
+        index: Optional[ReceiptIndexCache] = None
+    ):
+        """
+        Args:
+            store: 領収書PDFの保存先ストア
+            workers: レンダリングプロセス数（0の場合はスレッドで実行）
+            batch_concurrency: 一括再レンダリングの同時実行数（省略時はworkers * 2）
+            index: 保存後にコンテンツハッシュを差し替えるReceiptIndexCache（配信側と同じプロセスの場合）
+        """
+        self.store = store
+        self.index = index
+        self.workers = max(0, workers)
+        self.batch_concurrency = batch_concurrency or max(1, self.workers * 2)
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Optional[Executor]:
+        # プロセスプールは初回レンダリング時に起動（起動時間・テスト時のコストを抑える）
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            logger.info(f"[ReceiptRenderer] Started {self.workers} rendering workers")
+        return self._executor
+
+    async def render(self, render_input: Dict[str, Any]) -> bytes:
+        """領収書PDFを生成（プロセスプールまたはスレッドで実行）"""
+        args = (
+            render_input["transaction_result"],
+            render_input.get("cart_mandate"),
+            render_input["payment_mandate"],
+            render_input["user_name"],
+            render_input.get("issued_at"),
+        )
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(render_receipt_bytes, *args)
+        return await asyncio.get_running_loop().run_in_executor(executor, render_receipt_bytes, *args)
+
+    async def render_to_store(self, render_input: Dict[str, Any]) -> str:
+        """
+        領収書PDFを生成してストアに保存
+
+        Returns:
+            str: コンテンツハッシュ
+        """
+        data = await self.render(render_input)
+        content_hash = await self.store.put(data)
+        transaction_id = render_input["transaction_result"].get("id")
+        if self.index is not None:
+            self.index.update(transaction_id, content_hash)
+        logger.info(
+            f"[ReceiptRenderer] Stored receipt PDF: transaction_id={transaction_id}, content_hash={content_hash}"
+        )
+        return content_hash
+
+    async def rerender_many(self, render_inputs: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        複数の領収書を再レンダリング
+
+        Args:
+            render_inputs: (transaction_id, render_input) のイテラブル
+
+        Returns:
+            Dict: {"rendered": {transaction_id: content_hash}, "failed": {transaction_id: error}}
+        """
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        rendered: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+
+        async def run(transaction_id: str, render_input: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    rendered[transaction_id] = await self.render_to_store(render_input)
+                except Exception as e:
+                    logger.error(f"[ReceiptRenderer] Failed to re-render receipt {transaction_id}: {e}")
+                    failed[transaction_id] = str(e)
+
+        await asyncio.gather(*(run(transaction_id, render_input) for transaction_id, render_input in render_inputs))
+        return {"rendered": rendered, "failed": failed}
+
+    def shutdown(self, wait: bool = True):
+        """レンダリングワーカーを停止"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+async def rerender_receipts_in_range(
+    db_manager,
+    renderer: ReceiptRenderer,
+    start: datetime,
+    end: datetime
+) -> Dict[str, Any]:
+    """
+    作成日時が[start, end)のトランザクションの領収書を一括再レンダリング
+
+    トランザクションイベントに記録されたマンデートの参照からレンダリング入力を再構築する
+    （領収書イベント・マンデートのないトランザクションはskippedに含める）。
+    発行日時は初回生成時と同じため、内容が変わらない領収書は同じコンテンツハッシュになる。
+    再レンダリング後、領収書レコードのコンテンツハッシュを更新する。
+    置き換えられ、どの領収書からも参照されなくなった古いハッシュはsupersededに含める（削除は呼び出し側）。
+
+    Returns:
+        Dict: {"rendered": {transaction_id: content_hash}, "failed": {...}, "skipped": [...], "superseded": [...]}
+    """
+    from common.database import ReceiptCRUD, TransactionCRUD
+
+    render_inputs: List[Tuple[str, Dict[str, Any]]] = []
+    skipped: List[str] = []
+    async with db_manager.get_session() as session:
+        transactions = await TransactionCRUD.list_by_created_range(session, start, end)
+        for transaction in transactions:
+            render_input = await load_render_input(session, transaction)
+            if render_input:
+                render_inputs.append((transaction.id, render_input))
+            else:
+                skipped.append(transaction.id)
+
+    logger.info(
+        f"[ReceiptRenderer] Re-rendering {len(render_inputs)} receipts "
+        f"({start.isoformat()} - {end.isoformat()}, skipped={len(skipped)})"
+    )
+    summary = await renderer.rerender_many(render_inputs)
+    summary["skipped"] = skipped
+    summary["superseded"] = []
+
+    if summary["rendered"]:
+        async with db_manager.get_session() as session:
+            previous = await ReceiptCRUD.get_content_hashes(session, list(summary["rendered"]))
+            await ReceiptCRUD.update_content_hashes(session, summary["rendered"])
+            replaced = sorted({
+                content_hash for transaction_id, content_hash in previous.items()
+                if content_hash and content_hash != summary["rendered"][transaction_id]
+            })
+            if replaced:
+                referenced = await ReceiptCRUD.get_referenced_content_hashes(session, replaced)
+                summary["superseded"] = [content_hash for content_hash in replaced if content_hash not in referenced]
+    return summary
@@ -0,0 +1,388 @@
+"""
+v2/services/payment_processor/utils/receipt_store.py
+
+コンテンツアドレス型の領収書ストア
+
+- 領収書PDFはSHA-256ハッシュをキーに保存（同一内容は1つだけ保存、書き換え不要）
+- キーは先頭2文字/次の2文字でシャーディング（例: ab/cd/abcd...pdf）し、1ディレクトリのファイル数を抑える
+- バックエンド: ローカルディスク（LocalDiskReceiptStore）/ S3互換オブジェクトストレージ（S3ReceiptStore）
+- HTTP配信: ETag（=コンテンツハッシュ）・If-None-Match・Rangeに対応（build_receipt_response）
+- 再レンダリングで置き換えられた古いオブジェクトは自動では削除しない
+  （scripts/rerender_receipts.py --delete-superseded で、どの領収書からも参照されなくなったものを
+  ReceiptIndexCacheのTTL経過後に削除する）
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import httpx
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_MEDIA_TYPE = "application/pdf"
+EMPTY_PAYLOAD_SHA256 = hashlib.sha256(b"").hexdigest()
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# ReceiptIndexCacheのTTL（古いハッシュを削除する前の猶予時間にも使う）
+RECEIPT_INDEX_TTL_SECONDS = 300.0
+
+
+def compute_content_hash(data: bytes) -> str:
+    """領収書PDFのコンテンツハッシュ（SHA-256、16進）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_key(content_hash: str) -> str:
+    """コンテンツハッシュからシャーディング済みのキーを生成"""
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.pdf"
+
+
+class ReceiptStore(ABC):
+    """領収書ストアの基底クラス（キーはcontent_key(content_hash)）"""
+
+    async def put(self, data: bytes) -> str:
+        """
+        領収書PDFを保存（同一内容が既にあれば書き込まない）
+
+        Returns:
+            str: コンテンツハッシュ
+        """
+        content_hash = compute_content_hash(data)
+        if await self.size(content_hash) is None:
+            await self._write(content_hash, data)
+        return content_hash
+
+    @abstractmethod
+    async def _write(self, content_hash: str, data: bytes):
+        """オブジェクトを書き込み"""
+
+    @abstractmethod
+    async def size(self, content_hash: str) -> Optional[int]:
+        """オブジェクトのサイズ（存在しない場合None）"""
+
+    @abstractmethod
+    async def delete(self, content_hash: str):
+        """オブジェクトを削除（存在しない場合は何もしない）"""
+
+    @abstractmethod
+    async def read(self, content_hash: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        オブジェクトを読み出し
+
+        Args:
+            start: 開始オフセット
+            end: 終了オフセット（含む、省略時は末尾まで）
+
+        Raises:
+            FileNotFoundError: オブジェクトが存在しない場合
+        """
+
+
+class LocalDiskReceiptStore(ReceiptStore):
+    """ローカルディスクの領収書ストア（ブロッキングI/Oはスレッドで実行）"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, content_hash: str) -> Path:
+        return self.root / content_key(content_hash)
+
+    async def _write(self, content_hash: str, data: bytes):
+        await asyncio.to_thread(self._write_atomic, self.path(content_hash), data)
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def size(self, content_hash: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(self.path(content_hash).stat)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, content_hash: str):
+        await asyncio.to_thread(self.path(content_hash).unlink, missing_ok=True)
+
+    async def read(self, content_hash: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        return await asyncio.to_thread(self._read_range, self.path(content_hash), start, end)
+
+    @staticmethod
+    def _read_range(path: Path, start: int, end: Optional[int]) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start + 1)
+
+
+class S3ReceiptStore(ReceiptStore):
+    """
+    S3互換オブジェクトストレージの領収書ストア（path-style URL、AWS Signature V4）
+
+    MinIO等のS3互換ストレージでも利用可能。
+    PUT時のx-amz-content-sha256にはコンテンツハッシュをそのまま使う。
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "receipts",
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip("/")
+        self.client = client or httpx.AsyncClient(timeout=10.0)
+
+    def url(self, content_hash: str) -> str:
+        key = content_key(content_hash)
+        if self.prefix:
+            key = f"{self.prefix}/{key}"
+        return f"{self.endpoint_url}/{self.bucket}/{key}"
+
+    def sign(self, method: str, url: str, payload_hash: str, now: Optional[datetime] = None) -> Dict[str, str]:
+        """AWS Signature V4の署名ヘッダーを生成"""
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = now.strftime("%Y%m%d")
+        parsed = urlsplit(url)
+
+        signed_headers = "host;x-amz-content-sha256;x-amz-date"
+        canonical_request = "\n".join([
+            method,
+            quote(parsed.path, safe="/~"),
+            "",
+            f"host:{parsed.netloc}\nx-amz-content-sha256:{payload_hash}\nx-amz-date:{amz_date}\n",
+            signed_headers,
+            payload_hash,
+        ])
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+
+        key = f"AWS4{self.secret_key}".encode()
+        for part in (datestamp, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        return {
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+            "Authorization": (
+                f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                f"SignedHeaders={signed_headers}, Signature={signature}"
+            ),
+        }
+
+    async def _write(self, content_hash: str, data: bytes):
+        url = self.url(content_hash)
+        headers = self.sign("PUT", url, content_hash)
+        headers["Content-Type"] = RECEIPT_MEDIA_TYPE
+        response = await self.client.put(url, content=data, headers=headers)
+        response.raise_for_status()
+
+    async def size(self, content_hash: str) -> Optional[int]:
+        url = self.url(content_hash)
+        response = await self.client.head(url, headers=self.sign("HEAD", url, EMPTY_PAYLOAD_SHA256))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return int(response.headers["Content-Length"])
+
+    async def delete(self, content_hash: str):
+        url = self.url(content_hash)
+        response = await self.client.delete(url, headers=self.sign("DELETE", url, EMPTY_PAYLOAD_SHA256))
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    async def read(self, content_hash: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        url = self.url(content_hash)
+        headers = self.sign("GET", url, EMPTY_PAYLOAD_SHA256)
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = await self.client.get(url, headers=headers)
+        if response.status_code == 404:
+            raise FileNotFoundError(content_hash)
+        response.raise_for_status()
+        return response.content
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_receipt_store(receipts_dir: Optional[str] = None) -> ReceiptStore:
+    """
+    環境変数から領収書ストアを生成
+
+    RECEIPT_STORE_BACKEND: local（デフォルト）/ s3
+    local: RECEIPTS_DIR（デフォルト: /app/v2/data/receipts）
+    s3: RECEIPT_S3_ENDPOINT, RECEIPT_S3_BUCKET, RECEIPT_S3_ACCESS_KEY, RECEIPT_S3_SECRET_KEY,
+        RECEIPT_S3_REGION（デフォルト: us-east-1）, RECEIPT_S3_PREFIX（デフォルト: receipts）
+    """
+    backend = os.getenv("RECEIPT_STORE_BACKEND", "local").lower()
+    if backend == "s3":
+        return S3ReceiptStore(
+            endpoint_url=os.environ["RECEIPT_S3_ENDPOINT"],
+            bucket=os.environ["RECEIPT_S3_BUCKET"],
+            access_key=os.environ["RECEIPT_S3_ACCESS_KEY"],
+            secret_key=os.environ["RECEIPT_S3_SECRET_KEY"],
+            region=os.getenv("RECEIPT_S3_REGION", "us-east-1"),
+            prefix=os.getenv("RECEIPT_S3_PREFIX", "receipts")
+        )
+    if backend != "local":
+        raise ValueError(f"Unknown RECEIPT_STORE_BACKEND: {backend}")
+    return LocalDiskReceiptStore(Path(receipts_dir or os.getenv("RECEIPTS_DIR", "/app/v2/data/receipts")))
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Rangeヘッダー（単一範囲のみ）を解析
+
+    Returns:
+        (start, end) 終了位置を含む範囲。ヘッダーなし・非対応形式の場合None（全体を返す）
+
+    Raises:
+        ValueError: 範囲がコンテンツ外の場合（416）
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # サフィックス指定（bytes=-N: 末尾Nバイト）
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def build_receipt_response(
+    store: ReceiptStore,
+    content_hash: str,
+    filename: str,
+    range_header: Optional[str] = None,
+    if_none_match: Optional[str] = None
+) -> Response:
+    """
+    領収書PDFのHTTPレスポンスを生成（ETag / If-None-Match / Range対応）
+
+    コンテンツアドレス型のため、ETagはコンテンツハッシュそのもので、内容は不変（immutable）。
+
+    Raises:
+        FileNotFoundError: ストアにオブジェクトが存在しない場合
+    """
+    etag = f'"{content_hash}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    size = await store.size(content_hash)
+    if size is None:
+        raise FileNotFoundError(content_hash)
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if byte_range is None:
+        return Response(content=await store.read(content_hash), media_type=RECEIPT_MEDIA_TYPE, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        content=await store.read(content_hash, start, end),
+        status_code=206,
+        media_type=RECEIPT_MEDIA_TYPE,
+        headers=headers
+    )
+
+
+class ReceiptIndexCache:
+    """
+    transaction_id → (所有者user_id, コンテンツハッシュ) の短期キャッシュ
+
+    繰り返しダウンロード時のReceiptCRUD検索を省略する（JWT検証・所有者チェックは毎回行う）。
+    同じプロセスでの再レンダリングはReceiptRendererがupdate()で新しいハッシュに差し替える。
+    別プロセス（scripts/rerender_receipts.py）での再レンダリング後は、TTLが切れるまで古いハッシュを配信する
+    （古いオブジェクトはTTL経過後まで削除しない）。
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = RECEIPT_INDEX_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+
+    def get(self, transaction_id: str) -> Optional[Tuple[str, str]]:
+        entry = self._entries.get(transaction_id)
+        if entry is None:
+            return None
+        expires_at, user_id, content_hash = entry
+        if expires_at < time.monotonic():
+            del self._entries[transaction_id]
+            return None
+        self._entries.move_to_end(transaction_id)
+        return user_id, content_hash
+
+    def put(self, transaction_id: str, user_id: str, content_hash: str):
+        self._entries[transaction_id] = (time.monotonic() + self.ttl_seconds, user_id, content_hash)
+        self._entries.move_to_end(transaction_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def update(self, transaction_id: str, content_hash: str):
+        """キャッシュ済みのエントリのコンテンツハッシュを差し替え（再レンダリング後、未キャッシュなら何もしない）"""
+        entry = self._entries.get(transaction_id)
+        if entry is not None:
+            expires_at, user_id, _ = entry
+            self._entries[transaction_id] = (expires_at, user_id, content_hash)
+
+    def discard(self, transaction_id: str):
+        self._entries.pop(transaction_id, None)
@@ -21,7 +21,7 @@ from datetime import datetime, timezone, timedelta
 import logging
 
 import httpx
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sse_starlette.sse import EventSourceResponse
 
@@ -49,6 +49,7 @@ from common.database import (
 from common.mandate_types import IntentMandate
 from common.risk_assessment import RiskAssessmentEngine
 from common.crypto import WebAuthnChallengeManager
+from common.token_auth import require_token
 from common.user_authorization import create_user_authorization_vp
 from common.auth import (
     # JWT認証
@@ -59,6 +60,10 @@ from common.auth import (
     verify_password,
     validate_password_strength,
 )
+from common.langfuse_support import get_callback_handler_class
+from common.sse_session import SSESessionManager, TooManyRunsError, SSE_HEARTBEAT_SECONDS, SSE_SEND_TIMEOUT_SECONDS
+from common.response_cache import ResponseCache, build_cached_response, compute_etag
+from common.idempotency import post_idempotent
 from common.logger import get_logger, LoggingAsyncClient
 
 # OpenTelemetry 手動トレーシング
@@ -103,6 +108,12 @@ WEBAUTHN_CHALLENGE_TIMEOUT_MS = 60000  # WebAuthnチャレンジのタイムア
 MERCHANT_APPROVAL_TIMEOUT = 120  # 秒（Merchant署名待機のタイムアウト）
 MERCHANT_APPROVAL_POLL_INTERVAL = 3  # 秒（ポーリング間隔）
 
+# GET /products のレスポンスキャッシュ（Merchantの商品変更通知で無効化）
+PRODUCT_CACHE_ENABLED = os.getenv("PRODUCT_CACHE_ENABLED", "true").lower() == "true"
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "512"))
+PRODUCT_CACHE_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "30"))
+PRODUCT_CACHE_STALE_SECONDS = float(os.getenv("PRODUCT_CACHE_STALE_SECONDS", "300"))
+
 # AP2ステータス定数
 STATUS_SUCCESS = "success"
 STATUS_CANCELLED = "cancelled"
@@ -229,6 +240,18 @@ class ShoppingAgent(BaseAgent):
         # Langfuseハンドラー管理（セッションごとにCallbackHandlerインスタンスを保持）
         self._langfuse_handlers: Dict[str, Any] = {}
 
+        # GET /products のレスポンスキャッシュ
+        self.product_cache = ResponseCache(
+            "products",
+            max_entries=PRODUCT_CACHE_MAX_ENTRIES,
+            ttl_seconds=PRODUCT_CACHE_TTL_SECONDS,
+            stale_seconds=PRODUCT_CACHE_STALE_SECONDS
+        )
+
+        # /chat/streamの実行ログ（Last-Event-IDでの再開・切断時のキャンセル）
+        self.sse_sessions = SSESessionManager()
+        self.sse_sessions.export_metrics()
+
         # A2AHelpers初期化（a2a_handlerが利用可能になった後）
         self.a2a_helpers = A2AHelpers(
             a2a_handler=self.a2a_handler,
@@ -248,6 +271,15 @@ class ShoppingAgent(BaseAgent):
             await self.db_manager.init_db()
             logger.info(f"[{self.agent_name}] Database initialized")
 
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            """シャットダウン時の処理"""
+            logger.info(f"[{self.agent_name}] Running shutdown tasks...")
+
+            # 実行中のチャットストリーム・商品キャッシュの再検証をキャンセル
+            await self.sse_sessions.aclose()
+            await self.product_cache.aclose()
+
         logger.info(f"[{self.agent_name}] Initialized with database-backed risk assessment")
 
     def get_ap2_roles(self) -> list[str]:
@@ -775,7 +807,8 @@ class ShoppingAgent(BaseAgent):
         @self.app.post("/chat/stream")
         async def chat_stream(
             request: ChatStreamRequest,
-            current_user: UserInDB = Depends(self.get_current_user_dependency)  # AP2準拠: Layer 1認証
+            current_user: UserInDB = Depends(self.get_current_user_dependency),  # AP2準拠: Layer 1認証
+            last_event_id: Optional[str] = Header(None)
         ):
             """
             POST /chat/stream - ユーザーとの対話（SSE Streaming）
@@ -789,8 +822,10 @@ class ShoppingAgent(BaseAgent):
             リクエスト:
             - Body: { user_input: string, session_id?: string }
             - Header: Authorization: Bearer <JWT>
+            - Header: Last-Event-ID: <run_id>:<seq>（再接続時。フローを再実行せず続きのイベントを返す）
+            - 実行中の実行がユーザーごとの上限（SSE_MAX_RUNS_PER_OWNER）に達している場合は429
 
-            レスポンス（SSE）:
+            レスポンス（SSE、各イベントにid: <run_id>:<seq>）:
             - { "type": "agent_text", "content": "..." }
             - { "type": "signature_request", "mandate": { ...IntentMandate... } }
             - { "type": "cart_options", "items": [...] }
@@ -798,6 +833,21 @@ class ShoppingAgent(BaseAgent):
             session_id = request.session_id or str(uuid.uuid4())
             user_id = current_user.id  # AP2準拠: JWT認証済みユーザーID
 
+            # 再接続: 同じ実行のイベントログから続きを配信
+            if last_event_id:
+                resumed = self.sse_sessions.resume(last_event_id, owner=user_id)
+                if resumed is None:
+                    logger.warning(f"[chat_stream] Unknown Last-Event-ID: {last_event_id}")
+                    error_event = StreamEvent(type="error", error="ストリームの再開に失敗しました。もう一度お試しください。")
+                    return EventSourceResponse(iter([json.dumps(error_event.model_dump(exclude_none=True))]))
+                run, after_seq = resumed
+                logger.info(f"[chat_stream] Resuming run {run.run_id} after seq {after_seq}")
+                return EventSourceResponse(
+                    self.sse_sessions.stream(run, after_seq),
+                    ping=SSE_HEARTBEAT_SECONDS,
+                    send_timeout=SSE_SEND_TIMEOUT_SECONDS
+                )
+
             # デバッグログ: Step-up完了メッセージを検出
             logger.info(
                 f"[chat_stream] Received request\n"
@@ -839,31 +889,83 @@ class ShoppingAgent(BaseAgent):
                     error_event = StreamEvent(type="error", error=str(e))
                     yield json.dumps(error_event.model_dump(exclude_none=True))
 
-            return EventSourceResponse(event_generator())
+            # フローはレスポンスから切り離して実行（クライアントが戻らなければ猶予後にキャンセル）
+            # アドミッション制御のスロットは接続中しか保持されないため、実行数はユーザーごとに制限する
+            try:
+                run = self.sse_sessions.start(event_generator(), owner=user_id)
+            except TooManyRunsError as e:
+                logger.warning(f"[chat_stream] {e}")
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many concurrent chat streams. Resume with Last-Event-ID or retry later.",
+                    headers={"Retry-After": "1"}
+                )
+            return EventSourceResponse(
+                self.sse_sessions.stream(run),
+                ping=SSE_HEARTBEAT_SECONDS,
+                send_timeout=SSE_SEND_TIMEOUT_SECONDS
+            )
 
         @self.app.get("/products")
-        async def get_products(query: str = "", limit: int = 10):
+        async def get_products(query: str = "", limit: int = 10, if_none_match: Optional[str] = Header(None)):
             """
             GET /products - 商品検索（デバッグ用エンドポイント）
 
             注意: このエンドポイントは開発/テスト用です。
             実際のAP2フローでは、_search_products_via_merchant_agent()メソッドを使用して
             A2A通信でMerchant Agentに商品検索を依頼します。
+
+            キャッシュ:
+            - (query, limit)ごとにMerchant Agentのレスポンス本体とETagを保持（stale-while-revalidate）
+            - 再検証はIf-None-MatchでMerchant Agentに問い合わせ（304なら本体を再取得しない）
+            - クライアントのIf-None-Matchが一致した場合は304
             """
-            try:
+            async def fetch(etag: Optional[str]):
                 # デバッグ用：直接Merchant Agentの/searchエンドポイントにHTTPアクセス
                 # 本来のフローでは使用されません
                 response = await self.http_client.get(
                     f"{self.merchant_agent_url}/search",
-                    params={"query": query, "limit": limit}
+                    params={"query": query, "limit": limit},
+                    headers={"If-None-Match": etag} if etag else None
                 )
+                if response.status_code == 304:
+                    return None
                 response.raise_for_status()
-                return response.json()
+                return response.content, response.headers.get("ETag") or compute_etag(response.content)
+
+            try:
+                if PRODUCT_CACHE_ENABLED:
+                    entry = await self.product_cache.get_or_fetch((query, limit), fetch)
+                    content, etag = entry.content, entry.etag
+                else:
+                    content, etag = await fetch(None)
+                return build_cached_response(content, etag, if_none_match)
 
             except httpx.HTTPError as e:
                 logger.error(f"[get_products] HTTP error: {e}")
                 raise HTTPException(status_code=502, detail="Failed to fetch products")
 
+        @self.app.post("/products/cache/invalidate")
+        async def invalidate_products_cache(
+            event: Optional[Dict[str, Any]] = None,
+            x_invalidation_token: Optional[str] = Header(None)
+        ):
+            """
+            POST /products/cache/invalidate - 商品キャッシュの無効化
+
+            Merchantが商品の作成・更新・削除時に呼び出す（CATALOG_INVALIDATION_URLS）。
+            検索結果にどの商品が含まれるかは追跡しないため、全エントリを破棄する。
+
+            認証: X-Invalidation-TokenヘッダーがCATALOG_INVALIDATION_TOKENと一致すること（未設定時は常に403）
+
+            リクエスト（任意）:
+            - { "event": "product.updated", "product_id": "..." }
+            """
+            require_token("CATALOG_INVALIDATION_TOKEN", x_invalidation_token, detail="Invalidation token required")
+            invalidated = self.product_cache.invalidate()
+            logger.info(f"[invalidate_products_cache] Invalidated {invalidated} entries (event={event})")
+            return {"status": "invalidated", "entries": invalidated}
+
         @self.app.get("/transactions/{transaction_id}")
         async def get_transaction(transaction_id: str):
             """
@@ -1369,7 +1471,7 @@ class ShoppingAgent(BaseAgent):
             StreamEvent: ストリーミングイベント
         """
         # Langfuseトレース設定（AP2完全準拠: オブザーバビリティ機能）
-        from services.shopping_agent.langgraph_shopping_flow import LANGFUSE_ENABLED, CallbackHandler, langfuse_client
+        CallbackHandler = get_callback_handler_class()
 
         # A2UI v0.9: userActionメッセージをパース
         # A2UI v0.9: context contains resolved values (not path refs)
@@ -1410,7 +1512,7 @@ class ShoppingAgent(BaseAgent):
             # 同じsession_idで複数回呼び出すことで、1つの連続したトレースになる
             config["configurable"] = {"thread_id": session_id}
 
-            if LANGFUSE_ENABLED and CallbackHandler:
+            if CallbackHandler:
                 # セッションごとにCallbackHandlerインスタンスを取得または作成
                 # 同じハンドラーを再利用することで、すべてのグラフ実行が1つのトレースに統合される
                 if session_id not in self._langfuse_handlers:
@@ -1823,7 +1925,7 @@ class ShoppingAgent(BaseAgent):
             logger.error(f"[_generate_user_authorization_for_payment] Failed to retrieve public key: {e}", exc_info=True)
             return None
 
-    def _perform_risk_assessment(
+    async def _perform_risk_assessment(
         self,
         payment_mandate: Dict[str, Any],
         cart_mandate: Dict[str, Any],
@@ -1838,7 +1940,7 @@ class ShoppingAgent(BaseAgent):
             intent_mandate: IntentMandate
             session: セッションデータ（max_amount制約取得用）
         """
-        return self.payment_helpers.perform_risk_assessment(payment_mandate, cart_mandate, intent_mandate, session)
+        return await self.payment_helpers.perform_risk_assessment(payment_mandate, cart_mandate, intent_mandate, session)
 
     async def _create_payment_mandate(self, session: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -1900,7 +2002,7 @@ class ShoppingAgent(BaseAgent):
         }
 
         # 7. リスク評価を実施（sessionを渡してmax_amount制約を取得）
-        risk_score, fraud_indicators = self._perform_risk_assessment(
+        risk_score, fraud_indicators = await self._perform_risk_assessment(
             payment_mandate,
             session.get("cart_mandate"),
             session.get("intent_mandate"),
@@ -2153,8 +2255,13 @@ class ShoppingAgent(BaseAgent):
                 f"{'='*80}"
             )
 
-            response = await self.http_client.post(
+            # Idempotency-Key: この呼び出しの再送で同じキーを使い、トークンを二重発行しない
+            # （PaymentMandateはトークン化の後に作成するため、呼び出しごとのキーを使う。
+            #  カート単位の固定キーだとTTL内に期限切れトークンを再生してしまう）
+            response = await post_idempotent(
+                self.http_client,
                 f"{credential_provider_url}/payment-methods/tokenize",
+                f"tokenize_{uuid.uuid4().hex}",
                 json={
                     "user_id": user_id,
                     "payment_method_id": payment_method_id
@@ -32,6 +32,7 @@ from langchain_openai import ChatOpenAI
 # AP2型定義（完全準拠）
 import sys
 from common.models import Signature
+from common.metrics import LLM_REQUEST_SECONDS
 
 # A2UI builders for generating A2UI-compliant surfaces (v0.9 protocol)
 from services.shopping_agent.utils.a2ui_builders import (
@@ -50,27 +51,6 @@ from services.shopping_agent.utils.a2ui_builders import (
 
 logger = logging.getLogger(__name__)
 
-# Langfuseトレーシング設定
-LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() == "true"
-langfuse_client = None
-CallbackHandler = None
-
-if LANGFUSE_ENABLED:
-    try:
-        from langfuse.langchain import CallbackHandler as LangfuseCallbackHandler
-        from langfuse import Langfuse
-
-        langfuse_client = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
-        CallbackHandler = LangfuseCallbackHandler
-        logger.info("[Langfuse] Shopping Agent tracing enabled")
-    except Exception as e:
-        logger.warning(f"[Langfuse] Failed to initialize: {e}")
-        LANGFUSE_ENABLED = False
-
 
 # ============================================================================
 # State定義
@@ -258,7 +238,8 @@ JSON形式で返答してください:
                     SystemMessage(content=system_prompt),
                     HumanMessage(content=user_prompt)
                 ]
-                response = await llm.ainvoke(messages)
+                with LLM_REQUEST_SECONDS.labels(node="collect_intent").time():
+                    response = await llm.ainvoke(messages)
                 response_text = response.content
 
                 # JSON抽出
@@ -407,7 +388,9 @@ JSON形式で返答してください:
 
         # A2UI v0.9: 配送先フォームサーフェスをプロトコル準拠形式で送信
         # createSurface → updateComponents → updateDataModel の順でメッセージを送信
-        a2ui_messages = generate_shipping_form_a2ui_messages(shipping_fields)
+        a2ui_messages = generate_shipping_form_a2ui_messages(
+            shipping_fields, surface_state=session.setdefault("a2ui_surfaces", {})
+        )
         events.extend(a2ui_messages)
 
         return {
@@ -634,7 +617,9 @@ async def select_cp_node(state: ShoppingFlowState, agent_instance: Any) -> Shopp
 
             # A2UI v0.9: CP選択サーフェスをプロトコル準拠形式で送信
             # createSurface → updateComponents → updateDataModel の順でメッセージを送信
-            a2ui_messages = generate_cp_selection_a2ui_messages(available_cps)
+            a2ui_messages = generate_cp_selection_a2ui_messages(
+                available_cps, surface_state=session.setdefault("a2ui_surfaces", {})
+            )
             events.extend(a2ui_messages)
 
             session["step"] = "select_cp"
@@ -908,8 +893,12 @@ async def fetch_carts_node(state: ShoppingFlowState, agent_instance: Any) -> Sho
 
         # A2UI v0.9: 各カート候補のA2UIサーフェスをプロトコル準拠形式で送信
         # createSurface → updateComponents → updateDataModel の順でメッセージを送信
-        for cart_candidate in frontend_cart_candidates:
-            a2ui_messages = generate_cart_details_a2ui_messages(cart_candidate)
+        for index, cart_candidate in enumerate(frontend_cart_candidates):
+            a2ui_messages = generate_cart_details_a2ui_messages(
+                cart_candidate,
+                surface_state=session.setdefault("a2ui_surfaces", {}),
+                surface_key=f"cart_details:{index}"
+            )
             events.extend(a2ui_messages)
 
         events.append({
@@ -1182,7 +1171,9 @@ async def select_payment_method_node(state: ShoppingFlowState, agent_instance: A
 
             # A2UI v0.9: 支払い方法選択サーフェスをプロトコル準拠形式で送信
             # createSurface → updateComponents → updateDataModel の順でメッセージを送信
-            a2ui_messages = generate_payment_method_selection_a2ui_messages(available_payment_methods)
+            a2ui_messages = generate_payment_method_selection_a2ui_messages(
+                available_payment_methods, surface_state=session.setdefault("a2ui_surfaces", {})
+            )
             events.extend(a2ui_messages)
 
             logger.info(
@@ -5,6 +5,14 @@ Based on A2UI Specification v0.9
 This module provides builder functions to create A2UI-compliant surfaces
 for various UI components in the shopping flow.
 
+Component skeletons are precompiled per surface shape (see a2ui_templates.py):
+request data is bound through path references, so only the data model is
+built per request. When a per-session surface state is passed to the
+generate_*_a2ui_messages functions, a surface whose shape did not change is
+updated with updateDataModel diffs instead of being recreated
+(A2UI_INCREMENTAL_UPDATES=true; requires a client that keeps surfaces
+across turns).
+
 A2UI v0.9 Protocol Reference:
 https://a2ui.org/specification/v0.9-a2ui/
 
@@ -15,12 +23,24 @@ Message Types:
 - deleteSurface: Remove a surface
 """
 
-from typing import Any, Optional, List, Dict
+import os
+from typing import Any, Optional, List, Dict, Tuple
 import uuid
 
+from services.shopping_agent.utils.a2ui_templates import (
+    SurfaceTemplate,
+    generate_data_model_update_messages,
+    surface_template,
+)
+
 # Standard A2UI catalog ID
 A2UI_CATALOG_ID = "https://a2ui.dev/specification/0.9/standard_catalog_definition.json"
 
+# Send updateDataModel diffs for surfaces the client already holds
+A2UI_INCREMENTAL_UPDATES = os.getenv("A2UI_INCREMENTAL_UPDATES", "false").lower() == "true"
+
+NO_IMAGE_URL = "https://placehold.co/400x400/EEE/999?text=No+Image"
+
 
 def _generate_id(prefix: str = "comp") -> str:
     """Generate a unique component ID."""
@@ -99,112 +119,164 @@ def generate_delete_surface_message(surface_id: str) -> Dict[str, Any]:
     }
 
 
-# =============================================================================
-# Shipping Form A2UI Builder
-# =============================================================================
-
-def build_shipping_form_a2ui(
-    fields: list[dict],
-    surface_id: Optional[str] = None
-) -> dict:
+def render_surface_messages(
+    template: SurfaceTemplate,
+    data_model: Dict[str, Any],
+    surface_id: Optional[str] = None,
+    surface_state: Optional[Dict[str, Any]] = None,
+    surface_key: Optional[str] = None
+) -> List[Dict[str, Any]]:
     """
-    Build an A2UI surface for the shipping address form.
+    Generate A2UI v0.9 messages for a template-based surface.
+
+    Without surface_state this is the full createSurface → updateComponents →
+    updateDataModel sequence. With surface_state (a per-session dict, e.g.
+    session["a2ui_surfaces"]) the surface ID is kept stable per surface_key,
+    and when incremental updates are enabled and the previously sent surface
+    has the same template, only updateDataModel diffs are returned (an empty
+    list when nothing changed).
 
     Args:
-        fields: List of form fields with name, label, type, required, placeholder, options
-        surface_id: Optional surface ID (generated if not provided)
+        template: Precompiled component skeleton
+        data_model: Data model for this request
+        surface_id: Optional surface ID for a newly created surface
+        surface_state: Per-session record of sent surfaces (updated in place)
+        surface_key: Key within surface_state (defaults to the surface type)
 
     Returns:
-        A2UI surface definition for shipping form
+        List of SSE events
     """
-    surface_id = surface_id or _generate_id("shipping-form")
+    if surface_state is None:
+        return generate_a2ui_messages(
+            surface_id=surface_id or _generate_id(_surface_id_prefix(template)),
+            components=list(template.components),
+            data_model=data_model
+        )
+
+    key = surface_key or template.surface_type
+    previous = surface_state.get(key)
+
+    if A2UI_INCREMENTAL_UPDATES and previous and "dataModel" in previous and previous.get("template") == template.fingerprint:
+        surface_id = previous["surfaceId"]
+        messages = generate_data_model_update_messages(surface_id, previous["dataModel"], data_model)
+    else:
+        surface_id = surface_id or (previous or {}).get("surfaceId") or _generate_id(_surface_id_prefix(template))
+        messages = generate_a2ui_messages(
+            surface_id=surface_id,
+            components=list(template.components),
+            data_model=data_model
+        )
+
+    surface_state[key] = {"surfaceId": surface_id, "template": template.fingerprint}
+    if A2UI_INCREMENTAL_UPDATES:
+        # 差分計算のため送信済みのデータモデルを保持（セッションに保存される）
+        surface_state[key]["dataModel"] = data_model
+    return messages
+
+
+def _surface_id_prefix(template: SurfaceTemplate) -> str:
+    if template.surface_type == "credential_provider_selection":
+        return "cp-selection"
+    return template.surface_type.replace("_", "-")
+
+
+def _surface(template: SurfaceTemplate, data_model: Dict[str, Any], surface_id: Optional[str]) -> dict:
+    """Surface definition (surfaceId, surfaceType, components, dataModel) built from a template."""
+    return {
+        "surfaceId": surface_id or _generate_id(_surface_id_prefix(template)),
+        "surfaceType": template.surface_type,
+        "components": list(template.components),
+        "dataModel": data_model
+    }
+
 
-    # Build field components
+# =============================================================================
+# Shipping Form A2UI Builder
+# =============================================================================
+
+def _shipping_fields_key(fields: list[dict]) -> Tuple[Any, ...]:
+    """Shape key of the shipping form (everything except default values)."""
+    return tuple(
+        (
+            field["name"],
+            field["label"],
+            field.get("type", "text"),
+            bool(field.get("required")),
+            field.get("placeholder") or "",
+            tuple((opt["value"], opt["label"]) for opt in field.get("options") or ())
+        )
+        for field in fields
+    )
+
+
+@surface_template("shipping_form")
+def shipping_form_template(fields_key: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+    """Compile the shipping form skeleton."""
     field_components = []
     field_ids = []
 
-    for field in fields:
-        field_id = _generate_id(f"field-{field['name']}")
+    for name, label, field_type, required, placeholder, options in fields_key:
+        field_id = f"field-{name}"
         field_ids.append(field_id)
 
-        if field.get("type") == "select" and field.get("options"):
+        if field_type == "select" and options:
             # Use ChoicePicker for select fields
-            options = [
-                {
-                    "id": opt["value"],
-                    "label": opt["label"]  # v0.9: literal values are plain
-                }
-                for opt in field["options"]
-            ]
             field_components.append({
                 "id": field_id,
                 "component": "ChoicePicker",  # v0.9: component type as string
-                "label": field["label"] + (" *" if field.get("required") else ""),  # v0.9: literal string
-                "options": options,
-                "selectedId": {"path": f"/shipping/{field['name']}"},  # v0.9: path reference as object
+                "label": label + (" *" if required else ""),  # v0.9: literal string
+                "options": [{"id": value, "label": option_label} for value, option_label in options],
+                "selectedId": {"path": f"/shipping/{name}"},  # v0.9: path reference as object
                 "multiSelect": False
             })
         else:
             # Use TextField for text inputs
-            usage_hint = "shortText"  # v0.9: textFieldType → usageHint
-            if field.get("type") == "email":
-                usage_hint = "email"
-            elif field.get("type") == "phone":
-                usage_hint = "phone"
-            elif field.get("type") == "number":
-                usage_hint = "number"
+            usage_hint = {"email": "email", "phone": "phone", "number": "number"}.get(field_type, "shortText")
 
             # v0.9: flattened component structure
             component_def = {
                 "id": field_id,
                 "component": "TextField",  # v0.9: component type as string
-                "label": field["label"] + (" *" if field.get("required") else ""),  # v0.9: literal string
-                "text": {"path": f"/shipping/{field['name']}"},  # v0.9: path reference as object
+                "label": label + (" *" if required else ""),  # v0.9: literal string
+                "text": {"path": f"/shipping/{name}"},  # v0.9: path reference as object
                 "usageHint": usage_hint  # v0.9: textFieldType → usageHint
             }
 
-            if field.get("placeholder"):
-                component_def["placeholder"] = field["placeholder"]  # v0.9: literal string
+            if placeholder:
+                component_def["placeholder"] = placeholder  # v0.9: literal string
 
             # Note: TextField.required is NOT in A2UI v0.9 standard schema
             # Required indicator is shown in label text instead (e.g., "Name *")
 
             field_components.append(component_def)
 
-    # Build submit button
-    submit_button_text_id = _generate_id("submit-text")
-    submit_button_id = _generate_id("submit-button")
-
-    # Build column container
-    column_id = _generate_id("form-column")
     # Root component must have id="root" for A2UI v0.9 auto-rendering
-
-    components = [
+    return [
         # Card wrapper (root component) - v0.9 flattened format
         {
             "id": "root",
-            "component": "Card",  # v0.9: component type as string
-            "child": column_id
+            "component": "Card",
+            "child": "form-column"
         },
         # Column layout - v0.9 flattened format
         {
-            "id": column_id,
-            "component": "Column",  # v0.9: component type as string
-            "children": field_ids + [submit_button_id],
+            "id": "form-column",
+            "component": "Column",
+            "children": field_ids + ["submit-button"],
             "distribution": "start",
             "gap": 12
         },
         # Submit button text - v0.9 flattened format
         {
-            "id": submit_button_text_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": "配送先を確定"  # v0.9: literal string
+            "id": "submit-text",
+            "component": "Text",
+            "text": "配送先を確定"
         },
         # Submit button - v0.9 flattened format
         {
-            "id": submit_button_id,
-            "component": "Button",  # v0.9: component type as string
-            "child": submit_button_text_id,
+            "id": "submit-button",
+            "component": "Button",
+            "child": "submit-text",
             "primary": True,
             "disabled": {"path": "/formInvalid"},  # v0.9: path reference as object
             "action": {
@@ -216,6 +288,11 @@ def build_shipping_form_a2ui(
         }
     ] + field_components
 
+
+def _shipping_form_parts(fields: list[dict]) -> Tuple[SurfaceTemplate, Dict[str, Any]]:
+    """Template and data model of the shipping form."""
+    template = shipping_form_template(_shipping_fields_key(fields))
+
     # Build initial data model with validation metadata
     required_fields = [field["name"] for field in fields if field.get("required", False)]
     initial_values = {field["name"]: field.get("default", "") for field in fields}
@@ -233,18 +310,30 @@ def build_shipping_form_a2ui(
             "requiredFields": required_fields
         }
     }
+    return template, data_model
 
-    return {
-        "surfaceId": surface_id,
-        "surfaceType": "shipping_form",
-        "components": components,
-        "dataModel": data_model
-    }
+
+def build_shipping_form_a2ui(
+    fields: list[dict],
+    surface_id: Optional[str] = None
+) -> dict:
+    """
+    Build an A2UI surface for the shipping address form.
+
+    Args:
+        fields: List of form fields with name, label, type, required, placeholder, options
+        surface_id: Optional surface ID (generated if not provided)
+
+    Returns:
+        A2UI surface definition for shipping form
+    """
+    return _surface(*_shipping_form_parts(fields), surface_id)
 
 
 def generate_shipping_form_a2ui_messages(
     fields: list[dict],
-    surface_id: Optional[str] = None
+    surface_id: Optional[str] = None,
+    surface_state: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate A2UI v0.9 protocol messages for shipping form.
@@ -252,15 +341,15 @@ def generate_shipping_form_a2ui_messages(
     Args:
         fields: List of form fields
         surface_id: Optional surface ID
+        surface_state: Optional per-session surface state (see render_surface_messages)
 
     Returns:
         List of SSE events (createSurface, updateComponents, updateDataModel)
     """
-    surface = build_shipping_form_a2ui(fields, surface_id)
-    return generate_a2ui_messages(
-        surface_id=surface["surfaceId"],
-        components=surface["components"],
-        data_model=surface["dataModel"]
+    return render_surface_messages(
+        *_shipping_form_parts(fields),
+        surface_id=surface_id,
+        surface_state=surface_state
     )
 
 
@@ -268,136 +357,130 @@ def generate_shipping_form_a2ui_messages(
 # Credential Provider Selection A2UI Builder
 # =============================================================================
 
-def build_cp_selection_a2ui(
-    providers: list[dict],
-    surface_id: Optional[str] = None
-) -> dict:
-    """
-    Build an A2UI surface for credential provider selection.
-
-    Args:
-        providers: List of credential providers with id, name, description, supported_methods
-        surface_id: Optional surface ID (generated if not provided)
-
-    Returns:
-        A2UI surface definition for CP selection
-    """
-    surface_id = surface_id or _generate_id("cp-selection")
-
-    # Build provider card components
+@surface_template("credential_provider_selection")
+def cp_selection_template(count: int) -> List[Dict[str, Any]]:
+    """Compile the credential provider selection skeleton for count providers."""
     provider_components = []
     card_ids = []
 
-    for index, provider in enumerate(providers):
-        card_id = _generate_id(f"cp-card-{index}")
-        row_id = _generate_id(f"cp-row-{index}")
-        index_id = _generate_id(f"cp-index-{index}")
-        info_col_id = _generate_id(f"cp-info-{index}")
-        name_id = _generate_id(f"cp-name-{index}")
-        desc_id = _generate_id(f"cp-desc-{index}")
-        methods_id = _generate_id(f"cp-methods-{index}")
-
+    for index in range(count):
+        path = f"/credentialProviders/{index}"
+        card_id = f"cp-card-{index}"
         card_ids.append(card_id)
 
         provider_components.extend([
             # Card - v0.9 flattened format
             {
                 "id": card_id,
-                "component": "Card",  # v0.9: component type as string
-                "child": row_id,
+                "component": "Card",
+                "child": f"cp-row-{index}",
                 "action": {
                     "name": "select_credential_provider",
                     "context": {
                         "index": index + 1,  # v0.9: literal number
-                        "providerId": provider["id"]  # v0.9: literal string
+                        "providerId": {"path": f"{path}/id"}
                     }
                 }
             },
             # Row layout - v0.9 flattened format
             {
-                "id": row_id,
-                "component": "Row",  # v0.9: component type as string
-                "children": [index_id, info_col_id],
+                "id": f"cp-row-{index}",
+                "component": "Row",
+                "children": [f"cp-index-{index}", f"cp-info-{index}"],
                 "alignment": "center",
                 "gap": 12
             },
             # Index number - v0.9 flattened format
             {
-                "id": index_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": str(index + 1),  # v0.9: literal string
+                "id": f"cp-index-{index}",
+                "component": "Text",
+                "text": str(index + 1),
                 "styleHint": "h2"
             },
             # Info column - v0.9 flattened format
             {
-                "id": info_col_id,
-                "component": "Column",  # v0.9: component type as string
-                "children": [name_id, desc_id, methods_id],
+                "id": f"cp-info-{index}",
+                "component": "Column",
+                "children": [f"cp-name-{index}", f"cp-desc-{index}", f"cp-methods-{index}"],
                 "distribution": "start",
                 "gap": 4
             },
             # Provider name - v0.9 flattened format
             {
-                "id": name_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": provider["name"],  # v0.9: literal string
+                "id": f"cp-name-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/name"},
                 "styleHint": "h4"
             },
             # Description - v0.9 flattened format
             {
-                "id": desc_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": provider.get("description", ""),  # v0.9: literal string
+                "id": f"cp-desc-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/description"},
                 "styleHint": "body"
             },
             # Supported methods - v0.9 flattened format
             {
-                "id": methods_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": f"対応: {', '.join(provider.get('supported_methods', []))}",  # v0.9: literal string
+                "id": f"cp-methods-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/supported_methods_text"},
                 "styleHint": "caption"
             }
         ])
 
-    # Build list container
     # Root component must have id="root" for A2UI v0.9 auto-rendering
-
-    components = [
+    return [
         # Root Column - v0.9 flattened format
         {
             "id": "root",
-            "component": "Column",  # v0.9: component type as string
+            "component": "Column",
             "children": card_ids,
             "distribution": "start",
             "gap": 8
         }
     ] + provider_components
 
-    # Build data model
+
+def _cp_selection_parts(providers: list[dict]) -> Tuple[SurfaceTemplate, Dict[str, Any]]:
+    """Template and data model of the credential provider selection."""
     data_model = {
         "credentialProviders": [
             {
                 "id": p["id"],
                 "name": p["name"],
                 "description": p.get("description", ""),
-                "supported_methods": p.get("supported_methods", [])
+                "supported_methods": p.get("supported_methods", []),
+                "supported_methods_text": f"対応: {', '.join(p.get('supported_methods', []))}"
             }
             for p in providers
         ],
         "selectedIndex": None
     }
 
-    return {
-        "surfaceId": surface_id,
-        "surfaceType": "credential_provider_selection",
-        "components": components,
-        "dataModel": data_model
-    }
+    return cp_selection_template(len(providers)), data_model
 
 
-def generate_cp_selection_a2ui_messages(
+def build_cp_selection_a2ui(
     providers: list[dict],
     surface_id: Optional[str] = None
+) -> dict:
+    """
+    Build an A2UI surface for credential provider selection.
+
+    Args:
+        providers: List of credential providers with id, name, description, supported_methods
+        surface_id: Optional surface ID (generated if not provided)
+
+    Returns:
+        A2UI surface definition for CP selection
+    """
+    return _surface(*_cp_selection_parts(providers), surface_id)
+
+
+def generate_cp_selection_a2ui_messages(
+    providers: list[dict],
+    surface_id: Optional[str] = None,
+    surface_state: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate A2UI v0.9 protocol messages for credential provider selection.
@@ -405,15 +488,15 @@ def generate_cp_selection_a2ui_messages(
     Args:
         providers: List of credential providers
         surface_id: Optional surface ID
+        surface_state: Optional per-session surface state (see render_surface_messages)
 
     Returns:
         List of SSE events (createSurface, updateComponents, updateDataModel)
     """
-    surface = build_cp_selection_a2ui(providers, surface_id)
-    return generate_a2ui_messages(
-        surface_id=surface["surfaceId"],
-        components=surface["components"],
-        data_model=surface["dataModel"]
+    return render_surface_messages(
+        *_cp_selection_parts(providers),
+        surface_id=surface_id,
+        surface_state=surface_state
     )
 
 
@@ -421,135 +504,128 @@ def generate_cp_selection_a2ui_messages(
 # Payment Method Selection A2UI Builder
 # =============================================================================
 
-def build_payment_method_selection_a2ui(
-    payment_methods: list[dict],
-    surface_id: Optional[str] = None
-) -> dict:
-    """
-    Build an A2UI surface for payment method selection.
-
-    Args:
-        payment_methods: List of payment methods with id, type, brand, last4
-        surface_id: Optional surface ID (generated if not provided)
-
-    Returns:
-        A2UI surface definition for payment method selection
-    """
-    surface_id = surface_id or _generate_id("payment-method-selection")
-
-    # Build payment method card components
+@surface_template("payment_method_selection")
+def payment_method_selection_template(count: int) -> List[Dict[str, Any]]:
+    """Compile the payment method selection skeleton for count methods."""
     method_components = []
     card_ids = []
 
-    for index, method in enumerate(payment_methods):
-        card_id = _generate_id(f"pm-card-{index}")
-        row_id = _generate_id(f"pm-row-{index}")
-        index_id = _generate_id(f"pm-index-{index}")
-        info_col_id = _generate_id(f"pm-info-{index}")
-        brand_id = _generate_id(f"pm-brand-{index}")
-        type_id = _generate_id(f"pm-type-{index}")
-
+    for index in range(count):
+        path = f"/paymentMethods/{index}"
+        card_id = f"pm-card-{index}"
         card_ids.append(card_id)
 
-        # Format display text
-        brand = method.get("brand", "").upper()
-        last4 = method.get("last4", "")
-        display_text = f"{brand} **** {last4}" if brand and last4 else method.get("type", "カード")
-
-        type_text = "クレジットカード" if method.get("type") == "card" else method.get("type", "")
-
         method_components.extend([
             # Card - v0.9 flattened format
             {
                 "id": card_id,
-                "component": "Card",  # v0.9: component type as string
-                "child": row_id,
+                "component": "Card",
+                "child": f"pm-row-{index}",
                 "action": {
                     "name": "select_payment_method",
                     "context": {
                         "index": index + 1,  # v0.9: literal number
-                        "paymentMethodId": method["id"]  # v0.9: literal string
+                        "paymentMethodId": {"path": f"{path}/id"}
                     }
                 }
             },
             # Row layout - v0.9 flattened format
             {
-                "id": row_id,
-                "component": "Row",  # v0.9: component type as string
-                "children": [index_id, info_col_id],
+                "id": f"pm-row-{index}",
+                "component": "Row",
+                "children": [f"pm-index-{index}", f"pm-info-{index}"],
                 "alignment": "center",
                 "gap": 12
             },
             # Index number - v0.9 flattened format
             {
-                "id": index_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": str(index + 1),  # v0.9: literal string
+                "id": f"pm-index-{index}",
+                "component": "Text",
+                "text": str(index + 1),
                 "styleHint": "h2"
             },
             # Info column - v0.9 flattened format
             {
-                "id": info_col_id,
-                "component": "Column",  # v0.9: component type as string
-                "children": [brand_id, type_id],
+                "id": f"pm-info-{index}",
+                "component": "Column",
+                "children": [f"pm-brand-{index}", f"pm-type-{index}"],
                 "distribution": "start",
                 "gap": 4
             },
             # Brand and last4 - v0.9 flattened format
             {
-                "id": brand_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": display_text,  # v0.9: literal string
+                "id": f"pm-brand-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/display_text"},
                 "styleHint": "h4"
             },
             # Type - v0.9 flattened format
             {
-                "id": type_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": type_text,  # v0.9: literal string
+                "id": f"pm-type-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/type_text"},
                 "styleHint": "caption"
             }
         ])
 
-    # Build list container
     # Root component must have id="root" for A2UI v0.9 auto-rendering
-
-    components = [
+    return [
         # Root Column - v0.9 flattened format
         {
             "id": "root",
-            "component": "Column",  # v0.9: component type as string
+            "component": "Column",
             "children": card_ids,
             "distribution": "start",
             "gap": 8
         }
     ] + method_components
 
-    # Build data model
+
+def _payment_method_selection_parts(payment_methods: list[dict]) -> Tuple[SurfaceTemplate, Dict[str, Any]]:
+    """Template and data model of the payment method selection."""
+    methods = []
+    for m in payment_methods:
+        # Format display text
+        brand = m.get("brand", "").upper()
+        last4 = m.get("last4", "")
+        methods.append({
+            "id": m["id"],
+            "type": m.get("type", ""),
+            "brand": m.get("brand", ""),
+            "last4": last4,
+            "display_text": f"{brand} **** {last4}" if brand and last4 else m.get("type", "カード"),
+            "type_text": "クレジットカード" if m.get("type") == "card" else m.get("type", "")
+        })
+
     data_model = {
-        "paymentMethods": [
-            {
-                "id": m["id"],
-                "type": m.get("type", ""),
-                "brand": m.get("brand", ""),
-                "last4": m.get("last4", "")
-            }
-            for m in payment_methods
-        ],
+        "paymentMethods": methods,
         "selectedIndex": None
     }
 
-    return {
-        "surfaceId": surface_id,
-        "surfaceType": "payment_method_selection",
-        "components": components,
-        "dataModel": data_model
-    }
+    return payment_method_selection_template(len(payment_methods)), data_model
 
 
-def generate_payment_method_selection_a2ui_messages(
+def build_payment_method_selection_a2ui(
     payment_methods: list[dict],
     surface_id: Optional[str] = None
+) -> dict:
+    """
+    Build an A2UI surface for payment method selection.
+
+    Args:
+        payment_methods: List of payment methods with id, type, brand, last4
+        surface_id: Optional surface ID (generated if not provided)
+
+    Returns:
+        A2UI surface definition for payment method selection
+    """
+    return _surface(*_payment_method_selection_parts(payment_methods), surface_id)
+
+
+def generate_payment_method_selection_a2ui_messages(
+    payment_methods: list[dict],
+    surface_id: Optional[str] = None,
+    surface_state: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate A2UI v0.9 protocol messages for payment method selection.
@@ -557,15 +633,15 @@ def generate_payment_method_selection_a2ui_messages(
     Args:
         payment_methods: List of payment methods
         surface_id: Optional surface ID
+        surface_state: Optional per-session surface state (see render_surface_messages)
 
     Returns:
         List of SSE events (createSurface, updateComponents, updateDataModel)
     """
-    surface = build_payment_method_selection_a2ui(payment_methods, surface_id)
-    return generate_a2ui_messages(
-        surface_id=surface["surfaceId"],
-        components=surface["components"],
-        data_model=surface["dataModel"]
+    return render_surface_messages(
+        *_payment_method_selection_parts(payment_methods),
+        surface_id=surface_id,
+        surface_state=surface_state
     )
 
 
@@ -573,132 +649,105 @@ def generate_payment_method_selection_a2ui_messages(
 # Product Carousel A2UI Builder
 # =============================================================================
 
-def build_product_carousel_a2ui(
-    products: list[dict],
-    surface_id: Optional[str] = None
-) -> dict:
-    """
-    Build an A2UI surface for product carousel.
-
-    Args:
-        products: List of products with id, sku, name, description, price, inventory_count, image_url
-        surface_id: Optional surface ID (generated if not provided)
-
-    Returns:
-        A2UI surface definition for product carousel
-    """
-    surface_id = surface_id or _generate_id("product-carousel")
-
-    # Build product card components
+@surface_template("product_carousel")
+def product_carousel_template(count: int) -> List[Dict[str, Any]]:
+    """Compile the product carousel skeleton for count products."""
     product_components = []
     card_ids = []
 
-    for index, product in enumerate(products):
-        card_id = _generate_id(f"product-card-{index}")
-        col_id = _generate_id(f"product-col-{index}")
-        image_id = _generate_id(f"product-image-{index}")
-        name_id = _generate_id(f"product-name-{index}")
-        desc_id = _generate_id(f"product-desc-{index}")
-        price_id = _generate_id(f"product-price-{index}")
-        inventory_id = _generate_id(f"product-inventory-{index}")
-        button_text_id = _generate_id(f"button-text-{index}")
-        button_id = _generate_id(f"add-to-cart-{index}")
-
+    for index in range(count):
+        path = f"/products/{index}"
+        card_id = f"product-card-{index}"
         card_ids.append(card_id)
 
-        # Format price (cents to yen)
-        price = product.get("price", 0)
-        price_text = f"¥{price // 100:,}" if isinstance(price, int) else f"¥{price:,.0f}"
-
-        # Get image URL
-        image_url = product.get("metadata", {}).get("image_url") or product.get("image_url") or "https://placehold.co/400x400/EEE/999?text=No+Image"
-
-        # Inventory count
-        inventory_count = product.get("inventory_count", 0)
-
         product_components.extend([
             # Card - v0.9 flattened format
             {
                 "id": card_id,
-                "component": "Card",  # v0.9: component type as string
-                "child": col_id
+                "component": "Card",
+                "child": f"product-col-{index}"
             },
             # Column layout - v0.9 flattened format
             {
-                "id": col_id,
-                "component": "Column",  # v0.9: component type as string
-                "children": [image_id, name_id, desc_id, price_id, inventory_id, button_id],
+                "id": f"product-col-{index}",
+                "component": "Column",
+                "children": [
+                    f"product-image-{index}",
+                    f"product-name-{index}",
+                    f"product-desc-{index}",
+                    f"product-price-{index}",
+                    f"product-inventory-{index}",
+                    f"add-to-cart-{index}"
+                ],
                 "distribution": "start",
                 "gap": 8
             },
             # Product image - v0.9 flattened format
             {
-                "id": image_id,
-                "component": "Image",  # v0.9: component type as string
-                "url": image_url,  # v0.9: literal string
+                "id": f"product-image-{index}",
+                "component": "Image",
+                "url": {"path": f"{path}/thumbnail_url"},
                 "fit": "contain",
                 "usageHint": "thumbnail",
-                "altText": product.get("name", "")  # v0.9: literal string
+                "altText": {"path": f"{path}/name"}
             },
             # Product name - v0.9 flattened format
             {
-                "id": name_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": product.get("name", ""),  # v0.9: literal string
+                "id": f"product-name-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/name"},
                 "styleHint": "h4"
             },
             # Description - v0.9 flattened format
             {
-                "id": desc_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": product.get("description", "")[:100],  # v0.9: literal string
+                "id": f"product-desc-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/summary"},
                 "styleHint": "caption"
             },
             # Price - v0.9 flattened format
             {
-                "id": price_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": price_text,  # v0.9: literal string
+                "id": f"product-price-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/price_text"},
                 "styleHint": "h3"
             },
             # Inventory - v0.9 flattened format
             {
-                "id": inventory_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": f"在庫: {inventory_count}点",  # v0.9: literal string
+                "id": f"product-inventory-{index}",
+                "component": "Text",
+                "text": {"path": f"{path}/inventory_text"},
                 "styleHint": "caption"
             },
             # Button text - v0.9 flattened format
             {
-                "id": button_text_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": "カートに追加"  # v0.9: literal string
+                "id": f"button-text-{index}",
+                "component": "Text",
+                "text": "カートに追加"
             },
             # Add to cart button - v0.9 flattened format
             {
-                "id": button_id,
-                "component": "Button",  # v0.9: component type as string
-                "child": button_text_id,
+                "id": f"add-to-cart-{index}",
+                "component": "Button",
+                "child": f"button-text-{index}",
                 "primary": True,
-                "disabled": inventory_count == 0,  # v0.9: literal boolean
+                "disabled": {"path": f"{path}/sold_out"},
                 "action": {
                     "name": "add_to_cart",
                     "context": {
-                        "productId": product.get("id", ""),  # v0.9: literal string
-                        "sku": product.get("sku", "")  # v0.9: literal string
+                        "productId": {"path": f"{path}/id"},
+                        "sku": {"path": f"{path}/sku"}
                     }
                 }
             }
         ])
 
-    # Build horizontal list container
     # Root component must have id="root" for A2UI v0.9 auto-rendering
-
-    components = [
+    return [
         # Root List - v0.9 flattened format
         {
             "id": "root",
-            "component": "List",  # v0.9: component type as string
+            "component": "List",
             "children": card_ids,
             "dataPath": "/products",
             "direction": "horizontal",
@@ -706,33 +755,54 @@ def build_product_carousel_a2ui(
         }
     ] + product_components
 
-    # Build data model
-    data_model = {
-        "products": [
-            {
-                "id": p.get("id", ""),
-                "sku": p.get("sku", ""),
-                "name": p.get("name", ""),
-                "description": p.get("description", ""),
-                "price": p.get("price", 0),
-                "inventory_count": p.get("inventory_count", 0),
-                "image_url": p.get("metadata", {}).get("image_url") or p.get("image_url") or ""
-            }
-            for p in products
-        ]
-    }
 
-    return {
-        "surfaceId": surface_id,
-        "surfaceType": "product_carousel",
-        "components": components,
-        "dataModel": data_model
-    }
+def _product_carousel_parts(products: list[dict]) -> Tuple[SurfaceTemplate, Dict[str, Any]]:
+    """Template and data model of the product carousel."""
+    items = []
+    for p in products:
+        # Format price (cents to yen)
+        price = p.get("price", 0)
+        image_url = p.get("metadata", {}).get("image_url") or p.get("image_url") or ""
+        inventory_count = p.get("inventory_count", 0)
+        items.append({
+            "id": p.get("id", ""),
+            "sku": p.get("sku", ""),
+            "name": p.get("name", ""),
+            "description": p.get("description", ""),
+            "price": price,
+            "inventory_count": inventory_count,
+            "image_url": image_url,
+            "thumbnail_url": image_url or NO_IMAGE_URL,
+            "summary": p.get("description", "")[:100],
+            "price_text": f"¥{price // 100:,}" if isinstance(price, int) else f"¥{price:,.0f}",
+            "inventory_text": f"在庫: {inventory_count}点",
+            "sold_out": inventory_count == 0
+        })
 
+    return product_carousel_template(len(products)), {"products": items}
 
-def generate_product_carousel_a2ui_messages(
+
+def build_product_carousel_a2ui(
     products: list[dict],
     surface_id: Optional[str] = None
+) -> dict:
+    """
+    Build an A2UI surface for product carousel.
+
+    Args:
+        products: List of products with id, sku, name, description, price, inventory_count, image_url
+        surface_id: Optional surface ID (generated if not provided)
+
+    Returns:
+        A2UI surface definition for product carousel
+    """
+    return _surface(*_product_carousel_parts(products), surface_id)
+
+
+def generate_product_carousel_a2ui_messages(
+    products: list[dict],
+    surface_id: Optional[str] = None,
+    surface_state: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate A2UI v0.9 protocol messages for product carousel.
@@ -740,15 +810,15 @@ def generate_product_carousel_a2ui_messages(
     Args:
         products: List of products
         surface_id: Optional surface ID
+        surface_state: Optional per-session surface state (see render_surface_messages)
 
     Returns:
         List of SSE events (createSurface, updateComponents, updateDataModel)
     """
-    surface = build_product_carousel_a2ui(products, surface_id)
-    return generate_a2ui_messages(
-        surface_id=surface["surfaceId"],
-        components=surface["components"],
-        data_model=surface["dataModel"]
+    return render_surface_messages(
+        *_product_carousel_parts(products),
+        surface_id=surface_id,
+        surface_state=surface_state
     )
 
 
@@ -756,144 +826,110 @@ def generate_product_carousel_a2ui_messages(
 # Cart Details Modal A2UI Builder
 # =============================================================================
 
-def build_cart_details_a2ui(
-    cart_candidate: dict,
-    surface_id: Optional[str] = None
-) -> dict:
-    """
-    Build an A2UI surface for cart details modal.
-
-    Args:
-        cart_candidate: Cart candidate with artifact_id, artifact_name, cart_mandate
-        surface_id: Optional surface ID (generated if not provided)
-
-    Returns:
-        A2UI surface definition for cart details modal
-    """
-    surface_id = surface_id or _generate_id("cart-details")
-
-    cart_mandate = cart_candidate.get("cart_mandate", {})
-    contents = cart_mandate.get("contents", {})
-    metadata = cart_mandate.get("_metadata", {})
-    payment_request = contents.get("payment_request", {})
-    details = payment_request.get("details", {})
-
-    cart_name = metadata.get("cart_name") or cart_candidate.get("artifact_name") or "カート"
-    cart_description = metadata.get("cart_description", "")
-    merchant_name = contents.get("merchant_name", "")
-
-    display_items = details.get("display_items", [])
-    total = details.get("total", {})
-    shipping_address = payment_request.get("shipping_address", {})
-    shipping_options = details.get("shipping_options", [])
-
-    # Categorize items
-    product_items = [item for item in display_items if item.get("refund_period", 0) > 0]
-    shipping_item = next((item for item in display_items if "送料" in item.get("label", "")), None)
-    tax_item = next((item for item in display_items if "税" in item.get("label", "")), None)
-
-    # Calculate subtotal
-    subtotal = sum(item.get("amount", {}).get("value", 0) for item in product_items)
-
-    # Build components
-    components = []
-
-    # Modal content column
-    content_col_id = _generate_id("cart-content-col")
+def _price_row(row_id: str, label: Any, value: Any, style_hint: str) -> List[Dict[str, Any]]:
+    """Label/value row of the price breakdown."""
+    return [
+        {
+            "id": f"{row_id}-row",
+            "component": "Row",
+            "children": [f"{row_id}-label", f"{row_id}-value"],
+            "distribution": "spaceBetween"
+        },
+        {
+            "id": f"{row_id}-label",
+            "component": "Text",
+            "text": label,
+            "styleHint": style_hint
+        },
+        {
+            "id": f"{row_id}-value",
+            "component": "Text",
+            "text": value,
+            "styleHint": style_hint
+        }
+    ]
 
-    # Header
-    header_row_id = _generate_id("cart-header")
-    header_icon_id = _generate_id("cart-icon")
-    header_title_id = _generate_id("cart-title")
-    header_desc_id = _generate_id("cart-desc")
 
-    components.extend([
+@surface_template("cart_details")
+def cart_details_template(
+    item_count: int,
+    has_description: bool,
+    has_tax: bool,
+    has_shipping: bool
+) -> List[Dict[str, Any]]:
+    """Compile the cart details modal skeleton."""
+    components: List[Dict[str, Any]] = [
         # Header Row - v0.9 flattened format
         {
-            "id": header_row_id,
-            "component": "Row",  # v0.9: component type as string
-            "children": [header_icon_id, header_title_id],
+            "id": "cart-header",
+            "component": "Row",
+            "children": ["cart-icon", "cart-title"],
             "alignment": "center",
             "gap": 8
         },
         # Header Icon - v0.9 flattened format
         {
-            "id": header_icon_id,
-            "component": "Icon",  # v0.9: component type as string
+            "id": "cart-icon",
+            "component": "Icon",
             "name": "package"
         },
         # Header Title - v0.9 flattened format
         {
-            "id": header_title_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": cart_name,  # v0.9: literal string
+            "id": "cart-title",
+            "component": "Text",
+            "text": {"path": "/cart/name"},
             "styleHint": "h2"
         }
-    ])
+    ]
 
-    if cart_description:
+    if has_description:
         components.append({
-            "id": header_desc_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": cart_description,  # v0.9: literal string
+            "id": "cart-desc",
+            "component": "Text",
+            "text": {"path": "/cart/description"},
             "styleHint": "body"
         })
 
     # Product list section
-    products_section_id = _generate_id("products-section")
-    products_header_id = _generate_id("products-header")
-    products_list_id = _generate_id("products-list")
-
     product_card_ids = []
-    raw_items = metadata.get("raw_items", [])
-
-    for idx, item in enumerate(product_items):
-        item_card_id = _generate_id(f"item-card-{idx}")
-        item_row_id = _generate_id(f"item-row-{idx}")
-        item_info_col_id = _generate_id(f"item-info-{idx}")
-        item_name_id = _generate_id(f"item-name-{idx}")
-        item_price_id = _generate_id(f"item-price-{idx}")
-
-        product_card_ids.append(item_card_id)
-
-        raw_item = raw_items[idx] if idx < len(raw_items) else {}
-        unit_price = raw_item.get("unit_price", {}).get("value", 0)
-        quantity = raw_item.get("quantity", 1)
+    for idx in range(item_count):
+        path = f"/cart/items/{idx}"
+        product_card_ids.append(f"item-card-{idx}")
 
         components.extend([
             # Item Card - v0.9 flattened format
             {
-                "id": item_card_id,
-                "component": "Card",  # v0.9: component type as string
-                "child": item_row_id
+                "id": f"item-card-{idx}",
+                "component": "Card",
+                "child": f"item-row-{idx}"
             },
             # Item Row - v0.9 flattened format
             {
-                "id": item_row_id,
-                "component": "Row",  # v0.9: component type as string
-                "children": [item_info_col_id, item_price_id],
+                "id": f"item-row-{idx}",
+                "component": "Row",
+                "children": [f"item-info-{idx}", f"item-price-{idx}"],
                 "alignment": "center",
                 "distribution": "spaceBetween"
             },
             # Item Info Column - v0.9 flattened format
             {
-                "id": item_info_col_id,
-                "component": "Column",  # v0.9: component type as string
-                "children": [item_name_id],
+                "id": f"item-info-{idx}",
+                "component": "Column",
+                "children": [f"item-name-{idx}"],
                 "distribution": "start"
             },
             # Item Name - v0.9 flattened format
             {
-                "id": item_name_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": item.get("label", ""),  # v0.9: literal string
+                "id": f"item-name-{idx}",
+                "component": "Text",
+                "text": {"path": f"{path}/label"},
                 "styleHint": "h4"
             },
             # Item Price - v0.9 flattened format
             {
-                "id": item_price_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": f"¥{item.get('amount', {}).get('value', 0):,}",  # v0.9: literal string
+                "id": f"item-price-{idx}",
+                "component": "Text",
+                "text": {"path": f"{path}/price_text"},
                 "styleHint": "h4"
             }
         ])
@@ -901,195 +937,76 @@ def build_cart_details_a2ui(
     components.extend([
         # Products Header - v0.9 flattened format
         {
-            "id": products_header_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": f"商品一覧（{len(product_items)}点）",  # v0.9: literal string
+            "id": "products-header",
+            "component": "Text",
+            "text": f"商品一覧（{item_count}点）",
             "styleHint": "h4"
         },
         # Products List - v0.9 flattened format
         {
-            "id": products_list_id,
-            "component": "Column",  # v0.9: component type as string
+            "id": "products-list",
+            "component": "Column",
             "children": product_card_ids,
             "distribution": "start",
             "gap": 8
-        }
-    ])
-
-    # Divider
-    divider1_id = _generate_id("divider1")
-    components.append({
-        "id": divider1_id,
-        "component": "Divider",  # v0.9: component type as string
-        "orientation": "horizontal"
-    })
-
-    # Price breakdown
-    price_section_id = _generate_id("price-section")
-    subtotal_row_id = _generate_id("subtotal-row")
-    subtotal_label_id = _generate_id("subtotal-label")
-    subtotal_value_id = _generate_id("subtotal-value")
-    total_row_id = _generate_id("total-row")
-    total_label_id = _generate_id("total-label")
-    total_value_id = _generate_id("total-value")
-
-    price_children = [subtotal_row_id]
-
-    components.extend([
-        # Subtotal Row - v0.9 flattened format
-        {
-            "id": subtotal_row_id,
-            "component": "Row",  # v0.9: component type as string
-            "children": [subtotal_label_id, subtotal_value_id],
-            "distribution": "spaceBetween"
-        },
-        # Subtotal Label - v0.9 flattened format
-        {
-            "id": subtotal_label_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": "小計",  # v0.9: literal string
-            "styleHint": "body"
         },
-        # Subtotal Value - v0.9 flattened format
+        # Divider - v0.9 flattened format
         {
-            "id": subtotal_value_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": f"¥{subtotal:,}",  # v0.9: literal string
-            "styleHint": "body"
+            "id": "divider1",
+            "component": "Divider",
+            "orientation": "horizontal"
         }
     ])
 
-    # Tax row if exists
-    if tax_item:
-        tax_row_id = _generate_id("tax-row")
-        tax_label_id = _generate_id("tax-label")
-        tax_value_id = _generate_id("tax-value")
-        price_children.append(tax_row_id)
-
-        components.extend([
-            # Tax Row - v0.9 flattened format
-            {
-                "id": tax_row_id,
-                "component": "Row",  # v0.9: component type as string
-                "children": [tax_label_id, tax_value_id],
-                "distribution": "spaceBetween"
-            },
-            # Tax Label - v0.9 flattened format
-            {
-                "id": tax_label_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": tax_item.get("label", "税"),  # v0.9: literal string
-                "styleHint": "body"
-            },
-            # Tax Value - v0.9 flattened format
-            {
-                "id": tax_value_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": f"¥{tax_item.get('amount', {}).get('value', 0):,}",  # v0.9: literal string
-                "styleHint": "body"
-            }
-        ])
-
-    # Shipping row if exists
-    if shipping_item:
-        shipping_row_id = _generate_id("shipping-row")
-        shipping_label_id = _generate_id("shipping-label")
-        shipping_value_id = _generate_id("shipping-value")
-        price_children.append(shipping_row_id)
+    # Price breakdown
+    price_children = ["subtotal-row"]
+    components.extend(_price_row("subtotal", "小計", {"path": "/cart/subtotal_text"}, "body"))
 
-        components.extend([
-            # Shipping Row - v0.9 flattened format
-            {
-                "id": shipping_row_id,
-                "component": "Row",  # v0.9: component type as string
-                "children": [shipping_label_id, shipping_value_id],
-                "distribution": "spaceBetween"
-            },
-            # Shipping Label - v0.9 flattened format
-            {
-                "id": shipping_label_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": shipping_item.get("label", "送料"),  # v0.9: literal string
-                "styleHint": "body"
-            },
-            # Shipping Value - v0.9 flattened format
-            {
-                "id": shipping_value_id,
-                "component": "Text",  # v0.9: component type as string
-                "text": f"¥{shipping_item.get('amount', {}).get('value', 0):,}",  # v0.9: literal string
-                "styleHint": "body"
-            }
-        ])
+    if has_tax:
+        price_children.append("tax-row")
+        components.extend(_price_row("tax", {"path": "/cart/tax_label"}, {"path": "/cart/tax_text"}, "body"))
 
-    # Total row
-    divider2_id = _generate_id("divider2")
-    price_children.extend([divider2_id, total_row_id])
-
-    components.extend([
-        # Divider 2 - v0.9 flattened format
-        {
-            "id": divider2_id,
-            "component": "Divider",  # v0.9: component type as string
-            "orientation": "horizontal"
-        },
-        # Total Row - v0.9 flattened format
-        {
-            "id": total_row_id,
-            "component": "Row",  # v0.9: component type as string
-            "children": [total_label_id, total_value_id],
-            "distribution": "spaceBetween"
-        },
-        # Total Label - v0.9 flattened format
-        {
-            "id": total_label_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": "合計",  # v0.9: literal string
-            "styleHint": "h3"
-        },
-        # Total Value - v0.9 flattened format
-        {
-            "id": total_value_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": f"¥{total.get('amount', {}).get('value', 0):,}",  # v0.9: literal string
-            "styleHint": "h3"
-        }
-    ])
+    if has_shipping:
+        price_children.append("shipping-row")
+        components.extend(
+            _price_row("shipping", {"path": "/cart/shipping_label"}, {"path": "/cart/shipping_text"}, "body")
+        )
 
+    price_children.extend(["divider2", "total-row"])
     components.append({
-        "id": price_section_id,
-        "component": "Column",  # v0.9: component type as string
-        "children": price_children,
-        "distribution": "start",
-        "gap": 8
+        "id": "divider2",
+        "component": "Divider",
+        "orientation": "horizontal"
     })
-
-    # Action buttons
-    actions_row_id = _generate_id("actions-row")
-    close_button_id = _generate_id("close-button")
-    close_text_id = _generate_id("close-text")
-    select_button_id = _generate_id("select-button")
-    select_text_id = _generate_id("select-text")
+    components.extend(_price_row("total", "合計", {"path": "/cart/total_text"}, "h3"))
 
     components.extend([
+        {
+            "id": "price-section",
+            "component": "Column",
+            "children": price_children,
+            "distribution": "start",
+            "gap": 8
+        },
         # Actions Row - v0.9 flattened format
         {
-            "id": actions_row_id,
-            "component": "Row",  # v0.9: component type as string
-            "children": [close_button_id, select_button_id],
+            "id": "actions-row",
+            "component": "Row",
+            "children": ["close-button", "select-button"],
             "distribution": "spaceBetween",
             "gap": 8
         },
         # Close Button Text - v0.9 flattened format
         {
-            "id": close_text_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": "閉じる"  # v0.9: literal string
+            "id": "close-text",
+            "component": "Text",
+            "text": "閉じる"
         },
         # Close Button - v0.9 flattened format
         {
-            "id": close_button_id,
-            "component": "Button",  # v0.9: component type as string
-            "child": close_text_id,
+            "id": "close-button",
+            "component": "Button",
+            "child": "close-text",
             "primary": False,
             "action": {
                 "name": "close_cart_modal"
@@ -1097,77 +1014,112 @@ def build_cart_details_a2ui(
         },
         # Select Button Text - v0.9 flattened format
         {
-            "id": select_text_id,
-            "component": "Text",  # v0.9: component type as string
-            "text": "このカートを選択"  # v0.9: literal string
+            "id": "select-text",
+            "component": "Text",
+            "text": "このカートを選択"
         },
         # Select Button - v0.9 flattened format
         {
-            "id": select_button_id,
-            "component": "Button",  # v0.9: component type as string
-            "child": select_text_id,
+            "id": "select-button",
+            "component": "Button",
+            "child": "select-text",
             "primary": True,
             "action": {
                 "name": "select_cart",
                 "context": {
-                    "artifactId": cart_candidate.get("artifact_id", "")  # v0.9: literal string
+                    "artifactId": {"path": "/cart/artifact_id"}
                 }
             }
         }
     ])
 
     # Main content column
-    content_children = [header_row_id]
-    if cart_description:
-        content_children.append(header_desc_id)
-    content_children.extend([
-        products_header_id,
-        products_list_id,
-        divider1_id,
-        price_section_id,
-        actions_row_id
+    content_children = ["cart-header"]
+    if has_description:
+        content_children.append("cart-desc")
+    content_children.extend(["products-header", "products-list", "divider1", "price-section", "actions-row"])
+
+    components.extend([
+        {
+            "id": "cart-content-col",
+            "component": "Column",
+            "children": content_children,
+            "distribution": "start",
+            "gap": 16
+        },
+        # Modal wrapper - v0.9 flattened format
+        # Root component must have id="root" for A2UI v0.9 auto-rendering
+        {
+            "id": "root",
+            "component": "Modal",
+            "contentChild": "cart-content-col",
+            "open": {"path": "/modalOpen"},  # v0.9: path reference as object
+            "title": {"path": "/cart/name"}
+        }
     ])
 
-    components.append({
-        "id": content_col_id,
-        "component": "Column",  # v0.9: component type as string
-        "children": content_children,
-        "distribution": "start",
-        "gap": 16
-    })
+    return components
 
-    # Modal wrapper - v0.9 flattened format
-    # Root component must have id="root" for A2UI v0.9 auto-rendering
-    components.append({
-        "id": "root",
-        "component": "Modal",  # v0.9: component type as string
-        "contentChild": content_col_id,
-        "open": {"path": "/modalOpen"},  # v0.9: path reference as object
-        "title": cart_name  # v0.9: literal string
-    })
 
-    # Build data model
+def _cart_details_parts(cart_candidate: dict) -> Tuple[SurfaceTemplate, Dict[str, Any]]:
+    """Template and data model of the cart details modal."""
+    cart_mandate = cart_candidate.get("cart_mandate", {})
+    contents = cart_mandate.get("contents", {})
+    metadata = cart_mandate.get("_metadata", {})
+    payment_request = contents.get("payment_request", {})
+    details = payment_request.get("details", {})
+
+    cart_name = metadata.get("cart_name") or cart_candidate.get("artifact_name") or "カート"
+    cart_description = metadata.get("cart_description", "")
+
+    display_items = details.get("display_items", [])
+    total = details.get("total", {})
+    shipping_address = payment_request.get("shipping_address", {})
+
+    # Categorize items
+    product_items = [item for item in display_items if item.get("refund_period", 0) > 0]
+    shipping_item = next((item for item in display_items if "送料" in item.get("label", "")), None)
+    tax_item = next((item for item in display_items if "税" in item.get("label", "")), None)
+
+    # Calculate subtotal
+    subtotal = sum(item.get("amount", {}).get("value", 0) for item in product_items)
+    tax = tax_item.get("amount", {}).get("value", 0) if tax_item else 0
+    shipping = shipping_item.get("amount", {}).get("value", 0) if shipping_item else 0
+    total_value = total.get("amount", {}).get("value", 0)
+
+    raw_items = metadata.get("raw_items", [])
+    items = []
+    for idx, item in enumerate(product_items):
+        raw_item = raw_items[idx] if idx < len(raw_items) else {}
+        total_price = item.get("amount", {}).get("value", 0)
+        items.append({
+            "label": item.get("label", ""),
+            "description": raw_item.get("description", ""),
+            "image_url": raw_item.get("image_url", ""),
+            "unit_price": raw_item.get("unit_price", {}).get("value", 0),
+            "quantity": raw_item.get("quantity", 1),
+            "total_price": total_price,
+            "price_text": f"¥{total_price:,}"
+        })
+
     data_model = {
         "cart": {
             "id": contents.get("id", ""),
+            "artifact_id": cart_candidate.get("artifact_id", ""),
             "name": cart_name,
             "description": cart_description,
-            "merchant_name": merchant_name,
-            "items": [
-                {
-                    "label": item.get("label", ""),
-                    "description": raw_items[idx].get("description", "") if idx < len(raw_items) else "",
-                    "image_url": raw_items[idx].get("image_url", "") if idx < len(raw_items) else "",
-                    "unit_price": raw_items[idx].get("unit_price", {}).get("value", 0) if idx < len(raw_items) else 0,
-                    "quantity": raw_items[idx].get("quantity", 1) if idx < len(raw_items) else 1,
-                    "total_price": item.get("amount", {}).get("value", 0)
-                }
-                for idx, item in enumerate(product_items)
-            ],
+            "merchant_name": contents.get("merchant_name", ""),
+            "items": items,
             "subtotal": subtotal,
-            "tax": tax_item.get("amount", {}).get("value", 0) if tax_item else 0,
-            "shipping": shipping_item.get("amount", {}).get("value", 0) if shipping_item else 0,
-            "total": total.get("amount", {}).get("value", 0)
+            "tax": tax,
+            "shipping": shipping,
+            "total": total_value,
+            "subtotal_text": f"¥{subtotal:,}",
+            "tax_label": tax_item.get("label", "税") if tax_item else "",
+            "tax_text": f"¥{tax:,}",
+            "shipping_label": shipping_item.get("label", "送料") if shipping_item else "",
+            "shipping_text": f"¥{shipping:,}",
+            "total_text": f"¥{total_value:,}"
         },
         "modalOpen": False  # デフォルトは閉じた状態。ユーザーが「詳細」をクリックしたときに開く
     }
@@ -1182,17 +1134,34 @@ def build_cart_details_a2ui(
             "phone_number": shipping_address.get("phone_number", "")
         }
 
-    return {
-        "surfaceId": surface_id,
-        "surfaceType": "cart_details",
-        "components": components,
-        "dataModel": data_model
-    }
+    template = cart_details_template(
+        len(product_items), bool(cart_description), tax_item is not None, shipping_item is not None
+    )
+    return template, data_model
 
 
-def generate_cart_details_a2ui_messages(
+def build_cart_details_a2ui(
     cart_candidate: dict,
     surface_id: Optional[str] = None
+) -> dict:
+    """
+    Build an A2UI surface for cart details modal.
+
+    Args:
+        cart_candidate: Cart candidate with artifact_id, artifact_name, cart_mandate
+        surface_id: Optional surface ID (generated if not provided)
+
+    Returns:
+        A2UI surface definition for cart details modal
+    """
+    return _surface(*_cart_details_parts(cart_candidate), surface_id)
+
+
+def generate_cart_details_a2ui_messages(
+    cart_candidate: dict,
+    surface_id: Optional[str] = None,
+    surface_state: Optional[Dict[str, Any]] = None,
+    surface_key: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate A2UI v0.9 protocol messages for cart details modal.
@@ -1200,13 +1169,15 @@ def generate_cart_details_a2ui_messages(
     Args:
         cart_candidate: Cart candidate data
         surface_id: Optional surface ID
+        surface_state: Optional per-session surface state (see render_surface_messages)
+        surface_key: Key within surface_state (one per cart candidate slot)
 
     Returns:
         List of SSE events (createSurface, updateComponents, updateDataModel)
     """
-    surface = build_cart_details_a2ui(cart_candidate, surface_id)
-    return generate_a2ui_messages(
-        surface_id=surface["surfaceId"],
-        components=surface["components"],
-        data_model=surface["dataModel"]
+    return render_surface_messages(
+        *_cart_details_parts(cart_candidate),
+        surface_id=surface_id,
+        surface_state=surface_state,
+        surface_key=surface_key
     )
@@ -0,0 +1,150 @@
+"""
+A2UI Surface Templates
+Based on A2UI Specification v0.9
+
+Precompiled component skeletons and data model diffs for the A2UI builders.
+
+A surface is split into two parts:
+- Template: the component tree. Every value that depends on request data is a
+  path reference ({"path": "/products/0/name"}), and component IDs are
+  deterministic, so the tree depends only on the surface "shape" (e.g. number
+  of products) and is built once per shape and cached.
+- Data model: filled per request. When a surface with the same template was
+  already sent, only the changed paths are emitted as updateDataModel messages.
+
+A2UI v0.9 Protocol Reference:
+https://a2ui.org/specification/v0.9-a2ui/
+"""
+
+import functools
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Cached skeletons per surface type (one entry per shape)
+A2UI_TEMPLATE_CACHE_SIZE = int(os.getenv("A2UI_TEMPLATE_CACHE_SIZE", "128"))
+
+# Above this many operations a diff is sent as a single root replace instead
+A2UI_MAX_DIFF_OPS = int(os.getenv("A2UI_MAX_DIFF_OPS", "64"))
+
+
+@dataclass(frozen=True)
+class SurfaceTemplate:
+    """
+    Precompiled component skeleton for one surface type and shape.
+
+    Components are shared between all surfaces built from the template and
+    must be treated as read-only.
+    """
+
+    surface_type: str
+    key: Tuple[Any, ...]
+    components: Tuple[Dict[str, Any], ...]
+
+    @functools.cached_property
+    def fingerprint(self) -> str:
+        """Stable identifier of the template (stored in the session across turns)."""
+        digest = hashlib.sha256(repr(self.key).encode("utf-8")).hexdigest()[:16]
+        return f"{self.surface_type}:{digest}"
+
+
+def surface_template(surface_type: str) -> Callable[[Callable[..., Iterable[Dict[str, Any]]]], Callable[..., SurfaceTemplate]]:
+    """
+    Decorator that turns a skeleton compiler into a cached template factory.
+
+    The decorated function receives the shape key as positional arguments
+    (hashable values only) and returns the component list.
+
+    Example:
+        @surface_template("product_carousel")
+        def product_carousel_template(count: int):
+            return [...]
+
+        product_carousel_template(20).components  # built once, then cached
+    """
+    def decorator(compile_components: Callable[..., Iterable[Dict[str, Any]]]) -> Callable[..., SurfaceTemplate]:
+        @functools.lru_cache(maxsize=A2UI_TEMPLATE_CACHE_SIZE)
+        @functools.wraps(compile_components)
+        def get_template(*key: Any) -> SurfaceTemplate:
+            return SurfaceTemplate(surface_type, key, tuple(compile_components(*key)))
+
+        return get_template
+
+    return decorator
+
+
+# =============================================================================
+# Data Model Diffs (JSON Pointer, RFC 6901)
+# =============================================================================
+
+def _escape_pointer_token(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def diff_data_model(old: Any, new: Any, path: str = "") -> List[Tuple[str, str, Any]]:
+    """
+    Compute updateDataModel operations that turn old into new.
+
+    Objects are compared key by key and lists of equal length element by
+    element; anything else that differs is replaced as a whole.
+
+    Args:
+        old: Previously sent data model (or sub-value)
+        new: New data model (or sub-value)
+        path: JSON Pointer of the compared values ("" for the root)
+
+    Returns:
+        List of (op, path, value) with op in "add", "replace", "remove"
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Tuple[str, str, Any]] = []
+        for key in old.keys() - new.keys():
+            ops.append(("remove", f"{path}/{_escape_pointer_token(key)}", None))
+        for key, value in new.items():
+            child_path = f"{path}/{_escape_pointer_token(key)}"
+            if key not in old:
+                ops.append(("add", child_path, value))
+            else:
+                ops.extend(diff_data_model(old[key], value, child_path))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            ops.extend(diff_data_model(old_item, new_item, f"{path}/{index}"))
+        return ops
+
+    if old == new and type(old) is type(new):
+        return []
+    return [("replace", path or "/", new)]
+
+
+def generate_data_model_update_messages(
+    surface_id: str,
+    old_data_model: Dict[str, Any],
+    new_data_model: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Generate A2UI v0.9 updateDataModel messages for the changed paths only.
+
+    Args:
+        surface_id: Surface that already holds old_data_model on the client
+        old_data_model: Previously sent data model
+        new_data_model: New data model
+
+    Returns:
+        List of updateDataModel events (empty when nothing changed). Large
+        diffs collapse into a single root replace.
+    """
+    ops = diff_data_model(old_data_model, new_data_model)
+    if len(ops) > A2UI_MAX_DIFF_OPS:
+        ops = [("replace", "/", new_data_model)]
+
+    messages = []
+    for op, path, value in ops:
+        message: Dict[str, Any] = {"surfaceId": surface_id, "path": path, "op": op}
+        if op != "remove":
+            message["value"] = value
+        messages.append({"updateDataModel": message})
+    return messages
@@ -203,7 +203,7 @@ class PaymentHelpers:
             logger.error(f"[_generate_user_authorization_for_payment] Failed to generate user_authorization: {e}", exc_info=True)
             return None
 
-    def perform_risk_assessment(
+    async def perform_risk_assessment(
         self,
         payment_mandate: Dict[str, Any],
         cart_mandate: Dict[str, Any],
@@ -224,7 +224,8 @@ class PaymentHelpers:
         """
         try:
             logger.info("[ShoppingAgent] Performing risk assessment...")
-            risk_result = self.risk_engine.assess_payment_mandate(
+            # 取引パターン特徴量はDBの集計から取得（レプリカ間で共有）
+            risk_result = await self.risk_engine.assess_payment_mandate_async(
                 payment_mandate=payment_mandate,
                 cart_mandate=cart_mandate,
                 intent_mandate=intent_mandate,
@@ -16,24 +16,30 @@ MCP仕様準拠：
 - execute_payment: Payment Processorに決済依頼
 """
 
+import asyncio
 import os
 import sys
 from pathlib import Path
 import json
 import uuid
 import uvicorn
+from dataclasses import asdict
 import httpx
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from datetime import datetime, timezone, timedelta
 
-from common.mcp_server import MCPServer
+from common.mcp_server import MCPServer, get_progress_reporter
 from common.database import DatabaseManager
 from common.logger import get_logger
-from common.a2a_handler import A2AMessageHandler
-from common.risk_assessment import RiskAssessmentEngine
 from common.telemetry import setup_telemetry, instrument_fastapi_app
 from services.shopping_agent_mcp.utils import MandateBuilders, A2AHelpers
 
+if TYPE_CHECKING:
+    # 署名（common.crypto・common.models）・リスク評価（numpy）はimportが重いため起動処理（lifespan）で遅延import
+    from common.a2a_handler import A2AMessageHandler
+    from common.crypto import KeyManager
+    from common.risk_assessment import RiskAssessmentEngine
+
 logger = get_logger(__name__, service_name='shopping_agent_mcp')
 
 # グローバル設定
@@ -49,13 +55,13 @@ db_manager = DatabaseManager(DATABASE_URL)
 http_client = httpx.AsyncClient(timeout=600.0)
 
 # A2Aハンドラー初期化（起動時に遅延初期化）
-a2a_handler: Optional[A2AMessageHandler] = None
+a2a_handler: Optional['A2AMessageHandler'] = None
 
 # KeyManager初期化（グローバル）
 key_manager: Optional['KeyManager'] = None
 
 # リスク評価エンジン初期化（起動時に遅延初期化）
-risk_engine: Optional[RiskAssessmentEngine] = None
+risk_engine: Optional['RiskAssessmentEngine'] = None
 
 # MCPサーバー初期化
 mcp = MCPServer(
@@ -130,11 +136,15 @@ async def request_cart_candidates(params: Dict[str, Any]) -> Dict[str, Any]:
 
     Returns:
         {"cart_candidates": [...]}
+
+    SSEストリーミング時は送信・受信の進捗を通知する（Merchant AgentのA2A応答は
+    全カート候補をまとめて返すため、部分結果は通知しない）。
     """
     global a2a_handler
 
     intent_mandate = params["intent_mandate"]
     shipping_address = params.get("shipping_address")
+    progress = get_progress_reporter(params)
 
     try:
         # A2Aハンドラーがstartup時に初期化されていることを確認
@@ -158,6 +168,8 @@ async def request_cart_candidates(params: Dict[str, Any]) -> Dict[str, Any]:
             f"message_id={message.header.message_id}, intent_id={intent_mandate['id']}"
         )
 
+        await progress.report(0, message="Sending IntentMandate to Merchant Agent")
+
         # Merchant AgentにA2Aメッセージ送信
         response = await http_client.post(
             f"{MERCHANT_AGENT_URL}/a2a/message",
@@ -175,6 +187,9 @@ async def request_cart_candidates(params: Dict[str, Any]) -> Dict[str, Any]:
         cart_candidates = payload.get("cart_candidates", [])
 
         logger.info(f"[request_cart_candidates] Received {len(cart_candidates)} cart candidates from A2A response")
+
+        await progress.report(1, total=1, message=f"Received {len(cart_candidates)} cart candidates")
+
         return {"cart_candidates": cart_candidates}
 
     except httpx.HTTPError as e:
@@ -275,13 +290,13 @@ async def assess_payment_risk(params: Dict[str, Any]) -> Dict[str, Any]:
         }
 
         # リスク評価実行
-        risk_result = await risk_engine.assess_payment_mandate(payment_mandate_mock)
+        risk_result = await risk_engine.assess_payment_mandate_async(payment_mandate_mock)
 
         logger.info(
-            f"[assess_payment_risk] Risk assessed: score={risk_result['risk_score']}, "
-            f"recommendation={risk_result['recommendation']}"
+            f"[assess_payment_risk] Risk assessed: score={risk_result.risk_score}, "
+            f"recommendation={risk_result.recommendation}"
         )
-        return {"risk_assessment": risk_result}
+        return {"risk_assessment": asdict(risk_result)}
 
     except Exception as e:
         logger.error(f"[assess_payment_risk] Error: {e}", exc_info=True)
@@ -404,7 +419,9 @@ async def lifespan(app: FastAPI):
         logger.info("[Shopping Agent MCP] Database initialized")
 
         # 2. KeyManager初期化（グローバル）
+        from common.a2a_handler import A2AMessageHandler
         from common.crypto import KeyManager, SignatureManager
+        from common.risk_assessment import RiskAssessmentEngine
         keys_directory = os.getenv("AP2_KEYS_DIRECTORY", "/app/v2/keys")
         key_manager = KeyManager(keys_directory=keys_directory)
         passphrase = os.getenv("AP2_SHOPPING_AGENT_PASSPHRASE", "")
@@ -415,21 +432,33 @@ async def lifespan(app: FastAPI):
         logger.info(f"[Startup] Extracted key_id={key_id} from AGENT_ID={AGENT_ID}")
 
         # 3. 秘密鍵をロード（ED25519優先、ECDSAフォールバック）
-        try:
-            # ED25519鍵をロード
-            private_key_ed25519 = key_manager.load_private_key_encrypted(key_id, passphrase, algorithm="ED25519")
-            logger.info(f"[Startup] ED25519 private key loaded for {key_id}")
-        except Exception as e:
-            logger.warning(f"[Startup] Failed to load ED25519 key: {e}")
-            private_key_ed25519 = None
-
-        try:
-            # ECDSA鍵をロード（フォールバック）
-            private_key_ecdsa = key_manager.load_private_key_encrypted(key_id, passphrase, algorithm="ECDSA")
-            logger.info(f"[Startup] ECDSA private key loaded for {key_id}")
-        except Exception as e:
-            logger.warning(f"[Startup] Failed to load ECDSA key: {e}")
-            private_key_ecdsa = None
+        key_agent_socket = os.getenv("KEY_AGENT_SOCKET", "")
+        if key_agent_socket:
+            # 鍵エージェントモード: 復号せず鍵エージェントの鍵を参照
+            from common.key_agent import KeyAgentClient
+            await asyncio.to_thread(KeyAgentClient(key_agent_socket).attach, key_manager, key_id)
+            private_key_ed25519 = key_manager.get_private_key(key_id, algorithm="ED25519")
+            private_key_ecdsa = key_manager.get_private_key(key_id, algorithm="ECDSA")
+            logger.info(f"[Startup] Using key agent at {key_agent_socket} for {key_id}")
+        else:
+            # 2つの鍵の復号は並行して実行
+            private_key_ed25519, private_key_ecdsa = await asyncio.gather(
+                asyncio.to_thread(key_manager.load_private_key_encrypted, key_id, passphrase, algorithm="ED25519"),
+                asyncio.to_thread(key_manager.load_private_key_encrypted, key_id, passphrase, algorithm="ECDSA"),
+                return_exceptions=True
+            )
+            if isinstance(private_key_ed25519, Exception):
+                logger.warning(f"[Startup] Failed to load ED25519 key: {private_key_ed25519}")
+                private_key_ed25519 = None
+            else:
+                logger.info(f"[Startup] ED25519 private key loaded for {key_id}")
+
+            if isinstance(private_key_ecdsa, Exception):
+                # ECDSA鍵（フォールバック）
+                logger.warning(f"[Startup] Failed to load ECDSA key: {private_key_ecdsa}")
+                private_key_ecdsa = None
+            else:
+                logger.info(f"[Startup] ECDSA private key loaded for {key_id}")
 
         if not private_key_ed25519 and not private_key_ecdsa:
             raise RuntimeError(f"No private keys found for {key_id}")
@@ -0,0 +1,212 @@
+"""
+Tests for Shopping Agent A2UI Builders
+
+Tests cover:
+- a2ui_templates.py (precompiled skeletons, data model diffs)
+- a2ui_builders.py (template-based surfaces, incremental updates)
+"""
+
+import json
+
+import pytest
+
+from services.shopping_agent.utils import a2ui_builders
+from services.shopping_agent.utils.a2ui_builders import (
+    build_cart_details_a2ui,
+    build_product_carousel_a2ui,
+    build_shipping_form_a2ui,
+    generate_cp_selection_a2ui_messages,
+    generate_product_carousel_a2ui_messages,
+    product_carousel_template,
+)
+from services.shopping_agent.utils.a2ui_templates import diff_data_model, generate_data_model_update_messages
+
+
+def make_products(count, inventory=5):
+    return [
+        {
+            "id": f"prod_{i}",
+            "sku": f"SKU-{i}",
+            "name": f"むぎぼーグッズ{i}",
+            "description": "むぎぼーのオリジナルグッズ",
+            "price": 150000,
+            "inventory_count": inventory,
+            "metadata": {"image_url": f"/assets/{i}.png"},
+        }
+        for i in range(count)
+    ]
+
+
+def resolve(data_model, value):
+    """Resolve a {"path": ...} reference like the frontend renderer does"""
+    if isinstance(value, dict) and "path" in value:
+        for part in value["path"].strip("/").split("/"):
+            data_model = data_model[int(part)] if isinstance(data_model, list) else data_model[part]
+        return data_model
+    return value
+
+
+# ============================================================================
+# Templates
+# ============================================================================
+
+
+class TestSurfaceTemplates:
+    """Test precompiled component skeletons"""
+
+    def test_skeleton_is_cached_per_shape(self):
+        """Surfaces of the same shape share one skeleton"""
+        first = build_product_carousel_a2ui(make_products(3))
+        second = build_product_carousel_a2ui(make_products(3, inventory=0))
+
+        assert first["components"] == second["components"]
+        assert first["surfaceId"] != second["surfaceId"]
+        assert product_carousel_template(3) is product_carousel_template(3)
+        assert product_carousel_template(3).fingerprint != product_carousel_template(4).fingerprint
+
+    def test_product_values_are_bound_to_data_model(self):
+        """Component values resolve against the data model"""
+        surface = build_product_carousel_a2ui(make_products(2, inventory=0))
+        components = {c["id"]: c for c in surface["components"]}
+        data_model = surface["dataModel"]
+
+        assert resolve(data_model, components["product-name-1"]["text"]) == "むぎぼーグッズ1"
+        assert resolve(data_model, components["product-price-1"]["text"]) == "¥1,500"
+        assert resolve(data_model, components["product-image-1"]["url"]) == "/assets/1.png"
+        assert resolve(data_model, components["add-to-cart-1"]["disabled"]) is True
+        assert resolve(data_model, components["add-to-cart-1"]["action"]["context"]["productId"]) == "prod_1"
+        assert components["root"]["children"] == ["product-card-0", "product-card-1"]
+
+    def test_cart_details_shape(self):
+        """Optional cart rows follow the cart contents"""
+        cart_candidate = {
+            "artifact_id": "artifact_1",
+            "cart_mandate": {
+                "contents": {
+                    "id": "cart_1",
+                    "payment_request": {
+                        "details": {
+                            "display_items": [
+                                {"label": "Tシャツ", "amount": {"value": 3000}, "refund_period": 30},
+                                {"label": "送料", "amount": {"value": 500}, "refund_period": 0},
+                            ],
+                            "total": {"amount": {"value": 3500}},
+                        }
+                    },
+                },
+                "_metadata": {"cart_name": "おすすめプラン"},
+            },
+        }
+
+        surface = build_cart_details_a2ui(cart_candidate)
+        components = {c["id"]: c for c in surface["components"]}
+
+        assert "tax-row" not in components
+        assert "cart-desc" not in components
+        assert resolve(surface["dataModel"], components["shipping-value"]["text"]) == "¥500"
+        assert resolve(surface["dataModel"], components["total-value"]["text"]) == "¥3,500"
+        assert resolve(surface["dataModel"], components["root"]["title"]) == "おすすめプラン"
+        assert resolve(surface["dataModel"], components["select-button"]["action"]["context"]["artifactId"]) == "artifact_1"
+
+    def test_shipping_form_defaults_in_data_model(self):
+        """Default values only change the data model"""
+        fields = [
+            {"name": "recipient", "label": "受取人名", "type": "text", "required": True},
+            {"name": "country", "label": "国", "type": "text", "required": True, "default": "JP"},
+        ]
+
+        surface = build_shipping_form_a2ui(fields)
+
+        assert surface["dataModel"]["shipping"] == {"recipient": "", "country": "JP"}
+        assert surface["dataModel"]["formInvalid"] is True
+        assert {c["id"] for c in surface["components"]} >= {"root", "field-recipient", "field-country", "submit-button"}
+
+
+# ============================================================================
+# Data Model Diffs
+# ============================================================================
+
+
+class TestDataModelDiff:
+    """Test updateDataModel diffs"""
+
+    def test_diff_operations(self):
+        """Changed, added and removed keys map to JSON Pointer operations"""
+        old = {"a": 1, "b": {"c": [1, 2]}, "d": True, "e/f": 1}
+        new = {"a": 1, "b": {"c": [1, 3]}, "d": 1, "g": "x", "e/f": 2}
+
+        ops = diff_data_model(old, new)
+
+        assert sorted(ops) == sorted([
+            ("replace", "/b/c/1", 3),
+            ("replace", "/d", 1),
+            ("add", "/g", "x"),
+            ("replace", "/e~1f", 2),
+        ])
+        assert diff_data_model({"a": [1]}, {"a": [1, 2]}) == [("replace", "/a", [1, 2])]
+        assert diff_data_model({"a": 1}, {}) == [("remove", "/a", None)]
+
+    def test_large_diff_collapses_to_root_replace(self, monkeypatch):
+        """Too many operations are sent as one root replace"""
+        monkeypatch.setattr("services.shopping_agent.utils.a2ui_templates.A2UI_MAX_DIFF_OPS", 2)
+        new = {"a": 2, "b": 2, "c": 2}
+
+        messages = generate_data_model_update_messages("surface-1", {"a": 1, "b": 1, "c": 1}, new)
+
+        assert messages == [{"updateDataModel": {"surfaceId": "surface-1", "path": "/", "op": "replace", "value": new}}]
+
+
+# ============================================================================
+# Incremental Updates
+# ============================================================================
+
+
+class TestIncrementalUpdates:
+    """Test surface state across turns"""
+
+    @pytest.fixture
+    def incremental(self, monkeypatch):
+        monkeypatch.setattr(a2ui_builders, "A2UI_INCREMENTAL_UPDATES", True)
+
+    def test_same_shape_sends_data_model_diff(self, incremental):
+        """Only the changed product fields are sent on the next turn"""
+        surface_state = {}
+        products = make_products(20)
+
+        first = generate_product_carousel_a2ui_messages(products, surface_state=surface_state)
+        products[3]["inventory_count"] = 0
+        second = generate_product_carousel_a2ui_messages(products, surface_state=surface_state)
+
+        surface_id = first[0]["createSurface"]["surfaceId"]
+        assert [list(m) for m in first] == [["createSurface"], ["updateComponents"], ["updateDataModel"]]
+        assert {m["updateDataModel"]["path"] for m in second} == {
+            "/products/3/inventory_count", "/products/3/inventory_text", "/products/3/sold_out"
+        }
+        assert all(m["updateDataModel"]["surfaceId"] == surface_id for m in second)
+        assert len(json.dumps(second)) < len(json.dumps(first)) / 10
+        assert generate_product_carousel_a2ui_messages(products, surface_state=surface_state) == []
+
+    def test_shape_change_recreates_surface(self, incremental):
+        """A different shape resends the components under the same surface ID"""
+        surface_state = {}
+        providers = [{"id": "cp_1", "name": "CP1", "supported_methods": ["card"]}]
+
+        first = generate_cp_selection_a2ui_messages(providers, surface_state=surface_state)
+        second = generate_cp_selection_a2ui_messages(
+            providers + [{"id": "cp_2", "name": "CP2"}], surface_state=surface_state
+        )
+
+        assert "createSurface" in second[0]
+        assert second[0]["createSurface"]["surfaceId"] == first[0]["createSurface"]["surfaceId"]
+        assert len(second[1]["updateComponents"]["components"]) == 15
+
+    def test_disabled_by_default(self):
+        """Without incremental updates every turn recreates the surface"""
+        surface_state = {}
+        products = make_products(2)
+
+        generate_product_carousel_a2ui_messages(products, surface_state=surface_state)
+        messages = generate_product_carousel_a2ui_messages(products, surface_state=surface_state)
+
+        assert "createSurface" in messages[0]
+        assert "dataModel" not in surface_state["product_carousel"]
@@ -0,0 +1,313 @@
+"""
+Tests for Admission Control
+
+Tests cover:
+- Token bucket rate limiting (local, Redis-shared with fallback)
+- Priority concurrency limiter (lane priority, lane caps, queue budget shedding)
+- AdmissionControlMiddleware (429/503 responses, A2A sender/lane classification)
+"""
+
+import asyncio
+import json
+from collections import Counter
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from common.admission_control import (
+    LANE_A2A,
+    LANE_CHAT,
+    LANE_PAYMENT,
+    AdmissionControlMiddleware,
+    LanePolicy,
+    LocalRateLimiter,
+    PriorityConcurrencyLimiter,
+    RedisRateLimiter,
+    RoutePolicy,
+    TokenBucket,
+    default_lane_policies,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def lanes(max_concurrency, chat_max=None, budget=1.0):
+    return [
+        LanePolicy(LANE_PAYMENT, 0, max_concurrency, budget),
+        LanePolicy(LANE_A2A, 1, max_concurrency, budget),
+        LanePolicy(LANE_CHAT, 2, chat_max or max_concurrency, budget),
+    ]
+
+
+def a2a_body(sender, data_type):
+    return {"header": {"sender": sender, "message_id": "m1"}, "dataPart": {"@type": data_type, "payload": {}}}
+
+
+def create_app(routes, concurrency, rate_limiter, gate=None, stats=None):
+    app = FastAPI()
+
+    async def handler(request: Request):
+        if gate is not None:
+            await gate.wait()
+        return JSONResponse({"ok": True})
+
+    app.add_api_route("/a2a/message", handler, methods=["POST"])
+    app.add_api_route("/chat/stream", handler, methods=["POST"])
+    app.add_api_route("/other", handler, methods=["POST"])
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        routes=routes,
+        concurrency=concurrency,
+        rate_limiter=rate_limiter,
+        stats=stats
+    )
+    return app
+
+
+def http_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestRateLimiters:
+    """Test token bucket rate limiters"""
+
+    def test_token_bucket_burst_and_refill(self):
+        """Test bucket allows burst, then reports time until next token"""
+        bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+
+        assert bucket.take(0.0) == 0.0
+        assert bucket.take(0.0) == 0.0
+        assert bucket.take(0.0) == pytest.approx(0.5)
+        assert bucket.take(0.5) == 0.0
+
+    @pytest.mark.asyncio
+    async def test_local_limiter_separate_keys_and_lru(self):
+        """Test keys have independent buckets and old keys are evicted"""
+        clock = FakeClock()
+        limiter = LocalRateLimiter(max_keys=2, clock=clock)
+
+        assert await limiter.acquire("a", 1.0, 1) == 0.0
+        assert await limiter.acquire("a", 1.0, 1) > 0
+        assert await limiter.acquire("b", 1.0, 1) == 0.0
+        await limiter.acquire("c", 1.0, 1)
+
+        # "a"は追い出され、新しいバケットで再開
+        assert await limiter.acquire("a", 1.0, 1) == 0.0
+
+    @pytest.mark.asyncio
+    async def test_redis_limiter_uses_script_result(self):
+        """Test Redis limiter returns the shared bucket result"""
+        redis_client = AsyncMock()
+        redis_client.run_script.return_value = "0.25"
+        limiter = RedisRateLimiter(redis_client, namespace="agent")
+
+        assert await limiter.acquire("route:/a2a/message", 10.0, 20) == 0.25
+        kwargs = redis_client.run_script.call_args.kwargs
+        assert kwargs["keys"] == ["ratelimit:agent:route:/a2a/message"]
+        assert kwargs["args"] == [10.0, 20]
+
+    @pytest.mark.asyncio
+    async def test_redis_limiter_falls_back_to_local(self):
+        """Test Redis errors fall back to the in-process bucket"""
+        redis_client = AsyncMock()
+        redis_client.run_script.return_value = None
+        limiter = RedisRateLimiter(redis_client, namespace="agent")
+
+        assert await limiter.acquire("k", 1.0, 1) == 0.0
+        assert await limiter.acquire("k", 1.0, 1) > 0
+
+
+class TestPriorityConcurrencyLimiter:
+    """Test priority lanes"""
+
+    @pytest.mark.asyncio
+    async def test_released_slot_goes_to_highest_priority_lane(self):
+        """Test waiting payment request is admitted before an earlier chat request"""
+        limiter = PriorityConcurrencyLimiter(1, lanes(1))
+        assert await limiter.acquire(LANE_A2A)
+
+        order = []
+
+        async def wait(lane):
+            assert await limiter.acquire(lane)
+            order.append(lane)
+            limiter.release(lane)
+
+        chat = asyncio.create_task(wait(LANE_CHAT))
+        await asyncio.sleep(0)
+        payment = asyncio.create_task(wait(LANE_PAYMENT))
+        await asyncio.sleep(0)
+
+        limiter.release(LANE_A2A)
+        await asyncio.gather(chat, payment)
+
+        assert order == [LANE_PAYMENT, LANE_CHAT]
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_lane_cap_leaves_room_for_payments(self):
+        """Test chat cannot take more than its lane cap"""
+        limiter = PriorityConcurrencyLimiter(2, lanes(2, chat_max=1, budget=0.01))
+
+        assert await limiter.acquire(LANE_CHAT)
+        assert await limiter.acquire(LANE_CHAT) is False
+        assert await limiter.acquire(LANE_PAYMENT)
+        assert limiter.stats()["lanes"][LANE_CHAT]["in_flight"] == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_budget_and_queue_limit_shed(self):
+        """Test requests are shed after the queue budget or when the queue is full"""
+        limiter = PriorityConcurrencyLimiter(1, lanes(1, budget=0.01), max_queue=1)
+        assert await limiter.acquire(LANE_A2A)
+
+        waiter = asyncio.create_task(limiter.acquire(LANE_A2A))
+        await asyncio.sleep(0)
+        # 待ち行列が満杯 → 即座に拒否
+        assert await limiter.acquire(LANE_CHAT) is False
+        # 待ち時間予算超過
+        assert await waiter is False
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        """Test a cancelled waiter is removed from the queue"""
+        limiter = PriorityConcurrencyLimiter(1, lanes(1, budget=5.0))
+        assert await limiter.acquire(LANE_A2A)
+
+        waiter = asyncio.create_task(limiter.acquire(LANE_A2A))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release(LANE_A2A)
+
+        assert limiter.in_flight == 0
+        assert limiter.queued == 0
+
+
+class TestAdmissionControlMiddleware:
+    """Test admission control middleware"""
+
+    @pytest.mark.asyncio
+    async def test_route_rate_limit_returns_429(self):
+        """Test route bucket rejects with 429 and Retry-After"""
+        stats = Counter()
+        routes = [RoutePolicy("/chat/stream", LANE_CHAT, rate=1.0, burst=2)]
+        app = create_app(routes, PriorityConcurrencyLimiter(4, lanes(4)), LocalRateLimiter(), stats=stats)
+
+        async with http_client(app) as client:
+            statuses = [(await client.post("/chat/stream", json={})).status_code for _ in range(3)]
+            rejected = await client.post("/chat/stream", json={})
+            other = await client.post("/other", json={})
+
+        assert statuses == [200, 200, 429]
+        assert rejected.headers["retry-after"] == "1"
+        assert other.status_code == 200
+        assert stats["chat:admitted"] == 2
+        assert stats["chat:rate_limited"] == 2
+
+    @pytest.mark.asyncio
+    async def test_a2a_sender_bucket_and_payment_lane(self):
+        """Test per-sender buckets and payment messages using their own route bucket"""
+        stats = Counter()
+        routes = [RoutePolicy("/a2a/message", LANE_A2A, rate=1.0, burst=1, sender_rate=1.0, sender_burst=2,
+                              classify=True, payment_rate=1.0, payment_burst=5)]
+        app = create_app(routes, PriorityConcurrencyLimiter(4, lanes(4)), LocalRateLimiter(), stats=stats)
+
+        async with http_client(app) as client:
+            first = await client.post("/a2a/message", json=a2a_body("did:ap2:agent:a", "ap2.requests.CartRequest"))
+            # ルート全体のバケットが空
+            second = await client.post("/a2a/message", json=a2a_body("did:ap2:agent:b", "ap2.requests.CartRequest"))
+            # 決済はpaymentレーン専用のルートバケット＋送信元DIDのバケット
+            payments = [
+                (await client.post(
+                    "/a2a/message", json=a2a_body("did:ap2:agent:c", "ap2.mandates.PaymentMandate")
+                )).status_code
+                for _ in range(3)
+            ]
+
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert payments == [200, 200, 429]
+        assert stats["payment:admitted"] == 2
+        assert stats["a2a:rate_limited"] == 1
+
+    @pytest.mark.asyncio
+    async def test_spoofed_payment_type_is_still_route_limited(self):
+        """Test payment-typed messages from rotating senders cannot bypass the route-wide limit"""
+        stats = Counter()
+        routes = [RoutePolicy("/a2a/message", LANE_A2A, rate=1.0, burst=1, sender_rate=10.0, sender_burst=10,
+                              classify=True, payment_rate=1.0, payment_burst=2)]
+        app = create_app(routes, PriorityConcurrencyLimiter(4, lanes(4)), LocalRateLimiter(), stats=stats)
+
+        async with http_client(app) as client:
+            statuses = [
+                (await client.post(
+                    "/a2a/message", json=a2a_body(f"did:ap2:agent:{i}", "ap2.mandates.PaymentMandate")
+                )).status_code
+                for i in range(4)
+            ]
+            # paymentレーンのバケットを使い切っても通常のA2Aの枠は残る
+            other = await client.post("/a2a/message", json=a2a_body("did:ap2:agent:x", "ap2.requests.CartRequest"))
+
+        assert statuses == [200, 200, 429, 429]
+        assert other.status_code == 200
+        assert stats["payment:rate_limited"] == 2
+
+    def test_default_lanes_cap_payment_lane(self):
+        """Test the payment lane cannot take every slot by default"""
+        payment = {lane.name: lane for lane in default_lane_policies(64)}[LANE_PAYMENT]
+        assert payment.max_concurrency == 48
+
+    @pytest.mark.asyncio
+    async def test_busy_server_sheds_with_503(self):
+        """Test requests beyond concurrency and queue budget get 503"""
+        gate = asyncio.Event()
+        routes = [RoutePolicy("/chat/stream", LANE_CHAT)]
+        limiter = PriorityConcurrencyLimiter(1, lanes(1, budget=0.02))
+        app = create_app(routes, limiter, LocalRateLimiter(), gate=gate)
+
+        async with http_client(app) as client:
+            in_flight = asyncio.create_task(client.post("/chat/stream", json={}))
+            await asyncio.sleep(0.05)
+            shed = await client.post("/chat/stream", json={})
+            gate.set()
+            assert (await in_flight).status_code == 200
+
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "1"
+        assert json.loads(shed.content)["detail"] == "Server is busy, retry later"
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_body_is_replayed_to_app(self):
+        """Test classified A2A body is still readable by the endpoint"""
+        received = []
+        app = FastAPI()
+
+        @app.post("/a2a/message")
+        async def handler(request: Request):
+            received.append(await request.json())
+            return {"ok": True}
+
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            routes=[RoutePolicy("/a2a/message", LANE_A2A, classify=True)],
+            concurrency=PriorityConcurrencyLimiter(1, lanes(1)),
+            rate_limiter=LocalRateLimiter()
+        )
+        body = a2a_body("did:ap2:agent:a", "ap2.requests.CartRequest")
+
+        async with http_client(app) as client:
+            response = await client.post("/a2a/message", json=body)
+
+        assert response.status_code == 200
+        assert received == [body]
@@ -60,6 +60,11 @@ class TestAgentPassphraseManager:
                 AgentPassphraseManager.get_passphrase("missing_agent")
             assert "AP2_MISSING_AGENT_PASSPHRASE" in str(exc_info.value)
 
+    def test_passphrase_not_required_in_key_agent_mode(self):
+        """Services do not decrypt keys when a key agent is configured"""
+        with patch.dict(os.environ, {"KEY_AGENT_SOCKET": "/run/key-agent/key-agent.sock"}, clear=True):
+            assert AgentPassphraseManager.get_passphrase("missing_agent") == ""
+
     def test_passphrase_env_key_format(self):
         """Test that environment key is properly formatted"""
         with patch.dict(os.environ, {"AP2_MY_AGENT_PASSPHRASE": "secret"}):
@@ -218,6 +223,38 @@ class TestCommonEndpoints:
         data = response.json()
         assert data["status"] == "healthy"
 
+    @patch('common.base_agent.KeyManager')
+    @patch('common.base_agent.SignatureManager')
+    @patch('common.base_agent.A2AMessageHandler')
+    @patch('common.base_agent.setup_telemetry')
+    def test_admission_stats_endpoint(self, mock_telemetry, mock_a2a, mock_sig_mgr, mock_key_mgr):
+        """Test admission control is enabled by default and exposes lane stats"""
+        mock_key_instance = Mock()
+        mock_key_mgr.return_value = mock_key_instance
+        mock_key_instance.load_private_key_encrypted.return_value = None
+
+        agent = ConcreteAgent(
+            agent_id="did:ap2:agent:test",
+            agent_name="Test Agent",
+            passphrase="test_passphrase"
+        )
+
+        client = TestClient(agent.app)
+        response = client.get("/admission/stats")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["enabled"] is True
+        assert set(data["lanes"]) == {"payment", "a2a", "chat"}
+
+        with patch.dict(os.environ, {"ADMISSION_CONTROL_ENABLED": "false"}):
+            disabled = ConcreteAgent(
+                agent_id="did:ap2:agent:test",
+                agent_name="Test Agent",
+                passphrase="test_passphrase"
+            )
+        assert TestClient(disabled.app).get("/admission/stats").json() == {"enabled": False}
+
     @patch('common.base_agent.KeyManager')
     @patch('common.base_agent.SignatureManager')
     @patch('common.base_agent.A2AMessageHandler')
@@ -610,11 +647,12 @@ class TestAdditionalCoverage:
         mock_key_instance = Mock()
         mock_key_mgr.return_value = mock_key_instance
 
-        # First call (ECDSA) succeeds, second call (Ed25519) fails
-        mock_key_instance.load_private_key_encrypted.side_effect = [
-            None,  # ECDSA succeeds
-            Exception("Ed25519 key not found")  # Ed25519 fails
-        ]
+        # ECDSA succeeds, Ed25519 fails (loads run concurrently, so key on algorithm)
+        def load_key(key_id, passphrase, algorithm="ECDSA"):
+            if algorithm == "ED25519":
+                raise Exception("Ed25519 key not found")
+
+        mock_key_instance.load_private_key_encrypted.side_effect = load_key
 
         # Should raise RuntimeError for Ed25519 key not found
         with pytest.raises(RuntimeError) as exc_info:
@@ -626,6 +664,73 @@ class TestAdditionalCoverage:
 
         assert "Ed25519鍵が見つかりません" in str(exc_info.value)
 
+    @patch('common.base_agent.KeyManager')
+    @patch('common.base_agent.SignatureManager')
+    @patch('common.base_agent.A2AMessageHandler')
+    @patch('common.base_agent.setup_telemetry')
+    def test_keys_are_decrypted_concurrently(self, mock_telemetry, mock_a2a, mock_sig_mgr, mock_key_mgr):
+        """ECDSA and Ed25519 keys are decrypted in parallel at startup"""
+        import threading
+
+        mock_key_instance = Mock()
+        mock_key_mgr.return_value = mock_key_instance
+
+        # Each load waits for the other one; sequential loading would time out
+        barrier = threading.Barrier(2, timeout=5)
+        mock_key_instance.load_private_key_encrypted.side_effect = lambda *args, **kwargs: barrier.wait()
+
+        ConcreteAgent(
+            agent_id="did:ap2:agent:test",
+            agent_name="Test Agent",
+            passphrase="test_passphrase"
+        )
+
+        algorithms = sorted(call.kwargs["algorithm"] for call in mock_key_instance.load_private_key_encrypted.call_args_list)
+        assert algorithms == ["ECDSA", "ED25519"]
+
+    @patch('common.base_agent.KeyAgentClient')
+    @patch('common.base_agent.KeyManager')
+    @patch('common.base_agent.SignatureManager')
+    @patch('common.base_agent.A2AMessageHandler')
+    @patch('common.base_agent.setup_telemetry')
+    def test_key_agent_mode(self, mock_telemetry, mock_a2a, mock_sig_mgr, mock_key_mgr, mock_client, monkeypatch):
+        """KEY_AGENT_SOCKET set: keys are attached from the key agent instead of decrypted"""
+        monkeypatch.setenv("KEY_AGENT_SOCKET", "/run/key-agent/key-agent.sock")
+        mock_key_instance = Mock()
+        mock_key_mgr.return_value = mock_key_instance
+
+        agent = ConcreteAgent(
+            agent_id="did:ap2:agent:test",
+            agent_name="Test Agent",
+            passphrase=""
+        )
+
+        mock_client.assert_called_once_with("/run/key-agent/key-agent.sock")
+        mock_client.return_value.attach.assert_called_once_with(mock_key_instance, "test", ["ECDSA", "ED25519"])
+        mock_key_instance.load_private_key_encrypted.assert_not_called()
+        assert agent.key_agent is mock_client.return_value
+
+    @patch('common.base_agent.KeyAgentClient')
+    @patch('common.base_agent.KeyManager')
+    @patch('common.base_agent.SignatureManager')
+    @patch('common.base_agent.A2AMessageHandler')
+    @patch('common.base_agent.setup_telemetry')
+    def test_key_agent_unavailable(self, mock_telemetry, mock_a2a, mock_sig_mgr, mock_key_mgr, mock_client, monkeypatch):
+        """Key agent connection failure aborts startup"""
+        from common.key_agent import KeyAgentError
+
+        monkeypatch.setenv("KEY_AGENT_SOCKET", "/run/key-agent/key-agent.sock")
+        mock_client.return_value.attach.side_effect = KeyAgentError("connection refused")
+
+        with pytest.raises(RuntimeError) as exc_info:
+            ConcreteAgent(
+                agent_id="did:ap2:agent:test",
+                agent_name="Test Agent",
+                passphrase=""
+            )
+
+        assert "鍵エージェント" in str(exc_info.value)
+
     @patch('common.base_agent.KeyManager')
     @patch('common.base_agent.SignatureManager')
     @patch('common.base_agent.A2AMessageHandler')
@@ -0,0 +1,210 @@
+"""
+Tests for the end-to-end benchmark suite
+
+- パーセンタイル集計とベースライン比較（benchmarks/stats.py）
+- 暗号・正規化マイクロベンチマークのフィクスチャと計測（benchmarks/fixtures.py, benchmarks/micro.py）
+- フェイクMeilisearch・Redis（benchmarks/fakes.py）
+- インプロセスクラスターでのIntent → Cart → Paymentフロー（benchmarks/harness.py, benchmarks/loadgen.py）
+"""
+
+import httpx
+import pytest
+
+from benchmarks.fakes import FakeRedis, create_fake_meilisearch_app
+from benchmarks.stats import LatencyRecorder, compare_to_baseline, percentile, summarize
+
+
+class TestStats:
+    """パーセンタイル集計とベースライン比較"""
+
+    def test_percentile_interpolates(self):
+        values = [0.1, 0.2, 0.3, 0.4, 0.5]
+
+        assert percentile(values, 50) == pytest.approx(0.3)
+        assert percentile(values, 95) == pytest.approx(0.48)
+        assert percentile([], 99) == 0.0
+
+    def test_summarize_in_milliseconds(self):
+        summary = summarize([0.002, 0.001, 0.003], errors=1)
+
+        assert summary["count"] == 3
+        assert summary["errors"] == 1
+        assert summary["p50_ms"] == pytest.approx(2.0)
+        assert summary["max_ms"] == pytest.approx(3.0)
+
+    def test_recorder_counts_errors(self):
+        recorder = LatencyRecorder()
+        recorder.record("intent", 0.01)
+        recorder.record("intent", 0.02, ok=False)
+
+        assert recorder.summary()["intent"]["count"] == 2
+        assert recorder.summary()["intent"]["errors"] == 1
+
+        recorder.reset()
+        assert recorder.summary() == {}
+
+    def test_compare_to_baseline(self):
+        baseline = {"stages": {"intent": {"p50_ms": 100.0, "p95_ms": 200.0, "p99_ms": 300.0}}}
+        current = {
+            "stages": {
+                "intent": {"p50_ms": 110.0, "p95_ms": 260.0, "p99_ms": 300.0},
+                "payment": {"p50_ms": 50.0, "p95_ms": 60.0, "p99_ms": 70.0},
+            }
+        }
+
+        rows = compare_to_baseline(current, baseline, tolerance=0.2)
+
+        assert {row["metric"]: row["regression"] for row in rows} == {
+            "p50_ms": False, "p95_ms": True, "p99_ms": False
+        }
+        assert all(row["name"] == "intent" for row in rows)
+
+    def test_compare_higher_is_better(self):
+        baseline = {"benchmarks": {"canonicalize_json[large]": {"ops_per_sec": 100.0, "alloc_peak_bytes": 1000}}}
+        current = {"benchmarks": {"canonicalize_json[large]": {"ops_per_sec": 80.0, "alloc_peak_bytes": 900}}}
+
+        rows = compare_to_baseline(
+            current, baseline, tolerance=0.1,
+            metrics=("ops_per_sec", "alloc_peak_bytes"),
+            sections=("benchmarks",),
+            higher_is_better=("ops_per_sec",)
+        )
+
+        assert {row["metric"]: row["regression"] for row in rows} == {
+            "ops_per_sec": True, "alloc_peak_bytes": False
+        }
+
+
+class TestMicroBenchmarks:
+    """暗号・正規化マイクロベンチマーク"""
+
+    def test_cart_fixture_sizes(self):
+        from benchmarks.fixtures import build_cart_mandate, build_payment_mandate
+
+        cart_mandate = build_cart_mandate(200)
+        details = cart_mandate["contents"]["payment_request"]["details"]
+        payment_mandate = build_payment_mandate(cart_mandate)
+
+        # 商品200行 + 消費税 + 送料
+        assert len(details["display_items"]) == 202
+        assert sum(item["amount"]["value"] for item in details["display_items"]) == details["total"]["amount"]["value"]
+        assert payment_mandate["amount"]["value"] == details["total"]["amount"]["value"]
+
+    def test_build_cases_covers_primitives(self, tmp_path):
+        from benchmarks.micro import build_cases
+
+        names = {case.name for case in build_cases(str(tmp_path))}
+
+        for size in ("small", "medium", "large"):
+            assert f"canonicalize_json[{size}]" in names
+            assert f"verify_signature.ED25519[{size}]" in names
+            assert f"MerchantAuthorizationJWT.verify[{size}]" in names
+            assert f"verify_user_authorization_vp[{size}]" in names
+        assert "public_key_from_multibase[ECDSA]" in names
+
+    def test_measure_time_and_allocations(self):
+        from benchmarks.micro import measure_allocations, measure_time
+
+        timing = measure_time(lambda: sum(range(100)), max_time=0.01, round_time=0.001, min_rounds=3)
+        allocations = measure_allocations(lambda: [0] * 10000, calls=3)
+
+        assert timing["rounds"] >= 3
+        assert timing["ops_per_sec"] > 0
+        assert allocations["alloc_peak_bytes"] >= 80000
+        assert allocations["alloc_retained_bytes"] < 80000
+
+
+class TestFakes:
+    """フェイクMeilisearch・Redis"""
+
+    async def test_fake_meilisearch_drops_trailing_terms(self):
+        app = create_fake_meilisearch_app()
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://meilisearch") as client:
+            await client.post("/indexes", json={"uid": "products"})
+            await client.post("/indexes/products/documents", json=[
+                {"id": 1, "name": "むぎぼーTシャツ"},
+                {"id": 2, "name": "むぎぼーマグカップ"},
+                {"id": 3, "name": "ステッカー"},
+            ])
+            exact = await client.post("/indexes/products/search", json={"q": "むぎぼー マグ"})
+            relaxed = await client.post("/indexes/products/search", json={"q": "むぎぼー グッズ"})
+
+        assert [hit["id"] for hit in exact.json()["hits"]] == [2]
+        assert [hit["id"] for hit in relaxed.json()["hits"]] == [1, 2]
+
+    async def test_fake_redis_expiry_and_pipeline(self):
+        redis = FakeRedis()
+        await redis.set("token", "value", ex=60)
+        await redis.set("expired", "value", ex=60)
+        redis._expires_at["expired"] = 0
+
+        assert await redis.set("token", "other", nx=True) is None
+        assert await redis.get("expired") is None
+
+        async with redis.pipeline() as pipe:
+            pipe.zadd("queue", {"a": 2, "b": 1})
+            pipe.zrangebyscore("queue", 0, 10)
+            results = await pipe.execute()
+
+        assert results == [2, ["b", "a"]]
+
+
+class TestInProcessFlow:
+    """インプロセスクラスターでのエンドツーエンドフロー"""
+
+    async def test_closed_loop_flow_captures_payment(self, tmp_path):
+        from benchmarks.harness import InProcessCluster
+        from benchmarks.loadgen import LoadGenerator, ShoppingFlowClient
+
+        async with InProcessCluster(work_dir=str(tmp_path)) as cluster:
+            async with cluster.client(timeout=60.0) as client:
+                flow = ShoppingFlowClient(cluster, client)
+                await flow.setup()
+                generator = LoadGenerator(flow, seed=0)
+                await generator.run_closed(concurrency=1, duration=60.0, max_flows=1)
+
+        assert generator.errors == {}
+        assert generator.completed == 1
+        stages = generator.stages.summary()
+        assert set(stages) == {"intent", "credential", "payment", "flow"}
+        services = cluster.recorder.summary()
+        assert services["llm"]["count"] >= 1
+        assert services["payment_network"]["errors"] == 0
+
+    async def test_retried_charge_records_single_ledger_entry(self, tmp_path):
+        """/network/chargeの応答が失われても、同じIdempotency-Keyでの再送は二重キャプチャしない"""
+        from sqlalchemy import func, select
+
+        from benchmarks.harness import InProcessCluster
+        from benchmarks.loadgen import LoadGenerator, ShoppingFlowClient
+        from services.payment_network.settlement.ledger import SettlementEntry
+
+        async with InProcessCluster(work_dir=str(tmp_path)) as cluster:
+            charges = []
+            deliver = cluster.transport.handle_async_request
+
+            async def lose_first_charge_response(request):
+                response = await deliver(request)
+                if request.url.path == "/network/charge":
+                    charges.append(request.headers.get("idempotency-key"))
+                    if len(charges) == 1:
+                        await response.aread()
+                        raise httpx.ReadTimeout("response lost", request=request)
+                return response
+
+            cluster.transport.handle_async_request = lose_first_charge_response
+            async with cluster.client(timeout=60.0) as client:
+                flow = ShoppingFlowClient(cluster, client)
+                await flow.setup()
+                generator = LoadGenerator(flow, seed=0)
+                await generator.run_closed(concurrency=1, duration=60.0, max_flows=1)
+
+            ledger = cluster.services["payment_network"].settlement_ledger
+            async with ledger.async_session() as session:
+                entries = (await session.execute(select(func.count()).select_from(SettlementEntry))).scalar()
+
+        assert generator.errors == {}
+        assert generator.completed == 1
+        assert len(charges) == 2 and charges[0] == charges[1]
+        assert entries == 1
@@ -523,6 +523,56 @@ class TestReceiptCRUD:
         assert receipt is not None
         assert receipt.id == "receipt_specific_001"
 
+    @pytest.mark.asyncio
+    async def test_update_content_hashes(self, db_session):
+        """Test updating receipt content hashes by transaction ID"""
+        await ReceiptCRUD.create(db_session, {
+            "user_id": "user_006",
+            "transaction_id": "txn_hash_001",
+            "receipt_url": "https://example.com/receipts/receipt_006.pdf",
+            "amount": {"value": "100.00", "currency": "JPY"},
+            "content_hash": "old_hash"
+        })
+
+        updated = await ReceiptCRUD.update_content_hashes(
+            db_session, {"txn_hash_001": "new_hash", "txn_missing": "other_hash"}
+        )
+
+        receipt = await ReceiptCRUD.get_by_transaction_id(db_session, "txn_hash_001")
+        assert updated == 1
+        assert receipt.content_hash == "new_hash"
+        assert receipt.to_dict()["content_hash"] == "new_hash"
+
+        assert await ReceiptCRUD.get_content_hashes(db_session, ["txn_hash_001", "txn_missing"]) == {
+            "txn_hash_001": "new_hash"
+        }
+        assert await ReceiptCRUD.get_referenced_content_hashes(db_session, ["new_hash", "old_hash"]) == {"new_hash"}
+
+    @pytest.mark.asyncio
+    async def test_init_db_adds_content_hash_to_existing_table(self, temp_db_path):
+        """Test init_db adds new nullable columns to an existing receipts table"""
+        from sqlalchemy import text
+
+        manager = DatabaseManager(database_url=f"sqlite+aiosqlite:///{temp_db_path}")
+        async with manager.engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE receipts (id VARCHAR PRIMARY KEY, user_id VARCHAR NOT NULL, "
+                "transaction_id VARCHAR NOT NULL, receipt_url VARCHAR NOT NULL, amount_value INTEGER NOT NULL, "
+                "currency VARCHAR NOT NULL, payment_timestamp DATETIME NOT NULL, received_at DATETIME)"
+            ))
+
+        await manager.init_db()
+
+        async with manager.get_session() as session:
+            receipt = await ReceiptCRUD.create(session, {
+                "user_id": "user_007",
+                "transaction_id": "txn_legacy_001",
+                "receipt_url": "https://example.com/receipts/receipt_007.pdf",
+                "content_hash": "abc"
+            })
+            assert receipt.content_hash == "abc"
+        await manager.engine.dispose()
+
 
 class TestProductCRUDExtended:
     """Extended Product CRUD tests for edge cases"""
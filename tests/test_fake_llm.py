@@ -0,0 +1,177 @@
+"""
+Tests for Fake LLM (common/fake_llm.py)
+
+- 応答時間の分布の解析と抽出（シード指定で決定的）
+- スクリプト済み応答（analyze_intent・optimize_cart・collect_intent、スクリプトファイルの優先）
+- OpenAI互換API（非ストリーミング・ストリーミング・DMRのURL・/v1/models）
+"""
+
+import json
+import random
+
+import httpx
+import pytest
+
+from common.fake_llm import (
+    LatencyDistribution,
+    create_fake_llm_app,
+    extract_max_amount,
+    load_script,
+)
+
+COLLECT_INTENT_SYSTEM = "あなたはShopping AgentのIntent分析エキスパートです。"
+COLLECT_INTENT_USER = "以下のユーザー要望を分析してください:\n\n{}\n\nJSON形式で返答してください:\n{{}}"
+
+
+async def chat(app, messages, path="/v1/chat/completions", **body):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://llm") as client:
+        return await client.post(path, json={"model": "ai/qwen3", "messages": messages, **body})
+
+
+def reply_json(response):
+    return json.loads(response.json()["choices"][0]["message"]["content"])
+
+
+class TestLatencyDistribution:
+    """応答時間の分布"""
+
+    @pytest.mark.parametrize("spec, expected", [
+        ("200", LatencyDistribution("fixed", (200.0,))),
+        (150, LatencyDistribution("fixed", (150.0,))),
+        ("uniform:100:500", LatencyDistribution("uniform", (100.0, 500.0))),
+        ("lognormal:800:0.5", LatencyDistribution("lognormal", (800.0, 0.5))),
+    ])
+    def test_parse(self, spec, expected):
+        assert LatencyDistribution.parse(spec) == expected
+
+    @pytest.mark.parametrize("spec", ["gamma:1:2", "uniform:100", "fixed:a"])
+    def test_parse_rejects_invalid_spec(self, spec):
+        with pytest.raises(ValueError):
+            LatencyDistribution.parse(spec)
+
+    def test_sample_is_deterministic_with_seed(self):
+        distribution = LatencyDistribution.parse("lognormal:800:0.5")
+
+        first = [distribution.sample_ms(random.Random(7)) for _ in range(3)]
+        second = [distribution.sample_ms(random.Random(7)) for _ in range(3)]
+
+        assert first == second
+        assert all(value > 0 for value in first)
+        assert LatencyDistribution.parse("normal:0:100").sample_ms(random.Random(1)) >= 0
+        assert str(distribution) == "lognormal:800:0.5"
+
+
+class TestScriptedReplies:
+    """スクリプト済み応答"""
+
+    async def test_collect_intent(self):
+        app = create_fake_llm_app()
+
+        response = await chat(app, [
+            {"role": "system", "content": COLLECT_INTENT_SYSTEM},
+            {"role": "user", "content": COLLECT_INTENT_USER.format("むぎぼーのTシャツが欲しい。1万円以内で")},
+        ])
+
+        assert reply_json(response) == {
+            "intent": "むぎぼーのTシャツが欲しい。1万円以内で",
+            "max_amount": 10000,
+            "keywords": ["むぎぼー", "Tシャツ"]
+        }
+        assert app.state.replies["collect_intent"] == 1
+
+    async def test_analyze_intent(self):
+        app = create_fake_llm_app()
+
+        response = await chat(app, [
+            {"role": "system", "content": "あなたはMerchant Agentのインテント分析エキスパートです。"},
+            {"role": "user", "content": "自然言語説明: むぎぼーのマグカップ\n最大金額: 5000円"},
+        ])
+
+        preferences = reply_json(response)
+        assert preferences["primary_need"] == "むぎぼーのマグカップ"
+        assert preferences["search_keywords"] == ["むぎぼー", "マグカップ"]
+
+    async def test_optimize_cart_builds_plans_from_prompt(self):
+        app = create_fake_llm_app()
+        products = [
+            {"id": "p1", "name": "むぎぼーTシャツ", "price_jpy": 3000},
+            {"id": "p2", "name": "むぎぼーマグカップ", "price_jpy": 1500},
+        ]
+        prompt = f"商品リスト（2件）:\n{json.dumps(products, ensure_ascii=False)}\n\nカートプランを作成"
+
+        response = await chat(app, [
+            {"role": "system", "content": "あなたはMerchant Agentのカート最適化エキスパートです。"},
+            {"role": "user", "content": prompt},
+        ])
+
+        plans = reply_json(response)
+        assert [plan["name"] for plan in plans] == ["予算内プラン", "充実プラン", "シンプルプラン"]
+        assert plans[2]["items"] == [{"product_id": "p2", "quantity": 1}]
+        assert app.state.requests == 1
+
+    async def test_script_file_takes_precedence(self, tmp_path):
+        script = tmp_path / "script.json"
+        script.write_text(json.dumps([
+            {"name": "custom_intent", "match": "Intent分析", "response": {"intent": "固定", "max_amount": None, "keywords": []}}
+        ]), encoding="utf-8")
+        app = create_fake_llm_app(script_rules=load_script(str(script)))
+
+        response = await chat(app, [
+            {"role": "system", "content": COLLECT_INTENT_SYSTEM},
+            {"role": "user", "content": COLLECT_INTENT_USER.format("何か")},
+        ])
+
+        assert reply_json(response)["intent"] == "固定"
+        assert app.state.replies == {"custom_intent": 1}
+
+    async def test_unknown_prompt_returns_empty_object(self):
+        response = await chat(create_fake_llm_app(), [{"role": "user", "content": "こんにちは"}])
+
+        assert reply_json(response) == {}
+
+    def test_extract_max_amount(self):
+        assert extract_max_amount("5000円以内") == 5000
+        assert extract_max_amount("1.5万円まで") == 15000
+        assert extract_max_amount("予算なし") is None
+
+
+class TestOpenAICompatibleAPI:
+    """OpenAI互換API"""
+
+    async def test_dmr_engine_path_and_usage(self):
+        response = await chat(
+            create_fake_llm_app(),
+            [{"role": "user", "content": "こんにちは"}],
+            path="/engines/llama.cpp/v1/chat/completions"
+        )
+
+        body = response.json()
+        assert body["object"] == "chat.completion"
+        assert body["choices"][0]["finish_reason"] == "stop"
+        assert body["usage"]["completion_tokens"] == 1
+
+    async def test_streaming_chunks(self):
+        app = create_fake_llm_app(token_latency_ms=0.1)
+
+        response = await chat(app, [
+            {"role": "system", "content": COLLECT_INTENT_SYSTEM},
+            {"role": "user", "content": COLLECT_INTENT_USER.format("むぎぼーのグッズ")},
+        ], stream=True, stream_options={"include_usage": True})
+
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line[len("data: "):] for line in response.text.split("\n\n") if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event) for event in events[:-1]]
+        content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+        assert json.loads(content)["intent"] == "むぎぼーのグッズ"
+        assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+        assert chunks[-2]["choices"][0]["finish_reason"] == "stop"
+        assert chunks[-1]["usage"]["completion_tokens"] == len(chunks) - 3
+
+    async def test_models(self):
+        app = create_fake_llm_app(model="ai/qwen3")
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://llm") as client:
+            response = await client.get("/engines/llama.cpp/v1/models")
+
+        assert response.json()["data"][0]["id"] == "ai/qwen3"
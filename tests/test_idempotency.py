@@ -0,0 +1,244 @@
+"""
+Tests for Idempotency-Key Middleware
+
+Tests cover:
+- Replaying completed responses
+- Coalescing concurrent duplicates (same process and across replicas)
+- Key reuse with a different request
+- Failed requests are not stored
+- Fail open when Redis is unavailable
+- post_idempotent client helper (retries with the same key)
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from common.idempotency import IdempotencyMiddleware, post_idempotent
+from common.redis_client import RedisClient
+
+
+class FakeRedis:
+    """redis.asyncio.Redisのインメモリスタンドイン（idempotencyで使う操作のみ）"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+
+def create_app(redis_client, calls, delay=0.0, status_code=200):
+    app = FastAPI()
+
+    @app.post("/charge")
+    async def charge(request: Request):
+        payload = await request.json()
+        calls.append(payload)
+        await asyncio.sleep(delay)
+        return JSONResponse({"charge_id": f"ch_{len(calls)}", "amount": payload["amount"]}, status_code=status_code)
+
+    app.add_middleware(
+        IdempotencyMiddleware,
+        redis_client=redis_client,
+        paths=["/charge"],
+        namespace="test",
+        wait_seconds=2.0,
+        poll_interval=0.01
+    )
+    return app
+
+
+def redis_client(fake=None):
+    client = RedisClient()
+    client.client = fake or FakeRedis()
+    return client
+
+
+def http_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestIdempotencyMiddleware:
+    """Test Idempotency-Key middleware"""
+
+    @pytest.mark.asyncio
+    async def test_retry_replays_stored_response(self):
+        """Test retry with same key returns stored response without re-executing"""
+        calls = []
+        app = create_app(redis_client(), calls)
+
+        async with http_client(app) as client:
+            first = await client.post("/charge", json={"amount": 1000}, headers={"Idempotency-Key": "key-1"})
+            second = await client.post("/charge", json={"amount": 1000}, headers={"Idempotency-Key": "key-1"})
+
+        assert len(calls) == 1
+        assert first.json() == second.json() == {"charge_id": "ch_1", "amount": 1000}
+        assert "idempotent-replayed" not in first.headers
+        assert second.headers["idempotent-replayed"] == "true"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_coalesced(self):
+        """Test concurrent duplicates in one process share one execution"""
+        calls = []
+        app = create_app(redis_client(), calls, delay=0.05)
+
+        async with http_client(app) as client:
+            responses = await asyncio.gather(*[
+                client.post("/charge", json={"amount": 500}, headers={"Idempotency-Key": "key-2"})
+                for _ in range(5)
+            ])
+
+        assert len(calls) == 1
+        assert {r.status_code for r in responses} == {200}
+        assert {r.json()["charge_id"] for r in responses} == {"ch_1"}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_across_replicas(self):
+        """Test duplicate on another replica waits for the in-flight request"""
+        fake = FakeRedis()
+        calls_a, calls_b = [], []
+        app_a = create_app(redis_client(fake), calls_a, delay=0.05)
+        app_b = create_app(redis_client(fake), calls_b, delay=0.05)
+
+        async with http_client(app_a) as client_a, http_client(app_b) as client_b:
+            first_task = asyncio.create_task(
+                client_a.post("/charge", json={"amount": 700}, headers={"Idempotency-Key": "key-3"})
+            )
+            await asyncio.sleep(0.01)
+            second = await client_b.post("/charge", json={"amount": 700}, headers={"Idempotency-Key": "key-3"})
+            first = await first_task
+
+        assert len(calls_a) + len(calls_b) == 1
+        assert first.json() == second.json()
+        assert second.headers["idempotent-replayed"] == "true"
+
+    @pytest.mark.asyncio
+    async def test_key_reused_with_different_body(self):
+        """Test reusing a key with a different request returns 422"""
+        calls = []
+        app = create_app(redis_client(), calls)
+
+        async with http_client(app) as client:
+            await client.post("/charge", json={"amount": 1000}, headers={"Idempotency-Key": "key-4"})
+            reused = await client.post("/charge", json={"amount": 9999}, headers={"Idempotency-Key": "key-4"})
+
+        assert reused.status_code == 422
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_server_error_not_stored(self):
+        """Test 5xx responses are released so a retry executes again"""
+        calls = []
+        app = create_app(redis_client(), calls, status_code=503)
+
+        async with http_client(app) as client:
+            await client.post("/charge", json={"amount": 1000}, headers={"Idempotency-Key": "key-5"})
+            retry = await client.post("/charge", json={"amount": 1000}, headers={"Idempotency-Key": "key-5"})
+
+        assert len(calls) == 2
+        assert "idempotent-replayed" not in retry.headers
+
+    @pytest.mark.asyncio
+    async def test_requests_without_key_pass_through(self):
+        """Test requests without Idempotency-Key are always executed"""
+        calls = []
+        app = create_app(redis_client(), calls)
+
+        async with http_client(app) as client:
+            await client.post("/charge", json={"amount": 1000})
+            await client.post("/charge", json={"amount": 1000})
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_fail_open_when_redis_unavailable(self):
+        """Test requests are processed normally when Redis is unavailable"""
+        class BrokenRedis(FakeRedis):
+            async def set(self, *args, **kwargs):
+                raise ConnectionError("redis down")
+
+        calls = []
+        app = create_app(redis_client(BrokenRedis()), calls)
+
+        async with http_client(app) as client:
+            response = await client.post("/charge", json={"amount": 1000}, headers={"Idempotency-Key": "key-6"})
+
+        assert response.status_code == 200
+        assert len(calls) == 1
+
+
+class LostResponseTransport(httpx.AsyncBaseTransport):
+    """Delivers requests to the app but drops the first N responses (simulated read timeout)"""
+
+    def __init__(self, app, drop=1):
+        self.inner = httpx.ASGITransport(app=app)
+        self.drop = drop
+
+    async def handle_async_request(self, request):
+        response = await self.inner.handle_async_request(request)
+        await response.aread()
+        if self.drop:
+            self.drop -= 1
+            raise httpx.ReadTimeout("response lost", request=request)
+        return response
+
+
+class TestPostIdempotent:
+    """Test the client-side retry helper"""
+
+    @pytest.mark.asyncio
+    async def test_lost_response_is_replayed_not_reexecuted(self):
+        """Test a retry after a lost response replays the stored result"""
+        calls = []
+        app = create_app(redis_client(), calls)
+
+        transport = LostResponseTransport(app, drop=1)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await post_idempotent(client, "/charge", "txn_001", backoff_seconds=0, json={"amount": 1000})
+
+        assert response.status_code == 200
+        assert response.headers["idempotent-replayed"] == "true"
+        assert response.json()["charge_id"] == "ch_1"
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_retries(self):
+        """Test the last transport error is raised once retries are exhausted"""
+        calls = []
+        transport = LostResponseTransport(create_app(redis_client(), calls), drop=5)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with pytest.raises(httpx.ReadTimeout):
+                await post_idempotent(client, "/charge", "txn_002", retries=2, backoff_seconds=0, json={"amount": 1})
+
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_server_error_retried_client_error_returned(self):
+        """Test 5xx is retried with the same key while 4xx is returned as is"""
+        calls = []
+        async with http_client(create_app(redis_client(), calls, status_code=503)) as client:
+            response = await post_idempotent(client, "/charge", "txn_003", retries=2, backoff_seconds=0, json={"amount": 1})
+        assert response.status_code == 503
+        assert len(calls) == 3
+
+        calls = []
+        async with http_client(create_app(redis_client(), calls, status_code=402)) as client:
+            response = await post_idempotent(client, "/charge", "txn_004", retries=2, backoff_seconds=0, json={"amount": 1})
+        assert response.status_code == 402
+        assert len(calls) == 1
@@ -0,0 +1,157 @@
+"""
+Tests for Key Agent (common/key_agent.py)
+
+- 暗号化鍵の読み込みとUnixドメインソケット経由の署名
+- RemotePrivateKeyを登録したKeyManagerでの署名（SignatureManager・検証の互換性）
+- 鍵IDごとのソケット（他の鍵IDへのリクエストの拒否）
+- エラー処理（未登録の鍵・未対応のアルゴリズム・接続失敗・不正フレーム）
+"""
+
+import asyncio
+import os
+import shutil
+import stat
+import tempfile
+
+import pytest
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from common.crypto import KeyManager, SignatureManager
+from common.key_agent import (
+    OP_SIGN,
+    STATUS_ERROR,
+    KeyAgentClient,
+    KeyAgentError,
+    KeyAgentServer,
+    RemotePrivateKey,
+    encode_request,
+)
+
+
+@pytest.fixture
+def work_dir():
+    # Unixドメインソケットのパス長制限（約108バイト）のため短いパスを使用
+    path = tempfile.mkdtemp(prefix="ka_", dir="/tmp")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def key_files(work_dir):
+    """暗号化された鍵ファイル（ECDSA・Ed25519）を作成"""
+    keys_directory = os.path.join(work_dir, "keys")
+    key_manager = KeyManager(keys_directory=keys_directory)
+    ecdsa_key, _ = key_manager.generate_key_pair("shopping_agent")
+    ed25519_key, _ = key_manager.generate_ed25519_key_pair("shopping_agent")
+    key_manager.save_private_key_encrypted("shopping_agent", ecdsa_key, "agent-pass")
+    key_manager.save_private_key_encrypted("shopping_agent_ed25519", ed25519_key, "agent-pass")
+    merchant_key, _ = key_manager.generate_key_pair("merchant")
+    merchant_ed25519_key, _ = key_manager.generate_ed25519_key_pair("merchant")
+    key_manager.save_private_key_encrypted("merchant", merchant_key, "merchant-pass")
+    key_manager.save_private_key_encrypted("merchant_ed25519", merchant_ed25519_key, "merchant-pass")
+    return keys_directory
+
+
+@pytest.fixture
+async def agent(work_dir, key_files):
+    server = KeyAgentServer(os.path.join(work_dir, "agent"))
+    server.load_keys(
+        KeyManager(keys_directory=key_files), {"shopping_agent": "agent-pass", "merchant": "merchant-pass"}
+    )
+    await server.start()
+    client = KeyAgentClient(server.socket_path("shopping_agent"), timeout=2)
+    yield server, client
+    client.close()
+    await server.stop()
+
+
+class TestKeyAgent:
+    """鍵エージェント経由の署名"""
+
+    async def test_sign_ecdsa_and_ed25519(self, agent):
+        server, client = agent
+        await asyncio.to_thread(client.ping)
+
+        ecdsa_public = await asyncio.to_thread(client.get_public_key, "shopping_agent", "ECDSA")
+        signature = await asyncio.to_thread(client.sign, "shopping_agent", "ECDSA", b"payload")
+        ecdsa_public.verify(signature, b"payload", ec.ECDSA(hashes.SHA256()))
+
+        ed25519_public = await asyncio.to_thread(client.get_public_key, "shopping_agent", "ED25519")
+        signature = await asyncio.to_thread(client.sign, "shopping_agent", "ED25519", b"payload")
+        ed25519_public.verify(signature, b"payload")
+
+        assert server.requests == 5
+        # 接続はプールされて再利用される
+        assert client._idle.qsize() == 1
+
+    async def test_socket_is_owner_only(self, agent):
+        server, _ = agent
+        assert stat.S_IMODE(os.stat(server.socket_path("shopping_agent")).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(server.socket_path("merchant")).st_mode) == 0o600
+
+    async def test_socket_serves_only_its_key(self, agent):
+        """共有ソケットではないため、他のエージェントの鍵では署名できない"""
+        server, client = agent
+        with pytest.raises(KeyAgentError, match="Key merchant is not served on this socket"):
+            await asyncio.to_thread(client.sign, "merchant", "ECDSA", b"payload")
+        with pytest.raises(KeyAgentError, match="not served on this socket"):
+            await asyncio.to_thread(client.get_public_key, "merchant", "ECDSA")
+
+        merchant_client = KeyAgentClient(server.socket_path("merchant"), timeout=2)
+        try:
+            merchant_public = await asyncio.to_thread(merchant_client.get_public_key, "merchant", "ECDSA")
+            signature = await asyncio.to_thread(merchant_client.sign, "merchant", "ECDSA", b"payload")
+            merchant_public.verify(signature, b"payload", ec.ECDSA(hashes.SHA256()))
+            with pytest.raises(KeyAgentError, match="not served on this socket"):
+                await asyncio.to_thread(merchant_client.sign, "shopping_agent", "ECDSA", b"payload")
+        finally:
+            merchant_client.close()
+
+    async def test_attached_key_manager_signs_through_agent(self, agent, work_dir):
+        _, client = agent
+        key_manager = KeyManager(keys_directory=os.path.join(work_dir, "service_keys"))
+        await asyncio.to_thread(client.attach, key_manager, "shopping_agent")
+
+        remote_key = key_manager.get_private_key("did:ap2:agent:shopping_agent", algorithm="ED25519")
+        assert isinstance(remote_key, RemotePrivateKey)
+
+        signature_manager = SignatureManager(key_manager)
+        for algorithm in ("ED25519", "ECDSA"):
+            signature = await asyncio.to_thread(
+                signature_manager.sign_data, {"amount": 1000}, "shopping_agent", algorithm
+            )
+            assert signature_manager.verify_signature({"amount": 1000}, signature)
+            assert not signature_manager.verify_signature({"amount": 999}, signature)
+
+    async def test_unknown_key(self, agent):
+        server, client = agent
+        response = server.handle_frame(encode_request(OP_SIGN, "ECDSA", "payment_processor", b"x")[4:], "payment_processor")
+        assert response[4] == STATUS_ERROR and b"Unknown key: payment_processor" in response
+
+        with pytest.raises(KeyAgentError, match="not served on this socket"):
+            await asyncio.to_thread(client.sign, "merchant", "ECDSA", b"payload")
+        # エラー後も同じ接続で次のリクエストを処理できる
+        await asyncio.to_thread(client.ping)
+
+    async def test_remote_ecdsa_key_requires_sha256(self, agent, work_dir):
+        _, client = agent
+        key_manager = KeyManager(keys_directory=os.path.join(work_dir, "service_keys"))
+        await asyncio.to_thread(client.attach, key_manager, "shopping_agent", ["ECDSA"])
+        remote_key = key_manager.get_private_key("shopping_agent")
+
+        with pytest.raises(KeyAgentError):
+            remote_key.sign(b"payload", ec.ECDSA(hashes.SHA384()))
+
+    def test_connection_failure(self, work_dir):
+        client = KeyAgentClient(os.path.join(work_dir, "missing.sock"))
+        with pytest.raises(KeyAgentError, match="Failed to connect"):
+            client.ping()
+
+    def test_malformed_frame(self):
+        server = KeyAgentServer("/tmp/unused")
+        response = server.handle_frame(b"\x02", "shopping_agent")
+        assert response[4] == STATUS_ERROR
+
+        response = server.handle_frame(encode_request(OP_SIGN, "ECDSA", "shopping_agent", b"x")[4:], "shopping_agent")
+        assert response[4] == STATUS_ERROR
@@ -1161,3 +1161,163 @@ class TestLoggingAsyncClient:
             response = await client.get('http://example.com/binary')
 
             assert response.status_code == 200
+
+
+class CountingValue:
+    """Counts how many times it is serialized (json.dumps default=str)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "value"
+
+
+def capture_logger(name, level, log_async=False):
+    """Create a logger whose console handler writes to a StringIO"""
+    from common.logger import setup_logger
+
+    stream = StringIO()
+    with patch('sys.stdout', stream):
+        logger = setup_logger(name, level=level, log_async=log_async)
+    return logger, stream
+
+
+class TestLazyPayloadLogging:
+    """Payload formatting is deferred until a handler emits the record"""
+
+    def test_payload_not_serialized_when_debug_disabled(self):
+        from common.logger import log_a2a_message
+
+        logger, stream = capture_logger('test_lazy_info', 'INFO')
+        value = CountingValue()
+
+        log_a2a_message(logger, 'sent', 'ap2/IntentMandate', {'value': value}, peer='merchant')
+
+        assert value.calls == 0
+        assert 'A2A Message sent to/from merchant: ap2/IntentMandate' in stream.getvalue()
+        assert 'A2A_MESSAGE_RAW' not in stream.getvalue()
+
+    def test_payload_masked_once_at_emit(self):
+        from common.logger import log_http_request
+
+        logger, stream = capture_logger('test_lazy_debug', 'DEBUG')
+        value = CountingValue()
+
+        log_http_request(
+            logger, 'POST', 'http://example.com/api',
+            headers={'Authorization': 'Bearer abc'},
+            body={'password': 'secret123', 'value': value}
+        )
+
+        output = stream.getvalue()
+        raw = json.loads(output.split('HTTP_REQUEST_RAW: ', 1)[1].splitlines()[0])
+        assert raw['headers'] == {'Authorization': '***MASKED***'}
+        assert raw['body'] == {'password': '***MASKED***', 'value': 'value'}
+        assert value.calls == 1
+
+    def test_lazy_payload_caches_text(self):
+        from common.logger import LazyPayload
+
+        value = CountingValue()
+        payload = LazyPayload({'value': value})
+
+        assert str(payload) == str(payload) == '{"value": "value"}'
+        assert value.calls == 1
+
+    def test_filter_skips_json_without_sensitive_keys(self):
+        from common.logger import SensitiveDataFilter
+
+        logger = logging.getLogger('test')
+        message = '{"username": "test_user"}'
+        record = logger.makeRecord(logger.name, logging.INFO, '', 0, message, (), None)
+
+        with patch('common.logger.json.loads') as mock_loads:
+            SensitiveDataFilter().filter(record)
+
+        mock_loads.assert_not_called()
+        assert record.msg is message
+
+    @pytest.mark.asyncio
+    async def test_client_skips_response_parsing_when_debug_disabled(self):
+        from common.logger import LoggingAsyncClient
+
+        logger, _ = capture_logger('test_lazy_client', 'INFO')
+
+        with patch('httpx.AsyncClient') as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client_class.return_value = mock_client
+            mock_response = MagicMock()
+            mock_response.status_code = 200
+            mock_client.request.return_value = mock_response
+
+            client = LoggingAsyncClient(logger)
+            response = await client.post('http://example.com/api', json={'data': 'test'})
+
+        assert response is mock_response
+        mock_response.json.assert_not_called()
+
+
+class TestAsyncLogHandler:
+    """LOG_ASYNC: records are emitted on the QueueListener thread"""
+
+    def test_setup_logger_from_env(self):
+        from common.logger import AsyncLogHandler, setup_logger
+
+        with patch.dict(os.environ, {'LOG_ASYNC': 'true'}):
+            logger = setup_logger('test_async_env')
+
+        assert isinstance(logger.handlers[0], AsyncLogHandler)
+        assert isinstance(logger.handlers[0].target, logging.StreamHandler)
+
+    def test_records_emitted_on_listener_thread(self):
+        import threading
+        from common.logger import log_a2a_message, stop_log_listener
+
+        logger, stream = capture_logger('test_async_emit', 'DEBUG', log_async=True)
+        value = CountingValue()
+        emit_threads = []
+        target = logger.handlers[0].target
+        original_emit = target.emit
+
+        def recording_emit(record):
+            emit_threads.append(threading.current_thread())
+            original_emit(record)
+
+        target.emit = recording_emit
+        payload = {'api_key': 'key123', 'value': value}
+        log_a2a_message(logger, 'received', 'ap2/CartMandate', payload)
+        logger.info('message %s', 'with args')
+        stop_log_listener()
+
+        output = stream.getvalue()
+        assert 'A2A Message received: ap2/CartMandate' in output
+        assert '"api_key": "***MASKED***"' in output
+        assert 'message with args' in output
+        assert value.calls == 1
+        assert emit_threads and threading.current_thread() not in emit_threads
+
+    def test_payload_snapshotted_before_enqueue(self):
+        """The caller may mutate the payload right after logging; the listener must see the logged state"""
+        from common.logger import LazyPayload, stop_log_listener
+
+        logger, stream = capture_logger('test_async_snapshot', 'DEBUG', log_async=True)
+        payload = {'status': 'pending'}
+        logger.debug('PAYLOAD: %s', LazyPayload(payload))
+        payload['status'] = 'captured'
+        stop_log_listener()
+
+        assert 'PAYLOAD: {"status": "pending"}' in stream.getvalue()
+
+    def test_listener_restarts_after_stop(self):
+        from common.logger import stop_log_listener
+
+        logger, stream = capture_logger('test_async_restart', 'INFO', log_async=True)
+        logger.info('first')
+        stop_log_listener()
+        logger.info('second')
+        stop_log_listener()
+
+        assert 'first' in stream.getvalue()
+        assert 'second' in stream.getvalue()
@@ -7,6 +7,7 @@ Tests cover:
 - Basic configuration
 - HTTP communication and error handling
 - Tool invocation
+- SSE streaming (progress and partial results, build_cart_mandates, cart-building node)
 """
 
 import pytest
@@ -967,3 +968,497 @@ class TestMCPServerHTTPEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert "result" in data
+
+
+class TestMCPBatching:
+    """Test JSON-RPC batch support in MCPClient/MCPServer"""
+
+    def test_http_post_batch(self):
+        """Test HTTP POST / with a JSON-RPC batch array"""
+        from common.mcp_server import MCPServer
+        from fastapi.testclient import TestClient
+
+        server = MCPServer(server_name="test_server")
+
+        @server.tool("echo_tool")
+        async def echo_func(params):
+            return {"echo": params.get("message", "")}
+
+        client = TestClient(server.app)
+
+        response = client.post("/", json=[
+            {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+             "params": {"name": "echo_tool", "arguments": {"message": "a"}}},
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+             "params": {"name": "missing_tool", "arguments": {}}},
+            {"jsonrpc": "2.0", "method": "tools/list", "params": {}},  # notification
+            "not-an-object",
+        ], headers={"Accept": "application/json"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 3
+        assert data[0]["id"] == 1
+        assert json.loads(data[0]["result"]["content"][0]["text"]) == {"echo": "a"}
+        assert data[1]["error"]["code"] == -32603
+        assert data[2]["error"]["code"] == -32600
+
+    def test_http_post_batch_session_header(self):
+        """Test initialize inside a batch returns Mcp-Session-Id header"""
+        from common.mcp_server import MCPServer
+        from fastapi.testclient import TestClient
+
+        server = MCPServer(server_name="test_server")
+        client = TestClient(server.app)
+
+        response = client.post("/", json=[
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        ], headers={"Accept": "application/json"})
+
+        assert response.status_code == 200
+        assert response.headers["Mcp-Session-Id"] in server.sessions
+        assert "session_id" not in response.json()[0]
+
+    def test_http_post_empty_and_oversized_batch(self):
+        """Test empty and oversized batches are rejected"""
+        from common.mcp_server import MCPServer, MAX_BATCH_SIZE
+        from fastapi.testclient import TestClient
+
+        server = MCPServer(server_name="test_server")
+        client = TestClient(server.app)
+
+        response = client.post("/", json=[], headers={"Accept": "application/json"})
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == -32600
+
+        message = {"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}}
+        response = client.post("/", json=[message] * (MAX_BATCH_SIZE + 1),
+                               headers={"Accept": "application/json"})
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_batch_members_dispatched_concurrently(self):
+        """Test batch members run concurrently on the server"""
+        import asyncio
+        from common.mcp_server import MCPServer
+
+        server = MCPServer(server_name="test_server")
+        started = asyncio.Event()
+
+        @server.tool("waiter")
+        async def waiter(params):
+            await asyncio.wait_for(started.wait(), timeout=1.0)
+            return {"ok": True}
+
+        @server.tool("starter")
+        async def starter(params):
+            started.set()
+            return {"ok": True}
+
+        responses, _ = await server._handle_jsonrpc_batch([
+            {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "waiter"}},
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "starter"}},
+        ], session_id=None)
+
+        assert all("result" in r for r in responses)
+
+    @pytest.mark.asyncio
+    async def test_client_call_tools(self):
+        """Test MCPClient.call_tools sends one POST and maps responses by id"""
+        from common.mcp_client import MCPClient
+
+        def respond(url, json, headers):
+            # Reverse order to verify id-based matching
+            items = []
+            for message in reversed(json):
+                if message["params"]["name"] == "bad_tool":
+                    items.append({"jsonrpc": "2.0", "id": message["id"],
+                                  "error": {"code": -32603, "message": "Internal error"}})
+                else:
+                    text = '{"tool": "%s"}' % message["params"]["name"]
+                    items.append({"jsonrpc": "2.0", "id": message["id"],
+                                  "result": {"content": [{"type": "text", "text": text}]}})
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.headers = {}
+            mock_response.json.return_value = items
+            mock_response.raise_for_status = Mock()
+            return mock_response
+
+        mock_http = AsyncMock(spec=httpx.AsyncClient)
+        mock_http.post = AsyncMock(side_effect=respond)
+
+        client = MCPClient(base_url="http://localhost:8000", http_client=mock_http)
+
+        results = await client.call_tools([
+            {"name": "tool_a", "arguments": {}},
+            {"name": "bad_tool", "arguments": {}},
+            {"name": "tool_b"},
+        ], return_exceptions=True)
+
+        mock_http.post.assert_called_once()
+        assert results[0] == {"tool": "tool_a"}
+        assert isinstance(results[1], ValueError)
+        assert results[2] == {"tool": "tool_b"}
+
+        with pytest.raises(ValueError, match="-32603"):
+            await client.call_tools([{"name": "bad_tool", "arguments": {}}])
+
+    @pytest.mark.asyncio
+    async def test_client_call_tools_empty(self):
+        """Test call_tools with no calls skips HTTP"""
+        from common.mcp_client import MCPClient
+
+        mock_http = AsyncMock(spec=httpx.AsyncClient)
+        client = MCPClient(base_url="http://localhost:8000", http_client=mock_http)
+
+        assert await client.call_tools([]) == []
+        mock_http.post.assert_not_called()
+
+
+class TestMCPStreaming:
+    """Test SSE streaming of tools/call results"""
+
+    @staticmethod
+    def _build_server():
+        import asyncio
+        from common.mcp_server import MCPServer, get_progress_reporter
+
+        server = MCPServer(server_name="test_server")
+
+        @server.tool("slow_tool")
+        async def slow_tool(params):
+            progress = get_progress_reporter(params)
+            items = []
+            for i in range(3):
+                await asyncio.sleep(0)
+                items.append(i)
+                await progress.report(i + 1, total=3, message="item", partial={"item": i})
+            return {"items": items}
+
+        @server.tool("failing_tool")
+        async def failing_tool(params):
+            raise RuntimeError("boom")
+
+        return server
+
+    def test_http_post_sse_response(self):
+        """Test tools/call with progressToken returns text/event-stream"""
+        from fastapi.testclient import TestClient
+
+        server = self._build_server()
+        client = TestClient(server.app)
+
+        response = client.post("/", json={
+            "jsonrpc": "2.0",
+            "id": 7,
+            "method": "tools/call",
+            "params": {"name": "slow_tool", "arguments": {}, "_meta": {"progressToken": "tok"}}
+        }, headers={"Accept": "application/json, text/event-stream"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [
+            json.loads(line[len("data: "):])
+            for line in response.text.splitlines() if line.startswith("data: ")
+        ]
+        assert len(events) == 4
+        assert events[0]["method"] == "notifications/progress"
+        assert events[0]["params"]["progressToken"] == "tok"
+        assert events[2]["params"]["partialResult"] == {"item": 2}
+        assert events[3]["id"] == 7
+        assert "result" in events[3]
+
+    def test_http_post_without_progress_token_returns_json(self):
+        """Test tools/call without progressToken keeps JSON response"""
+        from fastapi.testclient import TestClient
+
+        server = self._build_server()
+        client = TestClient(server.app)
+
+        response = client.post("/", json={
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "tools/call",
+            "params": {"name": "slow_tool", "arguments": {}}
+        }, headers={"Accept": "application/json, text/event-stream"})
+
+        assert response.headers["content-type"].startswith("application/json")
+        assert json.loads(response.json()["result"]["content"][0]["text"]) == {"items": [0, 1, 2]}
+
+    def test_http_get_sse_not_offered(self):
+        """Test GET with Accept: text/event-stream returns 405"""
+        from fastapi.testclient import TestClient
+
+        server = self._build_server()
+        client = TestClient(server.app)
+
+        response = client.get("/", headers={"Accept": "text/event-stream"})
+
+        assert response.status_code == 405
+
+    @pytest.mark.asyncio
+    async def test_client_call_tool_stream(self):
+        """Test MCPClient consumes progress events incrementally"""
+        from common.mcp_client import MCPClient
+
+        server = self._build_server()
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+        client = MCPClient(base_url="http://mcp", http_client=http_client)
+
+        events = [event async for event in client.call_tool_stream("slow_tool", {})]
+
+        assert [e["type"] for e in events] == ["progress", "progress", "progress", "result"]
+        assert events[0]["partial"] == {"item": 0}
+        assert events[-1]["result"] == {"items": [0, 1, 2]}
+
+        received = []
+
+        async def on_progress(event):
+            received.append(event["progress"])
+
+        result = await client.call_tool_with_progress("slow_tool", {}, on_progress)
+        assert received == [1, 2, 3]
+        assert result == {"items": [0, 1, 2]}
+
+        with pytest.raises(ValueError, match="-32603"):
+            async for _ in client.call_tool_stream("failing_tool", {}):
+                pass
+
+        await http_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_build_cart_mandates_streams_each_cart_mandate(self):
+        """Test build_cart_mandates emits every built CartMandate as a partial result"""
+        from common.mcp_client import MCPClient
+        from services.merchant_agent_mcp.main import mcp
+
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=mcp.app))
+        client = MCPClient(base_url="http://mcp", http_client=http_client)
+        products = [{"id": 1, "name": "むぎぼーぬいぐるみ", "price_jpy": 2500.0}]
+        cart_plans = [
+            {"name": "カート1", "items": [{"product_id": 1, "quantity": 1}]},
+            {"name": "壊れたプラン", "items": [{"product_id": 1}]},  # quantityなし → 構築失敗
+            {"name": "カート3", "items": [{"product_id": 1, "quantity": 2}]},
+        ]
+
+        events = [
+            event async for event in client.call_tool_stream(
+                "build_cart_mandates", {"cart_plans": cart_plans, "products": products}
+            )
+        ]
+        await http_client.aclose()
+
+        progress = [event for event in events if event["type"] == "progress"]
+        assert [event["progress"] for event in progress] == [1, 2, 3]
+        assert [event["partial"]["index"] for event in progress if event["partial"]] == [0, 2]
+        cart_mandates = events[-1]["result"]["cart_mandates"]
+        assert cart_mandates[1] is None
+        assert progress[0]["partial"]["cart_mandate"] == cart_mandates[0]
+        assert progress[2]["partial"]["cart_mandate"] == cart_mandates[2]
+
+    @pytest.mark.asyncio
+    async def test_cart_mandate_node_signs_on_first_partial(self):
+        """Test the merchant cart-building node starts signing before the tool call finishes"""
+        import asyncio
+        from services.merchant_agent.nodes.cart_mandate_node import build_cart_mandates
+
+        cart_plans = [{"name": "カート1"}, {"name": "カート2"}]
+        cart_mandates = [{"contents": {"id": f"cart_{i}"}} for i in range(2)]
+        first_signed = asyncio.Event()
+        signed = []
+
+        async def post(url, json, timeout):
+            signed.append(json["cart_mandate"]["contents"]["id"])
+            first_signed.set()
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {
+                "signed_cart_mandate": {**json["cart_mandate"], "merchant_authorization": "sig"}
+            }
+            return response
+
+        async def call_mcp_tool_with_progress(tool_name, arguments, on_progress):
+            assert tool_name == "build_cart_mandates"
+            assert arguments["cart_plans"] == cart_plans
+            await on_progress({"type": "progress", "partial": {"index": 0, "cart_mandate": cart_mandates[0]}})
+            # 最初の部分結果で署名が始まっていなければタイムアウトする
+            await asyncio.wait_for(first_signed.wait(), timeout=1)
+            # 2件目は最終結果からのみ受信（非ストリーミング時のフォールバック）
+            return {"cart_mandates": cart_mandates}
+
+        agent = Mock()
+        agent.merchant_url = "http://merchant"
+        agent.http_client.post = post
+        agent.call_mcp_tool_with_progress = call_mcp_tool_with_progress
+        state = {"cart_plans": cart_plans, "available_products": [], "intent_mandate": {"id": "intent_001"}}
+
+        state = await build_cart_mandates(agent, state)
+
+        assert signed == ["cart_0", "cart_1"]
+        assert [candidate["name"] for candidate in state["cart_candidates"]] == ["カート1", "カート2"]
+        signed_cart_mandate = state["cart_candidates"][0]["parts"][0]["data"]["ap2.mandates.CartMandate"]
+        assert signed_cart_mandate["merchant_authorization"] == "sig"
+
+    @pytest.mark.asyncio
+    async def test_progress_reporter_noop(self):
+        """Test progress reporter is a no-op without streaming"""
+        from common.mcp_server import get_progress_reporter
+
+        reporter = get_progress_reporter({})
+
+        assert reporter.enabled is False
+        await reporter.report(1, total=1, partial={"x": 1})
+
+
+class TestMCPObservedToolCalls:
+    """Test direct tool invocation with cached schema validation and observation"""
+
+    @staticmethod
+    def _build_client(sample_rate=1.0):
+        from common.mcp_client import MCPClient
+
+        mock_http = AsyncMock(spec=httpx.AsyncClient)
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": {"content": [{"type": "text", "text": '{"products": []}'}]}
+        }
+        mock_response.raise_for_status = Mock()
+        mock_http.post = AsyncMock(return_value=mock_response)
+
+        client = MCPClient(
+            base_url="http://localhost:8000",
+            http_client=mock_http,
+            observation_sample_rate=sample_rate
+        )
+        client.server_info = {
+            "capabilities": {
+                "tools": {
+                    "search_products": {
+                        "description": "Search products",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "keywords": {"type": "array"},
+                                "limit": {"type": "integer"}
+                            },
+                            "required": ["keywords"]
+                        }
+                    }
+                }
+            }
+        }
+        return client, mock_http
+
+    def test_validate_tool_arguments(self):
+        """Test arguments are validated against the cached inputSchema"""
+        client, _ = self._build_client()
+
+        client.validate_tool_arguments("search_products", {"keywords": ["a"], "limit": 5})
+        assert "search_products" in client._argument_validators
+
+        with pytest.raises(ValueError, match="missing required"):
+            client.validate_tool_arguments("search_products", {"limit": 5})
+        with pytest.raises(ValueError, match="'limit' must be int"):
+            client.validate_tool_arguments("search_products", {"keywords": [], "limit": "5"})
+        with pytest.raises(ValueError, match="'limit'"):
+            client.validate_tool_arguments("search_products", {"keywords": [], "limit": True})
+
+        # Unknown tools are left to the server
+        client.validate_tool_arguments("unknown_tool", {"anything": 1})
+
+    @pytest.mark.asyncio
+    async def test_call_tool_observed_notifies_callbacks(self):
+        """Test call_tool_observed reports tool start/end to the active RunnableConfig"""
+        from langchain_core.callbacks import AsyncCallbackHandler
+        from langchain_core.runnables import RunnableLambda
+
+        events = []
+
+        class RecordingHandler(AsyncCallbackHandler):
+            async def on_tool_start(self, serialized, input_str, **kwargs):
+                events.append(("start", serialized["name"], kwargs.get("inputs")))
+
+            async def on_tool_end(self, output, **kwargs):
+                events.append(("end", output))
+
+        client, _ = self._build_client()
+
+        async def node(_):
+            return await client.call_tool_observed("search_products", {"keywords": ["mug"]})
+
+        result = await RunnableLambda(node).ainvoke(None, config={"callbacks": [RecordingHandler()]})
+
+        assert result == {"products": []}
+        assert events == [
+            ("start", "search_products", {"keywords": ["mug"]}),
+            ("end", {"products": []}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_call_tool_observed_sampling_and_opt_out(self):
+        """Test observation can be disabled or sampled out"""
+        client, mock_http = self._build_client(sample_rate=0.0)
+        client._start_tool_observation = AsyncMock()
+
+        await client.call_tool_observed("search_products", {"keywords": []})
+        client._start_tool_observation.assert_not_called()
+
+        client.observation_sample_rate = 1.0
+        await client.call_tool_observed("search_products", {"keywords": []}, observe=False)
+        client._start_tool_observation.assert_not_called()
+
+        assert mock_http.post.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_call_tool_observed_rejects_invalid_arguments(self):
+        """Test invalid arguments fail before any HTTP request"""
+        client, mock_http = self._build_client()
+
+        with pytest.raises(ValueError):
+            await client.call_tool_observed("search_products", {"limit": 1})
+
+        mock_http.post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_call_tools_reports_invalid_arguments_per_call(self):
+        """Test an invalid call gets its validation error in its slot while the valid calls are still sent"""
+        client, mock_http = self._build_client()
+        client._start_tool_observation = AsyncMock(return_value=None)
+
+        def respond(url, json, headers):
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.headers = {}
+            mock_response.json.return_value = [
+                {"jsonrpc": "2.0", "id": message["id"],
+                 "result": {"content": [{"type": "text", "text": '{"products": []}'}]}}
+                for message in json
+            ]
+            mock_response.raise_for_status = Mock()
+            return mock_response
+
+        mock_http.post = AsyncMock(side_effect=respond)
+
+        results = await client.call_tools([
+            {"name": "search_products", "arguments": {"keywords": ["mug"]}},
+            {"name": "search_products", "arguments": {"limit": 1}},
+            {"name": "search_products", "arguments": {"keywords": ["cup"]}},
+        ], return_exceptions=True, observe=True)
+
+        assert results[0] == results[2] == {"products": []}
+        assert isinstance(results[1], ValueError) and "missing required" in str(results[1])
+        sent = mock_http.post.call_args.kwargs["json"]
+        assert [m["params"]["arguments"] for m in sent] == [{"keywords": ["mug"]}, {"keywords": ["cup"]}]
+        # 送信しない呼び出しはobservationを開始しない
+        assert client._start_tool_observation.await_count == 2
+
+        # 全件が不正な場合はHTTPリクエストを送らない
+        mock_http.post.reset_mock()
+        with pytest.raises(ValueError, match="missing required"):
+            await client.call_tools([{"name": "search_products", "arguments": {}}], observe=True)
+        mock_http.post.assert_not_called()
@@ -86,6 +86,157 @@ class TestMerchantAgentCartHelpers:
         assert costs["total_cents"] == 160000  # 1000 + 100 + 500 = 1600 JPY
 
 
+# ============================================================================
+# Merchant Agent Ranking Engine Tests
+# ============================================================================
+
+
+class TestCartRankingEngine:
+    """Test merchant_agent cart ranking engine"""
+
+    PRODUCTS = [
+        {"id": 1, "name": "むぎぼーTシャツ", "price_jpy": 3000.0, "inventory_count": 50},
+        {"id": 2, "name": "むぎぼーマグカップ", "price_jpy": 1500.0, "inventory_count": 2},
+        {"id": 3, "name": "キーホルダー", "price_jpy": 800.0, "inventory_count": 100},
+    ]
+
+    def test_rank_orders_by_score(self):
+        """Test candidates are ranked by weighted features"""
+        from services.merchant_agent.utils.ranking_engine import CartRankingEngine
+
+        engine = CartRankingEngine()
+        candidates = [
+            [{"product_id": 3, "quantity": 1}],  # keyword mismatch
+            [{"product_id": 1, "quantity": 1}],  # keyword match, plenty of stock
+            [{"product_id": 2, "quantity": 3}],  # keyword match, out of stock
+        ]
+
+        ranked = engine.rank(
+            candidates,
+            self.PRODUCTS,
+            preferences={"search_keywords": ["むぎぼー"]},
+            top_k=3
+        )
+
+        assert [r.index for r in ranked] == [1, 0, 2]
+        assert ranked[0].features["preference_match"] == 1.0
+        assert ranked[0].features["inventory_certainty"] == 1.0
+        assert ranked[2].features["inventory_certainty"] == 0.0
+        assert ranked[0].total_price == 3000.0
+
+    def test_rank_respects_top_k_and_skips_empty(self):
+        """Test top_k truncation and exclusion of carts without known products"""
+        from services.merchant_agent.utils.ranking_engine import CartRankingEngine
+
+        engine = CartRankingEngine()
+        candidates = [[{"product_id": 3, "quantity": 1}]] * 5 + [[{"product_id": 999, "quantity": 1}], []]
+
+        ranked = engine.rank(candidates, self.PRODUCTS, top_k=3)
+
+        assert len(ranked) == 3
+        # Ties keep the original order
+        assert [r.index for r in ranked] == [0, 1, 2]
+
+        assert len(engine.rank(candidates, self.PRODUCTS, top_k=None)) == 5
+
+    def test_budget_penalty_and_strategy(self):
+        """Test over-budget carts are penalized and budget_strategy shifts weights"""
+        from services.merchant_agent.utils.ranking_engine import CartRankingEngine, RankingWeights
+
+        engine = CartRankingEngine(weights=RankingWeights(preference=0.0, inventory=0.0, price=1.0))
+        candidates = [
+            [{"product_id": 1, "quantity": 2}],  # 6000円
+            [{"product_id": 3, "quantity": 1}],  # 800円
+        ]
+
+        ranked = engine.rank(candidates, self.PRODUCTS, max_amount=3000)
+        assert ranked[0].index == 1
+        assert ranked[1].score == 0.0
+
+        weights = RankingWeights()
+        low = weights.as_vector("low")
+        premium = weights.as_vector("premium")
+        assert low.sum() == pytest.approx(1.0)
+        assert low[2] > premium[2]
+
+    def test_inventory_status_string_keys(self):
+        """Test inventory_status from MCP JSON (string keys) overrides product stock"""
+        from services.merchant_agent.utils.ranking_engine import CartRankingEngine
+
+        engine = CartRankingEngine(safety_stock=0)
+        ranked = engine.rank(
+            [[{"product_id": 1, "quantity": 1}]],
+            self.PRODUCTS,
+            inventory_status={"1": 0}
+        )
+
+        assert ranked[0].features["inventory_certainty"] == 0.0
+
+    def test_weights_from_env(self, monkeypatch):
+        """Test ranking weights loaded from environment variables"""
+        from services.merchant_agent.utils.ranking_engine import RankingWeights
+
+        monkeypatch.setenv("MERCHANT_RANKING_WEIGHT_PRICE", "0.9")
+        weights = RankingWeights.from_env()
+
+        assert weights.price == 0.9
+        assert weights.preference == 0.4
+
+    async def test_rank_and_select_node(self):
+        """Test rank_and_select attaches ranking metadata to artifacts"""
+        from services.merchant_agent.nodes.ranking_node import rank_and_select
+        from services.merchant_agent.utils.ranking_engine import CartRankingEngine
+
+        def artifact(product_id, quantity):
+            return {
+                "artifactId": f"artifact_{product_id}",
+                "parts": [{
+                    "kind": "data",
+                    "data": {"ap2.mandates.CartMandate": {
+                        "_metadata": {"raw_items": [{"product_id": product_id, "quantity": quantity}]}
+                    }}
+                }]
+            }
+
+        agent = Mock()
+        agent.ranking_engine = CartRankingEngine()
+        state = {
+            "intent_mandate": {},
+            "available_products": self.PRODUCTS,
+            "inventory_status": {},
+            "user_preferences": {"search_keywords": ["Tシャツ"]},
+            "cart_candidates": [artifact(3, 1), artifact(2, 1), artifact(1, 1), artifact(3, 2)],
+        }
+
+        result = await rank_and_select(agent, state)
+
+        assert len(result["cart_candidates"]) == 3
+        assert result["cart_candidates"][0]["artifactId"] == "artifact_1"
+        assert "score" in result["cart_candidates"][0]["metadata"]["ranking"]
+
+    async def test_rank_and_select_falls_back_to_unranked(self):
+        """Test rank_and_select keeps the first carts when none can be ranked"""
+        from services.merchant_agent.nodes.ranking_node import rank_and_select
+        from services.merchant_agent.utils.ranking_engine import CartRankingEngine
+
+        agent = Mock()
+        agent.ranking_engine = CartRankingEngine()
+        # raw_itemsのないカート候補（明細を商品に解決できない）
+        candidates = [{"artifactId": f"artifact_{i}", "parts": []} for i in range(5)]
+        state = {
+            "intent_mandate": {},
+            "available_products": self.PRODUCTS,
+            "inventory_status": {},
+            "user_preferences": {},
+            "cart_candidates": candidates,
+        }
+
+        result = await rank_and_select(agent, state)
+
+        assert [c["artifactId"] for c in result["cart_candidates"]] == ["artifact_0", "artifact_1", "artifact_2"]
+        assert all("metadata" not in c for c in result["cart_candidates"])
+
+
 # ============================================================================
 # Merchant Agent LLM Utils Tests
 # ============================================================================
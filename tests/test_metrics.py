@@ -0,0 +1,156 @@
+"""
+Tests for Metrics (common/metrics.py)
+
+- Counter / Gauge / Histogram とPrometheusテキスト形式の出力
+- timedデコレーター（同期・非同期）
+- /metrics エンドポイント（BaseAgent・MCPServer）と計装箇所
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common import metrics
+from common.metrics import CONTENT_TYPE_LATEST, MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def sample_value(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not found in:\n{text}")
+
+
+class TestMetricTypes:
+    """Counter, gauge and histogram rendering"""
+
+    def test_counter_with_labels(self, registry):
+        requests = registry.counter("test_requests_total", "Requests", ("route",))
+        requests.labels(route="/a").inc()
+        requests.labels(route="/a").inc(2)
+        requests.labels(route='say "hi"\n').inc()
+
+        text = registry.render()
+        assert "# TYPE test_requests_total counter" in text
+        assert sample_value(text, 'test_requests_total{route="/a"}') == 3
+        assert 'test_requests_total{route="say \\"hi\\"\\n"} 1' in text
+
+        with pytest.raises(ValueError):
+            requests.labels(route="/a").inc(-1)
+
+    def test_counter_name_and_labels_validated(self, registry):
+        with pytest.raises(ValueError):
+            registry.counter("test_requests", "Requests")
+        requests = registry.counter("test_requests_total", "Requests", ("route",))
+        with pytest.raises(ValueError):
+            requests.labels(path="/a")
+        with pytest.raises(ValueError):
+            requests.inc()
+
+    def test_registration_is_idempotent(self, registry):
+        first = registry.histogram("test_seconds", "Latency", ("op",))
+        assert registry.histogram("test_seconds", "Latency", ("op",)) is first
+        with pytest.raises(ValueError):
+            registry.gauge("test_seconds", "Latency")
+
+    def test_gauge_set_and_function(self, registry):
+        depth = registry.gauge("test_queue_depth", "Depth")
+        depth.set(3)
+        depth.inc()
+        assert sample_value(registry.render(), "test_queue_depth") == 4
+
+        items = [1, 2]
+        depth.set_function(lambda: len(items))
+        items.append(3)
+        assert sample_value(registry.render(), "test_queue_depth") == 3
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        latency = registry.histogram("test_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            latency.observe(value)
+
+        text = registry.render()
+        assert sample_value(text, 'test_seconds_bucket{le="0.1"}') == 2
+        assert sample_value(text, 'test_seconds_bucket{le="1"}') == 3
+        assert sample_value(text, 'test_seconds_bucket{le="+Inf"}') == 4
+        assert sample_value(text, "test_seconds_count") == 4
+        assert sample_value(text, "test_seconds_sum") == pytest.approx(5.65)
+
+
+class TestTimed:
+    """timed decorator"""
+
+    def test_sync_function_records_on_error(self, registry):
+        latency = registry.histogram("test_seconds", "Latency", ("op",))
+
+        @metrics.timed(latency, op="fail")
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            fail()
+        assert sample_value(registry.render(), 'test_seconds_count{op="fail"}') == 1
+
+    def test_async_function(self, registry):
+        latency = registry.histogram("test_seconds", "Latency")
+
+        @metrics.timed(latency)
+        async def work(value):
+            await asyncio.sleep(0)
+            return value * 2
+
+        assert asyncio.iscoroutinefunction(work)
+        assert asyncio.run(work(21)) == 42
+        assert sample_value(registry.render(), "test_seconds_count") == 1
+
+
+class TestMetricsEndpoint:
+    """/metrics endpoint and instrumented call sites"""
+
+    def test_endpoint_serves_text_format(self):
+        app = FastAPI()
+        metrics.register_metrics_endpoint(app)
+
+        response = TestClient(app).get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == CONTENT_TYPE_LATEST
+        assert "# TYPE ap2_llm_request_seconds histogram" in response.text
+
+    def test_endpoint_disabled(self, monkeypatch):
+        monkeypatch.setenv("METRICS_ENABLED", "false")
+        app = FastAPI()
+        metrics.register_metrics_endpoint(app)
+        assert TestClient(app).get("/metrics").status_code == 404
+
+    async def test_mcp_server_records_tool_calls(self):
+        from common.mcp_server import MCPServer
+
+        server = MCPServer("test_server")
+
+        @server.tool("echo", "Echo", {"type": "object", "properties": {}})
+        async def echo(params):
+            return {"ok": True}
+
+        child = metrics.REGISTRY.get("ap2_mcp_tool_seconds").labels(tool="echo", outcome="ok")
+        before = child.count
+        await server._handle_tool_call({"name": "echo", "arguments": {}}, None)
+        assert child.count == before + 1
+
+        response = TestClient(server.app).get("/metrics")
+        assert 'ap2_mcp_tool_seconds_count{tool="echo",outcome="ok"}' in response.text
+
+    async def test_nonce_store_size(self):
+        from common.nonce_manager import NonceManager
+
+        before = sample_value(metrics.render_metrics(), "ap2_nonce_store_size")
+        manager = NonceManager()
+        await manager.is_valid_nonce("nonce-1")
+        await manager.is_valid_nonce("nonce-2")
+        assert sample_value(metrics.render_metrics(), "ap2_nonce_store_size") == before + 2
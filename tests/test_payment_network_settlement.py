@@ -0,0 +1,245 @@
+"""
+Tests for Payment Network Settlement
+
+Tests cover:
+- settlement/ledger.py (authorize/capture ledger, group commit, batch close)
+- settlement/batch_file.py (settlement batch file writer)
+- network.py capture/settlement endpoints (admin token, charge -> capture -> close)
+"""
+
+import asyncio
+import csv
+import hashlib
+from datetime import datetime, timezone
+
+import pytest
+
+from services.payment_network.settlement import (
+    STATUS_AUTHORIZED,
+    STATUS_CAPTURED,
+    STATUS_SETTLED,
+    SettlementFileWriter,
+    SettlementLedger,
+    to_minor_units,
+)
+
+
+@pytest.fixture
+async def ledger(tmp_path):
+    ledger = SettlementLedger(f"sqlite+aiosqlite:///{tmp_path / 'payment_network.db'}")
+    await ledger.init_db()
+    yield ledger
+    await ledger.dispose()
+
+
+def charge(i, merchant_id="merchant_001", currency="JPY", value="1000"):
+    return {
+        "network_transaction_id": f"net_txn_{i:04d}",
+        "transaction_id": f"txn_{i:04d}",
+        "authorization_code": f"AUTH{i:04d}",
+        "amount": {"value": value, "currency": currency},
+        "merchant_id": merchant_id,
+        "payer_id": "user_001",
+        "payment_mandate_id": f"payment_{i:04d}"
+    }
+
+
+class TestSettlementLedger:
+    """Test settlement ledger"""
+
+    def test_to_minor_units_rounds(self):
+        """Test amount conversion to cents avoids float truncation"""
+        assert to_minor_units("1000") == 100000
+        assert to_minor_units(0.29) == 29
+        assert to_minor_units("19.99") == 1999
+
+    @pytest.mark.asyncio
+    async def test_record_captured_charge(self, ledger):
+        """Test charge recorded with immediate capture"""
+        row = await ledger.record_authorization(charge(1, value="12.50"))
+
+        entry = await ledger.get_entry("net_txn_0001")
+        assert row["status"] == STATUS_CAPTURED
+        assert entry["status"] == STATUS_CAPTURED
+        assert entry["authorized_value"] == 1250
+        assert entry["captured_value"] == 1250
+
+    @pytest.mark.asyncio
+    async def test_authorize_then_capture(self, ledger):
+        """Test authorize-now/capture-later with partial capture"""
+        await ledger.record_authorization(charge(1, value="100"), capture=False)
+        assert (await ledger.get_entry("net_txn_0001"))["status"] == STATUS_AUTHORIZED
+
+        # オーソリ金額超過は拒否
+        assert await ledger.capture("net_txn_0001", "150") is None
+
+        captured = await ledger.capture("net_txn_0001", "80")
+        assert captured["status"] == STATUS_CAPTURED
+        assert captured["captured_value"] == 8000
+
+        # 二重キャプチャ・存在しない取引は拒否
+        assert await ledger.capture("net_txn_0001") is None
+        assert await ledger.capture("net_txn_missing") is None
+
+    @pytest.mark.asyncio
+    async def test_group_commit_appends_concurrent_charges(self, ledger):
+        """Test concurrent charges are committed together by the flusher"""
+        await ledger.start()
+        writes = []
+        original = ledger._write_rows
+
+        async def counting_write(rows):
+            writes.append(len(rows))
+            await original(rows)
+
+        ledger._write_rows = counting_write
+        await asyncio.gather(*(ledger.record_authorization(charge(i)) for i in range(50)))
+        await ledger.stop()
+
+        assert sum(writes) == 50
+        assert len(writes) < 50
+        assert (await ledger.get_entry("net_txn_0049"))["status"] == STATUS_CAPTURED
+
+    @pytest.mark.asyncio
+    async def test_group_commit_propagates_write_failure(self, ledger):
+        """Test a failed group commit fails every waiting charge"""
+        await ledger.start()
+
+        async def failing_write(rows):
+            raise RuntimeError("disk full")
+
+        ledger._write_rows = failing_write
+        results = await asyncio.gather(
+            *(ledger.record_authorization(charge(i)) for i in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_close_batches_groups_by_merchant_and_currency(self, ledger, tmp_path):
+        """Test batch close groups captured entries and writes one file per batch"""
+        await ledger.record_authorization(charge(1, "merchant_001", "JPY", "1000"))
+        await ledger.record_authorization(charge(2, "merchant_001", "JPY", "500"))
+        await ledger.record_authorization(charge(3, "merchant_001", "USD", "10"))
+        await ledger.record_authorization(charge(4, "merchant_002", "JPY", "300"))
+        # オーソリのみの取引はクローズ対象外
+        await ledger.record_authorization(charge(5, "merchant_002", "JPY", "700"), capture=False)
+
+        writer = SettlementFileWriter(str(tmp_path / "settlement"))
+        closed_at = datetime(2025, 10, 1, 12, 0, tzinfo=timezone.utc)
+        batches = await ledger.close_batches(writer, "TestNetwork", closed_at=closed_at)
+
+        summary = {(b["merchant_id"], b["currency"]): (b["entry_count"], b["total_value"]) for b in batches}
+        assert summary == {
+            ("merchant_001", "JPY"): (2, 150000),
+            ("merchant_001", "USD"): (1, 1000),
+            ("merchant_002", "JPY"): (1, 30000),
+        }
+        assert (await ledger.get_entry("net_txn_0001"))["status"] == STATUS_SETTLED
+        assert (await ledger.get_entry("net_txn_0005"))["status"] == STATUS_AUTHORIZED
+
+        batch = next(b for b in batches if b["merchant_id"] == "merchant_001" and b["currency"] == "JPY")
+        with open(batch["file_path"], "rb") as f:
+            data = f.read()
+        assert hashlib.sha256(data).hexdigest() == batch["file_sha256"]
+        rows = list(csv.reader(data.decode().splitlines()))
+        assert rows[0][:5] == ["H", batch["id"], "TestNetwork", "merchant_001", "JPY"]
+        assert [row[1] for row in rows[1:-1]] == ["net_txn_0001", "net_txn_0002"]
+        assert rows[-1] == ["T", "2", "150000"]
+        assert "20251001" in batch["file_path"]
+
+        # 清算済みの取引は再クローズされない
+        assert await ledger.close_batches(writer, "TestNetwork") == []
+        assert (await ledger.get_batch(batch["id"]))["file_sha256"] == batch["file_sha256"]
+        assert len(await ledger.list_batches()) == 3
+
+    @pytest.mark.asyncio
+    async def test_close_batches_removes_files_on_failure(self, ledger, tmp_path):
+        """Test batch files already written are removed when the close fails"""
+        await ledger.record_authorization(charge(1, "merchant_001"))
+        await ledger.record_authorization(charge(2, "merchant_002"))
+        writer = SettlementFileWriter(str(tmp_path / "settlement"))
+        written = []
+        original_write = writer.write
+
+        def failing_second_write(*args):
+            if written:
+                raise OSError("disk full")
+            path, digest = original_write(*args)
+            written.append(path)
+            return path, digest
+
+        writer.write = failing_second_write
+        with pytest.raises(OSError):
+            await ledger.close_batches(writer, "TestNetwork")
+
+        assert len(written) == 1
+        assert not (tmp_path / written[0]).exists()
+        assert (await ledger.get_entry("net_txn_0001"))["status"] == STATUS_CAPTURED
+        assert await ledger.list_batches() == []
+
+
+class TestSettlementEndpoints:
+    """Test the capture and settlement endpoints over HTTP"""
+
+    @pytest.mark.asyncio
+    async def test_authorize_capture_close_requires_admin_token(self, monkeypatch, tmp_path):
+        """Test charge(capture=false) -> capture -> close, with 403 on every endpoint without X-Admin-Token"""
+        import httpx
+        from services.payment_network import network
+        from tests.test_payment_network_utils import FakeRedis, issue
+
+        monkeypatch.setattr(network, "SETTLEMENT_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path}/ledger.db")
+        monkeypatch.setattr(network, "SETTLEMENT_DIR", str(tmp_path))
+        monkeypatch.setenv("NETWORK_ADMIN_TOKEN", "admin-secret")
+        service = network.PaymentNetworkService("TestNetwork")
+        service.redis_client.client = FakeRedis()
+        agent_token = await issue(service.token_helpers, "pm_001", "user_001")
+        # ASGITransportはstartupイベントを実行しないため、台帳を明示的に初期化する
+        await service.settlement_ledger.init_db()
+        await service.settlement_ledger.start()
+
+        admin = {"X-Admin-Token": "admin-secret"}
+        transport = httpx.ASGITransport(app=service.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                charged = await client.post("/network/charge", json={
+                    "agent_token": agent_token,
+                    "transaction_id": "txn_001",
+                    "amount": {"value": "1000", "currency": "JPY"},
+                    "payment_mandate_id": "pm_001",
+                    "payer_id": "user_001",
+                    "merchant_id": "merchant_001",
+                    "capture": False,
+                })
+                network_transaction_id = charged.json()["network_transaction_id"]
+                capture_body = {"network_transaction_id": network_transaction_id, "amount": {"value": "800"}}
+
+                capture_denied = await client.post("/network/capture", json=capture_body)
+                capture_wrong = await client.post(
+                    "/network/capture", json=capture_body, headers={"X-Admin-Token": "guess"}
+                )
+                close_denied = await client.post("/network/settlement/close")
+                captured = await client.post("/network/capture", json=capture_body, headers=admin)
+                closed = await client.post("/network/settlement/close", headers=admin)
+
+                batch_id = closed.json()["batches"][0]["id"]
+                list_denied = await client.get("/network/settlement/batches")
+                get_denied = await client.get(f"/network/settlement/batches/{batch_id}")
+                listed = await client.get("/network/settlement/batches", headers=admin)
+                fetched = await client.get(f"/network/settlement/batches/{batch_id}", headers=admin)
+        finally:
+            await service.settlement_ledger.stop()
+            await service.settlement_ledger.dispose()
+
+        assert charged.status_code == 200
+        assert charged.json()["status"] == "authorized"
+        assert capture_denied.status_code == capture_wrong.status_code == close_denied.status_code == 403
+        assert list_denied.status_code == get_denied.status_code == 403
+
+        assert captured.status_code == 200
+        assert captured.json()["status"] == "captured"
+        assert closed.status_code == 200
+        assert len(closed.json()["batches"]) == 1
+        assert [batch["id"] for batch in listed.json()["batches"]] == [batch_id]
+        assert fetched.json()["id"] == batch_id
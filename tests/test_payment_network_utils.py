@@ -240,3 +240,284 @@ class TestTokenHelpers:
 
         # All tokens should be unique
         assert len(tokens) == 10
+
+
+# ============================================================================
+# Agent Token Index / Bulk Verification Tests
+# ============================================================================
+
+
+class FakeRedis:
+    """redis.asyncio.Redisのインメモリスタンドイン（トークンストア・インデックスで使う操作のみ）"""
+
+    def __init__(self):
+        self.data = {}
+        self.zsets = {}
+        self.ttls = {}
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def expire(self, key, ttl, nx=False, gt=False):
+        current = self.ttls.get(key)
+        if (nx and current is None) or (gt and current is not None and ttl > current):
+            self.ttls[key] = ttl
+
+    async def zrangebyscore(self, key, min_score, max_score, start=None, num=None):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+        result = [member for member, score in members if min_score <= score <= max_score]
+        return result[start:start + num] if num is not None else result
+
+    async def zrem(self, key, *members):
+        zset = self.zsets.get(key, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def zadd(self, *args):
+        self.calls.append(self.redis.zadd(*args))
+
+    def expire(self, *args, **kwargs):
+        self.calls.append(self.redis.expire(*args, **kwargs))
+
+    async def execute(self):
+        return [await call for call in self.calls]
+
+
+def create_indexed_helpers():
+    from common.redis_client import RedisClient, TokenStore
+    from services.payment_network.utils import AgentTokenIndex, TokenHelpers
+
+    redis_client = RedisClient()
+    redis_client.client = FakeRedis()
+    helpers = TokenHelpers(
+        network_name="TestNetwork",
+        token_store=TokenStore(redis_client, prefix="agent_token"),
+        index=AgentTokenIndex(redis_client)
+    )
+    return helpers, redis_client.client
+
+
+async def issue(helpers, mandate_id, payer_id, expiry_hours=1):
+    payment_mandate = {"id": mandate_id, "payer_id": payer_id, "amount": {"value": "100", "currency": "JPY"}}
+    agent_token, _ = await helpers.generate_agent_token(
+        payment_mandate, "pm_token", attestation_verified=True, expiry_hours=expiry_hours
+    )
+    return agent_token
+
+
+class TestAgentTokenIndex:
+    """Test agent token secondary indexes, bulk verification, revocation and sweep"""
+
+    @pytest.mark.asyncio
+    async def test_generate_stores_epoch_expiry_and_indexes(self):
+        """Test token data has epoch expiry and is indexed by payer, mandate and expiry"""
+        import json
+
+        helpers, fake = create_indexed_helpers()
+        agent_token = await issue(helpers, "pm_001", "user_001", expiry_hours=2)
+
+        token_data = json.loads(fake.data[f"agent_token:{agent_token}"])
+        assert token_data["expires_at_epoch"] - token_data["issued_at_epoch"] == 2 * 3600
+        assert int(datetime.fromisoformat(token_data["expires_at"]).timestamp()) == token_data["expires_at_epoch"]
+
+        assert fake.zsets["agent_token_idx:payer:user_001"] == {agent_token: token_data["expires_at_epoch"]}
+        assert fake.zsets["agent_token_idx:mandate:pm_001"] == {agent_token: token_data["expires_at_epoch"]}
+        assert fake.ttls["agent_token_idx:payer:user_001"] == 2 * 3600
+        assert len(fake.zsets["agent_token_idx:expiry"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_verify_uses_epoch_expiry(self):
+        """Test verification uses expires_at_epoch when present"""
+        from services.payment_network.utils.token_helpers import TokenHelpers
+
+        token_store = Mock()
+        token_store.delete_token = AsyncMock(return_value=True)
+        # ISO表記は未来だがepochは過去 → epochが優先される
+        token_store.get_token = AsyncMock(return_value={
+            "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+            "expires_at_epoch": int(datetime.now(timezone.utc).timestamp()) - 10
+        })
+        helpers = TokenHelpers(network_name="TestNetwork", token_store=token_store)
+
+        valid, _, error = await helpers.verify_agent_token("agent_tok_test")
+
+        assert valid is False
+        assert error == "Agent Token expired"
+
+    @pytest.mark.asyncio
+    async def test_bulk_verify_preserves_order(self):
+        """Test bulk verification returns results in request order with one MGET"""
+        helpers, fake = create_indexed_helpers()
+        token_a = await issue(helpers, "pm_001", "user_001")
+        token_b = await issue(helpers, "pm_002", "user_001")
+
+        results = await helpers.verify_agent_tokens([token_b, "agent_tok_missing", token_a, token_b])
+
+        assert [result["agent_token"] for result in results] == [token_b, "agent_tok_missing", token_a, token_b]
+        assert [result["valid"] for result in results] == [True, False, True, True]
+        assert results[0]["token_info"]["payment_mandate_id"] == "pm_002"
+        assert results[1]["error"] == "Agent Token not found"
+        assert "payment_method_token" not in results[2]["token_info"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_verify_deletes_expired_tokens(self):
+        """Test bulk verification reports and deletes expired tokens"""
+        import json
+
+        helpers, fake = create_indexed_helpers()
+        agent_token = await issue(helpers, "pm_001", "user_001")
+        key = f"agent_token:{agent_token}"
+        token_data = json.loads(fake.data[key])
+        token_data["expires_at_epoch"] = int(datetime.now(timezone.utc).timestamp()) - 1
+        fake.data[key] = json.dumps(token_data)
+
+        results = await helpers.verify_agent_tokens([agent_token])
+
+        assert results[0]["valid"] is False
+        assert results[0]["error"] == "Agent Token expired"
+        assert key not in fake.data
+
+    @pytest.mark.asyncio
+    async def test_list_tokens_by_payer_and_mandate(self):
+        """Test enumerating tokens through the payer and mandate indexes"""
+        from services.payment_network.utils import hash_agent_token
+
+        helpers, _ = create_indexed_helpers()
+        token_a = await issue(helpers, "pm_001", "user_001")
+        token_b = await issue(helpers, "pm_002", "user_001")
+        await issue(helpers, "pm_003", "user_002")
+
+        by_payer = await helpers.list_agent_tokens(payer_id="user_001")
+        by_mandate = await helpers.list_agent_tokens(payment_mandate_id="pm_002")
+        by_both = await helpers.list_agent_tokens(payer_id="user_001", payment_mandate_id="pm_001")
+
+        assert {token["token_hash"] for token in by_payer} == {hash_agent_token(token_a), hash_agent_token(token_b)}
+        assert [token["token_hash"] for token in by_mandate] == [hash_agent_token(token_b)]
+        assert [token["token_hash"] for token in by_both] == [hash_agent_token(token_a)]
+        # トークン本体は返さない
+        assert all("agent_token" not in token for token in by_payer)
+
+    @pytest.mark.asyncio
+    async def test_list_tokens_requires_filter(self):
+        """Test enumeration without payer or mandate is rejected"""
+        helpers, _ = create_indexed_helpers()
+
+        with pytest.raises(ValueError):
+            await helpers.list_agent_tokens()
+
+    @pytest.mark.asyncio
+    async def test_revoke_by_payer_cleans_all_indexes(self):
+        """Test revoking a payer's tokens deletes data and index entries"""
+        helpers, fake = create_indexed_helpers()
+        token_a = await issue(helpers, "pm_001", "user_001")
+        await issue(helpers, "pm_002", "user_001")
+        token_c = await issue(helpers, "pm_003", "user_002")
+
+        revoked = await helpers.revoke_agent_tokens(payer_id="user_001")
+
+        assert revoked == 2
+        assert f"agent_token:{token_a}" not in fake.data
+        assert fake.zsets["agent_token_idx:payer:user_001"] == {}
+        assert fake.zsets["agent_token_idx:mandate:pm_001"] == {}
+        assert len(fake.zsets["agent_token_idx:expiry"]) == 1
+        valid, _, _ = await helpers.verify_agent_token(token_c)
+        assert valid is True
+
+    @pytest.mark.asyncio
+    async def test_sweep_removes_expired_index_entries(self):
+        """Test sweep removes expired entries from every index without KEYS"""
+        helpers, fake = create_indexed_helpers()
+        expired_token = await issue(helpers, "pm_001", "user_001")
+        live_token = await issue(helpers, "pm_002", "user_001")
+        # 期限切れを再現（インデックスのスコアを過去に、トークンデータはTTLで消えた状態）
+        past = int(datetime.now(timezone.utc).timestamp()) - 60
+        for key in ("agent_token_idx:payer:user_001", "agent_token_idx:mandate:pm_001"):
+            if expired_token in fake.zsets[key]:
+                fake.zsets[key][expired_token] = past
+        for member in fake.zsets["agent_token_idx:expiry"]:
+            if expired_token in member:
+                fake.zsets["agent_token_idx:expiry"][member] = past
+        del fake.data[f"agent_token:{expired_token}"]
+
+        swept = await helpers.sweep_expired_tokens()
+
+        assert swept == 1
+        assert list(fake.zsets["agent_token_idx:payer:user_001"]) == [live_token]
+        assert fake.zsets["agent_token_idx:mandate:pm_001"] == {}
+        assert len(fake.zsets["agent_token_idx:expiry"]) == 1
+        assert await helpers.sweep_expired_tokens() == 0
+
+    @pytest.mark.asyncio
+    async def test_index_operations_require_index(self):
+        """Test revocation and sweep fail clearly without an index"""
+        from services.payment_network.utils.token_helpers import TokenHelpers
+
+        helpers = TokenHelpers(network_name="TestNetwork", token_store=Mock())
+
+        with pytest.raises(RuntimeError):
+            await helpers.revoke_agent_tokens(payer_id="user_001")
+        with pytest.raises(RuntimeError):
+            await helpers.sweep_expired_tokens()
+
+
+class TestTokenAdminEndpoints:
+    """Test admin gating of the token list/revoke/sweep endpoints"""
+
+    @pytest.mark.asyncio
+    async def test_token_endpoints_require_admin_token(self, monkeypatch, tmp_path):
+        """Test list/revoke/sweep reject requests without X-Admin-Token and never return raw tokens"""
+        import httpx
+        from services.payment_network import network
+        from services.payment_network.utils import hash_agent_token
+
+        monkeypatch.setattr(network, "SETTLEMENT_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path}/ledger.db")
+        monkeypatch.setattr(network, "SETTLEMENT_DIR", str(tmp_path))
+        monkeypatch.setenv("NETWORK_ADMIN_TOKEN", "admin-secret")
+        service = network.PaymentNetworkService("TestNetwork")
+        service.redis_client.client = FakeRedis()
+        agent_token = await issue(service.token_helpers, "pm_001", "user_001")
+
+        admin = {"X-Admin-Token": "admin-secret"}
+        transport = httpx.ASGITransport(app=service.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            anonymous = await client.get("/network/tokens", params={"payer_id": "user_001"})
+            wrong = await client.get(
+                "/network/tokens", params={"payer_id": "user_001"}, headers={"X-Admin-Token": "guess"}
+            )
+            listed = await client.get("/network/tokens", params={"payer_id": "user_001"}, headers=admin)
+            revoke_denied = await client.post("/network/tokens/revoke", json={"payer_id": "user_001"})
+            sweep_denied = await client.post("/network/tokens/sweep")
+            revoked = await client.post("/network/tokens/revoke", json={"payer_id": "user_001"}, headers=admin)
+
+        assert anonymous.status_code == wrong.status_code == 403
+        assert revoke_denied.status_code == sweep_denied.status_code == 403
+        assert listed.status_code == 200
+        assert [token["token_hash"] for token in listed.json()["tokens"]] == [hash_agent_token(agent_token)]
+        assert agent_token not in listed.text
+        assert revoked.json() == {"revoked": 1}
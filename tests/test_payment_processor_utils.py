@@ -4,6 +4,9 @@ Tests for Payment Processor Utils
 Tests cover:
 - jwt_helpers.py (payment_processor)
 - mandate_helpers.py (payment_processor)
+- job_queue.py (payment_processor)
+- receipt_renderer.py (payment_processor)
+- receipt_store.py (payment_processor)
 """
 
 import pytest
@@ -440,3 +443,457 @@ class TestMandateHelpers:
 
         # Should not raise (empty string is not None)
         MandateHelpers.validate_payment_mandate(payment_mandate)
+
+
+# ============================================================================
+# Payment Processor Background Job Queue Tests
+# ============================================================================
+
+
+class TestBackgroundJobQueue:
+    """Test payment_processor background job queue"""
+
+    @pytest.mark.asyncio
+    async def test_job_completes(self):
+        """Test submitted job runs and is removed from pending"""
+        from services.payment_processor.utils.job_queue import BackgroundJobQueue, Job
+
+        handled = []
+
+        async def handler(job):
+            handled.append(job.job_id)
+
+        queue = BackgroundJobQueue("test", handler=handler, workers=1)
+        await queue.start()
+        assert queue.submit(Job(job_id="txn_001", payload={}))
+        assert "txn_001" in queue.pending
+
+        await queue.join()
+        await queue.stop()
+
+        assert handled == ["txn_001"]
+        assert queue.pending == set()
+        assert queue.dead_letters == []
+
+    @pytest.mark.asyncio
+    async def test_job_retries_and_keeps_stage_state(self):
+        """Test failed job is retried and completed stages are skipped"""
+        from services.payment_processor.utils.job_queue import BackgroundJobQueue, Job
+
+        calls = {"generate": 0, "notify": 0}
+
+        async def handler(job):
+            if "receipt_url" not in job.state:
+                calls["generate"] += 1
+                job.state["receipt_url"] = "http://localhost/receipt.pdf"
+            calls["notify"] += 1
+            if calls["notify"] < 3:
+                raise RuntimeError("credential provider unavailable")
+
+        queue = BackgroundJobQueue("test", handler=handler, workers=1, retry_base_seconds=0.01)
+        await queue.start()
+        job = Job(job_id="txn_002", payload={})
+        queue.submit(job)
+
+        await queue.join()
+        await queue.stop()
+
+        assert calls == {"generate": 1, "notify": 3}
+        assert job.attempts == 3
+        assert queue.pending == set()
+
+    @pytest.mark.asyncio
+    async def test_job_dead_letter_after_max_retries(self):
+        """Test job exceeding max_retries is moved to dead_letters"""
+        from services.payment_processor.utils.job_queue import BackgroundJobQueue, Job
+
+        async def handler(job):
+            raise RuntimeError("always fails")
+
+        queue = BackgroundJobQueue("test", handler=handler, workers=1, max_retries=2, retry_base_seconds=0.01)
+        await queue.start()
+        queue.submit(Job(job_id="txn_003", payload={}))
+
+        await queue.join()
+        await queue.stop()
+
+        assert [job.job_id for job in queue.dead_letters] == ["txn_003"]
+        assert queue.dead_letters[0].attempts == 3
+        assert queue.dead_letters[0].last_error == "always fails"
+        assert queue.pending == set()
+
+    def test_submit_rejects_when_full(self):
+        """Test submit returns False when queue is full"""
+        from services.payment_processor.utils.job_queue import BackgroundJobQueue, Job
+
+        async def handler(job):
+            pass
+
+        queue = BackgroundJobQueue("test", handler=handler, max_queue_size=1)
+        assert queue.submit(Job(job_id="txn_a", payload={}))
+        assert not queue.submit(Job(job_id="txn_b", payload={}))
+        assert queue.pending == {"txn_a"}
+
+    @pytest.mark.asyncio
+    async def test_permanent_error_skips_retries(self):
+        """Test PermanentJobError moves the job to dead_letters without retrying"""
+        from services.payment_processor.utils.job_queue import BackgroundJobQueue, Job, PermanentJobError
+
+        async def handler(job):
+            raise PermanentJobError("CartMandate not provided")
+
+        queue = BackgroundJobQueue("test", handler=handler, workers=1, max_retries=5, retry_base_seconds=0.01)
+        await queue.start()
+        queue.submit(Job(job_id="txn_004", payload={}))
+
+        await queue.join()
+        await queue.stop()
+
+        assert [job.attempts for job in queue.dead_letters] == [1]
+        assert queue.pending == set()
+
+    @pytest.mark.asyncio
+    async def test_run_detached_is_tracked_and_retried(self):
+        """Test run_detached (queue full / not started) keeps the job pending and retries it"""
+        from services.payment_processor.utils.job_queue import BackgroundJobQueue, Job
+
+        calls = []
+
+        async def handler(job):
+            calls.append(job.attempts)
+            if len(calls) < 2:
+                raise RuntimeError("credential provider unavailable")
+
+        queue = BackgroundJobQueue("test", handler=handler, retry_base_seconds=0.01)
+        job = Job(job_id="txn_005", payload={"payment_mandate": {"payer_id": "user_1"}})
+        queue.run_detached(job)
+        assert queue.get_pending("txn_005") is job
+
+        await queue.join()
+
+        assert len(calls) == 2
+        assert queue.get_pending("txn_005") is None
+        assert queue.pending == set()
+        assert queue.dead_letters == []
+
+
+# ============================================================================
+# Payment Processor Receipt Renderer Tests
+# ============================================================================
+
+
+def _render_input(transaction_id):
+    return {
+        "transaction_result": {"id": transaction_id, "status": "captured"},
+        "cart_mandate": None,
+        "payment_mandate": {"payment_method": {"brand": "visa", "last4": "4242"}, "amount": {"value": 1000, "currency": "JPY"}},
+        "user_name": "Demo User"
+    }
+
+
+class TestReceiptRenderer:
+    """Test payment_processor receipt rendering worker"""
+
+    @pytest.mark.asyncio
+    async def test_render_to_store_in_thread(self, tmp_path):
+        """Test rendering without process pool stores the PDF by content hash"""
+        from services.payment_processor.utils.receipt_renderer import ReceiptRenderer
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore
+
+        store = LocalDiskReceiptStore(tmp_path / "receipts")
+        renderer = ReceiptRenderer(store, workers=0)
+        content_hash = await renderer.render_to_store(_render_input("txn_001"))
+
+        path = store.path(content_hash)
+        assert path.read_bytes().startswith(b"%PDF")
+        assert [p.name for p in path.parent.iterdir()] == [f"{content_hash}.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_render_in_process_pool(self, tmp_path):
+        """Test rendering in worker process"""
+        from services.payment_processor.utils.receipt_renderer import ReceiptRenderer
+
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore
+
+        renderer = ReceiptRenderer(LocalDiskReceiptStore(tmp_path), workers=1)
+        try:
+            data = await renderer.render(_render_input("txn_002"))
+        finally:
+            renderer.shutdown()
+
+        assert data.startswith(b"%PDF")
+
+    @pytest.mark.asyncio
+    async def test_rerender_receipts_in_range(self, db_manager, tmp_path):
+        """Test batch re-render rebuilds inputs from mandate references and dedups unchanged receipts"""
+        from common.database import ReceiptCRUD, TransactionCRUD
+        from services.payment_processor.utils.receipt_renderer import (
+            ReceiptRenderer, RECEIPT_RENDERED_EVENT, build_render_input, rerender_receipts_in_range,
+            save_receipt_mandates
+        )
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore
+
+        payment_result = {"status": "captured", "authorized_at": "2025-10-01T10:00:00+00:00",
+                          "captured_at": "2025-10-01T10:00:01+00:00"}
+        payment_mandate = {"id": "pm_001", "payer_id": "usr_12345678", "cart_mandate_id": "cart_001",
+                           "payment_method": {"brand": "visa", "last4": "4242"}}
+        cart_mandate = {"contents": {"id": "cart_001", "merchant_name": "むぎぼーショップ"},
+                        "_metadata": {"merchant_id": "did:ap2:merchant:mugibo_merchant"}}
+
+        store = LocalDiskReceiptStore(tmp_path)
+        renderer = ReceiptRenderer(store, workers=0)
+        original_hash = await renderer.render_to_store(
+            build_render_input("txn_with_input", payment_result, cart_mandate, payment_mandate)
+        )
+
+        async with db_manager.get_session() as session:
+            references = await save_receipt_mandates(session, "txn_with_input", cart_mandate, payment_mandate)
+            # 再試行で同じマンデートを保存しても重複しない
+            assert await save_receipt_mandates(session, "txn_with_input", cart_mandate, payment_mandate) == references
+            await TransactionCRUD.create(session, {
+                "id": "txn_with_input",
+                "events": [
+                    {"type": "payment_processed", "result": payment_result},
+                    {"type": RECEIPT_RENDERED_EVENT, "content_hash": original_hash, **references}
+                ]
+            })
+            await TransactionCRUD.create(session, {"id": "txn_without_input", "events": []})
+            await ReceiptCRUD.create(session, {
+                "user_id": "user_001",
+                "transaction_id": "txn_with_input",
+                "receipt_url": "http://localhost:8004/receipts/txn_with_input.pdf",
+                "content_hash": "stale"
+            })
+        assert references == {"cart_mandate_id": "cart_001", "payment_mandate_id": "pm_001"}
+
+        now = datetime.now(timezone.utc)
+        summary = await rerender_receipts_in_range(db_manager, renderer, now - timedelta(hours=1), now + timedelta(hours=1))
+        assert list(summary["rendered"]) == ["txn_with_input"]
+        assert summary["skipped"] == ["txn_without_input"]
+        assert summary["failed"] == {}
+        assert summary["superseded"] == ["stale"]
+        # 発行日時は元の決済時刻のため、内容が同じ領収書は同じコンテンツハッシュになる
+        assert summary["rendered"]["txn_with_input"] == original_hash
+        assert [p.name for p in store.path(original_hash).parent.iterdir()] == [f"{original_hash}.pdf"]
+
+        async with db_manager.get_session() as session:
+            receipt = await ReceiptCRUD.get_by_transaction_id(session, "txn_with_input")
+        assert receipt.content_hash == original_hash
+
+        # 内容が変わらない再レンダリングでは古いハッシュは発生しない
+        summary = await rerender_receipts_in_range(db_manager, renderer, now - timedelta(hours=1), now + timedelta(hours=1))
+        assert summary["rendered"] == {"txn_with_input": original_hash}
+        assert summary["superseded"] == []
+
+        summary = await rerender_receipts_in_range(db_manager, renderer, now - timedelta(days=2), now - timedelta(days=1))
+        assert summary == {"rendered": {}, "failed": {}, "skipped": [], "superseded": []}
+
+    @pytest.mark.asyncio
+    async def test_missing_mandate_is_skipped(self, db_manager, tmp_path):
+        """Test a receipt event whose mandate is gone is skipped rather than rendered with partial data"""
+        from common.database import TransactionCRUD
+        from services.payment_processor.utils.receipt_renderer import (
+            ReceiptRenderer, RECEIPT_RENDERED_EVENT, rerender_receipts_in_range
+        )
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore
+
+        async with db_manager.get_session() as session:
+            await TransactionCRUD.create(session, {
+                "id": "txn_missing_mandate",
+                "events": [
+                    {"type": "payment_processed", "result": {"status": "captured"}},
+                    {"type": RECEIPT_RENDERED_EVENT, "payment_mandate_id": "pm_missing", "cart_mandate_id": None}
+                ]
+            })
+
+        now = datetime.now(timezone.utc)
+        renderer = ReceiptRenderer(LocalDiskReceiptStore(tmp_path), workers=0)
+        summary = await rerender_receipts_in_range(db_manager, renderer, now - timedelta(hours=1), now + timedelta(hours=1))
+        assert summary["skipped"] == ["txn_missing_mandate"]
+
+
+# ============================================================================
+# Payment Processor Receipt Store Tests
+# ============================================================================
+
+
+def _in_memory_s3(objects, requests):
+    """S3互換ストレージのスタンドイン（path-style PUT/HEAD/GET/DELETE、Range対応）"""
+    import httpx
+
+    def handler(request):
+        requests.append(request)
+        key = request.url.path
+        if request.method == "PUT":
+            objects[key] = request.content
+            return httpx.Response(200)
+        if key not in objects:
+            return httpx.Response(404)
+        if request.method == "DELETE":
+            del objects[key]
+            return httpx.Response(204)
+        data = objects[key]
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Content-Length": str(len(data))})
+        range_header = request.headers.get("Range")
+        if range_header:
+            first, last = range_header[len("bytes="):].split("-")
+            end = int(last) if last else len(data) - 1
+            return httpx.Response(206, content=data[int(first):end + 1])
+        return httpx.Response(200, content=data)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestReceiptStore:
+    """Test payment_processor content-addressed receipt store"""
+
+    @pytest.mark.asyncio
+    async def test_local_store_sharded_and_deduplicated(self, tmp_path):
+        """Test local store shards by hash prefix and writes identical content once"""
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore, compute_content_hash
+
+        store = LocalDiskReceiptStore(tmp_path)
+        data = b"%PDF-1.4 receipt"
+        content_hash = await store.put(data)
+
+        assert content_hash == compute_content_hash(data)
+        path = store.path(content_hash)
+        assert path == tmp_path / content_hash[:2] / content_hash[2:4] / f"{content_hash}.pdf"
+
+        mtime = path.stat().st_mtime_ns
+        assert await store.put(data) == content_hash
+        assert path.stat().st_mtime_ns == mtime
+
+        assert await store.size(content_hash) == len(data)
+        assert await store.read(content_hash, 5, 7) == b"1.4"
+        assert await store.size("0" * 64) is None
+
+        await store.delete(content_hash)
+        await store.delete(content_hash)
+        assert await store.size(content_hash) is None
+
+    @pytest.mark.asyncio
+    async def test_s3_store_against_local_stand_in(self):
+        """Test S3 backend signs requests and supports ranged reads"""
+        from services.payment_processor.utils.receipt_store import S3ReceiptStore
+
+        objects, requests = {}, []
+        store = S3ReceiptStore(
+            endpoint_url="http://s3.local:9000",
+            bucket="ap2",
+            access_key="AKIDEXAMPLE",
+            secret_key="secret",
+            client=_in_memory_s3(objects, requests)
+        )
+        data = b"%PDF-1.4 s3 receipt"
+        content_hash = await store.put(data)
+
+        key = f"/ap2/receipts/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.pdf"
+        assert objects == {key: data}
+        put_request = next(r for r in requests if r.method == "PUT")
+        assert put_request.headers["x-amz-content-sha256"] == content_hash
+        assert put_request.headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/")
+
+        assert await store.put(data) == content_hash
+        assert [r.method for r in requests].count("PUT") == 1
+        assert await store.read(content_hash) == data
+        assert await store.read(content_hash, 9, 10) == b"s3"
+        with pytest.raises(FileNotFoundError):
+            await store.read("0" * 64)
+
+        await store.delete(content_hash)
+        await store.delete(content_hash)
+        assert objects == {}
+        await store.close()
+
+    def test_s3_signature_is_deterministic(self):
+        """Test SigV4 signature depends only on request and timestamp"""
+        from services.payment_processor.utils.receipt_store import S3ReceiptStore, EMPTY_PAYLOAD_SHA256
+
+        store = S3ReceiptStore("http://s3.local:9000", "ap2", "AKID", "secret")
+        now = datetime(2025, 10, 18, 12, 0, 0, tzinfo=timezone.utc)
+        url = store.url("ab" * 32)
+
+        first = store.sign("GET", url, EMPTY_PAYLOAD_SHA256, now=now)
+        assert first == store.sign("GET", url, EMPTY_PAYLOAD_SHA256, now=now)
+        assert first != store.sign("HEAD", url, EMPTY_PAYLOAD_SHA256, now=now)
+        assert "20251018/us-east-1/s3/aws4_request" in first["Authorization"]
+
+    def test_parse_range(self):
+        """Test single byte range parsing"""
+        from services.payment_processor.utils.receipt_store import parse_range
+
+        assert parse_range(None, 100) is None
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=50-500", 100) == (50, 99)
+        assert parse_range("bytes=0-1,5-6", 100) is None
+        with pytest.raises(ValueError):
+            parse_range("bytes=100-", 100)
+
+    @pytest.mark.asyncio
+    async def test_build_receipt_response(self, tmp_path):
+        """Test ETag, If-None-Match and Range handling"""
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore, build_receipt_response
+
+        store = LocalDiskReceiptStore(tmp_path)
+        data = b"0123456789"
+        content_hash = await store.put(data)
+        etag = f'"{content_hash}"'
+
+        full = await build_receipt_response(store, content_hash, "receipt.pdf")
+        assert full.status_code == 200
+        assert full.body == data
+        assert full.headers["ETag"] == etag
+        assert full.headers["Accept-Ranges"] == "bytes"
+
+        not_modified = await build_receipt_response(store, content_hash, "receipt.pdf", if_none_match=etag)
+        assert not_modified.status_code == 304
+        assert not_modified.body == b""
+
+        partial = await build_receipt_response(store, content_hash, "receipt.pdf", range_header="bytes=2-4")
+        assert partial.status_code == 206
+        assert partial.body == b"234"
+        assert partial.headers["Content-Range"] == "bytes 2-4/10"
+
+        unsatisfiable = await build_receipt_response(store, content_hash, "receipt.pdf", range_header="bytes=20-")
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["Content-Range"] == "bytes */10"
+
+        with pytest.raises(FileNotFoundError):
+            await build_receipt_response(store, "0" * 64, "receipt.pdf")
+
+    def test_receipt_index_cache_expires(self):
+        """Test receipt index cache TTL and size limit"""
+        from services.payment_processor.utils.receipt_store import ReceiptIndexCache
+
+        cache = ReceiptIndexCache(max_entries=2, ttl_seconds=60)
+        cache.put("txn_a", "user_a", "hash_a")
+        cache.put("txn_b", "user_b", "hash_b")
+        cache.put("txn_c", "user_c", "hash_c")
+
+        assert cache.get("txn_a") is None
+        assert cache.get("txn_c") == ("user_c", "hash_c")
+
+        expired = ReceiptIndexCache(ttl_seconds=-1)
+        expired.put("txn_a", "user_a", "hash_a")
+        assert expired.get("txn_a") is None
+
+    @pytest.mark.asyncio
+    async def test_render_to_store_updates_receipt_index(self, tmp_path):
+        """Test a re-render replaces the cached content hash and keeps the cached owner"""
+        from services.payment_processor.utils.receipt_renderer import ReceiptRenderer
+        from services.payment_processor.utils.receipt_store import LocalDiskReceiptStore, ReceiptIndexCache
+
+        index = ReceiptIndexCache()
+        index.put("txn_001", "user_001", "old_hash")
+        renderer = ReceiptRenderer(LocalDiskReceiptStore(tmp_path), workers=0, index=index)
+
+        content_hash = await renderer.render_to_store(_render_input("txn_001"))
+        await renderer.render_to_store(_render_input("txn_002"))
+
+        assert index.get("txn_001") == ("user_001", content_hash)
+        # 未キャッシュのトランザクションは追加しない（所有者はDBから引く）
+        assert index.get("txn_002") is None
@@ -0,0 +1,135 @@
+"""
+Tests for Profiler (common/profiler.py)
+
+- 有効化条件（PROFILING_ADMIN_TOKEN）と管理者トークンの検証
+- ルート指定・リクエスト件数指定の計測とtrace_idのタグ付け
+- collapsed stack / speedscope JSON の出力
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common.profiler import UNTRACED, ProfileSession, SamplingProfiler, register_profiling
+
+ADMIN = {"X-Admin-Token": "admin-secret"}
+
+
+def busy(seconds: float) -> int:
+    total = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+@pytest.fixture
+def profiled_app(monkeypatch):
+    monkeypatch.setenv("PROFILING_ADMIN_TOKEN", "admin-secret")
+    app = FastAPI()
+    profiler = register_profiling(app)
+
+    @app.get("/work")
+    async def work():
+        return {"total": busy(0.05)}
+
+    @app.get("/other")
+    async def other():
+        return {"total": busy(0.05)}
+
+    return app, profiler
+
+
+class TestRegistration:
+    """Opt-in registration and admin authentication"""
+
+    def test_disabled_without_token(self, monkeypatch):
+        monkeypatch.delenv("PROFILING_ADMIN_TOKEN", raising=False)
+        app = FastAPI()
+        assert register_profiling(app) is None
+        assert app.user_middleware == []
+        assert TestClient(app).get("/admin/profile").status_code == 404
+
+    def test_admin_token_required(self, profiled_app):
+        app, _ = profiled_app
+        client = TestClient(app)
+        assert client.get("/admin/profile").status_code == 403
+        assert client.get("/admin/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+        assert client.get("/admin/profile", headers=ADMIN).json() == {"running": False}
+
+
+class TestProfilingSession:
+    """Request-scoped sampling"""
+
+    def test_profile_next_requests_on_route(self, profiled_app):
+        app, profiler = profiled_app
+        with TestClient(app) as client:
+            response = client.post(
+                "/admin/profile/start",
+                json={"route": "/work", "max_requests": 2, "duration_seconds": 30, "interval_ms": 1},
+                headers=ADMIN
+            )
+            assert response.status_code == 200
+            assert client.post("/admin/profile/start", json={}, headers=ADMIN).status_code == 409
+
+            client.get("/other")
+            client.get("/work")
+            client.get("/work")
+
+            status = client.get("/admin/profile", headers=ADMIN).json()
+            assert status["running"] is False
+            assert status["matched_requests"] == 2
+            assert status["samples"] > 0
+
+            collapsed = client.get("/admin/profile/collapsed", headers=ADMIN).text
+            assert "busy (test_profiler.py:" in collapsed
+            assert "other (test_profiler.py:" not in collapsed
+
+            profile = client.get("/admin/profile/speedscope", headers=ADMIN).json()
+            assert profile["profiles"][0]["type"] == "sampled"
+            assert any(frame["name"] == "busy" for frame in profile["shared"]["frames"])
+
+    async def test_samples_tagged_with_trace_id(self):
+        from opentelemetry import trace
+        from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+
+        profiler = SamplingProfiler()
+        profiler.start(duration_seconds=10, interval_ms=1)
+        span = NonRecordingSpan(SpanContext(
+            trace_id=0xABC, span_id=0x1, is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)
+        ))
+        with trace.use_span(span):
+            task = profiler.begin_request("/a2a/message")
+            busy(0.05)
+            profiler.end_request(task)
+        await asyncio.sleep(0)
+        profiler.stop()
+
+        trace_id = format(0xABC, "032x")
+        assert trace_id in profiler.session.summary()["trace_ids"]
+        assert "busy" in profiler.collapsed(trace_id=trace_id)
+
+
+class TestOutputFormats:
+    """Collapsed stack and speedscope rendering"""
+
+    def test_collapsed_and_speedscope(self):
+        profiler = SamplingProfiler()
+        profiler.session = ProfileSession(duration_seconds=1, interval_seconds=0.005, finished_at=1.0)
+        root = ("main", "/app/main.py", 1)
+        leaf = ("verify", "/app/common/crypto.py", 40)
+        profiler.session.samples[("t1", (root, leaf))] = 3
+        profiler.session.samples[(UNTRACED, (root,))] = 1
+
+        assert profiler.collapsed() == "main (main.py:1) 1\nmain (main.py:1);verify (crypto.py:40) 3\n"
+        assert profiler.collapsed(trace_id="t1") == "main (main.py:1);verify (crypto.py:40) 3\n"
+
+        profile = profiler.speedscope()
+        assert [frame["name"] for frame in profile["shared"]["frames"]] == ["main", "verify"]
+        by_name = {p["name"]: p for p in profile["profiles"]}
+        assert by_name["trace t1"]["samples"] == [[0, 1]]
+        assert by_name["trace t1"]["endValue"] == pytest.approx(0.015)
+        assert by_name[UNTRACED]["samples"] == [[0]]
@@ -7,6 +7,7 @@ Tests cover:
 - Amount formatting (legacy and AP2 formats)
 - PDF structure and content
 - Error handling
+- Cached static layout (form XObject)
 """
 
 import pytest
@@ -504,3 +505,52 @@ class TestReceiptStructureValidation:
             )
 
             assert isinstance(result, BytesIO)
+
+
+class TestReceiptLayout:
+    """Test cached static receipt layout"""
+
+    def test_layout_is_cached_per_font(self):
+        """Test static layout is built once per font"""
+        from common.receipt_generator import get_receipt_layout
+
+        assert get_receipt_layout("Helvetica") is get_receipt_layout("Helvetica")
+
+    def test_layout_positions_match_sections(self):
+        """Test value positions follow section order and items start below them"""
+        from common.receipt_generator import ReceiptLayout
+
+        layout = ReceiptLayout("Helvetica")
+
+        assert layout.value_positions["transaction_id"][1] > layout.value_positions["captured_at"][1]
+        assert layout.value_positions["captured_at"][1] > layout.value_positions["user_name"][1]
+        assert layout.value_positions["merchant_id"][1] > layout.items_top
+
+    def test_static_layout_drawn_as_form(self):
+        """Test static layout is emitted once as a form XObject"""
+        from common.receipt_generator import STATIC_LAYOUT_FORM_NAME
+
+        with patch("common.receipt_generator.canvas.Canvas") as mock_canvas:
+            mock_canvas_instance = MagicMock()
+            mock_canvas.return_value = mock_canvas_instance
+
+            generate_receipt_pdf(
+                transaction_result={"id": "txn_form", "status": "captured"},
+                cart_mandate=None,
+                payment_mandate={"payment_method": {}, "amount": {"value": 1000, "currency": "JPY"}},
+                user_name="Form User"
+            )
+
+            mock_canvas_instance.beginForm.assert_called_once_with(STATIC_LAYOUT_FORM_NAME)
+            mock_canvas_instance.doForm.assert_called_once_with(STATIC_LAYOUT_FORM_NAME)
+
+    def test_generate_real_pdf(self):
+        """Test generating an actual PDF document"""
+        result = generate_receipt_pdf(
+            transaction_result={"id": "txn_real", "status": "captured"},
+            cart_mandate=None,
+            payment_mandate={"payment_method": {"brand": "visa", "last4": "4242"}},
+            user_name="Real User"
+        )
+
+        assert result.getvalue().startswith(b"%PDF")
@@ -217,6 +217,43 @@ class TestRedisSetOperation:
             assert result is True
 
 
+class TestRedisSetIfAbsentOperation:
+    """Test Redis SET NX operations"""
+
+    @pytest.mark.asyncio
+    async def test_set_if_absent_stored(self):
+        """Test SET NX stores JSON value with TTL"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.set.return_value = True
+        client.client = mock_redis
+
+        result = await client.set_if_absent("lock_key", {"state": "in_flight"}, ttl_seconds=60)
+
+        mock_redis.set.assert_called_once_with("lock_key", '{"state": "in_flight"}', ex=60, nx=True)
+        assert result is True
+
+    @pytest.mark.asyncio
+    async def test_set_if_absent_existing_key(self):
+        """Test SET NX returns False when key exists"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.set.return_value = None
+        client.client = mock_redis
+
+        assert await client.set_if_absent("lock_key", "value", ttl_seconds=60) is False
+
+    @pytest.mark.asyncio
+    async def test_set_if_absent_error_handling(self):
+        """Test SET NX returns None on Redis error"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.set.side_effect = Exception("Redis error")
+        client.client = mock_redis
+
+        assert await client.set_if_absent("lock_key", "value", ttl_seconds=60) is None
+
+
 class TestRedisGetOperation:
     """Test Redis GET operations"""
 
@@ -557,6 +594,116 @@ class TestRedisKeysOperation:
         assert result == []
 
 
+class TestRedisBatchAndSortedSetOperations:
+    """Test Redis MGET, multi-key DELETE and sorted set operations"""
+
+    @pytest.mark.asyncio
+    async def test_mget_parses_json(self):
+        """Test MGET returns parsed values in key order"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.mget.return_value = ['{"a": 1}', None, "plain"]
+        client.client = mock_redis
+
+        result = await client.mget(["k1", "k2", "k3"])
+
+        mock_redis.mget.assert_called_once_with(["k1", "k2", "k3"])
+        assert result == [{"a": 1}, None, "plain"]
+
+    @pytest.mark.asyncio
+    async def test_mget_empty_and_error(self):
+        """Test MGET with no keys and on Redis error"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.mget.side_effect = Exception("Redis error")
+        client.client = mock_redis
+
+        assert await client.mget([]) == []
+        assert await client.mget(["k1", "k2"]) == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_delete_many(self):
+        """Test deleting multiple keys in one call"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.delete.return_value = 2
+        client.client = mock_redis
+
+        assert await client.delete_many(["k1", "k2", "k3"]) == 2
+        mock_redis.delete.assert_called_once_with("k1", "k2", "k3")
+        assert await client.delete_many([]) == 0
+
+    @pytest.mark.asyncio
+    async def test_zadd_with_ttl_only_extends_expiry(self):
+        """Test ZADD sets TTL with NX and extends it with GT"""
+        client = RedisClient()
+        mock_pipe = MagicMock()
+        mock_pipe.execute = AsyncMock(return_value=[1, True, False])
+        mock_pipe.__aenter__ = AsyncMock(return_value=mock_pipe)
+        mock_pipe.__aexit__ = AsyncMock(return_value=False)
+        mock_redis = MagicMock()
+        mock_redis.pipeline.return_value = mock_pipe
+        client.client = mock_redis
+
+        assert await client.zadd("idx", {"tok": 100}, ttl_seconds=60) is True
+
+        mock_pipe.zadd.assert_called_once_with("idx", {"tok": 100})
+        mock_pipe.expire.assert_any_call("idx", 60, nx=True)
+        mock_pipe.expire.assert_any_call("idx", 60, gt=True)
+
+    @pytest.mark.asyncio
+    async def test_zrange_by_score_with_limit(self):
+        """Test ZRANGEBYSCORE passes limit as start/num"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.zrangebyscore.return_value = ["a", "b"]
+        client.client = mock_redis
+
+        assert await client.zrange_by_score("idx", 0, 100, limit=2) == ["a", "b"]
+        mock_redis.zrangebyscore.assert_called_once_with("idx", 0, 100, start=0, num=2)
+
+    @pytest.mark.asyncio
+    async def test_zrem(self):
+        """Test ZREM removes members and skips empty input"""
+        client = RedisClient()
+        mock_redis = AsyncMock()
+        mock_redis.zrem.return_value = 2
+        client.client = mock_redis
+
+        assert await client.zrem("idx", ["a", "b"]) == 2
+        mock_redis.zrem.assert_called_once_with("idx", "a", "b")
+        assert await client.zrem("idx", []) == 0
+
+
+class TestRedisScriptOperation:
+    """Test Lua script execution"""
+
+    @pytest.mark.asyncio
+    async def test_run_script_registers_once(self):
+        """Test script is registered once and reused"""
+        client = RedisClient()
+        mock_script = AsyncMock(return_value="0")
+        mock_redis = MagicMock()
+        mock_redis.register_script.return_value = mock_script
+        client.client = mock_redis
+
+        assert await client.run_script("return 0", keys=["k"], args=[1]) == "0"
+        assert await client.run_script("return 0", keys=["k"], args=[2]) == "0"
+
+        mock_redis.register_script.assert_called_once_with("return 0")
+        mock_script.assert_called_with(keys=["k"], args=[2])
+
+    @pytest.mark.asyncio
+    async def test_run_script_error_returns_none(self):
+        """Test script errors return None"""
+        client = RedisClient()
+        mock_redis = MagicMock()
+        mock_redis.register_script.return_value = AsyncMock(side_effect=Exception("NOSCRIPT"))
+        client.client = mock_redis
+
+        assert await client.run_script("return 0", keys=[], args=[]) is None
+
+
 class TestTokenStore:
     """Test TokenStore functionality"""
 
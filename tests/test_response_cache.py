@@ -0,0 +1,272 @@
+"""
+Tests for Response Cache
+
+Tests cover:
+- ETag helpers (compute_etag, etag_matches, build_json_response 304)
+- ResponseCache (fresh hit, stale-while-revalidate, conditional revalidation,
+  expired refresh, request coalescing, cancellation isolation, LRU eviction, invalidation)
+- CatalogNotifier (merchant product change notifications with the shared token)
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from common.response_cache import (
+    ResponseCache,
+    build_json_response,
+    compute_etag,
+    etag_matches,
+)
+from services.merchant.utils.catalog_notifier import CatalogNotifier
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeUpstream:
+    """Upstream that honours If-None-Match like the merchant agent /search"""
+
+    def __init__(self, content=b'{"products":[]}'):
+        self.content = content
+        self.requests = []
+        self.delay = 0.0
+        self.fail = False
+
+    async def fetch(self, etag):
+        self.requests.append(etag)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise httpx.ConnectError("down")
+        current = compute_etag(self.content)
+        if etag == current:
+            return None
+        return self.content, current
+
+
+def make_cache(**kwargs):
+    clock = FakeClock()
+    cache = ResponseCache("test", ttl_seconds=10, stale_seconds=60, clock=clock, **kwargs)
+    return cache, clock
+
+
+class TestETagHelpers:
+    def test_compute_etag_is_quoted_content_hash(self):
+        etag = compute_etag(b"abc")
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag == compute_etag(b"abc") != compute_etag(b"abd")
+
+    def test_etag_matches(self):
+        etag = compute_etag(b"abc")
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+        assert not etag_matches('"other"', etag)
+
+    def test_build_json_response(self):
+        response = build_json_response({"products": [{"name": "むぎぼー"}], "total": 1})
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert etag == compute_etag(response.body)
+        assert "むぎぼー".encode() in response.body
+
+        not_modified = build_json_response({"products": [{"name": "むぎぼー"}], "total": 1}, etag)
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+
+
+class TestResponseCache:
+    @pytest.mark.asyncio
+    async def test_miss_then_fresh_hit(self):
+        cache, clock = make_cache()
+        upstream = FakeUpstream()
+
+        first = await cache.get_or_fetch(("", 10), upstream.fetch)
+        clock.now = 5
+        second = await cache.get_or_fetch(("", 10), upstream.fetch)
+
+        assert first.content == second.content == upstream.content
+        assert upstream.requests == [None]
+        assert cache.stats["miss"] == 1 and cache.stats["hit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate_uses_conditional_request(self):
+        cache, clock = make_cache()
+        upstream = FakeUpstream()
+        entry = await cache.get_or_fetch("key", upstream.fetch)
+
+        clock.now = 20
+        stale = await cache.get_or_fetch("key", upstream.fetch)
+        assert stale is entry
+        await cache.drain()
+
+        # Revalidated with If-None-Match, and the 304 extends freshness
+        assert upstream.requests == [None, entry.etag]
+        assert cache.stats["stale"] == 1 and cache.stats["not_modified"] == 1
+        clock.now = 25
+        await cache.get_or_fetch("key", upstream.fetch)
+        assert cache.stats["hit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_revalidation_picks_up_changes(self):
+        cache, clock = make_cache()
+        upstream = FakeUpstream()
+        await cache.get_or_fetch("key", upstream.fetch)
+
+        upstream.content = b'{"products":[1]}'
+        clock.now = 20
+        await cache.get_or_fetch("key", upstream.fetch)
+        await cache.drain()
+
+        refreshed = await cache.get_or_fetch("key", upstream.fetch)
+        assert refreshed.content == b'{"products":[1]}'
+
+    @pytest.mark.asyncio
+    async def test_background_revalidation_failure_keeps_entry(self):
+        cache, clock = make_cache()
+        upstream = FakeUpstream()
+        entry = await cache.get_or_fetch("key", upstream.fetch)
+
+        upstream.fail = True
+        clock.now = 20
+        assert await cache.get_or_fetch("key", upstream.fetch) is entry
+        await cache.drain()
+        assert len(cache) == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_waits_for_upstream(self):
+        cache, clock = make_cache()
+        upstream = FakeUpstream()
+        await cache.get_or_fetch("key", upstream.fetch)
+
+        upstream.fail = True
+        clock.now = 100
+        with pytest.raises(httpx.ConnectError):
+            await cache.get_or_fetch("key", upstream.fetch)
+        assert cache.stats["expired"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_are_coalesced(self):
+        cache, _ = make_cache()
+        upstream = FakeUpstream()
+        upstream.delay = 0.01
+
+        results = await asyncio.gather(*(cache.get_or_fetch("key", upstream.fetch) for _ in range(5)))
+        assert len(upstream.requests) == 1
+        assert all(r.content == upstream.content for r in results)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_failure(self):
+        cache, _ = make_cache()
+        upstream = FakeUpstream()
+        upstream.delay = 0.01
+        upstream.fail = True
+
+        results = await asyncio.gather(
+            *(cache.get_or_fetch("key", upstream.fetch) for _ in range(3)), return_exceptions=True
+        )
+        assert len(upstream.requests) == 1
+        assert all(isinstance(r, httpx.ConnectError) for r in results)
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_waiters(self):
+        cache, _ = make_cache()
+        upstream = FakeUpstream()
+        upstream.delay = 0.02
+
+        leader = asyncio.ensure_future(cache.get_or_fetch("key", upstream.fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_fetch("key", upstream.fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert (await waiter).content == upstream.content
+        assert leader.cancelled()
+        assert len(upstream.requests) == 1
+        assert len(cache) == 1
+
+    @pytest.mark.asyncio
+    async def test_background_revalidation_task_is_tracked(self):
+        cache, clock = make_cache()
+        upstream = FakeUpstream()
+        await cache.get_or_fetch("key", upstream.fetch)
+
+        upstream.delay = 0.01
+        clock.now = 20
+        await cache.get_or_fetch("key", upstream.fetch)
+        assert len(cache._tasks) == 1
+        await cache.drain()
+        assert not cache._tasks and not cache._inflight
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        cache, _ = make_cache(max_entries=2)
+        upstream = FakeUpstream()
+        await cache.get_or_fetch("a", upstream.fetch)
+        await cache.get_or_fetch("b", upstream.fetch)
+        await cache.get_or_fetch("a", upstream.fetch)
+        await cache.get_or_fetch("c", upstream.fetch)
+
+        assert len(cache) == 2
+        await cache.get_or_fetch("a", upstream.fetch)
+        assert cache.stats["hit"] == 2
+        await cache.get_or_fetch("b", upstream.fetch)
+        assert cache.stats["miss"] == 4
+
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_entries_and_inflight_results(self):
+        cache, _ = make_cache()
+        upstream = FakeUpstream()
+        await cache.get_or_fetch("a", upstream.fetch)
+        assert cache.invalidate() == 1
+        assert len(cache) == 0
+
+        # A fetch that started before invalidation must not repopulate the cache
+        upstream.delay = 0.01
+        pending = asyncio.ensure_future(cache.get_or_fetch("b", upstream.fetch))
+        await asyncio.sleep(0)
+        cache.invalidate()
+        await pending
+        assert len(cache) == 0
+
+
+class TestCatalogNotifier:
+    @pytest.mark.asyncio
+    async def test_notifies_all_urls(self):
+        received = []
+
+        def handler(request):
+            received.append((str(request.url), request.content))
+            assert request.headers["X-Invalidation-Token"] == "secret"
+            return httpx.Response(200, json={"status": "invalidated"})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            notifier = CatalogNotifier(client, urls=["http://a/invalidate", "http://b/invalidate"], token="secret")
+            notifier.notify("product.updated", "prod_001")
+            await notifier.drain()
+
+        assert sorted(url for url, _ in received) == ["http://a/invalidate", "http://b/invalidate"]
+        assert b'"product_id":"prod_001"' in received[0][1].replace(b" ", b"")
+
+    @pytest.mark.asyncio
+    async def test_failures_are_swallowed(self):
+        def handler(request):
+            raise httpx.ConnectError("down")
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            notifier = CatalogNotifier(client, urls=["http://a/invalidate"])
+            notifier.notify("product.deleted", "prod_001")
+            await notifier.drain()
+
+    def test_no_urls_is_noop(self):
+        notifier = CatalogNotifier(http_client=None, urls=[])
+        notifier.notify("product.created", "prod_001")
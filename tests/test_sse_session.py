@@ -0,0 +1,215 @@
+"""
+Tests for SSE Session Layer
+
+Tests cover:
+- Event IDs and ring buffer (parse_event_id, resume after seq, gap detection)
+- Backpressure (producer waits for the slowest connected subscriber, and for the
+  last disconnected subscriber while nobody is connected)
+- Cancellation of abandoned runs after the grace period
+- SSESessionManager (owner check, per-owner run cap, pruning, EventSourceResponse integration)
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI, Header
+from sse_starlette.sse import EventSourceResponse
+
+from common.sse_session import SSERun, SSESessionManager, StreamGapError, TooManyRunsError, parse_event_id
+
+
+async def produce(count, delay=0.0):
+    for i in range(count):
+        if delay:
+            await asyncio.sleep(delay)
+        yield json.dumps({"i": i})
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestParseEventId:
+    def test_valid(self):
+        assert parse_event_id("abc123:7") == ("abc123", 7)
+
+    @pytest.mark.parametrize("value", [None, "", "abc", "abc:", ":3", "abc:x"])
+    def test_invalid(self, value):
+        assert parse_event_id(value) is None
+
+
+class TestSSERun:
+    @pytest.mark.asyncio
+    async def test_subscribe_from_start_and_resume(self):
+        manager = SSESessionManager(buffer_size=16)
+        run = manager.start(produce(5))
+        events = await collect(run.subscribe())
+        assert [seq for seq, _ in events] == [1, 2, 3, 4, 5]
+        assert json.loads(events[0][1]) == {"i": 0}
+
+        resumed = await collect(run.subscribe(after_seq=3))
+        assert [seq for seq, _ in resumed] == [4, 5]
+
+    @pytest.mark.asyncio
+    async def test_gap_when_events_evicted(self):
+        run = SSERun("run", buffer_size=2)
+        run.task = asyncio.create_task(run.run(produce(5)))
+        assert [seq for seq, _ in await collect(run.subscribe())] == [1, 2, 3, 4, 5]
+        assert [seq for seq, _ in run.events] == [4, 5]
+
+        with pytest.raises(StreamGapError):
+            await collect(run.subscribe(after_seq=1))
+        assert [seq for seq, _ in await collect(run.subscribe(after_seq=3))] == [4, 5]
+
+    @pytest.mark.asyncio
+    async def test_backpressure_waits_for_slow_subscriber(self):
+        run = SSERun("run", buffer_size=2)
+        subscription = run.subscribe()
+        # Register the subscriber (blocks waiting for the first event)
+        first = asyncio.ensure_future(subscription.__anext__())
+        await asyncio.sleep(0)
+        run.task = asyncio.create_task(run.run(produce(10)))
+        await asyncio.sleep(0.05)
+        assert first.done()
+
+        # The subscriber has not consumed anything yet, so the producer stops at the buffer size
+        assert not run.done
+        assert run.last_seq == 2
+
+        rest = await collect(subscription)
+        assert [seq for seq, _ in rest] == list(range(2, 11))
+        assert run.done
+
+    @pytest.mark.asyncio
+    async def test_production_pauses_while_disconnected(self):
+        """Production stops one buffer ahead of the last disconnected subscriber, so a late resume has no gap"""
+        manager = SSESessionManager(buffer_size=4, cancel_grace_seconds=5)
+        run = manager.start(produce(20))
+
+        subscription = run.subscribe()
+        seq, _ = await subscription.__anext__()
+        await subscription.aclose()
+        await asyncio.sleep(0.05)
+
+        assert not run.done
+        assert run.last_seq <= seq + 4
+        resumed = await collect(run.subscribe(after_seq=seq))
+        assert [s for s, _ in resumed] == list(range(seq + 1, 21))
+
+    @pytest.mark.asyncio
+    async def test_cancel_after_grace_when_abandoned(self):
+        manager = SSESessionManager(cancel_grace_seconds=0.05)
+        run = manager.start(produce(100, delay=0.01))
+
+        subscription = run.subscribe()
+        await subscription.__anext__()
+        await subscription.aclose()
+
+        await asyncio.sleep(0.2)
+        assert run.done and run.cancelled
+        assert run.last_seq < 100
+
+    @pytest.mark.asyncio
+    async def test_resubscribe_within_grace_keeps_run(self):
+        manager = SSESessionManager(cancel_grace_seconds=0.05)
+        run = manager.start(produce(10, delay=0.01))
+
+        subscription = run.subscribe()
+        seq, _ = await subscription.__anext__()
+        await subscription.aclose()
+
+        resumed = await collect(run.subscribe(after_seq=seq))
+        assert [s for s, _ in resumed] == list(range(seq + 1, 11))
+        assert not run.cancelled
+
+    @pytest.mark.asyncio
+    async def test_cancel_when_never_subscribed(self):
+        manager = SSESessionManager(cancel_grace_seconds=0.02)
+        run = manager.start(produce(100, delay=0.01))
+        await asyncio.sleep(0.1)
+        assert run.cancelled
+
+
+class TestSSESessionManager:
+    @pytest.mark.asyncio
+    async def test_resume_checks_owner(self):
+        manager = SSESessionManager()
+        run = manager.start(produce(1), owner="user_1")
+        await run.task
+
+        assert manager.resume(f"{run.run_id}:1", owner="user_1") == (run, 1)
+        assert manager.resume(f"{run.run_id}:1", owner="user_2") is None
+        assert manager.resume("unknown:1", owner="user_1") is None
+        assert manager.resume("garbage", owner="user_1") is None
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_ids_and_gap_error(self):
+        manager = SSESessionManager(buffer_size=2)
+        run = manager.start(produce(4))
+        await collect(manager.stream(run))
+
+        events = await collect(manager.stream(run, after_seq=2))
+        assert [e["id"] for e in events] == [f"{run.run_id}:3", f"{run.run_id}:4"]
+
+        gap = await collect(manager.stream(run, after_seq=0))
+        assert len(gap) == 1 and "id" not in gap[0]
+        assert json.loads(gap[0]["data"])["type"] == "error"
+
+    @pytest.mark.asyncio
+    async def test_max_runs_per_owner(self):
+        manager = SSESessionManager(max_runs_per_owner=2)
+        first = manager.start(produce(100, delay=0.01), owner="user_1")
+        manager.start(produce(100, delay=0.01), owner="user_1")
+
+        with pytest.raises(TooManyRunsError):
+            manager.start(produce(1), owner="user_1")
+        other = manager.start(produce(1), owner="user_2")
+        await other.task
+
+        # 完了・キャンセルされた実行は数えない
+        first.task.cancel()
+        await asyncio.gather(first.task, return_exceptions=True)
+        assert manager.start(produce(1), owner="user_1").owner == "user_1"
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_prune_retention_and_max_runs(self):
+        manager = SSESessionManager(retention_seconds=0.0, max_runs=2)
+        first = manager.start(produce(1))
+        await first.task
+        await asyncio.sleep(0.01)
+        second = manager.start(produce(1))
+        assert manager.get(first.run_id) is None
+
+        manager.retention_seconds = 60
+        await second.task
+        third = manager.start(produce(1))
+        fourth = manager.start(produce(1))
+        assert manager.get(second.run_id) is None
+        assert manager.get(third.run_id) is third and manager.get(fourth.run_id) is fourth
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_event_source_response_resume(self):
+        manager = SSESessionManager()
+        app = FastAPI()
+
+        @app.post("/stream")
+        async def stream(last_event_id: Optional[str] = Header(None)):
+            if last_event_id:
+                run, after_seq = manager.resume(last_event_id)
+                return EventSourceResponse(manager.stream(run, after_seq))
+            return EventSourceResponse(manager.stream(manager.start(produce(3))))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/stream")
+            ids = [line[4:] for line in response.text.splitlines() if line.startswith("id: ")]
+            assert len(ids) == 3
+
+            resumed = await client.post("/stream", headers={"Last-Event-ID": ids[0]})
+            data = [json.loads(line[6:]) for line in resumed.text.splitlines() if line.startswith("data: ")]
+            assert data == [{"i": 1}, {"i": 2}]
@@ -0,0 +1,126 @@
+"""
+Tests for startup time optimizations
+
+- 重いモジュール（LangChain/LangGraph、OTLPエクスポーター、fido2、numpy）がサービスのimport時に読み込まれないこと
+- Langfuseの遅延初期化（common/langfuse_support.py）
+- import時間ベンチマーク（scripts/bench_startup.py）のimporttime出力パース
+"""
+
+import json
+import subprocess
+import sys
+import types
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from common import langfuse_support
+from scripts.bench_startup import parse_importtime
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def loaded_modules(module: str, candidates):
+    """別プロセスでmoduleをimportし、candidatesのうち読み込まれたモジュールを返す"""
+    code = (
+        "import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps([name for name in {list(candidates)!r} if name in sys.modules]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestLazyImports:
+    """サービスモジュールのimportで重い依存が読み込まれないこと"""
+
+    def test_telemetry_does_not_import_exporters(self):
+        assert loaded_modules(
+            "common.telemetry",
+            ["opentelemetry.exporter.otlp.proto.grpc.trace_exporter", "opentelemetry.instrumentation.fastapi"]
+        ) == []
+
+    def test_merchant_agent_does_not_import_langgraph(self):
+        assert loaded_modules(
+            "services.merchant_agent.agent",
+            ["langchain_openai", "langgraph", "langfuse", "services.merchant_agent.langgraph_merchant"]
+        ) == []
+
+    def test_credential_provider_does_not_import_fido2(self):
+        assert loaded_modules("services.credential_provider.provider", ["fido2"]) == []
+
+    def test_shopping_agent_mcp_defers_signing_and_risk_modules(self):
+        assert loaded_modules(
+            "services.shopping_agent_mcp.main", ["numpy", "common.risk_assessment", "common.a2a_handler"]
+        ) == []
+
+
+class TestLangfuseSupport:
+    """Langfuseの遅延初期化"""
+
+    @pytest.fixture(autouse=True)
+    def reset(self):
+        langfuse_support.reset_langfuse()
+        yield
+        langfuse_support.reset_langfuse()
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(langfuse_support, "LANGFUSE_ENABLED", False)
+
+        assert langfuse_support.is_langfuse_enabled() is False
+        assert langfuse_support.get_langfuse_client() is None
+        assert langfuse_support.get_callback_handler_class() is None
+        langfuse_support.flush_langfuse()
+
+    def test_initializes_once_on_first_use(self, monkeypatch):
+        client = Mock()
+        langfuse_class = Mock(return_value=client)
+        handler_class = type("CallbackHandler", (), {})
+        monkeypatch.setitem(sys.modules, "langfuse", types.SimpleNamespace(Langfuse=langfuse_class))
+        monkeypatch.setitem(sys.modules, "langfuse.langchain", types.SimpleNamespace(CallbackHandler=handler_class))
+        monkeypatch.setattr(langfuse_support, "LANGFUSE_ENABLED", True)
+
+        assert langfuse_class.call_count == 0
+        assert langfuse_support.get_langfuse_client() is client
+        assert langfuse_support.get_callback_handler_class() is handler_class
+        assert langfuse_support.is_langfuse_enabled() is True
+        assert langfuse_class.call_count == 1
+
+        langfuse_support.flush_langfuse()
+        client.flush.assert_called_once()
+
+    def test_initialization_failure_disables_tracing(self, monkeypatch):
+        langfuse_class = Mock(side_effect=RuntimeError("bad credentials"))
+        monkeypatch.setitem(sys.modules, "langfuse", types.SimpleNamespace(Langfuse=langfuse_class))
+        monkeypatch.setitem(sys.modules, "langfuse.langchain", types.SimpleNamespace(CallbackHandler=object))
+        monkeypatch.setattr(langfuse_support, "LANGFUSE_ENABLED", True)
+
+        assert langfuse_support.is_langfuse_enabled() is False
+        assert langfuse_support.get_callback_handler_class() is None
+        langfuse_support.get_langfuse_client()
+        assert langfuse_class.call_count == 1
+
+
+class TestImportTimeParsing:
+    """scripts/bench_startup.pyのimporttime出力パース"""
+
+    def test_parse_importtime(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   _io",
+            "import time:      2000 |       5000 |     sqlalchemy.sql",
+            "import time:      1000 |       9000 |   sqlalchemy",
+            "import time:       300 |      12000 | common.database",
+            "Traceback (most recent call last):",
+        ])
+
+        assert parse_importtime(output) == [
+            ("_io", 120, 120, 1),
+            ("sqlalchemy.sql", 2000, 5000, 2),
+            ("sqlalchemy", 1000, 9000, 1),
+            ("common.database", 300, 12000, 0),
+        ]
@@ -367,11 +367,11 @@ class TestSetupTelemetry:
 
         # Mock OpenTelemetry components
         with patch('common.telemetry.trace.get_tracer_provider') as mock_get_provider, \
-             patch('common.telemetry.TracerProvider') as mock_tracer_provider_class, \
-             patch('common.telemetry.OTLPSpanExporter') as mock_exporter_class, \
-             patch('common.telemetry.BatchSpanProcessor') as mock_processor_class, \
+             patch('opentelemetry.sdk.trace.TracerProvider') as mock_tracer_provider_class, \
+             patch('opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter') as mock_exporter_class, \
+             patch('opentelemetry.sdk.trace.export.BatchSpanProcessor') as mock_processor_class, \
              patch('common.telemetry.trace.set_tracer_provider') as mock_set_provider, \
-             patch('common.telemetry.Resource') as mock_resource_class:
+             patch('opentelemetry.sdk.resources.Resource') as mock_resource_class:
 
             # Mock get_tracer_provider to return ProxyTracerProvider (uninitialized state)
             mock_existing = MagicMock()
@@ -414,12 +414,12 @@ class TestSetupTelemetry:
         monkeypatch.setenv('OTEL_ENABLED', 'true')
 
         with patch('common.telemetry.trace.get_tracer_provider') as mock_get_provider, \
-             patch('common.telemetry.TracerProvider') as mock_tracer_provider_class, \
-             patch('common.telemetry.OTLPSpanExporter'), \
-             patch('common.telemetry.BatchSpanProcessor'), \
+             patch('opentelemetry.sdk.trace.TracerProvider') as mock_tracer_provider_class, \
+             patch('opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter'), \
+             patch('opentelemetry.sdk.trace.export.BatchSpanProcessor'), \
              patch('common.telemetry.trace.set_tracer_provider'), \
-             patch('common.telemetry.Resource') as mock_resource_class, \
-             patch('common.telemetry.SERVICE_NAME', 'service.name'):
+             patch('opentelemetry.sdk.resources.Resource') as mock_resource_class, \
+             patch('opentelemetry.sdk.resources.SERVICE_NAME', 'service.name'):
 
             mock_existing = MagicMock()
             mock_existing.__class__ = trace.ProxyTracerProvider
@@ -444,8 +444,8 @@ class TestSetupTelemetry:
         monkeypatch.setenv('OTEL_ENABLED', 'true')
 
         with patch('common.telemetry.trace.get_tracer_provider') as mock_get_provider, \
-             patch('common.telemetry.OTLPSpanExporter') as mock_exporter_class, \
-             patch('common.telemetry.BatchSpanProcessor') as mock_processor_class:
+             patch('opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter') as mock_exporter_class, \
+             patch('opentelemetry.sdk.trace.export.BatchSpanProcessor') as mock_processor_class:
 
             # Mock existing provider (not NoOp or Proxy) - use real TracerProvider class
             mock_existing = MagicMock()
@@ -487,11 +487,11 @@ class TestSetupTelemetry:
         monkeypatch.setenv('OTEL_EXPORTER_OTLP_INSECURE', 'false')
 
         with patch('common.telemetry.trace.get_tracer_provider') as mock_get_provider, \
-             patch('common.telemetry.TracerProvider') as mock_tracer_provider_class, \
-             patch('common.telemetry.OTLPSpanExporter') as mock_exporter_class, \
-             patch('common.telemetry.BatchSpanProcessor'), \
+             patch('opentelemetry.sdk.trace.TracerProvider') as mock_tracer_provider_class, \
+             patch('opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter') as mock_exporter_class, \
+             patch('opentelemetry.sdk.trace.export.BatchSpanProcessor'), \
              patch('common.telemetry.trace.set_tracer_provider'), \
-             patch('common.telemetry.Resource'):
+             patch('opentelemetry.sdk.resources.Resource'):
 
             mock_existing = MagicMock()
             mock_existing.__class__ = trace.ProxyTracerProvider
@@ -514,8 +514,8 @@ class TestSetupTelemetry:
         monkeypatch.setenv('OTEL_ENABLED', 'true')
 
         with patch('common.telemetry.trace.get_tracer_provider') as mock_get_provider, \
-             patch('common.telemetry.OTLPSpanExporter') as mock_exporter_class, \
-             patch('common.telemetry.BatchSpanProcessor') as mock_processor_class:
+             patch('opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter') as mock_exporter_class, \
+             patch('opentelemetry.sdk.trace.export.BatchSpanProcessor') as mock_processor_class:
 
             # Mock existing provider without resource attribute
             mock_existing = MagicMock()
@@ -545,8 +545,8 @@ class TestSetupTelemetry:
         monkeypatch.setenv('OTEL_ENABLED', 'true')
 
         with patch('common.telemetry.trace.get_tracer_provider') as mock_get_provider, \
-             patch('common.telemetry.OTLPSpanExporter') as mock_exporter_class, \
-             patch('common.telemetry.BatchSpanProcessor') as mock_processor_class:
+             patch('opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter') as mock_exporter_class, \
+             patch('opentelemetry.sdk.trace.export.BatchSpanProcessor') as mock_processor_class:
 
             # Mock existing provider with resource
             mock_existing = MagicMock()
@@ -581,7 +581,7 @@ class TestInstrumentFastAPIApp:
 
         mock_app = MagicMock()
 
-        with patch('common.telemetry.FastAPIInstrumentor') as mock_instrumentor:
+        with patch('opentelemetry.instrumentation.fastapi.FastAPIInstrumentor') as mock_instrumentor:
             instrument_fastapi_app(mock_app)
 
             # Should not instrument when disabled
@@ -598,7 +598,7 @@ class TestInstrumentFastAPIApp:
         if hasattr(mock_app, '_is_instrumented_by_opentelemetry'):
             delattr(mock_app, '_is_instrumented_by_opentelemetry')
 
-        with patch('common.telemetry.FastAPIInstrumentor') as mock_instrumentor_class:
+        with patch('opentelemetry.instrumentation.fastapi.FastAPIInstrumentor') as mock_instrumentor_class:
             mock_instrumentor = MagicMock()
             mock_instrumentor_class.return_value = mock_instrumentor
             mock_instrumentor_class.instrument_app = MagicMock()
@@ -619,7 +619,7 @@ class TestInstrumentFastAPIApp:
         mock_app = MagicMock()
         mock_app._is_instrumented_by_opentelemetry = True
 
-        with patch('common.telemetry.FastAPIInstrumentor') as mock_instrumentor:
+        with patch('opentelemetry.instrumentation.fastapi.FastAPIInstrumentor') as mock_instrumentor:
             instrument_fastapi_app(mock_app)
 
             # Should skip instrumentation
@@ -634,7 +634,7 @@ class TestInstrumentFastAPIApp:
 
         mock_app = MagicMock()
 
-        with patch('common.telemetry.FastAPIInstrumentor.instrument_app', side_effect=Exception("Test error")):
+        with patch('opentelemetry.instrumentation.fastapi.FastAPIInstrumentor.instrument_app', side_effect=Exception("Test error")):
             # Should not raise exception
             instrument_fastapi_app(mock_app)
 
@@ -648,7 +648,7 @@ class TestInstrumentFastAPIApp:
         # Make add_middleware raise an exception
         mock_app.add_middleware.side_effect = Exception("Middleware error")
 
-        with patch('common.telemetry.FastAPIInstrumentor.instrument_app'):
+        with patch('opentelemetry.instrumentation.fastapi.FastAPIInstrumentor.instrument_app'):
             # Should not raise exception
             instrument_fastapi_app(mock_app)
 
@@ -945,44 +945,140 @@ class TestAddRequestResponseToSpan:
                           if call[0][0] == "http.response.body.error"]
             assert len(error_calls) > 0
 
+    def test_middleware_request_body_can_be_reread(self):
+        """Test the handler still receives the request body after the middleware read it"""
+        from fastapi import FastAPI, Request
+        from fastapi.testclient import TestClient
+        from starlette.middleware.base import BaseHTTPMiddleware
+        from common.telemetry import _add_request_response_to_span
+
+        app = FastAPI()
+        app.add_middleware(BaseHTTPMiddleware, dispatch=_add_request_response_to_span)
+
+        @app.post("/echo")
+        async def echo(request: Request):
+            return await request.json()
+
+        request_body = {"username": "test_user", "password": "secret123"}
+        with patch('common.telemetry.trace.get_current_span') as mock_get_span:
+            mock_span = MagicMock()
+            mock_span.is_recording.return_value = True
+            mock_get_span.return_value = mock_span
+
+            response = TestClient(app).post("/echo", json=request_body)
+
+        assert response.json() == request_body
+        mock_span.set_attribute.assert_any_call(
+            "http.request.body", '{"username":"test_user","password":"[REDACTED]"}'
+        )
+
     @pytest.mark.asyncio
-    async def test_middleware_request_body_can_be_reread(self):
-        """Test middleware allows request body to be re-read"""
+    async def test_middleware_skips_body_when_span_not_sampled(self):
+        """Test middleware does not read bodies for spans that are not sampled"""
         from common.telemetry import _add_request_response_to_span
 
         mock_request = MagicMock()
         mock_request.method = "POST"
         mock_request.headers = {"content-type": "application/json"}
-
-        request_body = {"username": "test_user", "data": "test_data"}
-        body_bytes = json.dumps(request_body).encode('utf-8')
-        mock_request.body = AsyncMock(return_value=body_bytes)
+        mock_request.body = AsyncMock(return_value=b'{"password": "secret123"}')
 
         mock_response = MagicMock()
-
-        # Track if _receive was set
-        receive_was_set = False
+        mock_response.headers = {"content-type": "application/json"}
+        mock_response.body = b'{"status": "success"}'
 
         async def mock_call_next(request):
-            nonlocal receive_was_set
-            # Check if _receive attribute was set and can be called
-            if hasattr(request, '_receive'):
-                receive_was_set = True
-                # Call the receive function to test line 241
-                result = await request._receive()
-                # Verify the receive function returns the expected format
-                assert result["type"] == "http.request"
-                assert result["body"] == body_bytes
             return mock_response
 
         with patch('common.telemetry.trace.get_current_span') as mock_get_span:
             mock_span = MagicMock()
             mock_span.is_recording.return_value = True
+            mock_span.get_span_context.return_value.trace_flags.sampled = False
             mock_get_span.return_value = mock_span
 
-            response = await _add_request_response_to_span(mock_request, mock_call_next)
+            await _add_request_response_to_span(mock_request, mock_call_next)
 
-            # Verify response was returned
-            assert response == mock_response
-            # Verify _receive was set and tested
-            assert receive_was_set
+        mock_request.body.assert_not_called()
+        attributes = [call[0][0] for call in mock_span.set_attribute.call_args_list]
+        assert attributes == ["http.response.duration_ms"]
+
+
+class TestJsonBodyMasker:
+    """Test JsonBodyMasker (byte-level masking without re-serialization)"""
+
+    def mask(self, body):
+        from common.telemetry import JsonBodyMasker, SENSITIVE_KEYS
+        return JsonBodyMasker(SENSITIVE_KEYS).mask(body)
+
+    def test_matches_recursive_masking(self):
+        """Test result matches _mask_sensitive_data for nested objects and arrays"""
+        from common.telemetry import _mask_sensitive_data
+
+        data = {
+            "user": {"name": "Alice", "Password": "p", "tokens": [1, 2]},
+            "items": [{"sku": "A", "api_key": "k"}, {"sku": "B", "nested": {"client_secret": None}}],
+            "access_token": {"value": "t", "expires": 3600, "list": [[1], {"a": "]}"}]},
+            "amount": 1000,
+            "note": "password: not a key",
+            "商品": "日本語",
+        }
+        for ensure_ascii in (True, False):
+            masked = self.mask(json.dumps(data, ensure_ascii=ensure_ascii).encode("utf-8"))
+            assert json.loads(masked) == _mask_sensitive_data(data)
+
+    def test_preserves_original_formatting(self):
+        """Test unmasked ranges are copied byte for byte"""
+        body = b'{ "name" : "caf\\u00e9",\n  "salt":123 , "ok": [true, null] }'
+        assert self.mask(body) == b'{ "name" : "caf\\u00e9",\n  "salt":"[REDACTED]" , "ok": [true, null] }'
+
+    def test_body_without_keywords_is_returned_as_is(self):
+        """Test bodies without sensitive keywords are not copied"""
+        body = json.dumps({"items": [{"sku": "A", "price": 100}]}).encode()
+        assert self.mask(body) is body
+
+    def test_keywords_inside_string_values(self):
+        """Test keywords inside values (including escaped quotes) are not treated as keys"""
+        body = json.dumps({"memo": 'say "password": 1', "secret": 'a\\"b', "next": "token"}).encode()
+        assert json.loads(self.mask(body)) == {"memo": 'say "password": 1', "secret": "[REDACTED]", "next": "token"}
+
+    @pytest.mark.parametrize("body", [
+        b"{invalid json", b'{"a": 1', b'{"a": 1]', b'{"a" 1}', b'{"password": }', b"  ", b'["x"}', b"\xff",
+    ])
+    def test_invalid_json(self, body):
+        """Test malformed JSON returns None"""
+        assert self.mask(body) is None
+
+
+class TestBodyCaptureSampler:
+    """Test BodyCaptureSampler (head sampling of body capture)"""
+
+    def span_context(self, trace_id, sampled=True):
+        return MagicMock(trace_id=trace_id, trace_flags=MagicMock(sampled=sampled))
+
+    def test_rules(self):
+        """Test exact and longest-prefix rules, falling back to the default rate"""
+        from common.telemetry import BodyCaptureSampler
+
+        sampler = BodyCaptureSampler(0.5, "/a2a/message=1.0, /chat/stream=0,/products*=0.1,/products/top*=0.2,bad")
+        assert sampler.rate_for("/a2a/message") == 1.0
+        assert sampler.rate_for("/chat/stream") == 0.0
+        assert sampler.rate_for("/products/123") == 0.1
+        assert sampler.rate_for("/products/top/1") == 0.2
+        assert sampler.rate_for("/health") == 0.5
+
+    def test_deterministic_by_trace_id(self):
+        """Test the decision depends on the low 64 bits of the trace id"""
+        from common.telemetry import BodyCaptureSampler
+
+        sampler = BodyCaptureSampler(0.25)
+        assert sampler.should_capture(self.span_context((1 << 64) + 1), "/")
+        assert not sampler.should_capture(self.span_context(1 << 63), "/")
+
+        captured = sum(sampler.should_capture(self.span_context(i * 0x9E3779B97F4A7C15), "/") for i in range(4000))
+        assert 800 < captured < 1200
+
+    def test_unsampled_span(self):
+        """Test unsampled spans are never captured"""
+        from common.telemetry import BodyCaptureSampler
+
+        assert not BodyCaptureSampler(1.0).should_capture(self.span_context(1, sampled=False), "/")
+        assert not BodyCaptureSampler(0.0).should_capture(self.span_context(1), "/")
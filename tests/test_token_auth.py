@@ -0,0 +1,30 @@
+"""
+Tests for Token Auth (common/token_auth.py)
+
+Tests cover:
+- require_token (match, mismatch, missing header, unset environment variable)
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from common.token_auth import require_token
+
+
+class TestRequireToken:
+    def test_matching_token_is_accepted(self, monkeypatch):
+        monkeypatch.setenv("TEST_ADMIN_TOKEN", "admin-secret")
+        require_token("TEST_ADMIN_TOKEN", "admin-secret")
+
+    @pytest.mark.parametrize("token", [None, "", "wrong"])
+    def test_missing_or_wrong_token_is_rejected(self, monkeypatch, token):
+        monkeypatch.setenv("TEST_ADMIN_TOKEN", "admin-secret")
+        with pytest.raises(HTTPException) as exc_info:
+            require_token("TEST_ADMIN_TOKEN", token)
+        assert exc_info.value.status_code == 403
+        assert exc_info.value.detail == "Admin token required"
+
+    def test_unset_variable_rejects_everything(self, monkeypatch):
+        monkeypatch.delenv("TEST_ADMIN_TOKEN", raising=False)
+        with pytest.raises(HTTPException, match="Invalidation token required"):
+            require_token("TEST_ADMIN_TOKEN", "", detail="Invalidation token required")